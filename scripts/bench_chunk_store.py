@@ -0,0 +1,135 @@
+"""
+Compare keeping chunk text in Pinecone metadata with keeping it in the chunk store.
+
+Indexes the chunks of a synthetic help center into two Pinecone fakes, one
+with full metadata and one with slim metadata plus a ChunkStore, then
+reports upsert payload sizes and the latency and response size of
+knowledge base queries (the query plus, for the store, the text lookup).
+The store shrinks what each query receives; over loopback, with the same
+simulated latency for both fakes, it does not make queries faster.
+
+    python scripts/bench_chunk_store.py --articles 1000 --queries 300 --latency-ms 20
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the repository root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from pinecone import Pinecone
+from src.fakes.corpus import SyntheticCorpus
+from src.fakes.embedding_server import fake_embedding
+from src.fakes.http_server import FaultConfig
+from src.fakes.pinecone_server import FakePineconeServer
+from src.models.article import Article
+from src.services.chunk_store import ChunkStore, slim_metadata
+from src.utils.chunking import chunk_articles
+from src.utils.html_text import html_to_text
+
+QUERIES = [
+    "How do I reset my password?",
+    "Where can I download an invoice?",
+    "How do I set up two-factor authentication?",
+    "Can I export my data?",
+    "How do I add a team member?",
+]
+
+def upsert(index, vectors: list, batch_size: int = 100) -> tuple:
+    """Seconds taken and JSON bytes sent"""
+    sent = 0
+    started = time.perf_counter()
+    for i in range(0, len(vectors), batch_size):
+        batch = vectors[i:i + batch_size]
+        sent += len(json.dumps({"vectors": batch}))
+        index.upsert(vectors=batch)
+    return time.perf_counter() - started, sent
+
+def query(index, store, vector: list, top_k: int) -> tuple:
+    """Seconds taken, metadata bytes received and the content of the matches"""
+    started = time.perf_counter()
+    results = index.query(vector=vector, top_k=top_k, include_metadata=True)
+    stored = store.get_many([match.id for match in results.matches]) if store else {}
+    contents = [(stored.get(match.id) or match.metadata).get("content") for match in results.matches]
+    elapsed = time.perf_counter() - started
+    received = len(json.dumps([{"id": m.id, "score": m.score, "metadata": m.metadata} for m in results.matches]))
+    return elapsed, received, contents
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark slim vector metadata with a local chunk store")
+    parser.add_argument("--articles", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = SyntheticCorpus(size=args.articles, seed=args.seed)
+    articles = [Article(id=a.id, status=a.status, title=html_to_text(a.title), content=html_to_text(a.html),
+                        helpcenter_url=f"https://help.example.com/{a.id}", updated_at=a.updated_at)
+                for a in corpus.ordered()]
+    chunks = chunk_articles(articles)
+    vectors = [fake_embedding(chunk["text"]).tolist() for chunk in chunks]
+    print(f"{len(articles)} articles, {len(chunks)} chunks")
+
+    faults = FaultConfig(latency_ms=args.latency_ms)
+    full_server, slim_server = FakePineconeServer(faults=faults), FakePineconeServer(faults=faults)
+    for server in (full_server, slim_server):
+        server.start()
+    pc = Pinecone(api_key="bench")
+    full_index, slim_index = pc.Index(host=full_server.url), pc.Index(host=slim_server.url)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ChunkStore(f"{directory}/chunks.sqlite3")
+        try:
+            full_seconds, full_bytes = upsert(full_index, [
+                {"id": c["id"], "values": v, "metadata": c["metadata"]} for c, v in zip(chunks, vectors)
+            ])
+            started = time.perf_counter()
+            store.put_many(chunks)
+            store_seconds = time.perf_counter() - started
+            slim_seconds, slim_bytes = upsert(slim_index, [
+                {"id": c["id"], "values": v, "metadata": slim_metadata(c["metadata"])} for c, v in zip(chunks, vectors)
+            ])
+            metadata_bytes = sum(len(json.dumps(c["metadata"])) for c in chunks)
+            slim_metadata_bytes = sum(len(json.dumps(slim_metadata(c["metadata"]))) for c in chunks)
+            print("Upsert:")
+            print(f"  full metadata   {full_seconds:6.2f}s  {full_bytes / 1e6:7.2f}MB sent  "
+                  f"(metadata {metadata_bytes / 1e6:.2f}MB)")
+            print(f"  slim + store    {slim_seconds + store_seconds:6.2f}s  {slim_bytes / 1e6:7.2f}MB sent  "
+                  f"(metadata {slim_metadata_bytes / 1e6:.2f}MB, store write {store_seconds * 1000:.0f}ms)")
+
+            timings = {"full": [], "slim": []}
+            received = {"full": 0, "slim": 0}
+            for i in range(args.queries):
+                vector = fake_embedding(QUERIES[i % len(QUERIES)] + f" {i}").tolist()
+                full = query(full_index, None, vector, args.top_k)
+                slim = query(slim_index, store, vector, args.top_k)
+                if full[2] != slim[2]:
+                    print(f"Query {i} returned different text")
+                    sys.exit(1)
+                for name, result in (("full", full), ("slim", slim)):
+                    timings[name].append(result[0])
+                    received[name] += result[1]
+            print(f"Query x{args.queries} (top_k={args.top_k}):")
+            medians = {}
+            for name, label in (("full", "full metadata"), ("slim", "slim + store")):
+                values = sorted(timings[name])
+                medians[name] = statistics.median(values) * 1000
+                print(f"  {label:<15} median={medians[name]:6.1f}ms  "
+                      f"p95={values[int(0.95 * (len(values) - 1))] * 1000:6.1f}ms  "
+                      f"{received[name] / args.queries / 1000:6.1f}KB metadata per query")
+            print(f"Metadata per query {received['full'] / args.queries / 1000:.1f}KB -> "
+                  f"{received['slim'] / args.queries / 1000:.1f}KB; median latency {medians['full']:.1f}ms -> "
+                  f"{medians['slim']:.1f}ms ({medians['slim'] - medians['full']:+.1f}ms)")
+        finally:
+            store.close()
+            for server in (full_server, slim_server):
+                server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compare the token chunker with the character splitter it replaces.
+
+Splits a synthetic help center with RecursiveCharacterTextSplitter
+(1000/200 characters, the old prepare_article_chunks), with chunk_articles
+in the calling process and with chunk_articles in a process pool. Reports
+articles per second, chunk counts and sizes in tokens, and, for a sentence
+added at the end and at the start of every article, how many chunks each
+edited article has to re-embed: ids that name text the index does not
+already hold under that id.
+
+    python scripts/bench_chunking.py --articles 2000 --processes 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add the repository root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from src.fakes.corpus import SyntheticCorpus
+from src.models.article import Article
+from src.utils.chunking import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS, TokenChunker, chunk_articles
+from src.utils.html_text import html_to_text
+
+def character_chunks(articles: list) -> list:
+    """The old prepare_article_chunks, ids and all"""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, length_function=len)
+    chunks = []
+    for article in articles:
+        if not article.content:
+            continue
+        texts = splitter.split_text(f"Title: {article.title}\n\nContent: {article.content}")
+        chunks.extend({"id": f"article_{article.id}_chunk_{i}", "text": text} for i, text in enumerate(texts))
+    return chunks
+
+def timed(label: str, split, articles: list, counter) -> list:
+    started = time.perf_counter()
+    chunks = split(articles)
+    elapsed = time.perf_counter() - started
+    sizes = sorted(counter.count(chunk["text"]) for chunk in chunks)
+    print(f"  {label:<28} {elapsed * 1000:8.0f}ms  {len(articles) / elapsed:9.0f} articles/s  "
+          f"{len(chunks):6d} chunks  tokens median={statistics.median(sizes):.0f} max={sizes[-1]}")
+    return chunks
+
+def re_embedded(split, articles: list, edited: list) -> str:
+    # A positional id that now names different text has to be re-embedded too
+    before = {(chunk["id"], chunk["text"]) for chunk in split(articles)}
+    after = {(chunk["id"], chunk["text"]) for chunk in split(edited)}
+    changed = len(after - before)
+    return f"{changed / len(edited):.2f} of {len(after) / len(edited):.2f} chunks per article"
+
+def edit(articles: list, content) -> list:
+    return [Article(id=a.id, status=a.status, title=a.title, content=content(a.content),
+                    helpcenter_url=a.helpcenter_url, updated_at=a.updated_at) for a in articles]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark article chunking for the knowledge base upload")
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=DEFAULT_OVERLAP_TOKENS)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = SyntheticCorpus(size=args.articles, seed=args.seed)
+    articles = [Article(id=a.id, status="PUBLISHED", title=html_to_text(a.title), content=html_to_text(a.html),
+                        helpcenter_url=f"https://help.example.com/{a.id}", updated_at=a.updated_at)
+                for a in corpus.ordered()]
+    edits = {
+        "sentence appended": edit(articles, lambda content: f"{content} Contact support if this did not help."),
+        "sentence prepended": edit(articles, lambda content: f"Updated for the new release. {content}"),
+    }
+    chunker = TokenChunker(args.max_tokens, args.overlap_tokens)
+    print(f"{len(articles)} articles, {sum(len(a.content or '') for a in articles) / 1e6:.1f}MB of text")
+
+    timed("1000/200 characters", character_chunks, articles, chunker.counter)
+    timed(f"{args.max_tokens}/{args.overlap_tokens} tokens", lambda a: chunk_articles(a, chunker), articles, chunker.counter)
+    timed(f"tokens ({args.processes} procs)", lambda a: chunk_articles(a, chunker, processes=args.processes),
+          articles, chunker.counter)
+
+    for name, edited in edits.items():
+        print(f"Re-embedded after a {name} to every article:")
+        print(f"  characters  {re_embedded(character_chunks, articles, edited)}")
+        print(f"  tokens      {re_embedded(lambda a: chunk_articles(a, chunker), articles, edited)}")
+
+if __name__ == "__main__":
+    main()
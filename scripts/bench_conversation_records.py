@@ -0,0 +1,103 @@
+"""
+Microbenchmark conversation bookkeeping on long transcripts.
+
+Compares the original list-of-dicts layout (ISO timestamp per message,
+state kept in a metadata dict found by scanning) with the compact records
+in MemoryConversationStore. Reports per-operation cost and the memory held
+by one transcript.
+
+    python scripts/bench_conversation_records.py --turns 10000
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+# Add the repository root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.services.conversation_service import ConversationService
+from src.services.conversation_store import MemoryConversationStore
+
+class LegacyConversations:
+    """The bookkeeping ConversationService did before the conversation store"""
+
+    def __init__(self):
+        self.active_conversations = {}
+
+    def add_message(self, stream_sid, role, content):
+        self.active_conversations.setdefault(stream_sid, []).append({
+            "role": role,
+            "content": content,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+
+    def update_call_state(self, stream_sid, state):
+        conversation = self.active_conversations.setdefault(stream_sid, [])
+        for item in conversation:
+            if 'metadata' in item:
+                item['metadata']['state'] = state
+                item['metadata']['state_updated_at'] = datetime.utcnow().isoformat()
+                return
+        conversation.append({'metadata': {'state': state, 'state_updated_at': datetime.utcnow().isoformat()}})
+
+    def get_call_state(self, stream_sid):
+        for item in self.active_conversations.get(stream_sid, []):
+            if 'metadata' in item and 'state' in item['metadata']:
+                return item['metadata']['state']
+        return "initial"
+
+    def recent_messages(self, stream_sid, count=3):
+        conversation = self.active_conversations.get(stream_sid, [])
+        return [msg for msg in conversation if msg.get('role') in ['caller', 'assistant']][-count:]
+
+def per_call_ns(fn, repeat: int) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter_ns() - started) / repeat
+
+def fill(service, contents) -> None:
+    service.update_call_state("bench", "initial")
+    for i, content in enumerate(contents):
+        service.add_message("bench", "caller" if i % 2 else "assistant", content)
+
+def run(name, make_service, turns: int, probes: int) -> None:
+    # Contents are built up front so only the bookkeeping is measured
+    contents = [f"turn {i}: could you tell me how to reset my password please" for i in range(turns)]
+
+    # Timed and measured separately since tracemalloc slows allocation down
+    service = make_service()
+    started = time.perf_counter_ns()
+    fill(service, contents)
+    add_ns = (time.perf_counter_ns() - started) / turns
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    measured = make_service()
+    fill(measured, contents)
+    held = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    # The flow check after every caller turn reads the state and the last three messages
+    state_ns = per_call_ns(lambda: service.update_call_state("bench", "awaiting_answer_feedback"), probes)
+    get_ns = per_call_ns(lambda: service.get_call_state("bench"), probes)
+    recent_ns = per_call_ns(lambda: service.recent_messages("bench", 3), probes)
+    print(f"{name:>8}: add_message {add_ns / 1000:6.2f}us  update_call_state {state_ns / 1000:8.2f}us  "
+          f"get_call_state {get_ns / 1000:8.2f}us  recent(3) {recent_ns / 1000:8.2f}us  "
+          f"held {held / turns:6.0f} B/message ({held / 1e6:.1f} MB)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark conversation bookkeeping on long transcripts")
+    parser.add_argument("--turns", type=int, default=10000)
+    parser.add_argument("--probes", type=int, default=200, help="Repetitions of each lookup")
+    args = parser.parse_args()
+
+    print(f"Transcript of {args.turns} turns")
+    run("legacy", LegacyConversations, args.turns, args.probes)
+    run("compact", lambda: ConversationService(MemoryConversationStore()), args.turns, args.probes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Measure what the conversation write-ahead log costs the call path.
+
+Runs the same interleaved transcripts through ConversationService with and
+without a ConversationWAL and compares the per-message cost of
+add_message and update_call_state, then reports how the background writer
+batched its fsyncs. Exits non-zero if the added cost per event exceeds
+--max-overhead-us, so it can gate a change.
+
+    python scripts/bench_conversation_wal.py --calls 50 --turns 200 --dir /tmp/wal
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the repository root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.services.conversation_service import ConversationService
+from src.services.conversation_store import MemoryConversationStore
+from src.services.conversation_wal import WAL_BATCH_EVENTS, WAL_FSYNC_DURATION, ConversationWAL
+
+def run(service: ConversationService, calls: int, turns: int, pause_every: int) -> list:
+    """Interleave the calls turn by turn and time every event on the call path"""
+    timings = []
+    sids = [f"bench-{i}" for i in range(calls)]
+    for sid in sids:
+        service.start_conversation(sid, "+15550000000")
+    for turn in range(turns):
+        for sid in sids:
+            started = time.perf_counter_ns()
+            service.add_message(sid, "caller" if turn % 2 else "assistant", f"turn {turn}: how do I reset my password?")
+            if turn % 2:
+                service.update_call_state(sid, "awaiting_answer_feedback")
+            timings.append(time.perf_counter_ns() - started)
+        if pause_every and turn % pause_every == 0:
+            # Calls speak in bursts, so give the writer gaps like a real loop would
+            time.sleep(0.001)
+    for sid in sids:
+        service.close_conversation(sid)
+    return timings
+
+def summarize(timings: list) -> tuple:
+    timings = sorted(timings)
+    mean = sum(timings) / len(timings) / 1000
+    p99 = timings[int(0.99 * (len(timings) - 1))] / 1000
+    return mean, p99
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the conversation WAL's overhead on the call path")
+    parser.add_argument("--calls", type=int, default=25)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--pause-every", type=int, default=1, help="Sleep 1ms every N turns, 0 for never")
+    parser.add_argument("--dir", default=None, help="Log directory (default: a temporary one)")
+    parser.add_argument("--max-overhead-us", type=float, default=10.0)
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="conversation-wal-")
+    try:
+        # A store per run so the two see the same amount of data
+        baseline = run(ConversationService(MemoryConversationStore(), wal=None), args.calls, args.turns, args.pause_every)
+        wal = ConversationWAL(directory)
+        logged = run(ConversationService(MemoryConversationStore(), wal=wal), args.calls, args.turns, args.pause_every)
+        started = time.perf_counter()
+        wal.close()
+        drain = time.perf_counter() - started
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    base_mean, base_p99 = summarize(baseline)
+    wal_mean, wal_p99 = summarize(logged)
+    overhead = wal_mean - base_mean
+    batches = WAL_BATCH_EVENTS.labels()
+    fsyncs = WAL_FSYNC_DURATION.labels()
+    print(f"{len(logged)} events from {args.calls} calls")
+    print(f"  without log: mean {base_mean:.2f}us  p99 {base_p99:.2f}us")
+    print(f"  with log:    mean {wal_mean:.2f}us  p99 {wal_p99:.2f}us  (+{overhead:.2f}us per event)")
+    print(f"  {fsyncs.count} group commits, {batches.sum / max(1, batches.count):.1f} events each on average; "
+          f"write+fsync p50 {fsyncs.quantile(0.5) * 1000:.2f}ms p99 {fsyncs.quantile(0.99) * 1000:.2f}ms; "
+          f"{drain * 1000:.0f}ms to drain at shutdown")
+    if overhead > args.max_overhead_us:
+        print(f"Overhead above {args.max_overhead_us}us per event")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Measure what searches see while the knowledge base is resynced.
+
+Syncs a synthetic help center, edits every article, then resyncs while a
+thread keeps searching, once with the index changing under the searches
+and once with generations. Each search is checked against the chunks
+before and after the resync: a result set with chunks only the old index
+had and chunks only the new one has saw the sync half applied. Then
+times a worker loading a large generation and the memory that takes.
+
+    python scripts/bench_kb_generations.py --articles 500 --latency-ms 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add the repository root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from pinecone import Pinecone
+from src.fakes.corpus import SyntheticCorpus
+from src.fakes.embedding_server import FakeEmbeddingServer
+from src.fakes.http_server import FaultConfig
+from src.fakes.kayako_server import FakeKayakoServer
+from src.fakes.pinecone_server import FakePineconeServer
+from src.services.kb_generations import GenerationStore
+from src.utils.chunking import chunk_id
+
+QUERIES = [
+    "How do I reset my password?",
+    "Where can I download an invoice?",
+    "How do I set up two-factor authentication?",
+    "Can I export my data?",
+    "How do I add a team member?",
+]
+
+def trial(args, generations: bool) -> None:
+    corpus = SyntheticCorpus(args.articles, args.seed)
+    faults = FaultConfig(latency_ms=args.latency_ms)
+    kayako = FakeKayakoServer(corpus, faults)
+    embeddings = FakeEmbeddingServer(faults=faults)
+    pinecone = FakePineconeServer(faults=faults)
+    servers = (kayako, embeddings, pinecone)
+    for server in servers:
+        server.start()
+    scratch = tempfile.TemporaryDirectory()
+    os.environ.update(
+        KAYAKO_BASE_URL=kayako.url, KAYAKO_USERNAME="bench", KAYAKO_PASSWORD="bench",
+        EMBEDDINGS_BASE_URL=embeddings.base_url, PINECONE_INDEX_HOST=pinecone.url, PINECONE_API_KEY="bench",
+        PINECONE_INDEX_NAME=pinecone.index_name, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY") or "bench",
+        KB_CHUNK_STORE=f"{scratch.name}/kb_chunks.sqlite3", KB_INGEST_CHECKPOINT=f"{scratch.name}/kb_ingest.jsonl",
+        KB_GENERATIONS_DIR=f"{scratch.name}/kb_generations" if generations else "",
+        KB_GENERATION_GRACE_SECONDS=str(args.grace_seconds),
+        # The fakes need no tokenizer download; estimated counts are fine for timing
+        KB_CHUNK_ALLOW_ESTIMATED_TOKENS="true"
+    )
+
+    from src.services.article_service import KayakoArticleService
+    from src.services.auth_service import KayakoAuthService
+    from src.services.kb_ingest import create_ingest_pipeline
+    from src.services.search_service import KnowledgeBaseSearchService, create_embeddings, open_index
+
+    try:
+        pipeline = create_ingest_pipeline(
+            KayakoArticleService(KayakoAuthService()), create_embeddings(), open_index(Pinecone(api_key="bench"))
+        )
+        asyncio.run(pipeline.run())
+        before = set(pinecone.namespace("").values)
+        service = KnowledgeBaseSearchService()
+        for article in corpus.ordered():
+            corpus.edit(article.id)
+
+        results = []
+        syncing = threading.Event()
+        syncing.set()
+
+        def search():
+            i = 0
+            while syncing.is_set():
+                matches = service.search(QUERIES[i % len(QUERIES)] + f" {i}", top_k=args.top_k)
+                results.append([(chunk_id(m["article_id"], m["content"]), m["content"]) for m in matches])
+                i += 1
+
+        searcher = threading.Thread(target=search)
+        searcher.start()
+        stats = asyncio.run(pipeline.run())
+        syncing.clear()
+        searcher.join()
+        after = set(pinecone.namespace("").values)
+
+        mixed = short = missing = 0
+        for matches in results:
+            ids = {vector_id for vector_id, _ in matches}
+            mixed += bool(ids & (before - after)) and bool(ids & (after - before))
+            short += len(matches) < args.top_k
+            missing += any(content == "No content available" for _, content in matches)
+        label = "generations" if generations else "in place"
+        print(f"{label:<12} resync {stats.seconds:5.1f}s  {len(results):4d} searches  "
+              f"{mixed:4d} mixed old and new  {short:3d} short  {missing:3d} without text")
+    finally:
+        for server in servers:
+            server.stop()
+        scratch.cleanup()
+
+def swap(chunks: int) -> None:
+    """Load a generation the size of a large help center, as a worker does when one is published"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = GenerationStore(directory)
+        per_article = 4
+        store.publish({
+            article_id: {f"article_{article_id}_chunk_{chunk:016x}" for chunk in range(per_article)}
+            for article_id in range(chunks // per_article)
+        })
+        tracemalloc.start()
+        started = time.perf_counter()
+        _, live = store.live_chunk_ids()
+        elapsed = time.perf_counter() - started
+        resident, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Swap to {len(live)} chunks: {elapsed * 1000:.0f}ms, "
+              f"{resident / 1e6:.1f}MB kept, {peak / 1e6:.1f}MB at the peak")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark search consistency during a knowledge base resync")
+    parser.add_argument("--articles", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--grace-seconds", type=float, default=1.0)
+    parser.add_argument("--swap-chunks", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for generations in (False, True):
+        trial(args, generations)
+    swap(args.swap_chunks)
+
+if __name__ == "__main__":
+    main()
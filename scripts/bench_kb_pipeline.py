@@ -0,0 +1,110 @@
+"""
+Benchmark the knowledge base sync and search against local fakes.
+
+Starts the Kayako, embeddings and Pinecone fakes in-process, runs
+scripts/upload_kb_embeddings.py twice (a full sync, then a no-op resync)
+and then a batch of KnowledgeBaseSearchService.search calls. Latency, error
+rate and rate limit of the fakes are configurable, so numbers are
+reproducible without live accounts.
+
+    python scripts/bench_kb_pipeline.py --articles 300 --latency-ms 30
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the repository root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent))
+
+from src.fakes.corpus import SyntheticCorpus
+from src.fakes.embedding_server import FakeEmbeddingServer
+from src.fakes.http_server import FaultConfig
+from src.fakes.kayako_server import FakeKayakoServer
+from src.fakes.pinecone_server import FakePineconeServer
+
+QUERIES = [
+    "How do I reset my password?",
+    "Where can I download an invoice?",
+    "How do I set up two-factor authentication?",
+    "Can I export my data?",
+    "How do I add a team member?",
+]
+
+def timed_sync(verbose: bool) -> float:
+    import upload_kb_embeddings
+    output = io.StringIO()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stdout if verbose else output):
+        try:
+            upload_kb_embeddings.main()
+        except SystemExit:
+            print(output.getvalue()[-2000:])
+            raise
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark KB sync and search against local fakes")
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--searches", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true", help="Show the sync script's output")
+    args = parser.parse_args()
+
+    faults = FaultConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit, seed=args.seed)
+    kayako = FakeKayakoServer(SyntheticCorpus(args.articles, args.seed), faults)
+    embeddings = FakeEmbeddingServer(faults=faults)
+    pinecone = FakePineconeServer(faults=faults)
+    servers = (kayako, embeddings, pinecone)
+    for server in servers:
+        server.start()
+
+    # Environment variables from a .env file do not override these
+    scratch = tempfile.TemporaryDirectory()
+    os.environ.update(
+        KAYAKO_BASE_URL=kayako.url, KAYAKO_USERNAME="bench", KAYAKO_PASSWORD="bench",
+        EMBEDDINGS_BASE_URL=embeddings.base_url,
+        PINECONE_INDEX_HOST=pinecone.url, PINECONE_API_KEY="bench", PINECONE_INDEX_NAME=pinecone.index_name,
+        OPENAI_API_KEY=os.getenv("OPENAI_API_KEY") or "bench",
+        KB_CHUNK_STORE=f"{scratch.name}/kb_chunks.sqlite3", KB_INGEST_CHECKPOINT=f"{scratch.name}/kb_ingest.jsonl",
+        KB_GENERATIONS_DIR=f"{scratch.name}/kb_generations",
+        # The fakes need no tokenizer download; estimated counts are fine for timing
+        KB_CHUNK_ALLOW_ESTIMATED_TOKENS="true"
+    )
+
+    try:
+        full = timed_sync(args.verbose)
+        print(f"Full sync of {args.articles} articles: {full:.2f}s, {pinecone.vector_count} vectors")
+        resync = timed_sync(args.verbose)
+        print(f"Resync with nothing changed: {resync:.2f}s")
+
+        from src.services.search_service import KnowledgeBaseSearchService
+        service = KnowledgeBaseSearchService()
+        timings = []
+        for i in range(args.searches):
+            started = time.perf_counter()
+            service.search(QUERIES[i % len(QUERIES)])
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(f"Search x{args.searches}: median={statistics.median(timings) * 1000:.1f}ms "
+              f"p95={timings[int(0.95 * (len(timings) - 1))] * 1000:.1f}ms")
+
+        for server in servers:
+            print(f"{type(server).__name__}: requests by status {dict(server.requests)}")
+    finally:
+        for server in servers:
+            server.stop()
+        scratch.cleanup()
+
+if __name__ == "__main__":
+    main()
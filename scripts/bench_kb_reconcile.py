@@ -0,0 +1,119 @@
+"""
+Measure pruning of removed articles from a large knowledge base index.
+
+Fills a Pinecone fake with chunks of articles the help center no longer
+has, then compares the old way of finding and deleting them (one
+top_k=10000 query, then a list and a delete per article) with the sync's
+reconciliation (paginated listing, one stale id set, batched concurrent
+deletes). The old way is timed on a sample of articles and extrapolated.
+
+    python scripts/bench_kb_reconcile.py --chunks 30000 --latency-ms 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the repository root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+from pinecone import Pinecone
+from src.fakes.corpus import SyntheticCorpus
+from src.fakes.embedding_server import FakeEmbeddingServer
+from src.fakes.http_server import FaultConfig
+from src.fakes.kayako_server import FakeKayakoServer
+from src.fakes.pinecone_server import FakePineconeServer
+
+# Small vectors keep a large fake index in memory; only ids and metadata matter here
+DIMENSIONS = 8
+CHUNKS_PER_ARTICLE = 4
+# Ids of the articles the help center no longer has start here
+REMOVED_ARTICLE_IDS = 100000
+
+def old_find_articles(index) -> set:
+    """get_existing_article_ids as it was"""
+    results = index.query(vector=[0] * DIMENSIONS, top_k=10000, include_metadata=True)
+    return {int(match.metadata['article_id']) for match in results.matches if match.metadata}
+
+def old_delete_article(index, article_id: int) -> None:
+    """delete_article_chunks as it was"""
+    vector_ids = []
+    for ids in index.list(prefix=f"article_{article_id}_chunk"):
+        vector_ids.extend(ids)
+    if vector_ids:
+        index.delete(ids=vector_ids)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pruning removed articles from the KB index")
+    parser.add_argument("--chunks", type=int, default=30000, help="Chunks of removed articles in the index")
+    parser.add_argument("--articles", type=int, default=50, help="Articles the help center still has")
+    parser.add_argument("--sample", type=int, default=50, help="Articles deleted the old way, to extrapolate from")
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    faults = FaultConfig(latency_ms=args.latency_ms)
+    kayako = FakeKayakoServer(SyntheticCorpus(args.articles, args.seed), faults)
+    embeddings = FakeEmbeddingServer(dimensions=DIMENSIONS, faults=faults)
+    pinecone = FakePineconeServer(dimension=DIMENSIONS, faults=faults)
+    servers = (kayako, embeddings, pinecone)
+    for server in servers:
+        server.start()
+    scratch = tempfile.TemporaryDirectory()
+    os.environ.update(
+        KAYAKO_BASE_URL=kayako.url, KAYAKO_USERNAME="bench", KAYAKO_PASSWORD="bench",
+        EMBEDDINGS_BASE_URL=embeddings.base_url, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY") or "bench",
+        KB_CHUNK_STORE=f"{scratch.name}/kb_chunks.sqlite3", KB_INGEST_CHECKPOINT=f"{scratch.name}/kb_ingest.jsonl",
+        KB_GENERATIONS_DIR=f"{scratch.name}/kb_generations", KB_GENERATION_GRACE_SECONDS="0",
+        # The fakes need no tokenizer download; estimated counts are fine for timing
+        KB_CHUNK_ALLOW_ESTIMATED_TOKENS="true"
+    )
+
+    from src.services.article_service import KayakoArticleService
+    from src.services.auth_service import KayakoAuthService
+    from src.services.kb_ingest import create_ingest_pipeline
+    from src.services.search_service import create_embeddings
+
+    try:
+        namespace = pinecone.namespace("")
+        rng = np.random.default_rng(args.seed)
+        removed = args.chunks // CHUNKS_PER_ARTICLE
+        for i in range(removed):
+            article_id = REMOVED_ARTICLE_IDS + i
+            for chunk in range(CHUNKS_PER_ARTICLE):
+                namespace.upsert(f"article_{article_id}_chunk_{chunk:016x}", rng.standard_normal(DIMENSIONS),
+                                 {"article_id": article_id, "chunk_index": chunk, "updated_at": "2020-01-01"})
+        print(f"Index holds {pinecone.vector_count} chunks of {removed} removed articles")
+
+        index = Pinecone(api_key="bench").Index(host=pinecone.url)
+        started = time.perf_counter()
+        found = old_find_articles(index)
+        print(f"Old: top_k=10000 query found {len(found)}/{removed} articles in {time.perf_counter() - started:.1f}s")
+        sample = sorted(found)[:args.sample]
+        started = time.perf_counter()
+        for article_id in sample:
+            old_delete_article(index, article_id)
+        per_article = (time.perf_counter() - started) / max(1, len(sample))
+        print(f"Old: {per_article * 1000:.0f}ms per article deleted, "
+              f"~{per_article * (removed - len(sample)):.0f}s for the other {removed - len(sample)}")
+
+        pipeline = create_ingest_pipeline(
+            KayakoArticleService(KayakoAuthService()), create_embeddings(), index
+        )
+        stats = asyncio.run(pipeline.run())
+        print(f"New: sync with pruning took {stats.seconds:.1f}s, deleted {stats.deleted} articles, "
+              f"index now holds {pinecone.vector_count} chunks ({stats.chunks} written by the sync)")
+        if pinecone.vector_count != stats.chunks:
+            print("Stale chunks left behind")
+            sys.exit(1)
+    finally:
+        for server in servers:
+            server.stop()
+        scratch.cleanup()
+
+if __name__ == "__main__":
+    main()
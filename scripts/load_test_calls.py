@@ -0,0 +1,351 @@
+"""
+Find out how many simultaneous calls one worker can carry.
+
+Ramps up concurrent simulated Twilio calls against /api/twilio/media-stream.
+Each call speaks the media-stream protocol (connected/start/media/mark/stop)
+with real-time mu-law audio: it listens, says something, pauses for the
+answer and repeats, acknowledging marks as their audio finishes playing.
+The worker talks to the local fake realtime server instead of OpenAI.
+
+For every step it reports time to first audio, response latency (caller
+stops talking -> first answer audio), jitter (how late each audio chunk
+arrived for gapless playback), plus the worker's event loop lag and CPU
+scraped from /metrics.
+
+By default the fake realtime server and one uvicorn worker are started as
+subprocesses:
+    python scripts/load_test_calls.py --steps 1,5,10,25,50
+To test a worker you started yourself, point its OPENAI_REALTIME_URL at
+`python -m src.fakes.realtime_server` and pass --app-url:
+    python scripts/load_test_calls.py --app-url http://localhost:8000
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Add the repository root to Python path
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+import websockets
+
+from src.utils.audio import FRAME_MS, SAMPLE_RATE, ulaw_silence, ulaw_tone
+
+# A pause this long in received audio means the assistant stopped talking
+BURST_GAP = 0.25
+
+@dataclass
+class CallResult:
+    time_to_first_audio: Optional[float] = None
+    response_latencies: List[float] = field(default_factory=list)
+    # How late each audio chunk arrived relative to gapless playback, in seconds
+    lateness: List[float] = field(default_factory=list)
+    # Worst delay of our own send schedule, to spot an overloaded load generator
+    send_drift: float = 0.0
+    media_received: int = 0
+    error: Optional[str] = None
+
+class SimulatedCall:
+    """One caller on a Twilio media stream"""
+
+    def __init__(self, ws_url: str, index: int, duration: float, talk_ms: int, pause_ms: int):
+        self.ws_url = ws_url
+        self.stream_sid = f"MZloadtest{index:05d}"
+        self.duration = duration
+        self.talk_frames = max(1, talk_ms // FRAME_MS)
+        self.pause_frames = max(1, pause_ms // FRAME_MS)
+        self.result = CallResult()
+        self._speech_ended_at: Optional[float] = None
+        self._playout_end: Optional[float] = None
+        self._mark_tasks = set()
+
+    async def run(self) -> CallResult:
+        try:
+            async with websockets.connect(self.ws_url, max_queue=None) as ws:
+                self._opened_at = time.perf_counter()
+                await ws.send(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+                await ws.send(json.dumps({
+                    "event": "start",
+                    "streamSid": self.stream_sid,
+                    "start": {
+                        "streamSid": self.stream_sid,
+                        "callSid": self.stream_sid.replace("MZ", "CA"),
+                        "customParameters": {"caller_number": "+15550100"},
+                        "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": SAMPLE_RATE, "channels": 1}
+                    }
+                }))
+                receiver = asyncio.create_task(self._receive(ws))
+                try:
+                    await self._speak(ws)
+                    await ws.send(json.dumps({"event": "stop", "streamSid": self.stream_sid}))
+                finally:
+                    receiver.cancel()
+                    for task in list(self._mark_tasks):
+                        task.cancel()
+        except Exception as e:
+            self.result.error = f"{type(e).__name__}: {e}"
+        return self.result
+
+    async def _speak(self, ws) -> None:
+        """Send 20ms frames on an absolute schedule: listen, talk, listen, ..."""
+        tone = base64.b64encode(ulaw_tone(FRAME_MS)).decode("ascii")
+        silence = base64.b64encode(ulaw_silence(FRAME_MS)).decode("ascii")
+        cycle = self.pause_frames + self.talk_frames
+        total_frames = int(self.duration * 1000 / FRAME_MS)
+        started = time.perf_counter()
+
+        for frame in range(total_frames):
+            due = started + frame * FRAME_MS / 1000
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.result.send_drift = max(self.result.send_drift, -delay)
+
+            talking = frame % cycle >= self.pause_frames
+            if not talking and frame % cycle == 0 and frame:
+                # Just finished a sentence; the clock for the answer starts now
+                self._speech_ended_at = time.perf_counter()
+            await ws.send(json.dumps({
+                "event": "media",
+                "streamSid": self.stream_sid,
+                "media": {
+                    "track": "inbound",
+                    "chunk": str(frame + 1),
+                    "timestamp": str(frame * FRAME_MS),
+                    "payload": tone if talking else silence
+                }
+            }))
+
+    async def _receive(self, ws) -> None:
+        async for message in ws:
+            data = json.loads(message)
+            event = data.get("event")
+            if event == "media":
+                self._on_media(data["media"]["payload"])
+            elif event == "mark":
+                self._acknowledge_mark(ws, data["mark"])
+            elif event == "clear":
+                self._playout_end = None
+
+    def _on_media(self, payload: str) -> None:
+        now = time.perf_counter()
+        result = self.result
+        result.media_received += 1
+        if result.time_to_first_audio is None:
+            result.time_to_first_audio = now - self._opened_at
+        if self._speech_ended_at is not None:
+            result.response_latencies.append(now - self._speech_ended_at)
+            self._speech_ended_at = None
+
+        duration = len(base64.b64decode(payload)) / SAMPLE_RATE
+        if self._playout_end is None or now > self._playout_end + BURST_GAP:
+            # Start of a new utterance; playback starts as soon as it arrives
+            self._playout_end = now + duration
+        else:
+            result.lateness.append(max(0.0, now - self._playout_end))
+            self._playout_end = max(self._playout_end, now) + duration
+
+    def _acknowledge_mark(self, ws, mark: dict) -> None:
+        """Twilio echoes a mark once the audio sent before it has been played"""
+        delay = max(0.0, (self._playout_end or 0) - time.perf_counter())
+
+        async def acknowledge():
+            await asyncio.sleep(delay)
+            await ws.send(json.dumps({"event": "mark", "streamSid": self.stream_sid, "mark": mark}))
+
+        task = asyncio.create_task(acknowledge())
+        self._mark_tasks.add(task)
+        task.add_done_callback(self._mark_tasks.discard)
+
+# Scraping the worker's /metrics
+
+Samples = Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]
+
+def parse_metrics(text: str) -> Samples:
+    """Parse the Prometheus text format into {(name, labels): value}"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        series, value = line.rsplit(" ", 1)
+        labels = ()
+        if "{" in series:
+            name, label_text = series.split("{", 1)
+            labels = tuple(
+                tuple(pair.split("=", 1)) for pair in label_text.rstrip("}").replace('"', "").split(",")
+            )
+        else:
+            name = series
+        samples[(name, labels)] = float(value)
+    return samples
+
+def fetch_metrics(base_url: str) -> Samples:
+    # Bypass any HTTP proxy from the environment; the worker is local
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+    with opener.open(f"{base_url}/metrics", timeout=10) as response:
+        return parse_metrics(response.read().decode())
+
+def histogram_quantile(before: Samples, after: Samples, name: str, q: float) -> Optional[float]:
+    """Quantile of what a histogram recorded between two scrapes"""
+    buckets = []
+    for (sample, labels), value in after.items():
+        if sample == f"{name}_bucket":
+            bound = dict(labels)["le"]
+            count = value - before.get((sample, labels), 0)
+            buckets.append((float("inf") if bound == "+Inf" else float(bound), count))
+    buckets.sort()
+    if not buckets or not buckets[-1][1]:
+        return None
+    rank = q * buckets[-1][1]
+    lower, seen = 0.0, 0.0
+    for bound, cumulative in buckets:
+        if cumulative >= rank:
+            if bound == float("inf"):
+                return lower
+            in_bucket = cumulative - seen
+            fraction = (rank - seen) / in_bucket if in_bucket else 1.0
+            return lower + (bound - lower) * fraction
+        lower, seen = bound, cumulative
+    return lower
+
+def sample_value(samples: Samples, name: str) -> float:
+    return sum(value for (sample, _), value in samples.items() if sample == name)
+
+# Running the ramp
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+async def run_step(args, base_url: str, concurrency: int) -> str:
+    ws_url = base_url.replace("http", "ws", 1) + "/api/twilio/media-stream"
+    loop = asyncio.get_running_loop()
+    before = await loop.run_in_executor(None, fetch_metrics, base_url)
+    started = time.perf_counter()
+
+    async def staggered(index: int) -> CallResult:
+        await asyncio.sleep(args.ramp_seconds * index / concurrency)
+        call = SimulatedCall(ws_url, index, args.call_seconds, args.talk_ms, args.pause_ms)
+        return await call.run()
+
+    results = await asyncio.gather(*(staggered(i) for i in range(concurrency)))
+    # Let the worker finish tearing the calls down before the second scrape
+    await asyncio.sleep(1.0)
+    elapsed = time.perf_counter() - started
+    after = await loop.run_in_executor(None, fetch_metrics, base_url)
+
+    ok = [r for r in results if not r.error]
+    for r in results:
+        if r.error:
+            print(f"  call failed: {r.error}")
+    ttfa = [r.time_to_first_audio for r in ok if r.time_to_first_audio is not None]
+    responses = [latency for r in ok for latency in r.response_latencies]
+    lateness = [late for r in ok for late in r.lateness]
+    cpu = sample_value(after, "process_cpu_seconds") - sample_value(before, "process_cpu_seconds")
+    cpu_per_call = cpu / (concurrency * args.call_seconds) if concurrency else 0.0
+    drift = max((r.send_drift for r in results), default=0.0)
+
+    return (
+        f"{concurrency:>5} {len(ok):>4} "
+        f"{ms(percentile(ttfa, 0.5)):>7} {ms(percentile(ttfa, 0.95)):>7} {ms(percentile(ttfa, 0.99)):>7} "
+        f"{ms(percentile(responses, 0.5)):>7} {ms(percentile(responses, 0.95)):>7} "
+        f"{ms(percentile(lateness, 0.99)):>7} {ms(max(lateness, default=None)):>7} "
+        f"{ms(histogram_quantile(before, after, 'event_loop_lag_seconds', 0.99)):>7} "
+        f"{cpu / elapsed * 100:>6.0f}% {cpu_per_call * 100:>7.1f}% "
+        f"{ms(drift):>6}"
+    )
+
+HEADER = (
+    "calls   ok  ttfa50  ttfa95  ttfa99  resp50  resp95 jitr99 jitrmax  lag99    cpu cpu/call drift\n"
+    "                  (ms)                 (ms)          (ms)           (ms)  (worker)         (ms)"
+)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout}s")
+
+def start_stack(args) -> Tuple[str, List[subprocess.Popen]]:
+    """Start the fake realtime server and a worker pointed at it"""
+    log = open(args.app_log, "w") if args.app_log else subprocess.DEVNULL
+    fake_port, app_port = free_port(), free_port()
+
+    fake_cmd = [
+        sys.executable, "-m", "src.fakes.realtime_server", "--port", str(fake_port),
+        "--first-audio-latency-ms", str(args.first_audio_latency_ms),
+        "--response-audio-ms", str(args.response_audio_ms),
+    ]
+    if args.function_call:
+        fake_cmd += ["--function-call", args.function_call]
+    fake = subprocess.Popen(fake_cmd, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT)
+    wait_for_port(fake_port)
+
+    env = dict(os.environ, OPENAI_REALTIME_URL=f"ws://127.0.0.1:{fake_port}")
+    env.setdefault("OPENAI_API_KEY", "load-test")
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1",
+         "--port", str(app_port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    wait_for_port(app_port)
+    return f"http://127.0.0.1:{app_port}", [app, fake]
+
+async def main():
+    parser = argparse.ArgumentParser(description="Ramp concurrent simulated calls against one worker")
+    parser.add_argument("--steps", default="1,5,10,25", help="Comma separated numbers of concurrent calls")
+    parser.add_argument("--call-seconds", type=float, default=15.0)
+    parser.add_argument("--ramp-seconds", type=float, default=2.0, help="Spread call starts over this long")
+    parser.add_argument("--talk-ms", type=int, default=1500, help="How long the caller talks each turn")
+    parser.add_argument("--pause-ms", type=int, default=4000, help="How long the caller listens each turn")
+    parser.add_argument("--app-url", help="Use a running worker instead of starting one")
+    parser.add_argument("--app-log", help="Write the started worker's output to this file")
+    parser.add_argument("--first-audio-latency-ms", type=int, default=300)
+    parser.add_argument("--response-audio-ms", type=int, default=2000)
+    parser.add_argument("--function-call", help="Make the fake model call this tool every turn")
+    args = parser.parse_args()
+
+    processes = []
+    if args.app_url:
+        base_url = args.app_url.rstrip("/")
+    else:
+        base_url, processes = start_stack(args)
+
+    try:
+        print(HEADER)
+        for concurrency in (int(n) for n in args.steps.split(",")):
+            print(await run_step(args, base_url, concurrency), flush=True)
+            await asyncio.sleep(2.0)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+if __name__ == "__main__":
+    asyncio.run(main())
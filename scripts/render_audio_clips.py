@@ -0,0 +1,67 @@
+import asyncio
+import base64
+import json
+import os
+import sys
+from pathlib import Path
+import websockets
+from dotenv import load_dotenv
+
+# Add the repository root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.services.audio_clip_cache import CLIP_SCRIPTS, DEFAULT_CLIP_DIR
+from src.services.audio_streaming_service import AudioStreamingService
+
+async def render_clip(url: str, headers: dict, text: str) -> bytes:
+    """Have the realtime model speak `text` in the live call voice and collect the mu-law audio"""
+    session_config = AudioStreamingService.session_config()
+    # Same voice and audio format as live calls, but no tools or turn detection
+    session_config["session"].pop("tools", None)
+    session_config["session"]["turn_detection"] = None
+
+    audio = bytearray()
+    async with websockets.connect(url, extra_headers=headers) as ws:
+        await ws.send(json.dumps(session_config))
+        await ws.send(json.dumps({
+            "type": "response.create",
+            "response": {
+                "modalities": ["text", "audio"],
+                "instructions": f"Say exactly the following and nothing else: '{text}'"
+            }
+        }))
+        async for message in ws:
+            event = json.loads(message)
+            if event.get("type") == "response.audio.delta":
+                audio.extend(base64.b64decode(event["delta"]))
+            elif event.get("type") == "response.done":
+                break
+            elif event.get("type") == "error":
+                raise Exception(event.get("error"))
+    return bytes(audio)
+
+async def main():
+    load_dotenv()
+    url = os.getenv('OPENAI_REALTIME_URL', AudioStreamingService.DEFAULT_REALTIME_URL)
+    headers = {
+        "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}",
+        "OpenAI-Beta": "realtime=v1"
+    }
+    output_dir = Path(os.getenv('AUDIO_CLIP_DIR') or DEFAULT_CLIP_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Render only the clips named on the command line, or all of them
+    names = sys.argv[1:] or list(CLIP_SCRIPTS)
+    for name in names:
+        print(f"Rendering '{name}': {CLIP_SCRIPTS[name]}")
+        audio = await render_clip(url, headers, CLIP_SCRIPTS[name])
+        path = output_dir / f"{name}.ulaw"
+        path.write_bytes(audio)
+        print(f"Wrote {len(audio)} bytes ({len(audio) / 8000:.1f}s) to {path}")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
@@ -2,12 +2,11 @@ import os
 import sys
 from pathlib import Path
 
-# Add the src directory to Python path
-src_path = Path(__file__).parent.parent / 'src'
-sys.path.append(str(src_path))
+# Add the repository root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
 
-from services.auth_service import KayakoAuthService
-from services.article_service import KayakoArticleService
+from src.services.auth_service import KayakoAuthService
+from src.services.article_service import KayakoArticleService
 
 def main():
     try:
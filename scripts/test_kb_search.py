@@ -2,11 +2,10 @@ import os
 import sys
 from pathlib import Path
 
-# Add the src directory to Python path
-src_path = Path(__file__).parent.parent / 'src'
-sys.path.append(str(src_path))
+# Add the repository root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
 
-from services.search_service import KnowledgeBaseSearchService
+from src.services.search_service import KnowledgeBaseSearchService
 
 def main():
     try:
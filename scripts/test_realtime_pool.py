@@ -0,0 +1,51 @@
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add the repository root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.fakes.realtime_server import FakeRealtimeConfig, FakeRealtimeServer
+from src.services.realtime_session_pool import RealtimeSessionPool
+
+GREETING = {"type": "response.create", "response": {"instructions": "Greet the caller"}}
+
+async def time_to_first_audio(pool: RealtimeSessionPool) -> float:
+    """Claim a session, ask for the greeting and time until the first audio delta arrives"""
+    started = time.perf_counter()
+    async with pool.session() as (ws, warm):
+        await ws.send(json.dumps(GREETING))
+        async for message in ws:
+            if json.loads(message).get("type") == "response.audio.delta":
+                return time.perf_counter() - started
+
+async def measure(pool: RealtimeSessionPool, calls: int) -> list:
+    await pool.start()
+    timings = []
+    for _ in range(calls):
+        # Give the replenisher time to refill, as it would between real calls
+        await asyncio.sleep(0.5)
+        timings.append(await time_to_first_audio(pool))
+    await pool.stop()
+    return timings
+
+async def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    server = FakeRealtimeServer(FakeRealtimeConfig(session_latency_ms=250, first_audio_latency_ms=200))
+    url = await server.start()
+    session_config = {"type": "session.update", "session": {"modalities": ["text", "audio"]}}
+
+    try:
+        for label, size in (("cold (no pool)", 0), ("warm (pool of 2)", 2)):
+            pool = RealtimeSessionPool(url, {}, session_config, size=size)
+            timings = await measure(pool, calls)
+            print(f"{label:>18}: time to first audio "
+                  f"median={statistics.median(timings) * 1000:.0f}ms max={max(timings) * 1000:.0f}ms")
+    finally:
+        await server.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
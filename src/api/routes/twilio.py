@@ -6,6 +6,10 @@ from urllib.parse import quote
 
 router = APIRouter()
 
+# Pre-warmed OpenAI Realtime sessions shared by every call on this worker.
+# Started and stopped by the application lifespan in src/main.py.
+session_pool = AudioStreamingService.create_session_pool()
+
 @router.post("/webhook")
 async def handle_incoming_call(request: Request):
     """Handle incoming call and set up media stream"""
@@ -13,6 +17,9 @@ async def handle_incoming_call(request: Request):
     form_data = await request.form()
     caller_number = form_data.get('From', 'Unknown')
     
+    # A media stream is about to connect; make sure a warm session is waiting for it
+    session_pool.prime()
+    
     response = VoiceResponse()
     response.say("Thank you for calling Kayako. Please wait while I connect you to an agent.")
     
@@ -33,5 +40,5 @@ async def handle_incoming_call(request: Request):
 @router.websocket("/media-stream")
 async def handle_media_stream(websocket: WebSocket):
     """Handle WebSocket connections between Twilio and OpenAI"""
-    streaming_service = AudioStreamingService()
+    streaming_service = AudioStreamingService(session_pool=session_pool)
     await streaming_service.handle_call_stream(websocket) 
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+Run the Kayako, embeddings and Pinecone fakes together.
+
+    python -m src.fakes --articles 500 --latency-ms 40 --error-rate 0.01
+
+Prints the environment variables that point the services and scripts at
+them. Faults apply to all three unless overridden per service.
+"""
+import argparse
+import time
+from .corpus import SyntheticCorpus
+from .embedding_server import FakeEmbeddingServer
+from .http_server import FaultConfig
+from .kayako_server import FakeKayakoServer
+from .pinecone_server import FakePineconeServer
+
+SERVICES = ("kayako", "embeddings", "pinecone")
+
+def fault_config(args, service: str) -> FaultConfig:
+    def pick(name):
+        value = getattr(args, f"{service}_{name}")
+        return getattr(args, name) if value is None else value
+
+    return FaultConfig(
+        latency_ms=pick("latency_ms"),
+        jitter_ms=pick("jitter_ms"),
+        error_rate=pick("error_rate"),
+        rate_limit=pick("rate_limit"),
+        seed=args.seed
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-ins for Kayako, OpenAI embeddings and Pinecone")
+    parser.add_argument("--articles", type=int, default=100, help="Size of the synthetic help center")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--index-name", default="kb")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests per second, 0 for unlimited")
+    for service in SERVICES:
+        for name in ("latency-ms", "jitter-ms", "error-rate", "rate-limit"):
+            parser.add_argument(f"--{service}-{name}", type=float, default=None)
+    args = parser.parse_args()
+
+    kayako = FakeKayakoServer(SyntheticCorpus(args.articles, args.seed), fault_config(args, "kayako"))
+    embeddings = FakeEmbeddingServer(args.dimension, fault_config(args, "embeddings"))
+    pinecone = FakePineconeServer(args.index_name, args.dimension, fault_config(args, "pinecone"))
+    for server in (kayako, embeddings, pinecone):
+        server.start()
+
+    print("Fakes running; point the services at them with:")
+    print(f"export KAYAKO_BASE_URL={kayako.url} KAYAKO_USERNAME=fake KAYAKO_PASSWORD=fake")
+    print(f"export EMBEDDINGS_BASE_URL={embeddings.base_url}")
+    print(f"export PINECONE_INDEX_HOST={pinecone.url} PINECONE_API_KEY=fake PINECONE_INDEX_NAME={args.index_name}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in (kayako, embeddings, pinecone):
+            server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Synthetic help center articles for the Kayako fake"""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+TOPICS = [
+    "password", "account", "billing", "invoice", "subscription", "email", "login",
+    "two-factor authentication", "team member", "workflow", "automation", "report",
+    "integration", "webhook", "API key", "mobile app", "notification", "ticket",
+    "help center", "custom field", "SLA", "macro", "chat widget", "data export",
+]
+ACTIONS = ["reset", "change", "update", "configure", "enable", "disable", "delete", "export", "set up", "troubleshoot"]
+WORDS = (
+    "open the settings page and select the option you need then save your changes "
+    "the admin area lists every available setting for your organization and team "
+    "if the problem continues contact support with the error message you received "
+    "changes apply immediately to all agents but may take a few minutes to sync "
+    "you can undo this at any time from the same screen using the restore button"
+).split()
+
+@dataclass
+class SyntheticArticle:
+    id: int
+    title: str
+    html: str
+    status: str
+    updated_at: str
+    revision: int = 1
+
+    @property
+    def title_field_id(self) -> int:
+        return self.id * 2
+
+    @property
+    def content_field_id(self) -> int:
+        return self.id * 2 + 1
+
+@dataclass
+class SyntheticCorpus:
+    """
+    A deterministic set of articles shaped like Kayako's help center.
+
+    Article bodies are HTML with the kind of markup real articles carry
+    (headings, lists, links, entities, the odd script tag) and vary from a
+    paragraph to a long guide. The corpus can be edited after it is served,
+    which lets sync code be exercised against changes.
+    """
+    size: int = 100
+    seed: int = 42
+    published_ratio: float = 0.9
+    articles: Dict[int, SyntheticArticle] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._random = random.Random(self.seed)
+        self._clock = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self._next_id = 1
+        for _ in range(self.size):
+            self.add()
+
+    def _tick(self) -> str:
+        self._clock += timedelta(minutes=self._random.randint(1, 600))
+        return self._clock.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+    def _html(self, title: str) -> str:
+        rnd = self._random
+        parts = [f"<h2>{title}</h2>"]
+        for _ in range(rnd.choice([1, 2, 3, 5, 8, 13, 21])):
+            sentence = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(12, 40)))
+            kind = rnd.random()
+            if kind < 0.15:
+                items = "".join(f"<li>Step {i + 1}: {rnd.choice(WORDS)} {rnd.choice(WORDS)}</li>" for i in range(rnd.randint(2, 6)))
+                parts.append(f"<ol>{items}</ol>")
+            elif kind < 0.25:
+                parts.append(f'<p>See <a href="https://help.example.com/{rnd.randint(1, 999)}">this guide</a> &amp; {sentence}.</p>')
+            else:
+                parts.append(f"<p>{sentence.capitalize()}.</p>")
+        if rnd.random() < 0.1:
+            parts.append("<script>window.helpCenter && window.helpCenter.track('view');</script>")
+        return "\n".join(parts)
+
+    def add(self) -> SyntheticArticle:
+        article_id = self._next_id
+        self._next_id += 1
+        title = f"How to {self._random.choice(ACTIONS)} your {self._random.choice(TOPICS)}"
+        status = "PUBLISHED" if self._random.random() < self.published_ratio else "DRAFT"
+        article = SyntheticArticle(article_id, title, self._html(title), status, self._tick())
+        self.articles[article_id] = article
+        return article
+
+    def edit(self, article_id: int) -> SyntheticArticle:
+        """Rewrite an article's body and bump its updated_at"""
+        article = self.articles[article_id]
+        article.revision += 1
+        article.html = self._html(article.title)
+        article.updated_at = self._tick()
+        return article
+
+    def remove(self, article_id: int) -> None:
+        self.articles.pop(article_id, None)
+
+    def ordered(self) -> List[SyntheticArticle]:
+        return [self.articles[i] for i in sorted(self.articles)]
+
+    def locale_field(self, field_id: int) -> Optional[str]:
+        article = self.articles.get(field_id // 2)
+        if not article:
+            return None
+        return article.title if field_id % 2 == 0 else article.html
@@ -0,0 +1,85 @@
+"""
+Local stand-in for the OpenAI embeddings endpoint.
+
+Vectors are deterministic feature hashes of the input's words, so the same
+text always embeds the same way and texts sharing words land close
+together: good enough for retrieval to return sensible matches. Token-id
+inputs (what tiktoken-aware clients send) are hashed the same way.
+Point the services at it with EMBEDDINGS_BASE_URL=<url>/v1.
+"""
+import base64
+import hashlib
+import re
+from typing import List, Union
+import numpy as np
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from .http_server import FaultConfig, FakeHTTPServer
+
+# The API rejects requests with more inputs than this
+MAX_INPUTS = 2048
+
+_WORD = re.compile(r"\w+")
+
+def fake_embedding(text_or_tokens: Union[str, List[int]], dimensions: int = 1536) -> np.ndarray:
+    """Unit-length feature-hashed bag of words"""
+    if isinstance(text_or_tokens, str):
+        features = _WORD.findall(text_or_tokens.lower())
+    else:
+        features = [str(token) for token in text_or_tokens]
+
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dimensions
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if not norm:
+        # Empty input still needs a valid direction
+        vector[0] = norm = 1.0
+    return vector / norm
+
+class FakeEmbeddingServer(FakeHTTPServer):
+    """OpenAI-compatible POST /v1/embeddings"""
+
+    def __init__(self, dimensions: int = 1536, faults: FaultConfig = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        super().__init__(faults, host, port)
+        self.dimensions = dimensions
+        self.inputs_embedded = 0
+        self.app.post("/v1/embeddings")(self._embed)
+        self.app.post("/embeddings")(self._embed)
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/v1"
+
+    async def _embed(self, request: Request):
+        body = await request.json()
+        inputs = body.get("input")
+        # A single string or a single token list counts as one input
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        if not inputs or len(inputs) > MAX_INPUTS:
+            return JSONResponse(
+                {"error": {"message": f"input must have 1 to {MAX_INPUTS} items", "type": "invalid_request_error"}},
+                status_code=400
+            )
+
+        dimensions = body.get("dimensions") or self.dimensions
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        tokens = 0
+        for i, item in enumerate(inputs):
+            vector = fake_embedding(item, dimensions)
+            tokens += len(item) if isinstance(item, list) else len(_WORD.findall(item))
+            embedding = base64.b64encode(vector.tobytes()).decode("ascii") if as_base64 else vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        self.inputs_embedded += len(inputs)
+
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-ada-002"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
@@ -0,0 +1,127 @@
+"""
+Shared plumbing for the HTTP fakes: fault injection and a background server.
+
+Every fake can be slowed down, made flaky and rate limited the same way, so
+the client-side effect of a change (batching, retries, concurrency) can be
+measured against a reproducible upstream instead of a live account.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from starlette.requests import ClientDisconnect
+
+@dataclass
+class FaultConfig:
+    # Added to every request before it is handled
+    latency_ms: float = 0.0
+    # Uniform random extra latency on top of latency_ms
+    jitter_ms: float = 0.0
+    # Fraction of requests answered with a 503
+    error_rate: float = 0.0
+    # Sustained requests per second before answering 429; 0 disables the limit
+    rate_limit: float = 0.0
+    # Requests allowed in a burst before the rate limit applies
+    burst: int = 10
+    # Seed for the latency jitter and error draws, for repeatable runs
+    seed: Optional[int] = None
+
+class FaultInjector:
+    """Token bucket rate limiter plus random latency and errors"""
+
+    def __init__(self, config: FaultConfig = None):
+        self.config = config or FaultConfig()
+        self._random = random.Random(self.config.seed)
+        self._tokens = float(self.config.burst)
+        self._refilled_at = time.monotonic()
+
+    def _take_token(self) -> bool:
+        if not self.config.rate_limit:
+            return True
+        now = time.monotonic()
+        self._tokens = min(float(self.config.burst),
+                           self._tokens + (now - self._refilled_at) * self.config.rate_limit)
+        self._refilled_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def apply(self) -> Optional[JSONResponse]:
+        """Delay the request, then return an error response if it should fail"""
+        config = self.config
+        if not self._take_token():
+            retry_after = max(1, int(1 / config.rate_limit + 0.5))
+            return JSONResponse({"error": "rate_limited"}, status_code=429,
+                                headers={"Retry-After": str(retry_after)})
+        delay = config.latency_ms + self._random.uniform(0, config.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if config.error_rate and self._random.random() < config.error_rate:
+            return JSONResponse({"error": "injected_failure"}, status_code=503)
+        return None
+
+class FakeHTTPServer:
+    """
+    Base class for the HTTP fakes.
+
+    Subclasses add routes to self.app. The server runs on its own thread and
+    event loop, so the synchronous clients used by the services (requests,
+    the Pinecone client, the OpenAI client) can call it from the main thread.
+    """
+
+    def __init__(self, faults: FaultConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.faults = FaultInjector(faults)
+        self.requests = Counter()  # Responses sent, by status code
+        self.app = FastAPI()
+        self.app.middleware("http")(self._inject_faults)
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def _inject_faults(self, request: Request, call_next):
+        response = await self.faults.apply()
+        if response is None:
+            try:
+                response = await call_next(request)
+            except ClientDisconnect:
+                # The client timed out while we were injecting latency
+                response = Response(status_code=499)
+        self.requests[response.status_code] += 1
+        return response
+
+    def start(self) -> str:
+        config = uvicorn.Config(self.app, host=self.host, port=self.port, log_level="warning", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError(f"{type(self).__name__} failed to start")
+            time.sleep(0.01)
+        self.port = self._server.servers[0].sockets[0].getsockname()[1]
+        return self.url
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.should_exit = True
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,102 @@
+"""
+Local stand-in for the parts of the Kayako API that KAI uses.
+
+Serves a SyntheticCorpus through /articles.json, /articles/{id}.json and
+/locale/fields/{id}.json, issues sessions from /users and records tickets
+posted to /cases. Point the services at it with KAYAKO_BASE_URL.
+"""
+import itertools
+import uuid
+from typing import Dict, List
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from .corpus import SyntheticArticle, SyntheticCorpus
+from .http_server import FaultConfig, FakeHTTPServer
+
+def _article_resource(article: SyntheticArticle) -> dict:
+    return {
+        "id": article.id,
+        "status": article.status,
+        "helpcenter_url": f"https://help.example.com/article/{article.id}",
+        "updated_at": article.updated_at,
+        "titles": [{"id": article.title_field_id, "resource_type": "locale_field"}],
+        "contents": [{"id": article.content_field_id, "resource_type": "locale_field"}],
+        "resource_type": "article"
+    }
+
+class FakeKayakoServer(FakeHTTPServer):
+    """Kayako help center and cases API backed by an in-memory corpus"""
+
+    def __init__(self, corpus: SyntheticCorpus = None, faults: FaultConfig = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        super().__init__(faults, host, port)
+        self.corpus = corpus or SyntheticCorpus()
+        self.sessions = set()
+        self.cases: List[Dict] = []
+        self._case_ids = itertools.count(1)
+
+        app = self.app
+        app.get("/users")(self._login)
+        app.get("/articles.json")(self._list_articles)
+        app.get("/articles/{article_id}.json")(self._get_article)
+        app.get("/locale/fields/{field_id}.json")(self._get_field)
+        app.post("/cases")(self._create_case)
+
+    def _authorized(self, request: Request) -> bool:
+        return request.headers.get("X-Session-ID") in self.sessions
+
+    @staticmethod
+    def _unauthorized() -> JSONResponse:
+        return JSONResponse({"status": 401, "errors": [{"code": "AUTHENTICATION_FAILED"}]}, status_code=401)
+
+    async def _login(self, request: Request):
+        if not request.headers.get("Authorization", "").startswith("Basic "):
+            return self._unauthorized()
+        session_id = uuid.uuid4().hex
+        self.sessions.add(session_id)
+        return JSONResponse(
+            {"status": 200, "session_id": session_id},
+            headers={"X-CSRF-Token": uuid.uuid4().hex}
+        )
+
+    async def _list_articles(self, request: Request, offset: int = 0, limit: int = 10):
+        if not self._authorized(request):
+            return self._unauthorized()
+        articles = self.corpus.ordered()
+        page = articles[offset:offset + limit]
+        return {
+            "status": 200,
+            "data": [_article_resource(article) for article in page],
+            "resource": "article",
+            "offset": offset,
+            "limit": limit,
+            "total_count": len(articles)
+        }
+
+    async def _get_article(self, request: Request, article_id: int):
+        if not self._authorized(request):
+            return self._unauthorized()
+        article = self.corpus.articles.get(article_id)
+        if not article:
+            return JSONResponse({"status": 404, "errors": [{"code": "RESOURCE_NOT_FOUND"}]}, status_code=404)
+        return {"status": 200, "data": _article_resource(article), "resource": "article"}
+
+    async def _get_field(self, request: Request, field_id: int):
+        if not self._authorized(request):
+            return self._unauthorized()
+        translation = self.corpus.locale_field(field_id)
+        if translation is None:
+            return JSONResponse({"status": 404, "errors": [{"code": "RESOURCE_NOT_FOUND"}]}, status_code=404)
+        return {
+            "status": 200,
+            "data": {"id": field_id, "locale": "en-us", "translation": translation, "resource_type": "locale_field"},
+            "resource": "locale_field"
+        }
+
+    async def _create_case(self, request: Request):
+        if not self._authorized(request):
+            return self._unauthorized()
+        payload = await request.json()
+        case = dict(payload, id=next(self._case_ids), resource_type="case")
+        self.cases.append(case)
+        return JSONResponse({"status": 201, "data": case, "resource": "case"}, status_code=201)
@@ -0,0 +1,238 @@
+"""
+In-memory stand-in for a Pinecone serverless index.
+
+Implements the REST data plane the Pinecone client uses (upsert, query,
+fetch, list, delete, describe_index_stats) plus describe_index on the
+control plane, with cosine similarity, metadata filters, namespaces and
+the per-request limits of the real service. Point the services at it with
+PINECONE_INDEX_HOST=<url>, or at the control plane with Pinecone(host=<url>).
+"""
+import json
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from .http_server import FaultConfig, FakeHTTPServer
+
+# Limits enforced by the real service
+MAX_UPSERT_VECTORS = 1000
+MAX_TOP_K = 10000
+MAX_METADATA_BYTES = 40960
+MAX_LIST_LIMIT = 100
+
+def matches_filter(metadata: dict, metadata_filter: Optional[dict]) -> bool:
+    """Evaluate a Pinecone metadata filter against one vector's metadata"""
+    if not metadata_filter:
+        return True
+    for key, condition in metadata_filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, f) for f in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, f) for f in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if not _compare(op, value, operand):
+                    return False
+    return True
+
+def _compare(op: str, value, operand) -> bool:
+    if op == "$eq":
+        return value == operand
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+    if op == "$exists":
+        return (value is not None) == bool(operand)
+    if value is None:
+        return False
+    if op == "$gt":
+        return value > operand
+    if op == "$gte":
+        return value >= operand
+    if op == "$lt":
+        return value < operand
+    if op == "$lte":
+        return value <= operand
+    raise ValueError(f"Unsupported filter operator {op}")
+
+class _Namespace:
+    """Vectors of one namespace, with a lazily rebuilt matrix for brute-force search"""
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self.values: Dict[str, np.ndarray] = {}
+        self.metadata: Dict[str, dict] = {}
+        self._ids: Optional[List[str]] = None
+        self._matrix: Optional[np.ndarray] = None
+
+    def upsert(self, vector_id: str, values: List[float], metadata: dict) -> None:
+        self.values[vector_id] = np.asarray(values, dtype=np.float32)
+        self.metadata[vector_id] = metadata or {}
+        self._ids = None
+
+    def delete(self, vector_id: str) -> None:
+        if self.values.pop(vector_id, None) is not None:
+            self.metadata.pop(vector_id, None)
+            self._ids = None
+
+    def search(self, vector: np.ndarray, top_k: int, metadata_filter: Optional[dict]) -> List[Tuple[str, float]]:
+        if self._ids is None:
+            self._ids = list(self.values)
+            matrix = np.stack([self.values[i] for i in self._ids]) if self._ids else np.zeros((0, self.dimension))
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._matrix = matrix / np.where(norms == 0, 1, norms)
+        if not self._ids:
+            return []
+
+        query_norm = np.linalg.norm(vector)
+        scores = self._matrix @ (vector / query_norm if query_norm else vector)
+        if metadata_filter:
+            allowed = np.array([matches_filter(self.metadata[i], metadata_filter) for i in self._ids])
+            scores = np.where(allowed, scores, -np.inf)
+        top_k = min(top_k, len(self._ids))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [(self._ids[i], float(scores[i])) for i in best if scores[i] != -np.inf]
+
+def _error(status: int, message: str) -> JSONResponse:
+    return JSONResponse({"code": status, "message": message, "details": []}, status_code=status)
+
+class FakePineconeServer(FakeHTTPServer):
+    """A single Pinecone index served over HTTP"""
+
+    def __init__(self, index_name: str = "kb", dimension: int = 1536, faults: FaultConfig = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        super().__init__(faults, host, port)
+        self.index_name = index_name
+        self.dimension = dimension
+        self.namespaces: Dict[str, _Namespace] = {}
+
+        app = self.app
+        app.get("/indexes/{name}")(self._describe_index)
+        app.post("/vectors/upsert")(self._upsert)
+        app.post("/query")(self._query)
+        app.get("/vectors/fetch")(self._fetch)
+        app.get("/vectors/list")(self._list)
+        app.post("/vectors/delete")(self._delete)
+        app.post("/describe_index_stats")(self._stats)
+
+    def namespace(self, name: str = "") -> _Namespace:
+        if name not in self.namespaces:
+            self.namespaces[name] = _Namespace(self.dimension)
+        return self.namespaces[name]
+
+    @property
+    def vector_count(self) -> int:
+        return sum(len(ns.values) for ns in self.namespaces.values())
+
+    async def _describe_index(self, name: str):
+        if name != self.index_name:
+            return _error(404, f"Resource {name} not found")
+        return {
+            "name": self.index_name,
+            "dimension": self.dimension,
+            "metric": "cosine",
+            "host": self.url,
+            "vector_type": "dense",
+            "deletion_protection": "disabled",
+            "spec": {"serverless": {"cloud": "aws", "region": "us-east-1"}},
+            "status": {"ready": True, "state": "Ready"}
+        }
+
+    async def _upsert(self, request: Request):
+        body = await request.json()
+        vectors = body.get("vectors", [])
+        if len(vectors) > MAX_UPSERT_VECTORS:
+            return _error(400, f"Upsert is limited to {MAX_UPSERT_VECTORS} vectors per request")
+        namespace = self.namespace(body.get("namespace", ""))
+        for vector in vectors:
+            if len(vector["values"]) != self.dimension:
+                return _error(400, f"Vector dimension {len(vector['values'])} does not match the dimension of the index {self.dimension}")
+            metadata = vector.get("metadata") or {}
+            if len(json.dumps(metadata)) > MAX_METADATA_BYTES:
+                return _error(400, f"Metadata size exceeds the limit of {MAX_METADATA_BYTES} bytes per vector")
+        for vector in vectors:
+            namespace.upsert(vector["id"], vector["values"], vector.get("metadata"))
+        return {"upsertedCount": len(vectors)}
+
+    async def _query(self, request: Request):
+        body = await request.json()
+        top_k = body.get("topK", 10)
+        if not 1 <= top_k <= MAX_TOP_K:
+            return _error(400, f"topK must be between 1 and {MAX_TOP_K}")
+        namespace = self.namespace(body.get("namespace", ""))
+        if body.get("id"):
+            if body["id"] not in namespace.values:
+                return {"matches": [], "namespace": body.get("namespace", ""), "usage": {"readUnits": 1}}
+            vector = namespace.values[body["id"]]
+        else:
+            vector = np.asarray(body.get("vector", []), dtype=np.float32)
+        if len(vector) != self.dimension:
+            return _error(400, f"Query vector dimension {len(vector)} does not match the dimension of the index {self.dimension}")
+
+        matches = []
+        for vector_id, score in namespace.search(vector, top_k, body.get("filter")):
+            match = {"id": vector_id, "score": score, "values": []}
+            if body.get("includeValues"):
+                match["values"] = namespace.values[vector_id].tolist()
+            if body.get("includeMetadata"):
+                match["metadata"] = namespace.metadata[vector_id]
+            matches.append(match)
+        # Read units grow with the namespace size on serverless indexes
+        read_units = max(1, len(namespace.values) // 1000)
+        return {"matches": matches, "namespace": body.get("namespace", ""), "usage": {"readUnits": read_units}}
+
+    async def _fetch(self, request: Request, namespace: str = ""):
+        ns = self.namespace(namespace)
+        vectors = {}
+        for vector_id in request.query_params.getlist("ids"):
+            if vector_id in ns.values:
+                vectors[vector_id] = {
+                    "id": vector_id,
+                    "values": ns.values[vector_id].tolist(),
+                    "metadata": ns.metadata[vector_id]
+                }
+        return {"vectors": vectors, "namespace": namespace, "usage": {"readUnits": 1}}
+
+    async def _list(self, prefix: str = "", limit: int = MAX_LIST_LIMIT,
+                    paginationToken: str = "", namespace: str = ""):
+        ns = self.namespace(namespace)
+        ids = sorted(i for i in ns.values if i.startswith(prefix))
+        if paginationToken:
+            ids = [i for i in ids if i > paginationToken]
+        limit = max(1, min(limit, MAX_LIST_LIMIT))
+        page = ids[:limit]
+        response = {"vectors": [{"id": i} for i in page], "namespace": namespace, "usage": {"readUnits": 1}}
+        if len(ids) > limit:
+            response["pagination"] = {"next": page[-1]}
+        return response
+
+    async def _delete(self, request: Request):
+        body = await request.json()
+        ns = self.namespace(body.get("namespace", ""))
+        if body.get("deleteAll"):
+            for vector_id in list(ns.values):
+                ns.delete(vector_id)
+        elif body.get("filter"):
+            for vector_id in [i for i, m in ns.metadata.items() if matches_filter(m, body["filter"])]:
+                ns.delete(vector_id)
+        else:
+            for vector_id in body.get("ids", []):
+                ns.delete(vector_id)
+        return {}
+
+    async def _stats(self, request: Request):
+        return {
+            "namespaces": {name: {"vectorCount": len(ns.values)} for name, ns in self.namespaces.items() if ns.values},
+            "dimension": self.dimension,
+            "indexFullness": 0.0,
+            "totalVectorCount": self.vector_count
+        }
@@ -0,0 +1,259 @@
+"""
+Local stand-in for the OpenAI Realtime API.
+
+Speaks enough of the realtime event protocol for KAI's call relay: it
+acknowledges session.update and answers every response.create with a burst
+of mu-law audio deltas followed by the matching transcript and done events.
+Caller audio goes through a simple energy-based stand-in for server VAD, so
+a caller that talks and then pauses gets speech_started/speech_stopped, a
+transcription and an automatic response, optionally a function call first.
+Latencies are configurable so pre-warming and relay changes can be measured
+without an OpenAI account.
+
+Run standalone with:
+    python -m src.fakes.realtime_server --port 9001
+and point the app at it with OPENAI_REALTIME_URL=ws://localhost:9001
+"""
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+from dataclasses import dataclass
+from typing import Optional
+import websockets
+from ..utils.audio import FRAME_MS, SAMPLE_RATE, split_frames, ulaw_rms, ulaw_tone
+
+@dataclass
+class FakeRealtimeConfig:
+    # Delay before session.updated is sent, standing in for session setup on the server
+    session_latency_ms: int = 150
+    # Delay between response.create and the first audio delta
+    first_audio_latency_ms: int = 300
+    # Length of the audio generated for each response
+    response_audio_ms: int = 2000
+    # Audio per response.audio.delta event
+    delta_ms: int = 100
+    # Transcript reported for every response
+    transcript: str = "Hi! This is Kai speaking. How can I assist you today?"
+    # Caller audio louder than this RMS level counts as speech
+    vad_threshold: float = 500.0
+    # Silence needed after speech before the caller's turn is considered over
+    vad_silence_ms: int = 500
+    # Delay between the end of the caller's turn and their transcript
+    transcription_latency_ms: int = 200
+    # Transcript reported for every caller turn
+    caller_transcript: str = "How do I reset my password?"
+    # When set, the model answers each caller turn by calling this function first
+    function_call: Optional[str] = None
+    # Delay between the response starting and the function call arguments being done
+    function_call_latency_ms: int = 150
+
+class FakeRealtimeServer:
+    """In-process fake realtime server; use start()/stop() or run it as a script"""
+
+    def __init__(self, config: FakeRealtimeConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeRealtimeConfig()
+        self.host = host
+        self.port = port
+        self._server = None
+        self._ids = itertools.count(1)
+        self.connections = 0
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self) -> str:
+        self._server = await websockets.serve(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.url
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids)}"
+
+    async def _handle(self, ws, path: Optional[str] = None) -> None:
+        self.connections += 1
+        session_id = self._new_id("sess")
+        await ws.send(json.dumps({"type": "session.created", "session": {"id": session_id}}))
+        responses = set()
+        vad = _VoiceActivity(self.config)
+
+        def spawn(coro):
+            task = asyncio.create_task(coro)
+            responses.add(task)
+            task.add_done_callback(responses.discard)
+
+        try:
+            async for message in ws:
+                event = json.loads(message)
+                event_type = event.get("type")
+                if event_type == "input_audio_buffer.append":
+                    change = vad.feed(base64.b64decode(event.get("audio", "")))
+                    if change == "started":
+                        await ws.send(json.dumps({
+                            "type": "input_audio_buffer.speech_started",
+                            "audio_start_ms": vad.position_ms,
+                            "item_id": vad.item_id
+                        }))
+                    elif change == "stopped":
+                        await self._end_caller_turn(ws, vad, spawn)
+                elif event_type == "session.update":
+                    await asyncio.sleep(self.config.session_latency_ms / 1000)
+                    await ws.send(json.dumps({
+                        "type": "session.updated",
+                        "session": dict(event.get("session", {}), id=session_id)
+                    }))
+                elif event_type == "response.create":
+                    spawn(self._respond(ws))
+                elif event_type == "response.cancel":
+                    for task in list(responses):
+                        task.cancel()
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for task in list(responses):
+                task.cancel()
+
+    async def _end_caller_turn(self, ws, vad: "_VoiceActivity", spawn) -> None:
+        """Commit the caller's speech, transcribe it later and answer it, like server VAD does"""
+        item_id = vad.item_id
+        await ws.send(json.dumps({
+            "type": "input_audio_buffer.speech_stopped",
+            "audio_end_ms": vad.position_ms,
+            "item_id": item_id
+        }))
+        await ws.send(json.dumps({"type": "input_audio_buffer.committed", "item_id": item_id}))
+        spawn(self._transcribe(ws, item_id))
+        if self.config.function_call:
+            spawn(self._call_function(ws))
+        else:
+            spawn(self._respond(ws))
+
+    async def _transcribe(self, ws, item_id: str) -> None:
+        await asyncio.sleep(self.config.transcription_latency_ms / 1000)
+        await ws.send(json.dumps({
+            "type": "conversation.item.input_audio_transcription.completed",
+            "item_id": item_id,
+            "content_index": 0,
+            "transcript": self.config.caller_transcript
+        }))
+
+    async def _call_function(self, ws) -> None:
+        """A response whose only output is a function call; the client answers with response.create"""
+        config = self.config
+        response_id = self._new_id("resp")
+        await ws.send(json.dumps({"type": "response.created", "response": {"id": response_id}}))
+        await asyncio.sleep(config.function_call_latency_ms / 1000)
+        await ws.send(json.dumps({
+            "type": "response.function_call_arguments.done",
+            "response_id": response_id,
+            "item_id": self._new_id("item"),
+            "output_index": 0,
+            "call_id": self._new_id("call"),
+            "name": config.function_call,
+            "arguments": json.dumps({"query": config.caller_transcript})
+        }))
+        await ws.send(json.dumps({"type": "response.done", "response": {"id": response_id, "status": "completed"}}))
+
+    async def _respond(self, ws) -> None:
+        config = self.config
+        response_id = self._new_id("resp")
+        item_id = self._new_id("item")
+        await ws.send(json.dumps({"type": "response.created", "response": {"id": response_id}}))
+        await asyncio.sleep(config.first_audio_latency_ms / 1000)
+
+        audio = ulaw_tone(config.response_audio_ms, frequency=330)
+        frames_per_delta = max(1, config.delta_ms // FRAME_MS)
+        frames = split_frames(audio)
+        for i in range(0, len(frames), frames_per_delta):
+            await ws.send(json.dumps({
+                "type": "response.audio.delta",
+                "response_id": response_id,
+                "item_id": item_id,
+                "output_index": 0,
+                "content_index": 0,
+                "delta": base64.b64encode(b"".join(frames[i:i + frames_per_delta])).decode("ascii")
+            }))
+            # The real API streams audio faster than real time; yield so other connections progress
+            await asyncio.sleep(0)
+
+        await ws.send(json.dumps({"type": "response.audio.done", "response_id": response_id, "item_id": item_id}))
+        await ws.send(json.dumps({
+            "type": "response.audio_transcript.done",
+            "response_id": response_id,
+            "item_id": item_id,
+            "transcript": config.transcript
+        }))
+        await ws.send(json.dumps({"type": "response.done", "response": {"id": response_id, "status": "completed"}}))
+
+class _VoiceActivity:
+    """Tracks whether the caller is talking, one appended audio chunk at a time"""
+
+    def __init__(self, config: FakeRealtimeConfig):
+        self.config = config
+        self.speaking = False
+        self.silence_ms = 0
+        self.position_ms = 0
+        self.turns = 0
+
+    @property
+    def item_id(self) -> str:
+        return f"item_caller_{self.turns}"
+
+    def feed(self, audio: bytes) -> Optional[str]:
+        """Returns "started" or "stopped" when the chunk changes the caller's state"""
+        duration_ms = len(audio) * 1000 // SAMPLE_RATE
+        self.position_ms += duration_ms
+        if ulaw_rms(audio) >= self.config.vad_threshold:
+            self.silence_ms = 0
+            if not self.speaking:
+                self.speaking = True
+                self.turns += 1
+                return "started"
+        elif self.speaking:
+            self.silence_ms += duration_ms
+            if self.silence_ms >= self.config.vad_silence_ms:
+                self.speaking = False
+                return "stopped"
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI Realtime API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--session-latency-ms", type=int, default=150)
+    parser.add_argument("--first-audio-latency-ms", type=int, default=300)
+    parser.add_argument("--response-audio-ms", type=int, default=2000)
+    parser.add_argument("--transcription-latency-ms", type=int, default=200)
+    parser.add_argument("--function-call", default=None,
+                        help="Answer every caller turn by calling this function first, e.g. search_knowledge_base")
+    parser.add_argument("--function-call-latency-ms", type=int, default=150)
+    args = parser.parse_args()
+
+    config = FakeRealtimeConfig(
+        session_latency_ms=args.session_latency_ms,
+        first_audio_latency_ms=args.first_audio_latency_ms,
+        response_audio_ms=args.response_audio_ms,
+        transcription_latency_ms=args.transcription_latency_ms,
+        function_call=args.function_call,
+        function_call_latency_ms=args.function_call_latency_ms
+    )
+
+    async def serve():
+        server = FakeRealtimeServer(config, args.host, args.port)
+        print(f"Fake realtime server listening on {await server.start()}")
+        await asyncio.Future()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""
+In-memory stand-in for Redis, speaking RESP2 over TCP.
+
+Covers the commands the conversation store and its tests use: strings,
+hashes, lists, sets, key expiry and MULTI/EXEC with WATCH. Like the HTTP
+fakes it runs on a background thread so blocking clients can use it.
+
+    python -m src.fakes.redis_server --port 6390
+"""
+import argparse
+import asyncio
+import fnmatch
+import threading
+import time
+from typing import Dict, List, Optional
+
+class _Error(Exception):
+    pass
+
+WRONGTYPE = "WRONGTYPE Operation against a key holding the wrong kind of value"
+
+class _Database:
+    def __init__(self):
+        self.data: Dict[bytes, object] = {}
+        self.expires: Dict[bytes, float] = {}
+        self.versions: Dict[bytes, int] = {}
+
+    def touch(self, key: bytes) -> None:
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def get(self, key: bytes, kind: type = None):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.delete(key)
+        value = self.data.get(key)
+        if value is not None and kind is not None and not isinstance(value, kind):
+            raise _Error(WRONGTYPE)
+        return value
+
+    def get_or_create(self, key: bytes, kind: type):
+        value = self.get(key, kind)
+        if value is None:
+            value = self.data[key] = kind()
+        return value
+
+    def delete(self, key: bytes) -> bool:
+        self.expires.pop(key, None)
+        if self.data.pop(key, None) is not None:
+            self.touch(key)
+            return True
+        return False
+
+class _Connection:
+    def __init__(self):
+        self.db = 0
+        self.queued: Optional[List[List[bytes]]] = None  # Commands inside MULTI
+        self.watched: Dict[tuple, int] = {}
+
+class FakeRedisServer:
+    """A single-process Redis with only the commands KAI needs"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.databases: Dict[int, _Database] = {}
+        self.commands_processed = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}"
+
+    def start(self) -> str:
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+            self._server.close()
+            # Drop open client connections before the loop goes away
+            connections = asyncio.all_tasks(self._loop)
+            for task in connections:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*connections, return_exceptions=True))
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="FakeRedisServer", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.url
+
+    def stop(self) -> None:
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _db(self, conn: _Connection) -> _Database:
+        if conn.db not in self.databases:
+            self.databases[conn.db] = _Database()
+        return self.databases[conn.db]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        conn = _Connection()
+        try:
+            while True:
+                command = await _read_command(reader)
+                if command is None:
+                    break
+                writer.write(self._dispatch(conn, command))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Cancelled on shutdown; finishing quietly keeps asyncio from logging it
+            pass
+        finally:
+            writer.close()
+
+    def _dispatch(self, conn: _Connection, command: List[bytes]) -> bytes:
+        self.commands_processed += 1
+        name = command[0].upper().decode()
+        args = command[1:]
+
+        if conn.queued is not None and name not in ("EXEC", "DISCARD", "MULTI", "WATCH"):
+            conn.queued.append(command)
+            return b"+QUEUED\r\n"
+        try:
+            if name == "MULTI":
+                if conn.queued is not None:
+                    raise _Error("ERR MULTI calls can not be nested")
+                conn.queued = []
+                return b"+OK\r\n"
+            if name == "DISCARD":
+                conn.queued = None
+                conn.watched.clear()
+                return b"+OK\r\n"
+            if name == "EXEC":
+                if conn.queued is None:
+                    raise _Error("ERR EXEC without MULTI")
+                queued, conn.queued = conn.queued, None
+                changed = any(
+                    self.databases.setdefault(db, _Database()).versions.get(key, 0) != version
+                    for (db, key), version in conn.watched.items()
+                )
+                conn.watched.clear()
+                if changed:
+                    return b"*-1\r\n"
+                replies = [self._dispatch(conn, queued_command) for queued_command in queued]
+                return b"*%d\r\n" % len(replies) + b"".join(replies)
+            if name == "WATCH":
+                if conn.queued is not None:
+                    raise _Error("ERR WATCH inside MULTI is not allowed")
+                db = self._db(conn)
+                for key in args:
+                    db.get(key)  # Expire first so a lapse counts as the key's version
+                    conn.watched[(conn.db, key)] = db.versions.get(key, 0)
+                return b"+OK\r\n"
+            if name == "UNWATCH":
+                conn.watched.clear()
+                return b"+OK\r\n"
+            if name == "SELECT":
+                conn.db = int(args[0])
+                return b"+OK\r\n"
+            handler = getattr(self, f"_cmd_{name.lower()}", None)
+            if handler is None:
+                raise _Error(f"ERR unknown command '{name}'")
+            return _encode(handler(self._db(conn), *args))
+        except _Error as e:
+            return b"-%s\r\n" % str(e).encode()
+        except (TypeError, ValueError, IndexError):
+            return b"-ERR wrong number or type of arguments for '%s' command\r\n" % name.lower().encode()
+
+    # Connection and keys
+
+    def _cmd_ping(self, db, message=None):
+        return message if message is not None else _Status("PONG")
+
+    def _cmd_auth(self, db, *args):
+        return _Status("OK")
+
+    def _cmd_flushdb(self, db):
+        for key in list(db.data):
+            db.delete(key)
+        return _Status("OK")
+
+    def _cmd_del(self, db, *keys):
+        return sum(db.delete(key) for key in keys)
+
+    def _cmd_exists(self, db, *keys):
+        return sum(db.get(key) is not None for key in keys)
+
+    def _cmd_keys(self, db, pattern):
+        pattern = pattern.decode()
+        return [key for key in list(db.data) if db.get(key) is not None and fnmatch.fnmatchcase(key.decode(), pattern)]
+
+    def _cmd_expire(self, db, key, seconds):
+        return self._cmd_pexpire(db, key, int(seconds) * 1000)
+
+    def _cmd_pexpire(self, db, key, millis):
+        if db.get(key) is None:
+            return 0
+        db.expires[key] = time.monotonic() + int(millis) / 1000
+        return 1
+
+    def _cmd_ttl(self, db, key):
+        if db.get(key) is None:
+            return -2
+        expires = db.expires.get(key)
+        return -1 if expires is None else max(0, int(expires - time.monotonic() + 0.5))
+
+    def _cmd_persist(self, db, key):
+        return 1 if db.expires.pop(key, None) is not None else 0
+
+    # Strings
+
+    def _cmd_get(self, db, key):
+        return db.get(key, bytes)
+
+    def _cmd_set(self, db, key, value, *options):
+        options = [o.upper() for o in options]
+        if b"NX" in options and db.get(key) is not None:
+            return None
+        db.data[key] = value
+        db.expires.pop(key, None)
+        for flag, scale in ((b"EX", 1000), (b"PX", 1)):
+            if flag in options:
+                db.expires[key] = time.monotonic() + int(options[options.index(flag) + 1]) * scale / 1000
+        db.touch(key)
+        return _Status("OK")
+
+    def _cmd_incrby(self, db, key, amount):
+        value = int(db.get(key, bytes) or 0) + int(amount)
+        db.data[key] = str(value).encode()
+        db.touch(key)
+        return value
+
+    def _cmd_incr(self, db, key):
+        return self._cmd_incrby(db, key, 1)
+
+    # Hashes
+
+    def _cmd_hset(self, db, key, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise ValueError()
+        value = db.get_or_create(key, dict)
+        added = 0
+        for field, item in zip(pairs[::2], pairs[1::2]):
+            added += field not in value
+            value[field] = item
+        db.touch(key)
+        return added
+
+    def _cmd_hget(self, db, key, field):
+        return (db.get(key, dict) or {}).get(field)
+
+    def _cmd_hgetall(self, db, key):
+        return [part for pair in (db.get(key, dict) or {}).items() for part in pair]
+
+    def _cmd_hdel(self, db, key, *fields):
+        value = db.get(key, dict) or {}
+        removed = sum(value.pop(field, None) is not None for field in fields)
+        if removed:
+            if not value:
+                db.delete(key)
+            db.touch(key)
+        return removed
+
+    def _cmd_hincrby(self, db, key, field, amount):
+        value = db.get_or_create(key, dict)
+        value[field] = str(int(value.get(field, b"0")) + int(amount)).encode()
+        db.touch(key)
+        return int(value[field])
+
+    # Lists
+
+    def _cmd_rpush(self, db, key, *items):
+        if not items:
+            raise ValueError()
+        value = db.get_or_create(key, list)
+        value.extend(items)
+        db.touch(key)
+        return len(value)
+
+    def _cmd_lpush(self, db, key, *items):
+        if not items:
+            raise ValueError()
+        value = db.get_or_create(key, list)
+        value[:0] = reversed(items)
+        db.touch(key)
+        return len(value)
+
+    def _cmd_llen(self, db, key):
+        return len(db.get(key, list) or [])
+
+    def _cmd_lrange(self, db, key, start, stop):
+        value = db.get(key, list) or []
+        start, stop, size = int(start), int(stop), len(value)
+        if start < 0:
+            start = max(0, size + start)
+        if stop < 0:
+            stop = size + stop
+        stop = min(stop, size - 1)
+        return value[start:stop + 1] if start <= stop else []
+
+    def _cmd_ltrim(self, db, key, start, stop):
+        value = db.get(key, list)
+        if value is not None:
+            kept = self._cmd_lrange(db, key, start, stop)
+            value[:] = kept
+            if not value:
+                db.delete(key)
+            db.touch(key)
+        return _Status("OK")
+
+    # Sets
+
+    def _cmd_sadd(self, db, key, *members):
+        value = db.get_or_create(key, set)
+        added = len(set(members) - value)
+        value.update(members)
+        db.touch(key)
+        return added
+
+    def _cmd_srem(self, db, key, *members):
+        value = db.get(key, set) or set()
+        removed = len(value & set(members))
+        value.difference_update(members)
+        if removed:
+            if not value:
+                db.delete(key)
+            db.touch(key)
+        return removed
+
+    def _cmd_smembers(self, db, key):
+        return sorted(db.get(key, set) or set())
+
+    def _cmd_scard(self, db, key):
+        return len(db.get(key, set) or set())
+
+class _Status(str):
+    """A simple string reply (+OK) rather than a bulk string"""
+
+def _encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, _Status):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, (bytes, str)):
+        data = value.encode() if isinstance(value, str) else value
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command, as typed into telnet
+        return line.split()
+    args = []
+    for _ in range(int(line[1:-2])):
+        header = await reader.readline()
+        length = int(header[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory stand-in for Redis")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+
+    server = FakeRedisServer(args.host, args.port)
+    print(f"Fake Redis listening on {server.start()}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,58 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from src.config.settings import Settings
 from src.api.routes import twilio
+from src.services.audio_clip_cache import clip_cache
+from src.services.auth_service import KayakoAuthService
+from src.services.conversation_archive import default_conversation_archive
+from src.services.conversation_service import expire_conversations
+from src.services.conversation_wal import default_conversation_wal, recover_orphaned_conversations
+from src.services.ticket_service import KayakoTicketService, drain_ticket_spool
+from src.utils.concurrency import run_in_thread
+from src.utils.metrics import PROCESS_CPU, monitor_event_loop_lag, registry
+from src.utils.tracing import tracer
 
-app = FastAPI(title="KAI Assist", description="AI-powered call center assistant")
+def recover_conversations(directory: str) -> None:
+    """Create tickets for calls that workers which died left open"""
+    try:
+        created = recover_orphaned_conversations(directory, KayakoTicketService(KayakoAuthService()))
+    except Exception as e:
+        print(f"Error recovering conversations: {e}")
+        return
+    if created:
+        print(f"Created {created} tickets for calls interrupted by a crash")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    clip_cache.preload()
+    await twilio.session_pool.start()
+    background_tasks = [
+        asyncio.create_task(monitor_event_loop_lag()),
+        asyncio.create_task(expire_conversations()),
+        asyncio.create_task(drain_ticket_spool()),
+    ]
+    wal = default_conversation_wal()
+    # Runs in the background; ticket creation is slow and must not delay startup
+    recovery = asyncio.create_task(run_in_thread(recover_conversations, str(wal.root))) if wal else None
+    yield
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    if recovery:
+        # The thread cannot be interrupted, so let it finish the tickets it is creating
+        await recovery
+    await twilio.session_pool.stop()
+    archive = default_conversation_archive()
+    if archive:
+        await run_in_thread(archive.close)
+    if wal:
+        await run_in_thread(wal.close)
+    tracer.shutdown()
+
+app = FastAPI(title="KAI Assist", description="AI-powered call center assistant", lifespan=lifespan)
 settings = Settings()
 
 # Include routers
@@ -12,6 +62,12 @@ app.include_router(twilio.router, prefix="/api/twilio", tags=["twilio"])
 async def root():
     return {"message": "KAI Assist API is running"}
 
+@app.get("/metrics")
+async def metrics():
+    """Expose this worker's metrics in the Prometheus text format"""
+    PROCESS_CPU.set(time.process_time())
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
-from bs4 import BeautifulSoup
+from ..utils.html_text import html_to_text, html_to_text_many
 
 @dataclass
 class Article:
@@ -15,21 +15,31 @@ class Article:
     @staticmethod
     def _clean_html(html_content: Optional[str]) -> Optional[str]:
         """Remove HTML tags and clean up whitespace"""
-        if not html_content:
-            return None
-        soup = BeautifulSoup(html_content, 'html.parser')
-        text = soup.get_text(separator=' ')
-        # Clean up whitespace
-        return ' '.join(text.split())
+        # Same text as BeautifulSoup's get_text(separator=' '), without building a tree
+        return html_to_text(html_content)
     
     @classmethod
-    def from_api_response(cls, data: dict, title: Optional[str] = None, content: Optional[str] = None) -> 'Article':
-        """Create an Article instance from Kayako API response data"""
+    def from_api_response(cls, data: dict, title: Optional[str] = None, content: Optional[str] = None,
+                          clean: bool = True) -> 'Article':
+        """
+        Create an Article instance from Kayako API response data
+
+        With clean=False the title and content are kept as HTML, to be
+        cleaned in bulk with clean_all.
+        """
         return cls(
             id=data['id'],
             status=data['status'],
             helpcenter_url=data['helpcenter_url'],
             updated_at=data['updated_at'],
-            title=cls._clean_html(title),
-            content=cls._clean_html(content)
-        ) 
\ No newline at end of file
+            title=cls._clean_html(title) if clean else title,
+            content=cls._clean_html(content) if clean else content
+        )
+
+    @staticmethod
+    def clean_all(articles: List['Article'], processes: int = 0) -> None:
+        """Clean the HTML of articles created with clean=False, in a process pool if processes > 1"""
+        texts = html_to_text_many([a.title for a in articles] + [a.content for a in articles], processes)
+        for article, title, content in zip(articles, texts, texts[len(articles):]):
+            article.title = title
+            article.content = content 
\ No newline at end of file
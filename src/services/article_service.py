@@ -1,7 +1,9 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+import os
 import requests
+from dotenv import load_dotenv
 from .auth_service import KayakoAuthService
-from models.article import Article
+from ..models.article import Article
 
 class KayakoArticleService:
     def __init__(self, auth_service: KayakoAuthService):
@@ -159,17 +161,49 @@ class KayakoArticleService:
             print(f"Error fetching article {article_id}: {e}")
             raise 
 
-    def get_published_articles(self, offset: int = 0, limit: int = 10) -> List[Article]:
+    def get_published_articles(self, offset: int = 0, limit: int = 10, clean: bool = True) -> List[Article]:
         """
         Fetch published articles from Kayako API
         
         Args:
             offset (int): Starting point for pagination
             limit (int): Number of articles to return per page
+            clean (bool): Whether to turn titles and contents into plain text;
+                if not, they are left as HTML for Article.clean_all
             
         Returns:
             List of published Article objects
         """
+        return self.get_published_page(offset, limit, clean)[0]
+    
+    def get_published_page(self, offset: int = 0, limit: int = 10, clean: bool = True) -> Tuple[List[Article], int]:
+        """
+        Fetch one page of articles and keep the published ones
+        
+        Returns:
+            The published Article objects, and how many articles of any
+            status the page held; only a page short of the limit is the last
+        """
+        try:
+            summaries = self.get_article_summaries(offset, limit)
+            articles = [
+                self.load_article(article_data, clean=clean)
+                for article_data in summaries
+                # Only process published articles
+                if article_data.get('status') == "PUBLISHED"
+            ]
+            return articles, len(summaries)
+            
+        except Exception as e:
+            print(f"Error fetching published articles: {e}")
+            raise
+    
+    def get_article_summaries(self, offset: int = 0, limit: int = 10) -> List[Dict]:
+        """
+        Fetch one page of articles as the API lists them, without titles or contents
+        
+        Each has id, status and updated_at; load_article fetches the rest.
+        """
         url = f"{self.base_url}/articles.json"
         
         params = {
@@ -177,59 +211,79 @@ class KayakoArticleService:
             'limit': limit
         }
         
-        try:
-            response = requests.get(
-                url,
-                params=params,
-                headers=self.auth_service.get_auth_headers()
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            articles = []
-            for article_data in data.get('data', []):
-                # Only process published articles
-                if article_data.get('status') == "PUBLISHED":
-                    # Get title ID and content ID
-                    title_id = next((t['id'] for t in article_data.get('titles', []) 
-                                   if t.get('resource_type') == 'locale_field'), None)
-                    content_id = next((c['id'] for c in article_data.get('contents', [])
-                                     if c.get('resource_type') == 'locale_field'), None)
-                    
-                    # Fetch actual title and content
-                    title = self.get_locale_field(title_id) if title_id else None
-                    content = self.get_locale_field(content_id) if content_id else None
-                    
-                    articles.append(Article.from_api_response(article_data, title, content))
-            
-            return articles
+        response = requests.get(
+            url,
+            params=params,
+            headers=self.auth_service.get_auth_headers()
+        )
+        response.raise_for_status()
+        return response.json().get('data', [])
+    
+    def get_all_article_summaries(self) -> List[Dict]:
+        """
+        Every article as the API lists them, one request per hundred articles
+        """
+        all_summaries = []
+        offset = 0
+        limit = 100
+        
+        while True:
+            summaries = self.get_article_summaries(offset=offset, limit=limit)
+            all_summaries.extend(summaries)
+            if len(summaries) < limit:
+                break
+            offset += limit
             
-        except Exception as e:
-            print(f"Error fetching published articles: {e}")
-            raise
+        return all_summaries
     
-    def get_all_published_articles(self) -> List[Article]:
+    def load_article(self, article_data: Dict, clean: bool = True) -> Article:
+        """
+        Fetch the title and content of an article from get_article_summaries
+        """
+        # Get title ID and content ID
+        title_id = next((t['id'] for t in article_data.get('titles', []) 
+                       if t.get('resource_type') == 'locale_field'), None)
+        content_id = next((c['id'] for c in article_data.get('contents', [])
+                         if c.get('resource_type') == 'locale_field'), None)
+        
+        # Fetch actual title and content
+        title = self.get_locale_field(title_id) if title_id else None
+        content = self.get_locale_field(content_id) if content_id else None
+        
+        return Article.from_api_response(article_data, title, content, clean=clean)
+    
+    def get_all_published_articles(self, clean_processes: int = None) -> List[Article]:
         """
         Fetch all published articles by handling pagination automatically
         
+        Args:
+            clean_processes (int): With more than 1, the HTML of every article
+                is cleaned at the end in a pool of this many processes instead
+                of page by page (default: ARTICLE_CLEAN_PROCESSES, else 0)
+        
         Returns:
             List of all published Article objects
         """
+        if clean_processes is None:
+            load_dotenv()
+            clean_processes = int(os.getenv('ARTICLE_CLEAN_PROCESSES', '0'))
+        bulk_clean = clean_processes > 1
         all_articles = []
         offset = 0
         limit = 100  # Fetch more articles per request
         
         while True:
-            articles = self.get_published_articles(offset=offset, limit=limit)
-            if not articles:
-                break
-                
+            articles, page_size = self.get_published_page(offset=offset, limit=limit, clean=not bulk_clean)
             all_articles.extend(articles)
             
-            # Check if we got less than the limit (meaning we're at the end)
-            if len(articles) < limit:
+            # Check if we got less than the limit (meaning we're at the end);
+            # drafts count, or a page of them would end the listing early
+            if page_size < limit:
                 break
                 
             offset += limit
+        
+        if bulk_clean:
+            Article.clean_all(all_articles, clean_processes)
             
         return all_articles 
\ No newline at end of file
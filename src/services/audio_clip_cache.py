@@ -0,0 +1,87 @@
+import base64
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from ..utils.audio import SAMPLE_RATE, split_frames
+
+GREETING_CLIP = "greeting"
+LOOKUP_CLIP = "lookup"
+
+# What each pre-rendered clip says. scripts/render_audio_clips.py renders these
+# with the same voice as live calls; the text is also what we tell the model was said.
+CLIP_SCRIPTS = {
+    GREETING_CLIP: "Hi! This is Kai speaking. How can I assist you today?",
+    # Played by FillerAudio while a slow knowledge base lookup runs
+    LOOKUP_CLIP: "Let me look that up for you.",
+}
+
+DEFAULT_CLIP_DIR = Path(__file__).parent.parent.parent / 'assets' / 'audio'
+
+class AudioClipCache:
+    """
+    Pre-rendered mu-law clips, loaded from disk once per process.
+
+    Clips are stored as raw 8kHz G.711 mu-law files named `<clip>.ulaw` and are
+    kept in memory as ready-to-send base64 Twilio media payloads.
+    """
+
+    def __init__(self, directory: Path = None, frames_per_payload: int = 10):
+        self.directory = Path(directory or DEFAULT_CLIP_DIR)
+        self.frames_per_payload = frames_per_payload
+        self._payloads: Dict[str, Optional[List[str]]] = {}
+        self._durations_ms: Dict[str, float] = {}
+
+    def get(self, name: str) -> Optional[List[str]]:
+        """Get the base64 media payloads for a clip, or None if it has not been rendered"""
+        if name not in self._payloads:
+            self._payloads[name] = self._load(name)
+        return self._payloads[name]
+
+    def duration_ms(self, name: str) -> Optional[float]:
+        """Playing time of a clip, or None if it has not been rendered"""
+        if self.get(name) is None:
+            return None
+        return self._durations_ms[name]
+
+    def preload(self) -> None:
+        """Load every known clip up front so the first call does not touch the disk"""
+        for name in CLIP_SCRIPTS:
+            self.get(name)
+
+    def _load(self, name: str) -> Optional[List[str]]:
+        path = self.directory / f"{name}.ulaw"
+        try:
+            audio = path.read_bytes()
+        except FileNotFoundError:
+            print(f"No pre-rendered audio for '{name}' at {path}")
+            return None
+
+        self._durations_ms[name] = len(audio) * 1000 / SAMPLE_RATE
+        frames = split_frames(audio)
+        step = self.frames_per_payload
+        return [
+            base64.b64encode(b"".join(frames[i:i + step])).decode('ascii')
+            for i in range(0, len(frames), step)
+        ]
+
+def spoken_prefix(script: str, fraction: float) -> str:
+    """
+    The words of a clip's script the caller heard before playback stopped
+
+    Speech runs at a fairly even pace through a short clip, so words are
+    counted heard when their last character falls within the fraction of
+    the script's characters that was played.
+    """
+    heard = max(0.0, min(1.0, fraction)) * len(script)
+    end = 0
+    for word in script.split(" "):
+        if end + len(word) > heard:
+            break
+        end += len(word) + 1
+    return script[:end].rstrip()
+
+load_dotenv()
+
+# Shared by every call on this worker so each clip is read from disk only once
+clip_cache = AudioClipCache(os.getenv('AUDIO_CLIP_DIR') or None)
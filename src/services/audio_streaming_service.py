@@ -1,8 +1,7 @@
 import json
-import base64
-import websockets
 import asyncio
 import os
+import time
 from fastapi import WebSocket
 from dotenv import load_dotenv
 from fastapi import WebSocketDisconnect
@@ -11,7 +10,33 @@ from .search_service import KnowledgeBaseSearchService
 from .ticket_service import KayakoTicketService
 from .auth_service import KayakoAuthService
 from .tool_service import ToolService
+from .socket_writer import QueuedSocketWriter
+from .realtime_session_pool import RealtimeSessionPool
+from .audio_clip_cache import CLIP_SCRIPTS, GREETING_CLIP, clip_cache, spoken_prefix
+from .call_teardown import CallTeardown
+from .kb_prefetch import KnowledgeBasePrefetcher
+from .filler_audio import FillerAudio
+from .realtime_event_router import RealtimeEventRouter
 from ..models.tool import Tools
+from ..utils.concurrency import run_in_thread
+from ..utils.metrics import registry
+from ..utils.tracing import tracer
+
+TIME_TO_FIRST_AUDIO = registry.histogram(
+    "call_time_to_first_audio_seconds",
+    "Time from accepting the Twilio WebSocket to sending the first greeting audio",
+    ["source"]
+)
+RESPONSE_LATENCY = registry.histogram(
+    "call_response_latency_seconds",
+    "Time from the caller's end of speech (speech_stopped) to the first assistant audio delta"
+)
+ACTIVE_CALLS = registry.gauge(
+    "active_calls", "Calls currently connected to this worker", ["worker"]
+)
+
+# Id of the conversation item standing in for the pre-rendered greeting, so it can be replaced
+GREETING_ITEM_ID = "kai_greeting"
 
 class AudioStreamingService:
     SYSTEM_MESSAGE = """You are a helpful and professional AI assistant for phone conversations. 
@@ -50,10 +75,14 @@ class AudioStreamingService:
         - Never continue conversation after using end_call tool
         - Keep all responses concise and clear."""
 
-    def __init__(self):
+    DEFAULT_REALTIME_URL = 'wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-12-17'
+
+    def __init__(self, session_pool: RealtimeSessionPool = None):
         load_dotenv()
         self.api_key = os.getenv('OPENAI_API_KEY')
         self.system_message = self.SYSTEM_MESSAGE
+        # Without a shared pool, every call opens and configures its own session
+        self.session_pool = session_pool or self.create_session_pool(size=0)
         self.conversation_service = ConversationService()
         
         # Initialize auth service first
@@ -64,12 +93,33 @@ class AudioStreamingService:
         self.tool_service = ToolService()
         self.caller_number = "+1 (512) 749-1212"
 
+        # Bounded send queues, one per socket, so a slow peer only backs up its own direction
+        self.twilio_queue_size = int(os.getenv('TWILIO_SEND_QUEUE_SIZE', '500'))
+        self.openai_queue_size = int(os.getenv('OPENAI_SEND_QUEUE_SIZE', '250'))
+
+        # Upper bound on how long we wait for the goodbye to be played before hanging up
+        self.end_call_max_wait = float(os.getenv('END_CALL_MAX_WAIT_SECONDS', '12'))
+
+        # Search the knowledge base on the caller's question before the model asks for it
+        self.kb_prefetch = os.getenv('KB_PREFETCH', 'true').lower() == 'true'
+
     async def handle_call_stream(self, websocket: WebSocket, caller_number: str = None) -> None:
         """Handle WebSocket connections between Twilio and OpenAI"""
         self.caller_number = caller_number
         await websocket.accept()
+        accepted_at = time.perf_counter()
         print("Client connected")
+        active_calls = ACTIVE_CALLS.labels(os.getpid())
+        active_calls.inc()
+        try:
+            # The trace is renamed to the stream SID once Twilio sends it
+            with tracer.trace("call") as call_span:
+                await self._relay_call(websocket, accepted_at, call_span)
+        finally:
+            active_calls.dec()
 
+    async def _relay_call(self, websocket: WebSocket, accepted_at: float, call_span) -> None:
+        """Relay audio and events between an accepted Twilio stream and an OpenAI realtime session"""
         # Connection specific state
         stream_sid = None
         latest_media_timestamp = 0
@@ -79,10 +129,18 @@ class AudioStreamingService:
         response_in_progress = False
         audio_playing = False
         audio_chunks_received = 0  # Track number of audio chunks received
+        background_tasks = set()  # Function calls run off the OpenAI read loop
+        first_audio_sent = False
+        speech_stopped_at = None  # When the caller last stopped talking, until the assistant answers
+        response_wait_span = None  # Traces the same gap as speech_stopped_at
+        response_spans = {}  # Open trace spans by realtime response ID
+        greeting_payloads = clip_cache.get(GREETING_CLIP)  # None if the greeting has not been rendered
+        greeting_playing = False
+        kb_prefetcher = KnowledgeBasePrefetcher(lambda: self.tool_service.knowledge_base_service) if self.kb_prefetch else None
 
         # Initialize state before stream_sid is available
         current_state = "initial"
-        self.conversation_service.update_call_state(stream_sid, current_state)
+        await self.conversation_service.update_call_state_async(stream_sid, current_state)
 
         async def send_mark():
             """Send a mark event to Twilio"""
@@ -92,12 +150,51 @@ class AudioStreamingService:
                     "streamSid": stream_sid,
                     "mark": {"name": "responsePart"}
                 }
-                await websocket.send_json(mark_event)
+                await twilio_writer.send_json(mark_event)
                 mark_queue.append('responsePart')
 
+        def record_first_audio(source: str):
+            """Record time to first audio the first time any audio is sent to the caller"""
+            nonlocal first_audio_sent
+            if not first_audio_sent:
+                first_audio_sent = True
+                elapsed = time.perf_counter() - accepted_at
+                TIME_TO_FIRST_AUDIO.labels(source).observe(elapsed)
+                print(f"Time to first audio: {elapsed * 1000:.0f}ms ({source})")
+
+        async def play_greeting():
+            """Stream the pre-rendered greeting straight to Twilio"""
+            nonlocal greeting_playing, response_start_timestamp_twilio
+            greeting_playing = True
+            response_start_timestamp_twilio = latest_media_timestamp
+            with tracer.span("call.greeting", payloads=len(greeting_payloads)):
+                for payload in greeting_payloads:
+                    await twilio_writer.send_json({
+                        "event": "media",
+                        "streamSid": stream_sid,
+                        "media": {"payload": payload}
+                    })
+                    record_first_audio("prerendered")
+                await twilio_writer.send_json({
+                    "event": "mark",
+                    "streamSid": stream_sid,
+                    "mark": {"name": "greeting"}
+                })
+            mark_queue.append('greeting')
+
+        async def truncate_greeting():
+            """Replace the greeting the model was told about with the part the caller heard"""
+            played_ms = latest_media_timestamp - response_start_timestamp_twilio
+            heard = spoken_prefix(CLIP_SCRIPTS[GREETING_CLIP], played_ms / clip_cache.duration_ms(GREETING_CLIP))
+            await openai_writer.send(json.dumps({"type": "conversation.item.delete", "item_id": GREETING_ITEM_ID}))
+            if heard:
+                # The greeting opened the conversation, so the heard part goes back at the start
+                await openai_writer.send(json.dumps(self._greeting_item(heard, previous_item_id="root")))
+                await self.conversation_service.add_message_async(stream_sid, "assistant", heard)
+
         async def handle_speech_started_event():
             """Handle interruption when the caller's speech starts."""
-            nonlocal response_start_timestamp_twilio, last_assistant_item
+            nonlocal response_start_timestamp_twilio, last_assistant_item, greeting_playing
             #print("Handling speech started event.")
             if mark_queue and response_start_timestamp_twilio is not None:
                 elapsed_time = latest_media_timestamp - response_start_timestamp_twilio
@@ -110,9 +207,14 @@ class AudioStreamingService:
                         "content_index": 0,
                         "audio_end_ms": elapsed_time
                     }
-                    await openai_ws.send(json.dumps(truncate_event))
+                    await openai_writer.send(json.dumps(truncate_event))
+                elif greeting_playing:
+                    # Played from a clip rather than generated, so there is no audio item to truncate
+                    await truncate_greeting()
 
-                await websocket.send_json({
+                # Audio still waiting in our queue is stale now; drop it before clearing Twilio's buffer
+                twilio_writer.flush(("media", "mark"))
+                await twilio_writer.send_json({
                     "event": "clear",
                     "streamSid": stream_sid
                 })
@@ -120,230 +222,350 @@ class AudioStreamingService:
                 mark_queue.clear()
                 last_assistant_item = None
                 response_start_timestamp_twilio = None
+                greeting_playing = False
 
-        async with websockets.connect(
-            'wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-12-17',
-            extra_headers={
-                "Authorization": f"Bearer {self.api_key}",
-                "OpenAI-Beta": "realtime=v1"
-            }
-        ) as openai_ws:
-            # Initialize session with OpenAI
-            await self._initialize_openai_session(openai_ws, websocket, stream_sid)
+        acquire_span = tracer.start_span("realtime.acquire_session")
+        async with self.session_pool.session() as (openai_ws, warm_session):
+            acquire_span.set_attribute("warm", warm_session)
+            acquire_span.end()
+            # Each socket gets its own bounded queue and writer task. Outbound audio to
+            # Twilio applies backpressure; inbound caller audio to OpenAI drops the
+            # oldest frames when the queue is full since stale audio is useless.
+            twilio_writer = QueuedSocketWriter(
+                "twilio", websocket.send_text, maxsize=self.twilio_queue_size
+            )
+            openai_writer = QueuedSocketWriter(
+                "openai", openai_ws.send, maxsize=self.openai_queue_size, droppable=("media",)
+            )
+            twilio_writer.start()
+            openai_writer.start()
+
+            # Covers slow knowledge base lookups; only plays when no assistant audio is still queued
+            filler = FillerAudio(twilio_writer, stream_sid=lambda: stream_sid, audio_pending=lambda: bool(mark_queue))
+
+            async def hang_up():
+                """Closing the media stream ends the <Connect> verb and with it the call"""
+                await twilio_writer.close()
+                await websocket.close(code=1000)
+
+            # Hangs up once the goodbye's audio has been acknowledged by Twilio marks
+            call_teardown = CallTeardown(
+                end_call=hang_up,
+                pending_marks=lambda: len(mark_queue),
+                max_wait=self.end_call_max_wait
+            )
+            ticket_requested = False
+
+            async def finish_call():
+                """Create the ticket and close the OpenAI side once the Twilio stream is over"""
+                nonlocal ticket_requested
+                await call_teardown.cancel()
+                if stream_sid and not ticket_requested:
+                    ticket_requested = True
+                    try:
+                        # Get the conversation and create ticket
+                        conversation = await self.conversation_service.get_conversation_async(stream_sid)
+                        if conversation:
+                            # Process the conversation regardless of caller_number
+                            print(f"\nProcessing conversation data. Caller number: {self.caller_number or 'Unknown'}")
+                            
+                            # Create a ticket from the conversation
+                            print("Creating ticket from conversation...")
+                            ticket = await run_in_thread(
+                                self.ticket_service.make_ticket, conversation, self.caller_number
+                            )
+                            if ticket:
+                                print(f"Ticket created: {ticket}")
+                            else:
+                                print("Failed to create ticket")
+                    finally:
+                        # Stop or disconnect, the transcript leaves the store and goes to the archive
+                        await self.conversation_service.close_conversation_async(stream_sid)
+                # Caller audio still queued for OpenAI is pointless once the call has ended
+                await openai_writer.close(drain_timeout=0)
+                if openai_ws and hasattr(openai_ws, 'closed') and not openai_ws.closed:
+                    try:
+                        await openai_ws.close(code=1000, reason="Call ended")
+                        print("OpenAI WebSocket closed successfully")
+                    except Exception as e:
+                        print(f"Error closing OpenAI WebSocket: {e}")
+
+            # The session is already configured (pre-warmed or freshly set up), so only the
+            # greeting is left: either tell the model it was pre-rendered or ask it to speak
+            await self._send_initial_conversation_item(openai_writer, greeting_prerendered=bool(greeting_payloads))
             
             async def receive_from_twilio():
                 """Handle incoming audio from Twilio"""
-                nonlocal stream_sid, latest_media_timestamp, response_start_timestamp_twilio, last_assistant_item, current_state
+                nonlocal stream_sid, latest_media_timestamp, response_start_timestamp_twilio, last_assistant_item, current_state, greeting_playing
+                call_stopped = False
                 try:
                     async for message in websocket.iter_text():
                         data = json.loads(message)
-                        if data['event'] == 'media' and openai_ws.open:
+                        if data['event'] == 'media' and not openai_writer.closed:
                             latest_media_timestamp = int(data['media']['timestamp'])
                             audio_data = {
                                 "type": "input_audio_buffer.append",
                                 "audio": data['media']['payload']
                             }
-                            await openai_ws.send(json.dumps(audio_data))
+                            await openai_writer.send(json.dumps(audio_data), kind="media")
                         elif data['event'] == 'start':
                             stream_sid = data['start']['streamSid']
+                            call_span.set_trace_id(stream_sid)
                             #print(f"\nCall started - Stream ID: {stream_sid}")
                             response_start_timestamp_twilio = None
                             latest_media_timestamp = 0
                             last_assistant_item = None
                             # Start new conversation and set initial state
-                            self.conversation_service.start_conversation(stream_sid)
-                            self.conversation_service.update_call_state(stream_sid, current_state)
+                            await self.conversation_service.start_conversation_async(stream_sid, self.caller_number)
+                            await self.conversation_service.update_call_state_async(stream_sid, current_state)
+                            if greeting_payloads:
+                                # Recorded once Twilio has played it all, or as far as it got if interrupted
+                                await play_greeting()
                         elif data['event'] == 'stop':
                             #print("Call ended.")
-                            if stream_sid:
-                                # Get the conversation and create ticket
-                                conversation = self.conversation_service.get_conversation(stream_sid)
-                                if conversation:
-                                    # Process the conversation regardless of caller_number
-                                    print(f"\nProcessing conversation data. Caller number: {self.caller_number or 'Unknown'}")
-                                    
-                                    # Create a ticket from the conversation
-                                    print("Creating ticket from conversation...")
-                                    ticket = self.ticket_service.make_ticket(conversation, self.caller_number)
-                                    if ticket:
-                                        print(f"Ticket created: {ticket}")
-                                    else:
-                                        print("Failed to create ticket")
-                                    
-                                #self.conversation_service.save_conversation(stream_sid)
-                            if openai_ws and hasattr(openai_ws, 'closed') and not openai_ws.closed:
-                                try:
-                                    await openai_ws.close(code=1000, reason="Call ended")
-                                    print("OpenAI WebSocket closed successfully")
-                                except Exception as e:
-                                    print(f"Error closing OpenAI WebSocket: {e}")
+                            call_stopped = True
                             break
                         elif data['event'] == 'mark':
                             if mark_queue:
-                                mark_queue.pop(0)
+                                if mark_queue.pop(0) == 'greeting':
+                                    greeting_playing = False
+                                    await self.conversation_service.add_message_async(
+                                        stream_sid, "assistant", CLIP_SCRIPTS[GREETING_CLIP]
+                                    )
+                            call_teardown.mark_acknowledged()
+                    # iter_text() ends quietly on disconnect, including after we hang up
+                    if not call_stopped:
+                        print("Client disconnected.")
                 except WebSocketDisconnect:
                     print("Client disconnected.")
-                    #if stream_sid:
-                        #self.conversation_service.save_conversation(stream_sid)
-                    if openai_ws and hasattr(openai_ws, 'closed') and not openai_ws.closed:
-                        await openai_ws.close()
                 except Exception as e:
                     print(f"Error receiving from Twilio: {e}")
+                finally:
+                    await finish_call()
+
+            # Realtime events are routed by type; handlers below are registered per event
+            router = RealtimeEventRouter()
+
+            @router.on_audio_delta
+            async def handle_audio_delta(delta, item_id):
+                """Forward an audio chunk to Twilio; this is the hot path"""
+                nonlocal audio_playing, audio_chunks_received, response_start_timestamp_twilio, last_assistant_item, speech_stopped_at, response_wait_span
+                audio_playing = True
+                audio_chunks_received += 1
+                
+                if speech_stopped_at is not None:
+                    RESPONSE_LATENCY.observe(time.perf_counter() - speech_stopped_at)
+                    speech_stopped_at = None
+                    response_wait_span.end()
+                    response_wait_span = None
+                if self.tool_service.kb_answer_sent_at is not None:
+                    self.tool_service.kb_answer_audio_started()
+                
+                # Both sides speak base64 mu-law, so the payload is passed through untouched
+                await twilio_writer.send(
+                    '{"event":"media","streamSid":%s,"media":{"payload":"%s"}}' % (json.dumps(stream_sid), delta),
+                    kind="media"
+                )
+
+                record_first_audio("warm_session" if warm_session else "cold_session")
+
+                if response_start_timestamp_twilio is None:
+                    response_start_timestamp_twilio = latest_media_timestamp
+
+                if item_id:
+                    last_assistant_item = item_id
+
+                await send_mark()
+
+            @router.on('response.audio.done')
+            async def handle_audio_done(response):
+                nonlocal audio_playing, audio_chunks_received
+                #print(f"Audio response complete. Sent {audio_chunks_received} chunks.")
+                audio_playing = False
+                audio_chunks_received = 0
+
+            @router.on('response.audio_transcript.done')
+            async def handle_assistant_transcript(response):
+                nonlocal response_in_progress, audio_playing, current_state
+                transcript = response.get('transcript', '')
+                print(f"Assistant: {transcript}")
+                await self.conversation_service.add_message_async(stream_sid, "assistant", transcript)
+                response_in_progress = False  # Response is complete
+                audio_playing = False  # Audio is no longer playing
+                
+                # Check if we need to update the state based on the message content
+                message_text = transcript.lower()
+                
+                if "did that answer your question" in message_text:
+                    current_state = "awaiting_answer_feedback"
+                    await self.conversation_service.update_call_state_async(stream_sid, current_state)
+                elif "do you have any other questions" in message_text:
+                    current_state = "awaiting_more_questions"
+                    await self.conversation_service.update_call_state_async(stream_sid, current_state)
+
+            @router.on('response.create.started')
+            async def handle_response_started(response):
+                nonlocal response_in_progress
+                response_in_progress = True  # Response has started
+
+            # Track response lifecycle so teardown knows when the goodbye is complete
+            @router.on('response.created')
+            async def handle_response_created(response):
+                response_id = response.get('response', {}).get('id')
+                response_spans[response_id] = tracer.start_span("realtime.response", response_id=response_id)
+                call_teardown.response_created(response_id)
+
+            @router.on('response.done')
+            async def handle_response_done(response):
+                response_id = response.get('response', {}).get('id')
+                span = response_spans.pop(response_id, None)
+                if span:
+                    span.set_attribute("status", response.get('response', {}).get('status'))
+                    span.end()
+                call_teardown.response_done(response_id)
+
+            @router.on('conversation.item.input_audio_transcription.completed')
+            async def handle_caller_transcript(response):
+                transcript = response.get('transcript', '')
+                print(f"\nCaller: {transcript}")
+                await self.conversation_service.add_message_async(stream_sid, "caller", transcript)
+                
+                # The first question is always looked up, so start on it while the model thinks
+                if kb_prefetcher is not None and current_state == "initial":
+                    kb_prefetcher.start(transcript)
+                
+                # After processing a user message, enforce the conversation flow
+                # Only if no response is currently in progress
+                if not response_in_progress:
+                    await self.tool_service.enforce_conversation_flow(
+                        current_state,
+                        self.conversation_service,
+                        stream_sid,
+                        openai_writer,
+                        twilio_writer,
+                        call_teardown
+                    )
+
+            # Handle interruption when speech is detected - ONLY if audio is actually playing
+            @router.on('input_audio_buffer.speech_started')
+            async def handle_speech_started(response):
+                #print("Speech started detected.")
+                if audio_playing and last_assistant_item:
+                    print(f"Interrupting response with id: {last_assistant_item}")
+                    await handle_speech_started_event()
+                elif greeting_playing:
+                    print("Interrupting pre-rendered greeting")
+                    await handle_speech_started_event()
+                await filler.interrupt()
+
+            @router.on('input_audio_buffer.speech_stopped')
+            async def handle_speech_stopped(response):
+                nonlocal speech_stopped_at, response_wait_span
+                speech_stopped_at = time.perf_counter()
+                if response_wait_span is not None:
+                    # The caller spoke again before hearing an answer
+                    response_wait_span.set_attribute("answered", False)
+                    response_wait_span.end()
+                response_wait_span = tracer.start_span("call.response_wait")
+
+            @router.on('response.function_call_arguments.done')
+            async def handle_function_call_done(response):
+                nonlocal response_in_progress
+                function_name = response.get('name')
+                function_args = response.get('arguments', '{}')
+                call_id = response.get('call_id')
+                
+                # Set response_in_progress to False before handling function call
+                response_in_progress = False
+                
+                # Run the tool off the read loop so audio and interruptions keep flowing
+                task = asyncio.create_task(
+                    run_function_call(function_name, function_args, call_id)
+                )
+                background_tasks.add(task)
+                task.add_done_callback(background_tasks.discard)
 
             async def send_to_twilio():
                 """Handle outgoing audio to Twilio"""
-                nonlocal stream_sid, last_assistant_item, response_start_timestamp_twilio, current_state, response_in_progress, audio_playing, audio_chunks_received
                 try:
                     async for message in openai_ws:
-                        response = json.loads(message)
-                        
-                        # Debug logging for all event types
-                        #print(f"OpenAI event: {response.get('type')}")
-                        
-                        if response.get('type') == 'error':
-                            #print(f"Error details: {json.dumps(response, indent=2)}")
-                            pass
-                        
-                        # Handle audio chunks
-                        if response.get('type') == 'response.audio.delta' and 'delta' in response:
-                            try:
-                                audio_playing = True
-                                audio_chunks_received += 1
-                                
-                                # Decode and re-encode the audio payload
-                                audio_payload = base64.b64encode(base64.b64decode(response['delta'])).decode('utf-8')
-                                
-                                # Debug log for audio chunks
-                                #print(f"Sending audio chunk #{audio_chunks_received} to Twilio")
-                                
-                                # Send the audio to Twilio
-                                await websocket.send_json({
-                                    "event": "media",
-                                    "streamSid": stream_sid,
-                                    "media": {
-                                        "payload": audio_payload
-                                    }
-                                })
-
-                                if response_start_timestamp_twilio is None:
-                                    response_start_timestamp_twilio = latest_media_timestamp
-
-                                if response.get('item_id'):
-                                    last_assistant_item = response['item_id']
-
-                                await send_mark()
-                            except Exception as e:
-                                print(f"Error sending audio to Twilio: {e}")
-                                import traceback
-                                print(traceback.format_exc())
-                        
-                        # Handle audio end
-                        if response.get('type') == 'response.audio.done':
-                            #print(f"Audio response complete. Sent {audio_chunks_received} chunks.")
-                            audio_playing = False
-                            audio_chunks_received = 0
-                        
-                        # Handle assistant transcription
-                        if response.get('type') == 'response.audio_transcript.done':
-                            transcript = response.get('transcript', '')
-                            print(f"Assistant: {transcript}")
-                            self.conversation_service.add_message(stream_sid, "assistant", transcript)
-                            response_in_progress = False  # Response is complete
-                            audio_playing = False  # Audio is no longer playing
-                            
-                            # Check if we need to update the state based on the message content
-                            message_text = transcript.lower()
-                            
-                            if "did that answer your question" in message_text:
-                                current_state = "awaiting_answer_feedback"
-                                self.conversation_service.update_call_state(stream_sid, current_state)
-                            elif "do you have any other questions" in message_text:
-                                current_state = "awaiting_more_questions"
-                                self.conversation_service.update_call_state(stream_sid, current_state)
-
-                        # Handle response start
-                        if response.get('type') == 'response.create.started':
-                            response_in_progress = True  # Response has started
-                        
-                        # Handle caller transcription
-                        if response.get('type') == 'conversation.item.input_audio_transcription.completed':
-                            transcript = response.get('transcript', '')
-                            print(f"\nCaller: {transcript}")
-                            self.conversation_service.add_message(stream_sid, "caller", transcript)
-                            
-                            # After processing a user message, enforce the conversation flow
-                            # Only if no response is currently in progress
-                            if not response_in_progress:
-                                await self.tool_service.enforce_conversation_flow(
-                                    current_state,
-                                    self.conversation_service,
-                                    stream_sid,
-                                    openai_ws,
-                                    websocket
-                                )
-
-                        # Handle interruption when speech is detected - ONLY if audio is actually playing
-                        if response.get('type') == 'input_audio_buffer.speech_started':
-                            #print("Speech started detected.")
-                            if audio_playing and last_assistant_item:
-                                print(f"Interrupting response with id: {last_assistant_item}")
-                                await handle_speech_started_event()
-                            else:
-                                #print("Speech detected but no audio is playing - not treating as interruption")
-                                pass
-
-                        # Handle function calls
-                        if response.get('type') == 'response.function_call_arguments.done':
-                            function_name = response.get('name')
-                            function_args = response.get('arguments', '{}')
-                            call_id = response.get('call_id')
-                            
-                            # Set response_in_progress to False before handling function call
-                            response_in_progress = False
-                            
-                            await self.tool_service.handle_function_call(
-                                function_name=function_name,
-                                function_args=function_args,
-                                call_id=call_id,
-                                websocket=websocket,
-                                openai_ws=openai_ws,
-                                stream_sid=stream_sid,
-                                conversation_service=self.conversation_service,
-                                caller_number=self.caller_number
-                            )
-                            
-                            # After the function call completes, enforce the conversation flow
-                            # Only if no response is currently in progress
-                            if not response_in_progress:
-                                await self.tool_service.enforce_conversation_flow(
-                                    current_state,
-                                    self.conversation_service,
-                                    stream_sid,
-                                    openai_ws,
-                                    websocket
-                                )
-
+                        await router.dispatch(message)
                 except Exception as e:
                     print(f"Error sending to Twilio: {e}")
                     import traceback
                     print(traceback.format_exc())
 
+            async def run_function_call(function_name, function_args, call_id):
+                """Handle a function call and then enforce the conversation flow"""
+                await self.tool_service.handle_function_call(
+                    function_name=function_name,
+                    function_args=function_args,
+                    call_id=call_id,
+                    websocket=twilio_writer,
+                    openai_ws=openai_writer,
+                    stream_sid=stream_sid,
+                    conversation_service=self.conversation_service,
+                    caller_number=self.caller_number,
+                    call_teardown=call_teardown,
+                    kb_prefetcher=kb_prefetcher,
+                    filler=filler
+                )
+                
+                # After the function call completes, enforce the conversation flow
+                # Only if no response is currently in progress
+                if not response_in_progress:
+                    await self.tool_service.enforce_conversation_flow(
+                        current_state,
+                        self.conversation_service,
+                        stream_sid,
+                        openai_writer,
+                        twilio_writer,
+                        call_teardown
+                    )
+
             # Handle bidirectional communication
-            await asyncio.gather(
-                receive_from_twilio(),
-                send_to_twilio()
-            )
+            try:
+                await asyncio.gather(
+                    receive_from_twilio(),
+                    send_to_twilio()
+                )
+            finally:
+                for task in list(background_tasks):
+                    task.cancel()
+                if kb_prefetcher is not None:
+                    kb_prefetcher.close()
+                await twilio_writer.close()
+                await openai_writer.close()
+                print(f"Relay stats - {twilio_writer.summary()}; {openai_writer.summary()}")
 
-    async def _initialize_openai_session(self, openai_ws, websocket=None, stream_sid=None):
-        """Initialize the OpenAI session with our preferences"""
-        session_config = {
+    @classmethod
+    def create_session_pool(cls, size: int = None) -> RealtimeSessionPool:
+        """Create a realtime session pool configured for KAI calls"""
+        load_dotenv()
+        if size is None:
+            size = int(os.getenv('REALTIME_POOL_SIZE', '2'))
+        return RealtimeSessionPool(
+            url=os.getenv('OPENAI_REALTIME_URL', cls.DEFAULT_REALTIME_URL),
+            headers={
+                "Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}",
+                "OpenAI-Beta": "realtime=v1"
+            },
+            session_config=cls.session_config(),
+            size=size,
+            max_idle=float(os.getenv('REALTIME_POOL_MAX_IDLE_SECONDS', '300'))
+        )
+
+    @classmethod
+    def session_config(cls) -> dict:
+        """The session.update event that configures a realtime session with our preferences"""
+        return {
             "type": "session.update",
             "session": {
                 "turn_detection": {"type": "server_vad"},
                 "input_audio_format": "g711_ulaw",
                 "output_audio_format": "g711_ulaw",
                 "voice": "alloy",
-                "instructions": self.system_message,
+                "instructions": cls.SYSTEM_MESSAGE,
                 "modalities": ["text", "audio"],
                 "temperature": 0.7,
                 "input_audio_transcription": {
@@ -352,26 +574,37 @@ class AudioStreamingService:
                 "tools": Tools.get_all_tools()
             }
         }
-        
-        #print('Sending session update')
-        await openai_ws.send(json.dumps(session_config))
 
-        # Wait a moment for the session to initialize
-        #await asyncio.sleep(2)
-        
-        #print("Session initialized with audio output enabled")
-        
-        # Send initial greeting immediately after session initialization
-        await self._send_initial_conversation_item(openai_ws)
-        
-        # Update the state if we have a stream_sid
-        if stream_sid:
-            self.conversation_service.update_call_state(stream_sid, "initial")
+    @staticmethod
+    def _greeting_item(text: str, previous_item_id: str = None) -> dict:
+        """The conversation item telling the model the pre-rendered greeting was said"""
+        event = {
+            "type": "conversation.item.create",
+            "item": {
+                "id": GREETING_ITEM_ID,
+                "type": "message",
+                "role": "assistant",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": text
+                    }
+                ]
+            }
+        }
+        if previous_item_id is not None:
+            event["previous_item_id"] = previous_item_id
+        return event
 
-    async def _send_initial_conversation_item(self, openai_ws):
+    async def _send_initial_conversation_item(self, openai_ws, greeting_prerendered: bool = False):
         """Send initial conversation item if AI talks first."""
         #print("Sending initial conversation item")
         
+        if greeting_prerendered:
+            # The greeting is played from the clip cache; record it as already said instead of generating it
+            await openai_ws.send(json.dumps(self._greeting_item(CLIP_SCRIPTS[GREETING_CLIP])))
+            return
+        
         # Use a direct instruction instead of a conversation item
         initial_instruction = {
             "type": "response.create",
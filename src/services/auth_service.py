@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 import requests
 import base64
 from dotenv import load_dotenv
+from ..utils.resilience import dependency
 
 class KayakoAuthService:
     def __init__(self):
@@ -14,6 +15,7 @@ class KayakoAuthService:
         self.session_id = None
         self.session_expiry = None
         self.csrf_token = None
+        self.kayako = dependency("kayako")
         
     def get_session_id(self) -> Optional[str]:
         """Get a valid session ID, refreshing if necessary"""
@@ -41,9 +43,13 @@ class KayakoAuthService:
             'Content-Type': 'application/json'
         }
         
-        try:
-            response = requests.get(auth_url, headers=headers)
+        def fetch_session():
+            response = requests.get(auth_url, headers=headers, timeout=self.kayako.timeout)
             response.raise_for_status()
+            return response
+        
+        try:
+            response = self.kayako.call(fetch_session)
             
             # Store CSRF token from response headers
             self.csrf_token = response.headers.get('X-CSRF-Token')
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+from ..utils.metrics import registry
+
+TEARDOWN_DURATION = registry.histogram(
+    "call_teardown_seconds",
+    "Time from requesting the goodbye to hanging up",
+    ["outcome"]
+)
+
+class TeardownState:
+    ACTIVE = "active"
+    SPEAKING_GOODBYE = "speaking_goodbye"  # Goodbye requested, model still generating it
+    DRAINING = "draining"                  # Goodbye fully generated, waiting for Twilio to play it
+    CLOSED = "closed"
+
+class CallTeardown:
+    """
+    Ends a call once the goodbye has actually been played to the caller.
+
+    After begin(), the first response the model creates is treated as the
+    goodbye. Once that response is done, the call is hung up as soon as Twilio
+    has acknowledged every mark sent after its audio. A hard cap ends the call
+    anyway if the model or Twilio never gets there. The wait runs as its own
+    task so the call's event loops keep processing in the meantime.
+    """
+
+    def __init__(self,
+                 end_call: Callable[[], Awaitable[None]],
+                 pending_marks: Callable[[], int],
+                 max_wait: float = 12.0):
+        self._end_call = end_call
+        self._pending_marks = pending_marks
+        self.max_wait = max_wait
+        self.state = TeardownState.ACTIVE
+        self._goodbye_response_id: Optional[str] = None
+        self._drained = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def begin(self) -> None:
+        """Start waiting for the goodbye; call right after asking the model to say it"""
+        if self.state != TeardownState.ACTIVE:
+            return
+        self.state = TeardownState.SPEAKING_GOODBYE
+        self._task = asyncio.create_task(self._run())
+
+    def response_created(self, response_id: str) -> None:
+        if self.state == TeardownState.SPEAKING_GOODBYE and self._goodbye_response_id is None:
+            self._goodbye_response_id = response_id
+
+    def response_done(self, response_id: str) -> None:
+        if self.state == TeardownState.SPEAKING_GOODBYE and response_id == self._goodbye_response_id:
+            self.state = TeardownState.DRAINING
+            self._check_drained()
+
+    def mark_acknowledged(self) -> None:
+        if self.state == TeardownState.DRAINING:
+            self._check_drained()
+
+    async def cancel(self) -> None:
+        """Stop waiting without ending the call, e.g. when the caller hangs up first"""
+        if self.state == TeardownState.CLOSED:
+            return
+        self.state = TeardownState.CLOSED
+        if self._task and not self._task.done() and self._task is not asyncio.current_task():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _check_drained(self) -> None:
+        if self._pending_marks() == 0:
+            self._drained.set()
+
+    async def _run(self) -> None:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._drained.wait(), self.max_wait)
+            outcome = "drained"
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            print(f"Goodbye not acknowledged within {self.max_wait}s, ending call anyway")
+
+        if self.state == TeardownState.CLOSED:
+            return
+        self.state = TeardownState.CLOSED
+        TEARDOWN_DURATION.labels(outcome).observe(time.perf_counter() - started)
+        try:
+            await self._end_call()
+        except Exception as e:
+            print(f"Error ending call: {e}")
@@ -0,0 +1,153 @@
+"""
+Text of knowledge base chunks, kept next to the service instead of in Pinecone.
+
+Vector metadata is sent with every upsert and returned with every query.
+With a chunk store the index keeps only the fields syncs and searches
+filter on, and the search service looks the rest up here by vector id
+after the query. scripts/bench_chunk_store.py (top_k=3, 1000 synthetic
+articles) measures about 1.6-2.1KB of metadata per query with the text
+in Pinecone against 0.5KB without; query latency is the same within
+noise (30.2ms against 30.1ms median over loopback), and upserts shrink
+less than 10%, since the vectors make up most of their payload.
+
+The text is also indexed for keyword search (SQLite FTS5), which answers
+questions locally while the embeddings or Pinecone are unreachable.
+"""
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import AbstractSet, Dict, Iterable, List, Optional, Sequence, Set
+from dotenv import load_dotenv
+
+# What stays in vector metadata when the text lives in the chunk store
+SLIM_METADATA_FIELDS = ("article_id", "chunk_index", "updated_at")
+
+def slim_metadata(metadata: Dict) -> Dict:
+    return {key: metadata[key] for key in SLIM_METADATA_FIELDS if key in metadata}
+
+# Keyword index over title and content; the triggers keep it in step with
+# the chunks table, including rows replaced by INSERT OR REPLACE
+_FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE chunks_fts USING fts5(title, content, content='chunks', content_rowid='rowid');
+    CREATE TRIGGER chunks_fts_insert AFTER INSERT ON chunks BEGIN
+        INSERT INTO chunks_fts (rowid, title, content) VALUES (new.rowid, new.title, new.content);
+    END;
+    CREATE TRIGGER chunks_fts_delete AFTER DELETE ON chunks BEGIN
+        INSERT INTO chunks_fts (chunks_fts, rowid, title, content) VALUES ('delete', old.rowid, old.title, old.content);
+    END;
+    INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild');
+"""
+
+_WORD = re.compile(r"\w+")
+
+class ChunkStore:
+    """
+    SQLite table of chunk title, url and text by vector id
+
+    WAL mode lets the sync script write while the service reads, and reads
+    go through a memory map. One connection is shared by the process's
+    threads behind a lock; lookups take well under a millisecond, so they
+    do not queue behind each other for long.
+    """
+
+    def __init__(self, path: str, mmap_bytes: int = 256 * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(f"PRAGMA mmap_size={int(mmap_bytes)}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id TEXT PRIMARY KEY, article_id INTEGER NOT NULL, title TEXT, url TEXT, content TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_by_article ON chunks (article_id)")
+        self._db.commit()
+        # Replaced rows only fire the delete trigger with recursive triggers on
+        self._db.execute("PRAGMA recursive_triggers=ON")
+        self.searchable = self._create_keyword_index()
+
+    def _create_keyword_index(self) -> bool:
+        """Index existing chunks for search() the first time; False if SQLite lacks FTS5"""
+        if self._db.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'").fetchone():
+            return True
+        try:
+            with self._db:
+                self._db.executescript("BEGIN;" + _FTS_SCHEMA + "COMMIT;")
+        except sqlite3.OperationalError as e:
+            print(f"Keyword search over the chunk store is unavailable: {e}")
+            return False
+        return True
+
+    def put_many(self, chunks: Iterable[Dict]) -> None:
+        """Store chunks as built by chunk_article"""
+        rows = [
+            (chunk["id"], int(chunk["metadata"]["article_id"]), chunk["metadata"].get("title"),
+             chunk["metadata"].get("url"), chunk["text"])
+            for chunk in chunks
+        ]
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?)", rows)
+
+    def get_many(self, ids: Sequence[str]) -> Dict[str, Dict]:
+        """title, url and content of the chunks with these ids; missing ones are left out"""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, title, url, content FROM chunks WHERE id IN ({placeholders})", list(ids)
+            ).fetchall()
+        return {row[0]: {"title": row[1], "url": row[2], "content": row[3]} for row in rows}
+
+    def search(self, query: str, limit: int = 3, live: Optional[AbstractSet[str]] = None) -> List[Dict]:
+        """
+        Chunks sharing words with the query, best first, by BM25 with titles weighted double
+
+        Each has the id, article_id, title, url, content and score (higher is
+        better, but not comparable to vector scores). When live is given, only
+        chunks in it are returned.
+        """
+        words = _WORD.findall(query.lower())
+        if not self.searchable or not words:
+            return []
+        match = " OR ".join(f'"{word}"' for word in dict.fromkeys(words))
+        # Leave room for chunks a sync wrote but has not published
+        fetch = limit * 4 if live is not None else limit
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT c.id, c.article_id, c.title, c.url, c.content, -bm25(chunks_fts, 2.0, 1.0) "
+                "FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid "
+                "WHERE chunks_fts MATCH ? ORDER BY bm25(chunks_fts, 2.0, 1.0) LIMIT ?",
+                (match, fetch)
+            ).fetchall()
+        results = [
+            {"id": row[0], "article_id": row[1], "title": row[2], "url": row[3], "content": row[4], "score": row[5]}
+            for row in rows if live is None or row[0] in live
+        ]
+        return results[:limit]
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in ids])
+
+    def delete_article(self, article_id: int) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM chunks WHERE article_id = ?", (int(article_id),))
+
+    def article_ids(self) -> Set[int]:
+        with self._lock:
+            return {row[0] for row in self._db.execute("SELECT DISTINCT article_id FROM chunks")}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+def create_chunk_store() -> Optional[ChunkStore]:
+    """Open the store at KB_CHUNK_STORE; None keeps chunk text in vector metadata"""
+    load_dotenv()
+    path = os.getenv('KB_CHUNK_STORE', 'data/kb_chunks.sqlite3')
+    return ChunkStore(path) if path else None
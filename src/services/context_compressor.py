@@ -0,0 +1,111 @@
+import os
+import re
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from ..utils.chunking import DEFAULT_OVERLAP_TOKENS
+from ..utils.metrics import registry
+from ..utils.tokens import TokenCounter, token_counter
+
+CONTEXT_TOKENS = registry.histogram(
+    "kb_context_tokens", "Tokens of knowledge base context per tool answer, before and after compression",
+    ["stage"], buckets=(50, 100, 200, 300, 400, 500, 750, 1000, 1500, 2000)
+)
+CONTEXT_TOKENS_SAVED = registry.counter(
+    "kb_context_tokens_saved_total", "Tokens of knowledge base context removed by compression"
+)
+
+# Longest overlap the uploader leaves between consecutive chunks, in characters, at a generous
+# characters per token
+MAX_CHUNK_OVERLAP = DEFAULT_OVERLAP_TOKENS * 10
+# Shorter common runs are more likely coincidence than overlap
+MIN_CHUNK_OVERLAP = 20
+
+# A URL in parentheses goes with them; a bare one stops short of the punctuation after it
+_URL = re.compile(r"\s*(?:\(https?://[^\s)]*\)|\bhttps?://[^\s)]*[^\s).,;:!?])")
+
+def strip_urls(text: str) -> str:
+    """Remove URLs, which are never read out on a call"""
+    return re.sub(r"[ \t]{2,}", " ", _URL.sub("", text))
+
+def _without_prefix(text: str, prefix: str) -> str:
+    # str.removeprefix is only available from Python 3.9
+    return text[len(prefix):] if text.startswith(prefix) else text
+
+def merge_overlapping(first: str, second: str) -> Optional[str]:
+    """first and second joined without the text they share, or None if they do not overlap"""
+    for size in range(min(len(first), len(second), MAX_CHUNK_OVERLAP), MIN_CHUNK_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return None
+
+class ContextCompressor:
+    """
+    Shrink search results to what the realtime model needs to answer
+
+    The model's latency and cost grow with the context it is given, and raw
+    results repeat themselves: chunks overlap by a sentence or two and
+    often come from the same article. Results under min_score are dropped
+    (the best one is always kept), chunks of one article are merged with
+    their overlaps removed, URLs are stripped and the whole is trimmed to
+    token_budget, best article first.
+    """
+
+    def __init__(self, min_score: float = None, token_budget: int = None, counter: TokenCounter = None):
+        load_dotenv()
+        self.min_score = min_score if min_score is not None else float(os.getenv('KB_CONTEXT_MIN_SCORE', '0.75'))
+        self.token_budget = token_budget if token_budget is not None else int(os.getenv('KB_CONTEXT_TOKEN_BUDGET', '400'))
+        self.counter = counter or token_counter()
+
+    def compress(self, chunks: List[Dict]) -> str:
+        """The tool answer for search results, as formatted by KnowledgeBaseSearchService.search"""
+        if not chunks:
+            return ""
+        best = max(chunks, key=lambda c: c['score'])
+        kept = [c for c in chunks if c['score'] >= self.min_score] or [best]
+
+        articles: Dict[int, List[Dict]] = {}
+        for chunk in kept:
+            articles.setdefault(chunk['article_id'], []).append(chunk)
+        ranked = sorted(articles.values(), key=lambda group: -max(c['score'] for c in group))
+
+        sections = []
+        remaining = self.token_budget
+        for group in ranked:
+            heading = f"From article '{group[0]['title']}':\n"
+            body = self._article_text(group)
+            needed = self.counter.count(heading + body)
+            if needed > remaining:
+                # Part of an article is still worth it, a sentence fragment is not
+                body_budget = remaining - self.counter.count(heading)
+                if body_budget < 30:
+                    break
+                body = self.counter.truncate(body, body_budget)
+                needed = remaining
+            sections.append(heading + body)
+            remaining -= needed
+            if remaining <= 0:
+                break
+        return "\n\n".join(sections)
+
+    @staticmethod
+    def _article_text(group: List[Dict]) -> str:
+        """One article's chunks in order, merged where they overlap"""
+        group = sorted(group, key=lambda c: c['chunk_index'])
+        title = group[0]['title']
+        parts = []
+        previous_index = None
+        for chunk in group:
+            text = chunk['content'].strip()
+            # The uploader puts the title in front of the first chunk; the heading already says it
+            text = _without_prefix(_without_prefix(text, f"Title: {title}").lstrip(), "Content:").strip()
+            if not text:
+                continue
+            if parts and chunk['chunk_index'] == previous_index + 1:
+                merged = merge_overlapping(parts[-1], text)
+                if merged is not None:
+                    parts[-1] = merged
+                    previous_index = chunk['chunk_index']
+                    continue
+            parts.append(text)
+            previous_index = chunk['chunk_index']
+        return strip_urls("\n...\n".join(parts)).strip()
@@ -0,0 +1,125 @@
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from ..utils.metrics import registry
+
+ARCHIVED_BYTES = registry.counter(
+    "conversation_archive_bytes_total", "Uncompressed bytes of transcripts written to the archive"
+)
+ARCHIVE_DROPPED = registry.counter(
+    "conversation_archive_dropped_total", "Finished transcripts dropped because the archive queue was full"
+)
+
+class ConversationArchive:
+    """
+    Append finished transcripts to gzip-compressed JSONL segments.
+
+    Writes happen on a background thread, so closing a conversation never
+    waits on the disk. A segment is rotated once it holds segment_bytes of
+    uncompressed JSON, and only the newest max_segments are kept. Each
+    worker writes its own segments, named after its PID.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 16 * 1024 * 1024,
+                 max_segments: int = 50, queue_size: int = 1000):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue(maxsize=queue_size)
+        self._segment = None
+        self._segment_path: Optional[Path] = None
+        self._segment_written = 0
+        self._sequence = 0
+        self._thread = threading.Thread(target=self._run, name="conversation-archive", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: Dict) -> bool:
+        """Queue a transcript for writing; returns False if it had to be dropped"""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            ARCHIVE_DROPPED.inc()
+            return False
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write what is queued and close the current segment"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            try:
+                self._write(record)
+                # Flush once a burst has been written so a crash loses little
+                if self._queue.empty():
+                    self._segment.flush()
+            except Exception as e:
+                print(f"Error archiving conversation: {e}")
+        self._close_segment()
+
+    def _write(self, record: Dict) -> None:
+        line = (json.dumps(record, default=str) + "\n").encode()
+        if self._segment is None or self._segment_written >= self.segment_bytes:
+            self._rotate()
+        self._segment.write(line)
+        self._segment_written += len(line)
+        ARCHIVED_BYTES.inc(len(line))
+
+    def _rotate(self) -> None:
+        self._close_segment()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._sequence += 1
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        self._segment_path = self.directory / f"conversations-{stamp}-{os.getpid()}-{self._sequence:04d}.jsonl.gz"
+        self._segment = gzip.open(self._segment_path, "ab")
+        self._segment_written = 0
+        self._prune()
+
+    def _close_segment(self) -> None:
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def _prune(self) -> None:
+        # Segments rotated within the filesystem's timestamp resolution tie on mtime; their names are in order
+        segments = sorted(self.directory.glob("conversations-*.jsonl.gz"), key=lambda p: (p.stat().st_mtime, p.name))
+        for path in segments[:max(0, len(segments) - self.max_segments)]:
+            if path != self._segment_path:
+                path.unlink(missing_ok=True)
+
+def create_conversation_archive() -> Optional[ConversationArchive]:
+    """Build the archive from CONVERSATION_ARCHIVE_DIR; None if archiving is off"""
+    load_dotenv()
+    directory = os.getenv('CONVERSATION_ARCHIVE_DIR', '')
+    if not directory:
+        return None
+    return ConversationArchive(
+        directory,
+        segment_bytes=int(float(os.getenv('CONVERSATION_ARCHIVE_SEGMENT_MB', '16')) * 1024 * 1024),
+        max_segments=int(os.getenv('CONVERSATION_ARCHIVE_MAX_SEGMENTS', '50'))
+    )
+
+_default_archive: Optional[ConversationArchive] = None
+_default_archive_created = False
+_default_archive_lock = threading.Lock()
+
+def default_conversation_archive() -> Optional[ConversationArchive]:
+    """The archive shared by every call in this process, if archiving is on"""
+    global _default_archive, _default_archive_created
+    if not _default_archive_created:
+        with _default_archive_lock:
+            if not _default_archive_created:
+                _default_archive = create_conversation_archive()
+                _default_archive_created = True
+    return _default_archive
@@ -1,34 +1,68 @@
-from typing import List, Dict
+from typing import Iterable, List, Dict, Optional
+import asyncio
 import json
-from datetime import datetime
+import os
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from .conversation_archive import ConversationArchive, default_conversation_archive
+from .conversation_store import ConversationStore, Message, default_conversation_store
+from .conversation_wal import CLOSE, MESSAGE, START, STATE, ConversationWAL, default_conversation_wal
+from ..utils.concurrency import run_in_thread
+from ..utils.metrics import registry
+
+LIVE_CONVERSATIONS = registry.gauge(
+    "live_conversations", "Conversations held in the conversation store"
+)
+RETAINED_BYTES = registry.gauge(
+    "conversation_bytes_retained", "Size of the messages held in the conversation store"
+)
+CONVERSATIONS_CLOSED = registry.counter(
+    "conversations_closed_total", "Conversations removed from the store", ["reason"]
+)
 
 class ConversationService:
-    def __init__(self):
-        self.active_conversations: Dict[str, List[Dict]] = {}
+    def __init__(self, store: ConversationStore = None, archive: Optional[ConversationArchive] = None,
+                 wal: Optional[ConversationWAL] = None):
+        # Shared by every call in the process (and across workers for the SQLite and Redis stores)
+        self.store = store or default_conversation_store()
+        # Finished transcripts go here when CONVERSATION_ARCHIVE_DIR is set
+        self.archive = archive or default_conversation_archive()
+        # Events are logged here when CONVERSATION_WAL_DIR is set, so a crash does not lose the call
+        self.wal = wal or default_conversation_wal()
     
-    def start_conversation(self, stream_sid: str) -> None:
+    def start_conversation(self, stream_sid: str, caller_number: str = None) -> None:
         """Initialize a new conversation"""
-        self.active_conversations[stream_sid] = []
+        self.store.start(stream_sid)
+        if self.wal:
+            self.wal.log(START, stream_sid, caller_number)
         
     def add_message(self, stream_sid: str, role: str, content: str) -> None:
         """Add a message to the conversation"""
-        if stream_sid not in self.active_conversations:
-            self.start_conversation(stream_sid)
+        if not stream_sid:
+            return  # Skip if stream_sid is not yet available
             
-        self.active_conversations[stream_sid].append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.utcnow().isoformat()
-        })
+        self.store.append(stream_sid, Message(role, content))
+        if self.wal:
+            self.wal.log(MESSAGE, stream_sid, role, content)
     
     def get_conversation(self, stream_sid: str) -> List[Dict]:
         """Get the full conversation history"""
-        return self.active_conversations.get(stream_sid, [])
+        conversation = self.store.messages(stream_sid)
+        state = self.store.get_state(stream_sid)
+        if state:
+            conversation.insert(0, {'metadata': state})
+        return conversation
+    
+    def recent_messages(self, stream_sid: str, count: int = 3) -> List[Message]:
+        """The last few messages, oldest first, without copying the whole transcript"""
+        if not stream_sid:
+            return []
+        return self.store.recent(stream_sid, count)
     
     def save_conversation(self, stream_sid: str) -> None:
         """Print out the conversation"""
-        if stream_sid in self.active_conversations:
-            conversation = self.active_conversations[stream_sid]
+        conversation = self.get_conversation(stream_sid)
+        if conversation:
             print("\nFinal Conversation:")
             for message in conversation:
                 # Check if this is a metadata entry
@@ -45,44 +79,109 @@ class ConversationService:
                     # Handle other message formats
                     print(f"Other message type: {message}")
             
-            # Clean up the active conversation
-            del self.active_conversations[stream_sid]
+        # Clean up the active conversation
+        self.store.delete(stream_sid)
+        if self.wal:
+            self.wal.log(CLOSE, stream_sid)
     
-    def update_call_state(self, stream_sid: str, state: str) -> None:
-        """Update the state of the conversation"""
+    def close_conversation(self, stream_sid: str, reason: str = "closed") -> None:
+        """Remove a finished conversation from the store and archive its transcript"""
         if not stream_sid:
-            return  # Skip if stream_sid is not yet available
+            return
         
-        if stream_sid not in self.active_conversations:
-            self.start_conversation(stream_sid)
+        messages = self.store.messages(stream_sid)
+        state = self.store.get_state(stream_sid)
+        self.store.delete(stream_sid)
+        if self.wal:
+            self.wal.log(CLOSE, stream_sid)
+        CONVERSATIONS_CLOSED.labels(reason).inc()
         
-        # Check if we already have metadata in the conversation
-        metadata_exists = False
-        for item in self.active_conversations[stream_sid]:
-            if 'metadata' in item:
-                item['metadata']['state'] = state
-                item['metadata']['state_updated_at'] = datetime.utcnow().isoformat()
-                metadata_exists = True
-                break
-        
-        # If no metadata exists, add it
-        if not metadata_exists:
-            self.active_conversations[stream_sid].append({
-                'metadata': {
-                    'state': state,
-                    'state_updated_at': datetime.utcnow().isoformat()
-                }
+        if self.archive and messages:
+            self.archive.submit({
+                "stream_sid": stream_sid,
+                "reason": reason,
+                "closed_at": datetime.now(timezone.utc).isoformat(),
+                "state": state,
+                "messages": messages
             })
+    
+    def evict_expired(self, ttl_seconds: float) -> int:
+        """Close conversations idle for longer than ttl_seconds; returns how many"""
+        expired = self.store.expired(ttl_seconds)
+        for stream_sid in expired:
+            print(f"Evicting conversation {stream_sid}, idle for over {ttl_seconds:.0f}s")
+            self.close_conversation(stream_sid, reason="expired")
+        return len(expired)
+    
+    def update_call_state(self, stream_sid: str, state: str, unless_in: Iterable[str] = ()) -> bool:
+        """
+        Update the state of the conversation
+
+        Leaves it alone if the current state is one of unless_in; the check and
+        the update are atomic, so only one of several racing callers wins.
+        Returns whether the state was updated.
+        """
+        if not stream_sid:
+            return False  # Skip if stream_sid is not yet available
         
-        #print(f"Call state updated: {state}")
+        updated = self.store.set_state(stream_sid, state, unless_in)
+        if updated and self.wal:
+            self.wal.log(STATE, stream_sid, state)
+        return updated
 
     def get_call_state(self, stream_sid: str) -> str:
         """Get the current state of the conversation"""
-        if not stream_sid or stream_sid not in self.active_conversations:
+        if not stream_sid:
             return "initial"
         
-        for item in self.active_conversations[stream_sid]:
-            if 'metadata' in item and 'state' in item['metadata']:
-                return item['metadata']['state']
-        
-        return "initial" 
\ No newline at end of file
+        return self.store.current_state(stream_sid) or "initial"
+
+    # Coroutine versions of the calls above, for use on the event loop. The
+    # SQLite and Redis stores block on the disk or the network (and a
+    # conditional state update can retry), so those run in a thread; the
+    # in-memory store is quick enough to call directly.
+
+    async def _offload(self, func, *args):
+        if self.store.blocking:
+            return await run_in_thread(func, *args)
+        return func(*args)
+
+    async def start_conversation_async(self, stream_sid: str, caller_number: str = None) -> None:
+        await self._offload(self.start_conversation, stream_sid, caller_number)
+
+    async def add_message_async(self, stream_sid: str, role: str, content: str) -> None:
+        await self._offload(self.add_message, stream_sid, role, content)
+
+    async def get_conversation_async(self, stream_sid: str) -> List[Dict]:
+        return await self._offload(self.get_conversation, stream_sid)
+
+    async def recent_messages_async(self, stream_sid: str, count: int = 3) -> List[Message]:
+        return await self._offload(self.recent_messages, stream_sid, count)
+
+    async def close_conversation_async(self, stream_sid: str, reason: str = "closed") -> None:
+        await self._offload(self.close_conversation, stream_sid, reason)
+
+    async def update_call_state_async(self, stream_sid: str, state: str, unless_in: Iterable[str] = ()) -> bool:
+        return await self._offload(self.update_call_state, stream_sid, state, unless_in)
+
+async def expire_conversations(service: ConversationService = None) -> None:
+    """
+    Evict idle conversations and report store size forever; run as a background task
+
+    Calls close their conversation when they end, so this only catches ones
+    that were never closed, e.g. after a crash in the relay.
+    """
+    load_dotenv()
+    ttl = float(os.getenv('CONVERSATION_TTL_SECONDS', '7200'))
+    interval = min(60.0, ttl / 4)
+    service = service or ConversationService()
+    while True:
+        try:
+            await run_in_thread(service.evict_expired, ttl)
+            LIVE_CONVERSATIONS.set(len(await run_in_thread(service.store.active)))
+            retained = await run_in_thread(service.store.retained_bytes)
+            if retained is not None:
+                RETAINED_BYTES.set(retained)
+        except Exception as e:
+            print(f"Error expiring conversations: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,462 @@
+import abc
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+from ..utils.resp import RespClient
+
+# Messages are stamped with the monotonic clock, which is cheap and never goes
+# backwards; this pair converts those stamps to wall-clock time when formatted
+_WALL_ANCHOR_NS = time.time_ns()
+_MONOTONIC_ANCHOR_NS = time.monotonic_ns()
+
+def _format_ns(monotonic_ns: int) -> str:
+    wall_ns = monotonic_ns - _MONOTONIC_ANCHOR_NS + _WALL_ANCHOR_NS
+    return datetime.fromtimestamp(wall_ns / 1e9, timezone.utc).isoformat()
+
+def _parse_iso(timestamp: str) -> int:
+    at = datetime.fromisoformat(timestamp)
+    if at.tzinfo is None:
+        # Stored before timestamps carried their offset; those were always UTC
+        at = at.replace(tzinfo=timezone.utc)
+    wall_ns = int(at.timestamp() * 1e9)
+    return wall_ns - _WALL_ANCHOR_NS + _MONOTONIC_ANCHOR_NS
+
+class Message:
+    """One turn of a conversation; the timestamp is only formatted when asked for"""
+
+    __slots__ = ("role", "content", "at_ns")
+
+    def __init__(self, role: str, content: str, at_ns: int = None):
+        self.role = role
+        self.content = content
+        self.at_ns = time.monotonic_ns() if at_ns is None else at_ns
+
+    @property
+    def timestamp(self) -> str:
+        return _format_ns(self.at_ns)
+
+    def to_dict(self) -> Dict:
+        return {"role": self.role, "content": self.content, "timestamp": self.timestamp}
+
+    @classmethod
+    def from_dict(cls, message: Dict) -> "Message":
+        timestamp = message.get("timestamp")
+        return cls(message.get("role"), message.get("content"), _parse_iso(timestamp) if timestamp else None)
+
+class ConversationStore(abc.ABC):
+    """
+    Where call transcripts and call state live.
+
+    Every operation is atomic on its own, so several workers (or a ticket
+    worker next to them) can share one store. messages() returns plain
+    dicts for tickets and archives; recent() returns Message records.
+    State is a dict with "state" and "state_updated_at".
+    """
+
+    # Whether operations wait on a disk or the network, so callers on the
+    # event loop should run them in a thread
+    blocking = True
+
+    @abc.abstractmethod
+    def start(self, stream_sid: str) -> None:
+        """Begin a conversation, discarding anything stored under the same ID"""
+
+    @abc.abstractmethod
+    def append(self, stream_sid: str, message: Message) -> None:
+        """Add a message, starting the conversation if needed"""
+
+    @abc.abstractmethod
+    def messages(self, stream_sid: str) -> List[Dict]:
+        """Every message as a dict with role, content and timestamp, oldest first"""
+
+    @abc.abstractmethod
+    def recent(self, stream_sid: str, count: int) -> List[Message]:
+        """The last count messages, oldest first, without reading the rest"""
+
+    @abc.abstractmethod
+    def get_state(self, stream_sid: str) -> Optional[Dict]:
+        """The state and when it was set, or None if it was never set"""
+
+    def current_state(self, stream_sid: str) -> Optional[str]:
+        """Just the state name, or None if it was never set"""
+        state = self.get_state(stream_sid)
+        return state["state"] if state else None
+
+    @abc.abstractmethod
+    def set_state(self, stream_sid: str, state: str, unless_in: Iterable[str] = ()) -> bool:
+        """
+        Set the call state, unless the current state is one of unless_in
+
+        The check and the update happen atomically. Returns whether the state
+        was set.
+        """
+
+    @abc.abstractmethod
+    def delete(self, stream_sid: str) -> None:
+        """Forget the conversation; deleting one that does not exist is fine"""
+
+    @abc.abstractmethod
+    def active(self) -> List[str]:
+        """IDs of every conversation currently stored"""
+
+    @abc.abstractmethod
+    def expired(self, idle_seconds: float) -> List[str]:
+        """IDs of conversations not written to for idle_seconds"""
+
+    def retained_bytes(self) -> Optional[int]:
+        """Size of the stored messages, or None if the store cannot tell cheaply"""
+        return None
+
+    def close(self) -> None:
+        pass
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class _Conversation:
+    """A call held in memory: its messages, state and bookkeeping, nothing else"""
+
+    __slots__ = ("messages", "state", "state_updated_ns", "bytes", "touched_ns")
+
+    def __init__(self):
+        self.messages: List[Message] = []
+        self.state: Optional[str] = None
+        self.state_updated_ns = 0
+        self.bytes = 0
+        self.touched_ns = time.monotonic_ns()
+
+# Roles are shared constants, so a message costs its record plus its content
+_MESSAGE_OVERHEAD = sys.getsizeof(Message("", "", 0)) + sys.getsizeof(0)
+
+class MemoryConversationStore(ConversationStore):
+    """Process-local store; the default, and only shared within one worker"""
+
+    blocking = False
+
+    def __init__(self):
+        self._conversations: Dict[str, _Conversation] = {}
+        # Tool calls and ticket creation touch the store from worker threads
+        self._lock = threading.Lock()
+
+    def _conversation(self, stream_sid: str) -> _Conversation:
+        conversation = self._conversations.get(stream_sid)
+        if conversation is None:
+            conversation = self._conversations[stream_sid] = _Conversation()
+        else:
+            conversation.touched_ns = time.monotonic_ns()
+        return conversation
+
+    def start(self, stream_sid: str) -> None:
+        with self._lock:
+            self._conversations[stream_sid] = _Conversation()
+
+    def append(self, stream_sid: str, message: Message) -> None:
+        with self._lock:
+            conversation = self._conversation(stream_sid)
+            conversation.messages.append(message)
+            conversation.bytes += _MESSAGE_OVERHEAD + sys.getsizeof(message.content)
+
+    def messages(self, stream_sid: str) -> List[Dict]:
+        with self._lock:
+            conversation = self._conversations.get(stream_sid)
+            messages = list(conversation.messages) if conversation else []
+        return [message.to_dict() for message in messages]
+
+    def recent(self, stream_sid: str, count: int) -> List[Message]:
+        with self._lock:
+            conversation = self._conversations.get(stream_sid)
+            return conversation.messages[-count:] if conversation else []
+
+    def get_state(self, stream_sid: str) -> Optional[Dict]:
+        with self._lock:
+            conversation = self._conversations.get(stream_sid)
+            if not conversation or conversation.state is None:
+                return None
+            state, updated_ns = conversation.state, conversation.state_updated_ns
+        return {"state": state, "state_updated_at": _format_ns(updated_ns)}
+
+    def current_state(self, stream_sid: str) -> Optional[str]:
+        conversation = self._conversations.get(stream_sid)
+        return conversation.state if conversation else None
+
+    def set_state(self, stream_sid: str, state: str, unless_in: Iterable[str] = ()) -> bool:
+        with self._lock:
+            conversation = self._conversation(stream_sid)
+            if conversation.state in unless_in:
+                return False
+            conversation.state = state
+            conversation.state_updated_ns = conversation.touched_ns
+            return True
+
+    def delete(self, stream_sid: str) -> None:
+        with self._lock:
+            self._conversations.pop(stream_sid, None)
+
+    def active(self) -> List[str]:
+        with self._lock:
+            return list(self._conversations)
+
+    def expired(self, idle_seconds: float) -> List[str]:
+        cutoff = time.monotonic_ns() - int(idle_seconds * 1e9)
+        with self._lock:
+            return [sid for sid, conversation in self._conversations.items() if conversation.touched_ns < cutoff]
+
+    def retained_bytes(self) -> Optional[int]:
+        with self._lock:
+            return sum(conversation.bytes for conversation in self._conversations.values())
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Store in a SQLite file, shared by every worker on the host.
+
+    Uses WAL mode so readers never block the writer, and one connection per
+    thread since SQLite connections cannot be shared between threads.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS conversations (
+            stream_sid TEXT PRIMARY KEY,
+            state TEXT,
+            state_updated_at TEXT,
+            touched_at REAL
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stream_sid TEXT NOT NULL,
+            body TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS messages_by_call ON messages (stream_sid, id);
+        CREATE INDEX IF NOT EXISTS conversations_by_touched ON conversations (touched_at);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        db = self._connection()
+        columns = [row[1] for row in db.execute("PRAGMA table_info(conversations)")]
+        if columns and "touched_at" not in columns:
+            db.execute("ALTER TABLE conversations ADD COLUMN touched_at REAL")
+        db.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _transaction(self, statements) -> None:
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                db.execute(sql, params)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def start(self, stream_sid: str) -> None:
+        self._transaction([
+            ("DELETE FROM messages WHERE stream_sid = ?", (stream_sid,)),
+            ("INSERT OR REPLACE INTO conversations (stream_sid, state, state_updated_at, touched_at) VALUES (?, NULL, NULL, ?)", (stream_sid, time.time())),
+        ])
+
+    def append(self, stream_sid: str, message: Message) -> None:
+        self._transaction([
+            ("INSERT INTO conversations (stream_sid, touched_at) VALUES (?, ?) "
+             "ON CONFLICT (stream_sid) DO UPDATE SET touched_at = excluded.touched_at", (stream_sid, time.time())),
+            ("INSERT INTO messages (stream_sid, body) VALUES (?, ?)", (stream_sid, json.dumps(message.to_dict()))),
+        ])
+
+    def messages(self, stream_sid: str) -> List[Dict]:
+        rows = self._connection().execute(
+            "SELECT body FROM messages WHERE stream_sid = ? ORDER BY id", (stream_sid,)
+        ).fetchall()
+        return [json.loads(body) for (body,) in rows]
+
+    def recent(self, stream_sid: str, count: int) -> List[Message]:
+        rows = self._connection().execute(
+            "SELECT body FROM messages WHERE stream_sid = ? ORDER BY id DESC LIMIT ?", (stream_sid, count)
+        ).fetchall()
+        return [Message.from_dict(json.loads(body)) for (body,) in reversed(rows)]
+
+    def get_state(self, stream_sid: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT state, state_updated_at FROM conversations WHERE stream_sid = ?", (stream_sid,)
+        ).fetchone()
+        if not row or row[0] is None:
+            return None
+        return {"state": row[0], "state_updated_at": row[1]}
+
+    def set_state(self, stream_sid: str, state: str, unless_in: Iterable[str] = ()) -> bool:
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT state FROM conversations WHERE stream_sid = ?", (stream_sid,)).fetchone()
+            if row and row[0] in set(unless_in):
+                db.execute("ROLLBACK")
+                return False
+            db.execute(
+                "INSERT INTO conversations (stream_sid, state, state_updated_at, touched_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (stream_sid) DO UPDATE SET state = excluded.state, "
+                "state_updated_at = excluded.state_updated_at, touched_at = excluded.touched_at",
+                (stream_sid, state, _now(), time.time())
+            )
+            db.execute("COMMIT")
+            return True
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def delete(self, stream_sid: str) -> None:
+        self._transaction([
+            ("DELETE FROM messages WHERE stream_sid = ?", (stream_sid,)),
+            ("DELETE FROM conversations WHERE stream_sid = ?", (stream_sid,)),
+        ])
+
+    def active(self) -> List[str]:
+        return [sid for (sid,) in self._connection().execute("SELECT stream_sid FROM conversations")]
+
+    def expired(self, idle_seconds: float) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT stream_sid FROM conversations WHERE touched_at IS NULL OR touched_at < ?",
+            (time.time() - idle_seconds,)
+        )
+        return [sid for (sid,) in rows]
+
+    def retained_bytes(self) -> Optional[int]:
+        return self._connection().execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM messages").fetchone()[0]
+
+    def close(self) -> None:
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+class RedisConversationStore(ConversationStore):
+    """
+    Store in Redis (or anything speaking its protocol), shared across hosts.
+
+    Each call has a list of JSON messages and a hash with its state and when
+    it was last written; a set tracks which calls exist. Conditional state
+    updates use WATCH/MULTI/EXEC.
+    """
+
+    def __init__(self, client: RespClient, prefix: str = "kai:conversation:"):
+        self.client = client
+        self.prefix = prefix
+        self.active_key = f"{prefix}active"
+
+    def _messages_key(self, stream_sid: str) -> str:
+        return f"{self.prefix}{stream_sid}:messages"
+
+    def _state_key(self, stream_sid: str) -> str:
+        return f"{self.prefix}{stream_sid}:state"
+
+    def start(self, stream_sid: str) -> None:
+        self.client.transaction([
+            ("DEL", self._messages_key(stream_sid), self._state_key(stream_sid)),
+            ("HSET", self._state_key(stream_sid), "touched_at", time.time()),
+            ("SADD", self.active_key, stream_sid),
+        ])
+
+    def append(self, stream_sid: str, message: Message) -> None:
+        self.client.transaction([
+            ("RPUSH", self._messages_key(stream_sid), json.dumps(message.to_dict())),
+            ("HSET", self._state_key(stream_sid), "touched_at", time.time()),
+            ("SADD", self.active_key, stream_sid),
+        ])
+
+    def messages(self, stream_sid: str) -> List[Dict]:
+        return [json.loads(item) for item in self.client.execute("LRANGE", self._messages_key(stream_sid), 0, -1)]
+
+    def recent(self, stream_sid: str, count: int) -> List[Message]:
+        items = self.client.execute("LRANGE", self._messages_key(stream_sid), -count, -1)
+        return [Message.from_dict(json.loads(item)) for item in items]
+
+    def get_state(self, stream_sid: str) -> Optional[Dict]:
+        fields = self.client.execute("HGETALL", self._state_key(stream_sid))
+        if not fields:
+            return None
+        stored = {fields[i].decode(): fields[i + 1].decode() for i in range(0, len(fields), 2)}
+        if "state" not in stored:
+            return None
+        return {"state": stored["state"], "state_updated_at": stored["state_updated_at"]}
+
+    def set_state(self, stream_sid: str, state: str, unless_in: Iterable[str] = ()) -> bool:
+        key = self._state_key(stream_sid)
+        update = [
+            ("HSET", key, "state", state, "state_updated_at", _now(), "touched_at", time.time()),
+            ("SADD", self.active_key, stream_sid),
+        ]
+        unless_in = set(unless_in)
+        if not unless_in:
+            self.client.transaction(update)
+            return True
+        while True:
+            with self.client.exclusive():
+                self.client.execute("WATCH", key)
+                current = self.client.execute("HGET", key, "state")
+                if current is not None and current.decode() in unless_in:
+                    self.client.execute("UNWATCH")
+                    return False
+                if self.client.transaction(update) is not None:
+                    return True
+            # Another worker changed the state in between; look again
+
+    def delete(self, stream_sid: str) -> None:
+        self.client.transaction([
+            ("DEL", self._messages_key(stream_sid), self._state_key(stream_sid)),
+            ("SREM", self.active_key, stream_sid),
+        ])
+
+    def active(self) -> List[str]:
+        return [sid.decode() for sid in self.client.execute("SMEMBERS", self.active_key)]
+
+    def expired(self, idle_seconds: float) -> List[str]:
+        stream_sids = self.active()
+        touched = self.client.pipeline([("HGET", self._state_key(sid), "touched_at") for sid in stream_sids])
+        cutoff = time.time() - idle_seconds
+        return [sid for sid, at in zip(stream_sids, touched) if at is None or float(at) < cutoff]
+
+    def close(self) -> None:
+        self.client.close()
+
+def create_conversation_store(url: str = None) -> ConversationStore:
+    """
+    Build a store from a URL, by default CONVERSATION_STORE
+
+    "memory" (the default), "sqlite:///relative/path.db",
+    "sqlite:////absolute/path.db" or "redis://[:password@]host[:port][/db]".
+    """
+    if url is None:
+        load_dotenv()
+        url = os.getenv('CONVERSATION_STORE', 'memory')
+    if url == "memory":
+        return MemoryConversationStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteConversationStore(url[len("sqlite:///"):])
+    if url.startswith("redis://"):
+        return RedisConversationStore(RespClient.from_url(url))
+    raise ValueError(f"Unsupported conversation store: {url}")
+
+_default_store: Optional[ConversationStore] = None
+_default_store_lock = threading.Lock()
+
+def default_conversation_store() -> ConversationStore:
+    """The store shared by every call in this process"""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = create_conversation_store()
+    return _default_store
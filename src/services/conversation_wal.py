@@ -0,0 +1,285 @@
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from dotenv import load_dotenv
+from ..utils.metrics import registry
+
+WAL_BATCH_EVENTS = registry.histogram(
+    "conversation_wal_batch_events", "Events written per group commit of the conversation log",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+WAL_FSYNC_DURATION = registry.histogram(
+    "conversation_wal_fsync_seconds", "Time to write and fsync one group commit of the conversation log"
+)
+WAL_DROPPED = registry.counter(
+    "conversation_wal_dropped_total", "Conversation events not logged because the log queue was full"
+)
+
+# Event kinds; records are JSON lines of [kind, stream_sid, time, ...]
+START, MESSAGE, STATE, CLOSE = "start", "message", "state", "close"
+
+# Held with flock for as long as a worker (or a recovery) owns its log
+# directory; the kernel drops it when the process dies, however it dies
+LOCK_FILE = "owner.lock"
+
+def _try_lock(path: Path, create: bool = True) -> Optional[int]:
+    """Take the owner lock without waiting; returns its descriptor, or None if it is held"""
+    fd = os.open(path, os.O_RDWR | (os.O_CREAT if create else 0), 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+class ConversationWAL:
+    """
+    Append-only log of conversation events, so a transcript outlives a crash.
+
+    The call path only puts a tuple on a queue. A background thread writes
+    everything queued as one batch and fsyncs once per batch (group commit),
+    so the more events arrive while a sync is in flight, the more share the
+    next one. Each worker logs to its own directory, in numbered segments;
+    a segment is deleted once every call it mentions has closed.
+
+    The directory is named after the PID plus a random suffix, since PIDs
+    are reused across restarts and containers, and is owned through a lock
+    on LOCK_FILE rather than the PID; see recover_orphaned_conversations.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 4 * 1024 * 1024, queue_size: int = 10000):
+        self.root = Path(directory)
+        self.directory, self._lock_fd = self._create_directory()
+        self.segment_bytes = segment_bytes
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=queue_size)
+        self._segment = None
+        self._sequence = 0
+        self._segment_written = 0
+        # Calls still open, by the segments they wrote to
+        self._open_calls: Dict[int, Set[str]] = {}
+        self._thread = threading.Thread(target=self._run, name="conversation-wal", daemon=True)
+        self._thread.start()
+
+    def _create_directory(self) -> tuple:
+        """Make this worker's directory, locked before recovery can see it"""
+        name = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        staging = self.root / f".{name}"
+        staging.mkdir(parents=True)
+        fd = _try_lock(staging / LOCK_FILE)
+        directory = self.root / name
+        staging.rename(directory)
+        return directory, fd
+
+    def log(self, kind: str, stream_sid: str, *fields) -> None:
+        """Queue an event; never blocks and never touches the disk"""
+        try:
+            self._queue.put_nowait((kind, stream_sid, time.time()) + fields)
+        except queue.Full:
+            WAL_DROPPED.inc()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write and sync what is queued, then stop the writer"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            # Everything that queued up during the last sync goes in this one
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [event for event in batch if event is not None]
+            if batch:
+                try:
+                    self._commit(batch)
+                except Exception as e:
+                    print(f"Error writing conversation log: {e}")
+        if self._segment is not None:
+            self._segment.close()
+        os.close(self._lock_fd)
+
+    def _commit(self, batch: List[tuple]) -> None:
+        started = time.perf_counter()
+        if self._segment is None or self._segment_written >= self.segment_bytes:
+            self._rotate()
+        data = "".join(json.dumps(event) + "\n" for event in batch).encode()
+        self._segment.write(data)
+        self._segment.flush()
+        os.fsync(self._segment.fileno())
+        self._segment_written += len(data)
+        WAL_FSYNC_DURATION.observe(time.perf_counter() - started)
+        WAL_BATCH_EVENTS.observe(len(batch))
+
+        # Only after the sync, so a closed call's events are never deleted before its close is durable
+        current = self._open_calls[self._sequence]
+        for kind, stream_sid, *_ in batch:
+            if kind == CLOSE:
+                for calls in self._open_calls.values():
+                    calls.discard(stream_sid)
+            else:
+                current.add(stream_sid)
+        self._prune()
+
+    def _rotate(self) -> None:
+        if self._segment is not None:
+            self._segment.close()
+        self._sequence += 1
+        # Fails rather than append to a segment this writer did not create
+        self._segment = open(self._segment_path(self._sequence), "xb")
+        self._segment_written = 0
+        self._open_calls[self._sequence] = set()
+
+    def _segment_path(self, sequence: int) -> Path:
+        return self.directory / f"{sequence:06d}.log"
+
+    def _prune(self) -> None:
+        for sequence in [s for s, calls in self._open_calls.items() if not calls and s != self._sequence]:
+            del self._open_calls[sequence]
+            self._segment_path(sequence).unlink(missing_ok=True)
+
+def replay(directory: Path) -> Dict[str, Dict]:
+    """
+    Rebuild the calls that never closed from one worker's log segments
+
+    Returns {stream_sid: {"caller_number", "state", "messages"}} with
+    conversations in the format ConversationService.get_conversation uses.
+    """
+    calls: Dict[str, Dict] = {}
+    for segment in sorted(directory.glob("*.log")):
+        with open(segment, "rb") as f:
+            for line in f:
+                try:
+                    kind, stream_sid, at, *fields = json.loads(line)
+                except ValueError:
+                    continue  # A write torn by the crash
+                timestamp = datetime.fromtimestamp(at, timezone.utc).isoformat()
+                if kind == START:
+                    calls[stream_sid] = {"caller_number": fields[0], "state": None, "messages": []}
+                elif kind == CLOSE:
+                    calls.pop(stream_sid, None)
+                else:
+                    call = calls.setdefault(stream_sid, {"caller_number": None, "state": None, "messages": []})
+                    if kind == MESSAGE:
+                        call["messages"].append({"role": fields[0], "content": fields[1], "timestamp": timestamp})
+                    elif kind == STATE:
+                        call["state"] = {"state": fields[0], "state_updated_at": timestamp}
+    return calls
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _claim(worker_dir: Path, root: Path) -> Optional[tuple]:
+    """
+    Take over a dead worker's directory; returns (claimed path, lock descriptor)
+
+    A worker holds the lock on its directory until it exits, and so does a
+    recovery, so a lock we can take means the owner is gone. Directories
+    from before the lock was introduced are named after the PID alone and
+    are only claimed once no process has that PID.
+    """
+    name = worker_dir.name
+    if name.startswith(".") or name == "unrecovered":
+        return None
+    try:
+        fd = _try_lock(worker_dir / LOCK_FILE, create=False)
+        if fd is None:
+            return None
+    except FileNotFoundError:
+        if not (name.isdigit() and not _process_alive(int(name))):
+            return None
+        fd = None
+
+    original = name[len("recovering-"):] if name.startswith("recovering-") else name
+    claimed = root / f"recovering-{original}"
+    try:
+        if claimed != worker_dir:
+            # Renaming fails if another worker claimed the same directory first
+            worker_dir.rename(claimed)
+    except OSError:
+        if fd is not None:
+            os.close(fd)
+        return None
+    if fd is None:
+        # Locked from here on, so an interrupted recovery can be picked up again
+        fd = _try_lock(claimed / LOCK_FILE)
+    return claimed, fd
+
+def recover_orphaned_conversations(directory: str, ticket_service) -> int:
+    """
+    Turn calls left open by workers that died into tickets
+
+    Claims each dead worker's log directory by locking and renaming it, so
+    two workers starting together do not both recover it. Calls whose
+    ticket could not be created are kept as JSON under unrecovered/.
+    Returns how many tickets were created.
+    """
+    root = Path(directory)
+    if not root.is_dir():
+        return 0
+    created = 0
+    for worker_dir in root.iterdir():
+        if not worker_dir.is_dir():
+            continue
+        claim = _claim(worker_dir, root)
+        if claim is None:
+            continue
+        claimed, lock_fd = claim
+        original = claimed.name[len("recovering-"):]
+        try:
+            for stream_sid, call in replay(claimed).items():
+                if not call["messages"]:
+                    continue
+                conversation = ([{"metadata": call["state"]}] if call["state"] else []) + call["messages"]
+                print(f"Recovering conversation {stream_sid} left open by worker {original}")
+                if ticket_service.make_ticket(conversation, call["caller_number"]):
+                    created += 1
+                else:
+                    unrecovered = root / "unrecovered"
+                    unrecovered.mkdir(exist_ok=True)
+                    (unrecovered / f"{stream_sid}.json").write_text(json.dumps({"stream_sid": stream_sid, **call}))
+            for path in claimed.iterdir():
+                path.unlink()
+            claimed.rmdir()
+        finally:
+            os.close(lock_fd)
+    return created
+
+def create_conversation_wal() -> Optional[ConversationWAL]:
+    """Build the log from CONVERSATION_WAL_DIR; None if logging is off"""
+    load_dotenv()
+    directory = os.getenv('CONVERSATION_WAL_DIR', '')
+    return ConversationWAL(directory) if directory else None
+
+_default_wal: Optional[ConversationWAL] = None
+_default_wal_created = False
+_default_wal_lock = threading.Lock()
+
+def default_conversation_wal() -> Optional[ConversationWAL]:
+    """The log shared by every call in this process, if logging is on"""
+    global _default_wal, _default_wal_created
+    if not _default_wal_created:
+        with _default_wal_lock:
+            if not _default_wal_created:
+                _default_wal = create_conversation_wal()
+                _default_wal_created = True
+    return _default_wal
@@ -0,0 +1,104 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Callable, List, Optional
+from dotenv import load_dotenv
+from .audio_clip_cache import LOOKUP_CLIP, AudioClipCache, clip_cache
+from .socket_writer import QueuedSocketWriter
+from ..utils.metrics import registry
+
+FILLER_OUTCOMES = registry.counter(
+    "filler_audio_total",
+    "Tool calls by what happened to the filler clip (not_needed, skipped, played, cut_short, interrupted)",
+    ["outcome"]
+)
+
+class FillerAudio:
+    """
+    Cover a slow tool call with a pre-rendered clip instead of dead air
+
+    Nothing is played if the call finishes within the threshold, so fast
+    lookups sound exactly as before. Otherwise the clip is streamed straight
+    to Twilio, paced at real time so that stopping it leaves at most one
+    payload buffered, and Twilio's buffer is cleared when the result is in.
+    The model is not involved, so no response round trip is added.
+    """
+
+    def __init__(self, twilio_writer: QueuedSocketWriter, stream_sid: Callable[[], Optional[str]],
+                 audio_pending: Callable[[], bool], clip: str = LOOKUP_CLIP, threshold: float = None,
+                 cache: AudioClipCache = None):
+        load_dotenv()
+        self.twilio_writer = twilio_writer
+        self.stream_sid = stream_sid
+        # True while the caller still has assistant audio to hear, which the filler must not cut into
+        self.audio_pending = audio_pending
+        self.payloads: Optional[List[str]] = (cache or clip_cache).get(clip)
+        self.threshold = threshold if threshold is not None else float(os.getenv('FILLER_AUDIO_THRESHOLD_SECONDS', '0.7'))
+        self.payload_seconds = (cache or clip_cache).frames_per_payload * 0.02
+        self._task: Optional[asyncio.Task] = None
+        self._sent = 0  # Payloads of the clip sent so far
+        self._finished = False
+        self._interrupted = False
+
+    @asynccontextmanager
+    async def while_waiting(self):
+        """Play the filler if the block is still running after the threshold"""
+        if not self.payloads:
+            yield
+            return
+        self._sent = 0
+        self._finished = False
+        self._interrupted = False
+        self._task = asyncio.create_task(self._play())
+        try:
+            yield
+        finally:
+            await self.stop()
+
+    async def _play(self) -> None:
+        await asyncio.sleep(self.threshold)
+        stream_sid = self.stream_sid()
+        if self.audio_pending() or not stream_sid:
+            FILLER_OUTCOMES.labels("skipped").inc()
+            return
+        for payload in self.payloads:
+            await self.twilio_writer.send_json({
+                "event": "media",
+                "streamSid": stream_sid,
+                "media": {"payload": payload}
+            })
+            self._sent += 1
+            # Stay one payload ahead of playback, so there is little to clear
+            if self._sent > 1:
+                await asyncio.sleep(self.payload_seconds)
+        await asyncio.sleep(self.payload_seconds)
+        self._finished = True
+        FILLER_OUTCOMES.labels("played").inc()
+
+    async def interrupt(self) -> None:
+        """The caller started talking over the filler"""
+        if self._task is not None and self._sent and not self._finished:
+            self._interrupted = True
+            await self.stop()
+
+    async def stop(self) -> None:
+        """Stop the filler and clear whatever of it Twilio has not played yet"""
+        task, self._task = self._task, None
+        if task is None:
+            return
+        if not task.done():
+            task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        if self._finished:
+            return
+        if not self._sent:
+            if task.cancelled():
+                FILLER_OUTCOMES.labels("not_needed").inc()
+            return
+        FILLER_OUTCOMES.labels("interrupted" if self._interrupted else "cut_short").inc()
+        # The answer has not been requested yet, so all queued and buffered audio is filler
+        self.twilio_writer.flush(("media",))
+        await self.twilio_writer.send_json({"event": "clear", "streamSid": self.stream_sid()})
@@ -0,0 +1,107 @@
+"""
+Published generations of the knowledge base.
+
+Vectors and chunk text are shared between generations: a chunk's id comes
+from its article and text, so a chunk that did not change keeps its id,
+its vector and its chunk store row. What makes a generation is its
+manifest, the complete set of chunk ids searches may return. A sync
+writes its new chunks where no search returns them yet, publishes the
+next manifest by atomically replacing a small pointer file, and only then
+deletes what the old generation had and the new one does not. Search
+workers check the pointer between queries and swap to the new manifest
+without a restart, so a search sees one whole generation or the next,
+never a sync half applied.
+"""
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, Optional, Set, Tuple
+from dotenv import load_dotenv
+
+POINTER = "current.json"
+
+def _write_atomically(path: Path, data: Dict) -> None:
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(json.dumps(data))
+    os.replace(temporary, path)
+
+@dataclass
+class Generation:
+    number: int
+    created_at: str
+    # Chunk ids by article
+    articles: Dict[int, Set[str]]
+
+class GenerationStore:
+    """
+    Manifests of the latest generations and the pointer to the current one
+
+    A manifest is written to its own file before the pointer names it, and
+    both are replaced atomically, so readers never see either half written.
+    The last few manifests are kept: a worker that has just read the
+    pointer may still be opening the manifest it named.
+    """
+
+    def __init__(self, directory: str, keep: int = 3):
+        self.directory = Path(directory)
+        self.pointer = self.directory / POINTER
+        self.keep = keep
+
+    def version(self) -> Optional[Tuple[int, int, int]]:
+        """Changes whenever a generation is published; a stat, cheap enough to check before every search"""
+        try:
+            stat = os.stat(self.pointer)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _manifest(self) -> Optional[Dict]:
+        try:
+            pointer = json.loads(self.pointer.read_text())
+        except FileNotFoundError:
+            return None
+        return json.loads((self.directory / pointer["manifest"]).read_text())
+
+    def current(self) -> Optional[Generation]:
+        """The published generation, or None before the first is"""
+        manifest = self._manifest()
+        if manifest is None:
+            return None
+        return Generation(manifest["generation"], manifest["created_at"],
+                          {int(article_id): set(ids) for article_id, ids in manifest["articles"].items()})
+
+    def live_chunk_ids(self) -> Optional[Tuple[int, FrozenSet[str]]]:
+        """The published generation's number and chunk ids, without the per-article sets current() builds"""
+        manifest = self._manifest()
+        if manifest is None:
+            return None
+        return manifest["generation"], frozenset(i for ids in manifest["articles"].values() for i in ids)
+
+    def publish(self, articles: Dict[int, Iterable[str]]) -> Generation:
+        """Make these chunk ids, by article, the next generation"""
+        current = self._manifest()
+        generation = Generation(
+            (current["generation"] if current else 0) + 1,
+            datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            {int(article_id): set(ids) for article_id, ids in articles.items() if ids}
+        )
+        name = f"{generation.number:08d}.json"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _write_atomically(self.directory / name, {
+            "generation": generation.number,
+            "created_at": generation.created_at,
+            "articles": {str(article_id): sorted(ids) for article_id, ids in sorted(generation.articles.items())}
+        })
+        _write_atomically(self.pointer, {"generation": generation.number, "manifest": name})
+        for path in self.directory.glob("[0-9]*.json"):
+            if int(path.stem) <= generation.number - self.keep:
+                path.unlink(missing_ok=True)
+        return generation
+
+def create_generation_store() -> Optional[GenerationStore]:
+    """Open the generations in KB_GENERATIONS_DIR; None has syncs change what searches see as they go"""
+    load_dotenv()
+    directory = os.getenv('KB_GENERATIONS_DIR', 'data/kb_generations')
+    return GenerationStore(directory) if directory else None
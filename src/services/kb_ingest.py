@@ -0,0 +1,603 @@
+"""
+Streaming sync of published articles into the knowledge base index.
+
+Fetch, clean, chunk, embed and upsert run as separate stages joined by
+bounded queues, so the first page of articles is being embedded while
+later pages are still downloading, and a slow stage holds the ones before
+it back instead of letting memory fill up. A sync takes about as long as
+its slowest stage rather than the sum of all of them.
+"""
+import asyncio
+import functools
+import itertools
+import json
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from dotenv import load_dotenv
+from ..models.article import Article
+from .chunk_store import ChunkStore, create_chunk_store, slim_metadata
+from .kb_generations import GenerationStore, create_generation_store
+from ..utils.chunking import DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP_TOKENS, TokenChunker, chunk_article
+from ..utils.concurrency import RateLimiter
+from ..utils.html_text import html_to_text
+from ..utils.metrics import registry
+
+KB_INGEST_STAGE_DURATION = registry.histogram(
+    "kb_ingest_stage_seconds", "Time for one item of a knowledge base sync stage (a page, article or batch)",
+    ["stage"], buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+KB_INGEST_ARTICLES = registry.counter(
+    "kb_ingest_articles_total", "Articles handled by knowledge base syncs, by outcome (updated, unchanged, deleted)",
+    ["outcome"]
+)
+
+# The embeddings API rejects requests with more inputs than this
+MAX_EMBED_INPUTS = 2048
+
+# Listing runs in parallel over these id prefixes, one per leading digit of the article id
+LIST_PREFIXES = tuple(f"article_{digit}" for digit in "0123456789")
+# Chunks whose metadata one versions query returns
+VERSIONS_QUERY_CHUNKS = 1000
+# Most ids Pinecone deletes in one request
+DELETE_BATCH_SIZE = 1000
+
+# Marks the end of a queue; each worker that sees it puts it back for its siblings
+_END = object()
+
+def list_article_chunks(index, prefix: str = "article_") -> Dict[int, Set[str]]:
+    """
+    Ids of the indexed chunks whose ids start with prefix, by article
+
+    Goes through the paginated list endpoint, so it sees every vector
+    however large the index is.
+    """
+    chunks: Dict[int, Set[str]] = {}
+    for ids in index.list(prefix=prefix):
+        for vector_id in ids:
+            # article_{id}_chunk_...
+            chunks.setdefault(int(vector_id.split("_", 2)[1]), set()).add(vector_id)
+    return chunks
+
+def get_article_versions(index, article_chunks: Dict[int, Set[str]], dimension: int) -> Dict[int, Set[str]]:
+    """
+    The updated_at values the chunks of these articles carry
+
+    One filtered query returns the metadata of every chunk of the articles,
+    since their chunk counts are known. An article whose chunks disagree
+    was only partly written by an earlier sync, so it never looks up to date.
+    """
+    results = index.query(
+        vector=[0] * dimension,
+        top_k=sum(len(ids) for ids in article_chunks.values()),
+        filter={"article_id": {"$in": list(article_chunks)}},
+        include_metadata=True
+    )
+    versions: Dict[int, Set[str]] = {}
+    for match in results.matches:
+        versions.setdefault(int(match.metadata['article_id']), set()).add(match.metadata.get('updated_at'))
+    return versions
+
+def _clean_article(article: Article) -> Article:
+    article.title = html_to_text(article.title)
+    article.content = html_to_text(article.content)
+    return article
+
+def _chunk_with_tokens(article: Article, chunker: TokenChunker) -> List[Tuple[Dict, int]]:
+    counter = chunker.counter
+    return [(chunk, counter.count(chunk["text"])) for chunk in chunk_article(article, chunker)]
+
+class IngestCheckpoint:
+    """
+    Progress of a sync on disk, so a crashed one resumes where it stopped
+
+    JSON lines of [kind, article_id, updated_at, chunk_ids]. An article is
+    marked dirty before any of its new vectors are written and done, with
+    the ids of its chunks, once all of them are. A resumed sync skips what
+    is done, publishing the recorded chunks for it, and redoes what is
+    dirty, even though the index may already show the new updated_at for
+    it. The file is deleted when a sync completes.
+    """
+
+    DIRTY, DONE = "dirty", "done"
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.done: Dict[int, str] = {}
+        self.done_chunks: Dict[int, Set[str]] = {}
+        self.dirty: Set[int] = set()
+        self._file = None
+        if self.path.exists():
+            for line in self.path.read_text().splitlines():
+                try:
+                    kind, article_id, updated_at, *chunk_ids = json.loads(line)
+                except ValueError:
+                    continue  # Torn by the crash
+                if kind == self.DONE:
+                    self.done[article_id] = updated_at
+                    if chunk_ids:
+                        self.done_chunks[article_id] = set(chunk_ids[0])
+                else:
+                    self.dirty.add(article_id)
+
+    @property
+    def resumed(self) -> bool:
+        return bool(self.done or self.dirty)
+
+    def _append(self, records: List[list]) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a")
+        self._file.write("".join(json.dumps(record) + "\n" for record in records))
+        self._file.flush()
+
+    def mark_dirty(self, article_ids: Iterable[int]) -> None:
+        new = [article_id for article_id in article_ids if article_id not in self.dirty]
+        if new:
+            self.dirty.update(new)
+            self._append([[self.DIRTY, article_id, None, None] for article_id in new])
+
+    def mark_done(self, article_id: int, updated_at: str, chunk_ids: Set[str]) -> None:
+        self.done[article_id] = updated_at
+        self.done_chunks[article_id] = set(chunk_ids)
+        self._append([[self.DONE, article_id, updated_at, sorted(chunk_ids)]])
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def clear(self) -> None:
+        self.close()
+        self.done.clear()
+        self.done_chunks.clear()
+        self.dirty.clear()
+        self.path.unlink(missing_ok=True)
+
+@dataclass
+class IngestStats:
+    articles: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    # Time spent handling items, summed over each stage's workers
+    busy_seconds: Dict[str, float] = field(default_factory=dict)
+
+@dataclass
+class _PendingArticle:
+    article: Article
+    chunk_ids: Set[str]
+    # Chunks not upserted yet
+    remaining: int
+
+class IngestPipeline:
+    """
+    Fetch → clean → chunk → embed → upsert, each stage its own workers
+
+    Embedding requests are packed up to embed_batch_tokens and held to the
+    requests and tokens per minute the account allows; upserts run in
+    parallel. Only new and changed articles go past the clean stage. With
+    a chunk store, chunk text is written there just before its vectors are
+    upserted with slim metadata.
+
+    With generations, the chunks an update or removal leaves behind stay
+    until everything else is written and the chunk ids searches may return
+    are published, plus grace_seconds, so searches only ever see the old
+    generation or the new one. Without, each article's go as soon as its
+    new chunks are in.
+
+    A sync refuses to start when the chunker can only estimate token counts
+    (tiktoken could not load its encoding), unless allow_estimated_tokens:
+    estimated chunks have other boundaries and ids, so an index synced from
+    hosts with and without the encoding would churn between the two.
+    """
+
+    def __init__(self, article_service, embeddings, index, chunker: TokenChunker = None,
+                 checkpoint: Optional[IngestCheckpoint] = None, store: Optional[ChunkStore] = None,
+                 generations: Optional[GenerationStore] = None, grace_seconds: float = 5.0,
+                 fetch_workers: int = 2,
+                 embed_concurrency: int = 4, upsert_concurrency: int = 4, embed_batch_tokens: int = 8000,
+                 upsert_batch_size: int = 100, queue_size: int = 64, processes: int = 0,
+                 embed_requests_per_minute: float = 0, embed_tokens_per_minute: float = 0,
+                 page_size: int = 100, allow_estimated_tokens: bool = False):
+        self.article_service = article_service
+        self.embeddings = embeddings
+        self.index = index
+        self.chunker = chunker or TokenChunker()
+        self.checkpoint = checkpoint
+        self.store = store
+        self.generations = generations
+        self.grace_seconds = grace_seconds
+        self.fetch_workers = fetch_workers
+        self.embed_concurrency = embed_concurrency
+        self.upsert_concurrency = upsert_concurrency
+        self.embed_batch_tokens = embed_batch_tokens
+        self.upsert_batch_size = upsert_batch_size
+        self.queue_size = queue_size
+        self.processes = processes
+        self.page_size = page_size
+        self.allow_estimated_tokens = allow_estimated_tokens
+        self._request_limit = RateLimiter(embed_requests_per_minute / 60)
+        self._token_limit = RateLimiter(embed_tokens_per_minute / 60)
+
+    async def run(self) -> IngestStats:
+        """Sync the index with the help center; the checkpoint is kept if this raises"""
+        return await self._run(None, ())
+
+    async def sync_articles(self, changed: Sequence[Dict], removed: Iterable[int] = ()) -> IngestStats:
+        """
+        Sync only these articles and leave the rest of the index alone
+
+        changed are published articles as get_article_summaries lists them,
+        loaded and rewritten here; removed are ids whose chunks are deleted.
+        Costs in proportion to the change rather than to the help center. The
+        checkpoint is not used: whoever chose the articles retries them.
+        """
+        return await self._run(changed, removed)
+
+    async def _run(self, changed: Optional[Sequence[Dict]], removed: Iterable[int]) -> IngestStats:
+        full = changed is None
+        if not self.chunker.counter.exact and not self.allow_estimated_tokens:
+            raise RuntimeError(
+                f"tiktoken encoding {self.chunker.encoding_name} is unavailable, so chunk sizes and ids would be "
+                "estimates; make the encoding available (TIKTOKEN_CACHE_DIR) or set KB_CHUNK_ALLOW_ESTIMATED_TOKENS"
+            )
+        started = time.perf_counter()
+        self.stats = IngestStats()
+        self._pending: Dict[int, _PendingArticle] = {}
+        # Chunk ids each article has once this sync is done
+        self._next: Dict[int, Set[str]] = {}
+        self._seen: Set[int] = set()
+        self._last_page: Optional[int] = None
+        self._checkpoint = self.checkpoint if full else None
+        self._threads = ThreadPoolExecutor(
+            max_workers=self.fetch_workers + self.embed_concurrency + self.upsert_concurrency + 2,
+            thread_name_prefix="kb-ingest"
+        )
+        self._cpu: Executor = ProcessPoolExecutor(self.processes) if self.processes > 1 else self._threads
+        cpu_workers = max(1, self.processes)
+        # Articles an interrupted sync may have left half written
+        self._redo: Set[int] = set(self._checkpoint.dirty) if self._checkpoint else set()
+        if self._checkpoint and self._checkpoint.resumed:
+            print(f"Resuming sync: {len(self._checkpoint.done)} articles already done")
+        fetched, cleaned, chunked, batched, embedded = (asyncio.Queue(self.queue_size) for _ in range(5))
+        try:
+            generation = await self._in_thread(self.generations.current) if self.generations else None
+            self._published = generation.articles if generation else {}
+            if full:
+                self._manifest = await self._list_index()
+                self._versions = await self._get_versions()
+            else:
+                removed = set(removed)
+                self._manifest = await self._list_articles({int(a['id']) for a in changed} | removed)
+                # Chosen because they changed, so nothing to compare against
+                self._versions = {}
+                if self.generations and generation is None:
+                    # Nothing published to build on yet, so start from what the index holds
+                    self._published = await self._list_index()
+                self._next = {article_id: set(ids) for article_id, ids in self._published.items()}
+            self._stored = await self._in_thread(self.store.article_ids) if self.store else set()
+            await _gather_or_cancel(
+                self._fetch(fetched) if full else self._load(changed, fetched),
+                self._stage("clean", cpu_workers, fetched, self._clean, cleaned),
+                self._stage("chunk", cpu_workers, cleaned, self._chunk, chunked),
+                self._batch(chunked, batched),
+                self._stage("embed", self.embed_concurrency, batched, self._embed, embedded),
+                self._stage("upsert", self.upsert_concurrency, embedded, self._upsert),
+            )
+            if full:
+                removed = set(self._manifest) - self._seen
+            for article_id in removed:
+                self._next.pop(article_id, None)
+            self._next = {article_id: ids for article_id, ids in self._next.items() if ids}
+            stale = sorted(
+                i for article_id, ids in self._manifest.items() for i in ids - self._next.get(article_id, set())
+            )
+            if self.generations and self._next != self._published:
+                published = await self._in_thread(self.generations.publish, self._next)
+                print(f"Published knowledge base generation {published.number}: "
+                      f"{sum(len(ids) for ids in self._next.values())} chunks of {len(self._next)} articles")
+                if stale:
+                    # Searches that read the old generation just before the swap finish with its chunks
+                    await asyncio.sleep(self.grace_seconds)
+            if stale:
+                print(f"Deleting {len(stale)} chunks of changed and removed articles...")
+                await self._delete(stale, progress=True)
+            if removed:
+                if self.store:
+                    for article_id in removed:
+                        await self._in_thread(self.store.delete_article, article_id)
+                self.stats.deleted = len(removed)
+                KB_INGEST_ARTICLES.labels("deleted").inc(len(removed))
+            if self._checkpoint:
+                self._checkpoint.clear()
+        finally:
+            if self._checkpoint:
+                self._checkpoint.close()
+            if self._cpu is not self._threads:
+                self._cpu.shutdown()
+            self._threads.shutdown(wait=False)
+        self.stats.seconds = time.perf_counter() - started
+        return self.stats
+
+    async def _list_index(self) -> Dict[int, Set[str]]:
+        """Every chunk id in the index by article, listed over several prefixes at once"""
+        started = time.perf_counter()
+        manifest: Dict[int, Set[str]] = {}
+        for shard in await asyncio.gather(*(
+            self._in_thread(list_article_chunks, self.index, prefix) for prefix in LIST_PREFIXES
+        )):
+            manifest.update(shard)
+        print(f"Listed {sum(len(ids) for ids in manifest.values())} indexed chunks of {len(manifest)} articles "
+              f"in {time.perf_counter() - started:.1f}s")
+        return manifest
+
+    async def _list_articles(self, article_ids: Set[int]) -> Dict[int, Set[str]]:
+        """The chunk ids of just these articles"""
+        semaphore = asyncio.Semaphore(self.upsert_concurrency)
+
+        async def list_one(article_id):
+            async with semaphore:
+                return await self._in_thread(list_article_chunks, self.index, f"article_{article_id}_chunk_")
+
+        manifest: Dict[int, Set[str]] = {}
+        for chunks in await asyncio.gather(*(list_one(article_id) for article_id in article_ids)):
+            manifest.update(chunks)
+        return manifest
+
+    async def _get_versions(self) -> Dict[int, Set[str]]:
+        """updated_at of every listed article, a few queries in flight at once"""
+        batches: List[Dict[int, Set[str]]] = [{}]
+        size = 0
+        for article_id, ids in self._manifest.items():
+            if batches[-1] and size + len(ids) > VERSIONS_QUERY_CHUNKS:
+                batches.append({})
+                size = 0
+            batches[-1][article_id] = ids
+            size += len(ids)
+        if not self._manifest:
+            return {}
+        dimension = (await self._in_thread(self.index.describe_index_stats)).dimension
+        semaphore = asyncio.Semaphore(self.upsert_concurrency)
+
+        async def query(batch):
+            async with semaphore:
+                return await self._in_thread(get_article_versions, self.index, batch, dimension)
+
+        versions: Dict[int, Set[str]] = {}
+        for result in await asyncio.gather(*(query(batch) for batch in batches if batch)):
+            versions.update(result)
+        return versions
+
+    async def _delete(self, ids: List[str], progress: bool = False) -> None:
+        """Delete vectors, then their text, in batches with several in flight"""
+        semaphore = asyncio.Semaphore(self.upsert_concurrency)
+        deleted = 0
+
+        async def delete(batch):
+            nonlocal deleted
+            async with semaphore:
+                # Vectors first, so a search never finds one whose text is gone
+                await self._in_thread(self.index.delete, ids=batch)
+                if self.store:
+                    await self._in_thread(self.store.delete, batch)
+            deleted += len(batch)
+            if progress:
+                print(f"Deleted {deleted}/{len(ids)} vectors")
+
+        await asyncio.gather(*(
+            delete(ids[i:i + DELETE_BATCH_SIZE]) for i in range(0, len(ids), DELETE_BATCH_SIZE)
+        ))
+
+    async def _in_thread(self, func: Callable, *args, **kwargs) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._threads, functools.partial(func, *args, **kwargs))
+
+    async def _in_cpu(self, func: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._cpu, func, *args)
+
+    @contextmanager
+    def _timed(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            KB_INGEST_STAGE_DURATION.labels(stage).observe(elapsed)
+            self.stats.busy_seconds[stage] = self.stats.busy_seconds.get(stage, 0.0) + elapsed
+
+    async def _stage(self, name: str, workers: int, inbox: asyncio.Queue,
+                     handle: Callable, outbox: asyncio.Queue = None) -> None:
+        async def work():
+            while True:
+                item = await inbox.get()
+                if item is _END:
+                    await inbox.put(_END)
+                    return
+                with self._timed(name):
+                    await handle(item, outbox)
+
+        await asyncio.gather(*(work() for _ in range(workers)))
+        if outbox is not None:
+            await outbox.put(_END)
+
+    async def _fetch(self, outbox: asyncio.Queue) -> None:
+        """Pages of articles, several in flight; no new page is started after a short one"""
+        pages = itertools.count()
+
+        async def work():
+            for page in pages:
+                if self._last_page is not None and page > self._last_page:
+                    return
+                with self._timed("fetch"):
+                    articles, page_size = await self._in_thread(
+                        self.article_service.get_published_page,
+                        offset=page * self.page_size, limit=self.page_size, clean=False
+                    )
+                if page_size < self.page_size:
+                    self._last_page = page if self._last_page is None else min(self._last_page, page)
+                for article in articles:
+                    await outbox.put(article)
+
+        await asyncio.gather(*(work() for _ in range(self.fetch_workers)))
+        await outbox.put(_END)
+
+    async def _load(self, summaries: Sequence[Dict], outbox: asyncio.Queue) -> None:
+        """Titles and contents of the given articles, several loading at once"""
+        remaining = iter(summaries)
+
+        async def work():
+            for summary in remaining:
+                with self._timed("fetch"):
+                    article = await self._in_thread(self.article_service.load_article, summary, clean=False)
+                await outbox.put(article)
+
+        await asyncio.gather(*(work() for _ in range(self.fetch_workers)))
+        await outbox.put(_END)
+
+    def _needs_update(self, article: Article) -> bool:
+        article_id = int(article.id)
+        if self._checkpoint:
+            if self._checkpoint.done.get(article_id) == article.updated_at:
+                return False
+        if article_id in self._redo:
+            return True
+        if self.store and article_id in self._versions and article_id not in self._stored:
+            # Indexed before the chunk store was; rewritten to move its text there
+            return True
+        return self._versions.get(article_id) != {article.updated_at}
+
+    def _kept_chunk_ids(self, article_id: int) -> Set[str]:
+        """The chunk ids of an article this sync leaves alone"""
+        if self._checkpoint and article_id in self._checkpoint.done_chunks:
+            return self._checkpoint.done_chunks[article_id]
+        # Anything else listed for it is left over from a sync that never published
+        return self._published.get(article_id) or self._manifest.get(article_id, set())
+
+    async def _clean(self, article: Article, outbox: asyncio.Queue) -> None:
+        self._seen.add(int(article.id))
+        self.stats.articles += 1
+        if not self._needs_update(article):
+            self._next[int(article.id)] = self._kept_chunk_ids(int(article.id))
+            self.stats.unchanged += 1
+            KB_INGEST_ARTICLES.labels("unchanged").inc()
+            return
+        await outbox.put(await self._in_cpu(_clean_article, article))
+
+    async def _chunk(self, article: Article, outbox: asyncio.Queue) -> None:
+        chunks = await self._in_cpu(_chunk_with_tokens, article, self.chunker)
+        pending = _PendingArticle(article, {chunk["id"] for chunk, _ in chunks}, len(chunks))
+        self.stats.chunks += len(chunks)
+        if not chunks:
+            # Nothing to embed, but whatever it had in the index goes
+            await self._finish(pending)
+            return
+        self._pending[int(article.id)] = pending
+        await outbox.put(chunks)
+
+    async def _batch(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        """Regroup chunks into embedding requests of up to embed_batch_tokens"""
+        batch: List[Dict] = []
+        tokens = 0
+        while True:
+            chunks = await inbox.get()
+            if chunks is _END:
+                break
+            for chunk, chunk_tokens in chunks:
+                if batch and (tokens + chunk_tokens > self.embed_batch_tokens or len(batch) >= MAX_EMBED_INPUTS):
+                    await outbox.put((batch, tokens))
+                    batch, tokens = [], 0
+                batch.append(chunk)
+                tokens += chunk_tokens
+        if batch:
+            await outbox.put((batch, tokens))
+        await outbox.put(_END)
+
+    async def _embed(self, item: Tuple[List[Dict], int], outbox: asyncio.Queue) -> None:
+        batch, tokens = item
+        await self._request_limit.acquire(1)
+        await self._token_limit.acquire(tokens)
+        vectors = await self._in_thread(self.embeddings.embed_documents, [chunk["text"] for chunk in batch])
+        to_upsert = [
+            {
+                "id": chunk["id"],
+                "values": vector,
+                "metadata": slim_metadata(chunk["metadata"]) if self.store else chunk["metadata"]
+            }
+            for chunk, vector in zip(batch, vectors)
+        ]
+        for i in range(0, len(to_upsert), self.upsert_batch_size):
+            await outbox.put((to_upsert[i:i + self.upsert_batch_size], batch[i:i + self.upsert_batch_size]))
+
+    async def _upsert(self, item: Tuple[List[Dict], List[Dict]], outbox: asyncio.Queue = None) -> None:
+        batch, chunks = item
+        article_ids = [int(vector["metadata"]["article_id"]) for vector in batch]
+        if self._checkpoint:
+            self._checkpoint.mark_dirty(set(article_ids))
+        if self.store:
+            # Before the vectors, so a search never finds one without its text
+            await self._in_thread(self.store.put_many, chunks)
+        await self._in_thread(self.index.upsert, vectors=batch)
+        for article_id in article_ids:
+            pending = self._pending[article_id]
+            pending.remaining -= 1
+            if not pending.remaining:
+                await self._finish(pending)
+
+    async def _finish(self, pending: _PendingArticle) -> None:
+        """All of an article's chunks are in; drop what the old version had that this one does not"""
+        article_id = int(pending.article.id)
+        self._pending.pop(article_id, None)
+        self._next[article_id] = pending.chunk_ids
+        if not self.generations:
+            # Searches see the index as it is written, so the old chunks go now rather than at the end
+            stale = self._manifest.get(article_id, set()) - pending.chunk_ids
+            if stale:
+                await self._delete(sorted(stale))
+            self._manifest[article_id] = set(pending.chunk_ids)
+        if self._checkpoint:
+            self._checkpoint.mark_done(article_id, pending.article.updated_at, pending.chunk_ids)
+        self.stats.updated += 1
+        KB_INGEST_ARTICLES.labels("updated").inc()
+
+async def _gather_or_cancel(*coroutines) -> None:
+    """Run the stages together; if one fails, cancel the rest so nothing waits on a queue forever"""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+def create_ingest_pipeline(article_service, embeddings, index) -> IngestPipeline:
+    """Build the pipeline from the KB_CHUNK_*, KB_EMBED_*, KB_UPSERT_*, KB_INGEST_* and KB_GENERATION* settings"""
+    load_dotenv()
+    checkpoint_path = os.getenv('KB_INGEST_CHECKPOINT', 'spool/kb_ingest.jsonl')
+    return IngestPipeline(
+        article_service, embeddings, index,
+        chunker=TokenChunker(
+            max_tokens=int(os.getenv('KB_CHUNK_MAX_TOKENS', DEFAULT_MAX_TOKENS)),
+            overlap_tokens=int(os.getenv('KB_CHUNK_OVERLAP_TOKENS', DEFAULT_OVERLAP_TOKENS))
+        ),
+        checkpoint=IngestCheckpoint(checkpoint_path) if checkpoint_path else None,
+        store=create_chunk_store(),
+        generations=create_generation_store(),
+        grace_seconds=float(os.getenv('KB_GENERATION_GRACE_SECONDS', '5')),
+        fetch_workers=int(os.getenv('KB_INGEST_FETCH_WORKERS', '2')),
+        embed_concurrency=int(os.getenv('KB_EMBED_CONCURRENCY', '4')),
+        upsert_concurrency=int(os.getenv('KB_UPSERT_CONCURRENCY', '4')),
+        embed_batch_tokens=int(os.getenv('KB_EMBED_BATCH_TOKENS', '8000')),
+        upsert_batch_size=int(os.getenv('KB_UPSERT_BATCH_SIZE', '100')),
+        queue_size=int(os.getenv('KB_INGEST_QUEUE_SIZE', '64')),
+        processes=int(os.getenv('KB_CHUNK_PROCESSES', '0')),
+        embed_requests_per_minute=float(os.getenv('KB_EMBED_REQUESTS_PER_MINUTE', '0')),
+        embed_tokens_per_minute=float(os.getenv('KB_EMBED_TOKENS_PER_MINUTE', '0')),
+        allow_estimated_tokens=os.getenv('KB_CHUNK_ALLOW_ESTIMATED_TOKENS', 'false').lower() == 'true',
+    )
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from typing import Callable, Dict, FrozenSet, List, Optional
+from dotenv import load_dotenv
+from .search_service import KnowledgeBaseSearchService
+from ..utils.concurrency import run_in_thread
+from ..utils.metrics import registry
+from ..utils.resilience import Deadline
+
+PREFETCH_OUTCOMES = registry.counter(
+    "kb_prefetch_total",
+    "Speculative knowledge base searches by outcome (hit, miss, unused, failed); hit rate is hit / (hit + miss)",
+    ["outcome"]
+)
+PREFETCH_SAVED = registry.histogram(
+    "kb_prefetch_saved_seconds",
+    "Search time saved per knowledge base question by a speculative search (0 when none matched)"
+)
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Words that say nothing about what the caller is asking
+_STOPWORDS = frozenset("""
+    an and are as at be but by can could do does for from have hello hi how if in is it its
+    just me my of on or please so that the there this to um uh was we what when where which why
+    will with would yeah yes you your hey okay ok know like want need trying get help question
+""".split())
+
+def query_terms(text: str) -> FrozenSet[str]:
+    """The words of text that carry meaning, cut to a 5 letter stem so 'resetting' matches 'reset'"""
+    return frozenset(word[:5] for word in _WORD.findall(text.lower()) if len(word) > 1 and word not in _STOPWORDS)
+
+class _Prefetch:
+    __slots__ = ("text", "terms", "task", "started_at", "finished_at", "used")
+
+    def __init__(self, text: str, terms: FrozenSet[str]):
+        self.text = text
+        self.terms = terms
+        self.task: Optional[asyncio.Task] = None
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        self.used = False
+
+class KnowledgeBasePrefetcher:
+    """
+    Search the knowledge base on what the caller said, before the model asks
+
+    The model only calls search_knowledge_base after the caller's turn is
+    transcribed and it has reasoned about it. Starting the same search as
+    soon as the transcript arrives overlaps embedding and the vector query
+    with that reasoning. One prefetcher lives for one call; its results are
+    used when the model's query shares enough meaningful words with what
+    the caller said.
+    """
+
+    def __init__(self, kb_service: Callable[[], KnowledgeBaseSearchService], min_overlap: float = None,
+                 min_terms: int = 2, max_pending: int = 3):
+        load_dotenv()
+        # First called in a worker thread, since creating the service may touch the network
+        self.kb_service = kb_service
+        # Share of the model query's terms that must appear in the transcript
+        self.min_overlap = min_overlap if min_overlap is not None else float(os.getenv('KB_PREFETCH_MIN_OVERLAP', '0.6'))
+        self.min_terms = min_terms
+        self.deadline_seconds = float(os.getenv('KB_PREFETCH_DEADLINE_SECONDS', '3'))
+        self._prefetches: "deque[_Prefetch]" = deque(maxlen=max_pending)
+
+    def start(self, transcript: str) -> bool:
+        """Start a background search on a caller transcript; False if it was too short to be a question"""
+        terms = query_terms(transcript)
+        if len(terms) < self.min_terms:
+            return False
+        if len(self._prefetches) == self._prefetches.maxlen:
+            self._discard(self._prefetches[0])
+        prefetch = _Prefetch(transcript, terms)
+        prefetch.task = asyncio.create_task(self._search(prefetch))
+        self._prefetches.append(prefetch)
+        return True
+
+    async def _search(self, prefetch: _Prefetch) -> Optional[List[Dict]]:
+        """The search results, or None if the search failed"""
+        deadline = Deadline.after(self.deadline_seconds)
+        try:
+            return await run_in_thread(lambda: self.kb_service().search(prefetch.text, top_k=3, deadline=deadline))
+        except Exception as e:
+            print(f"Speculative knowledge base search failed: {e!r}")
+            return None
+        finally:
+            prefetch.finished_at = time.perf_counter()
+
+    def _match(self, query: str) -> Optional[_Prefetch]:
+        """The most recent unused prefetch covering enough of the query's terms"""
+        terms = query_terms(query)
+        if not terms:
+            return None
+        for prefetch in reversed(self._prefetches):
+            if not prefetch.used and len(terms & prefetch.terms) / len(terms) >= self.min_overlap:
+                return prefetch
+        return None
+
+    async def answer(self, query: str, deadline: Optional[Deadline] = None) -> Optional[str]:
+        """
+        The tool answer for query from a matching prefetch, or None to search afresh
+
+        Waits for a prefetch still in flight, up to the deadline. Empty or
+        failed prefetches return None, since the model's own wording may
+        still find something.
+        """
+        asked_at = time.perf_counter()
+        prefetch = self._match(query)
+        if prefetch is None:
+            PREFETCH_OUTCOMES.labels("miss").inc()
+            PREFETCH_SAVED.observe(0.0)
+            return None
+        prefetch.used = True
+        try:
+            timeout = deadline.remaining() if deadline else None
+            chunks = await asyncio.wait_for(asyncio.shield(prefetch.task), timeout)
+        except asyncio.TimeoutError:
+            chunks = None
+        if chunks is None:
+            PREFETCH_OUTCOMES.labels("failed").inc()
+            PREFETCH_SAVED.observe(0.0)
+            return None
+        if not chunks:
+            PREFETCH_OUTCOMES.labels("miss").inc()
+            PREFETCH_SAVED.observe(0.0)
+            return None
+        # A fresh search would have taken as long as the prefetch did, starting now
+        duration = prefetch.finished_at - prefetch.started_at
+        saved = duration - max(0.0, prefetch.finished_at - asked_at)
+        PREFETCH_OUTCOMES.labels("hit").inc()
+        PREFETCH_SAVED.observe(saved)
+        print(f"Knowledge base prefetch hit, saved {saved * 1000:.0f}ms")
+        return self.kb_service().answer_from_chunks(query, chunks)
+
+    def _discard(self, prefetch: _Prefetch) -> None:
+        if not prefetch.used:
+            PREFETCH_OUTCOMES.labels("unused").inc()
+            # The search itself runs on in its thread; this only drops the result
+            prefetch.task.cancel()
+
+    def close(self) -> None:
+        """Drop the call's prefetches, counting those never used"""
+        for prefetch in self._prefetches:
+            self._discard(prefetch)
+        self._prefetches.clear()
@@ -0,0 +1,132 @@
+"""
+Continuous incremental sync of the knowledge base.
+
+Each poll lists article summaries only (a request per hundred articles,
+no titles or bodies) and picks out the published articles updated since
+the high-water mark, plus any published article it has not synced
+before. Just those are loaded, chunked, embedded and upserted;
+unpublished and deleted articles are removed from the index. Polls come
+quickly while articles are changing and back off while nothing is, with
+jitter so several deployments do not poll Kayako in step.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from dotenv import load_dotenv
+from .kb_ingest import IngestPipeline
+from ..utils.concurrency import run_in_thread
+from ..utils.metrics import registry
+
+KB_SYNC_ARTICLE_LAG = registry.histogram(
+    "kb_sync_article_lag_seconds", "Time from an article change in Kayako to the change being searchable",
+    buckets=(5, 15, 30, 60, 120, 300, 600, 1800, 3600, 4 * 3600)
+)
+KB_SYNC_LAST_SUCCESS = registry.gauge(
+    "kb_sync_last_success_timestamp_seconds", "When the knowledge base sync last finished a poll without error"
+)
+KB_SYNC_POLLS = registry.counter(
+    "kb_sync_polls_total", "Knowledge base sync polls, by outcome (idle, changed, failed)", ["outcome"]
+)
+KB_SYNC_INTERVAL = registry.gauge(
+    "kb_sync_interval_seconds", "Current wait between knowledge base sync polls, before jitter"
+)
+
+def _timestamp(updated_at: str) -> float:
+    """Seconds since the epoch of a Kayako timestamp such as 2024-01-01T10:00:00+00:00"""
+    return datetime.fromisoformat(updated_at.replace("Z", "+00:00")).timestamp()
+
+class KnowledgeBaseSync:
+    """
+    Polls Kayako and keeps the index in step with it
+
+    State (the high-water mark and the ids of synced articles) is kept in a
+    JSON file and only saved after a poll's changes are in the index, so a
+    crash means the next poll redoes them. Without state the first poll is
+    a full sync.
+    """
+
+    def __init__(self, article_service, pipeline: IngestPipeline, state_path: str,
+                 min_interval: float = 30.0, max_interval: float = 600.0, backoff: float = 1.5,
+                 jitter: float = 0.2):
+        self.article_service = article_service
+        self.pipeline = pipeline
+        self.state_path = Path(state_path)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.high_water: Optional[str] = None
+        # Published articles the index reflects, chunks or not
+        self.known: Set[int] = set()
+        if self.state_path.exists():
+            state = json.loads(self.state_path.read_text())
+            self.high_water = state.get("high_water")
+            self.known = set(state.get("articles", []))
+
+    def _save_state(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.state_path.with_suffix(".tmp")
+        temporary.write_text(json.dumps({"high_water": self.high_water, "articles": sorted(self.known)}))
+        os.replace(temporary, self.state_path)
+
+    async def poll(self) -> bool:
+        """Sync what changed since the last poll; returns whether anything did"""
+        summaries: List[Dict] = await run_in_thread(self.article_service.get_all_article_summaries)
+        published = {int(s['id']): s for s in summaries if s.get('status') == "PUBLISHED"}
+        latest = max((s['updated_at'] for s in summaries), key=_timestamp, default=self.high_water)
+
+        if self.high_water is None:
+            print("No knowledge base sync state, running a full sync...")
+            stats = await self.pipeline.run()
+            print(f"Full sync: {stats.updated} articles updated, {stats.deleted} deleted in {stats.seconds:.1f}s")
+            changed = True
+        else:
+            mark = _timestamp(self.high_water)
+            updated = [s for i, s in published.items() if i not in self.known or _timestamp(s['updated_at']) > mark]
+            removed = self.known - set(published)
+            changed = bool(updated or removed)
+            if changed:
+                stats = await self.pipeline.sync_articles(updated, removed)
+                now = time.time()
+                for summary in updated:
+                    KB_SYNC_ARTICLE_LAG.observe(max(0.0, now - _timestamp(summary['updated_at'])))
+                print(f"Synced {stats.updated} changed and {stats.deleted} removed articles "
+                      f"in {stats.seconds:.1f}s")
+
+        self.known = set(published)
+        if latest is not None and (self.high_water is None or _timestamp(latest) > _timestamp(self.high_water)):
+            self.high_water = latest
+        self._save_state()
+        KB_SYNC_LAST_SUCCESS.set(time.time())
+        return changed
+
+    async def run_forever(self) -> None:
+        """Poll until cancelled, sooner after changes and later while idle or failing"""
+        interval = self.min_interval
+        while True:
+            try:
+                changed = await self.poll()
+                KB_SYNC_POLLS.labels("changed" if changed else "idle").inc()
+                interval = self.min_interval if changed else min(self.max_interval, interval * self.backoff)
+            except Exception as e:
+                print(f"Knowledge base sync failed: {e!r}")
+                KB_SYNC_POLLS.labels("failed").inc()
+                interval = min(self.max_interval, interval * 2)
+            KB_SYNC_INTERVAL.set(interval)
+            await asyncio.sleep(interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+def create_kb_sync(article_service, pipeline: IngestPipeline) -> KnowledgeBaseSync:
+    """Build the sync from the KB_SYNC_* settings"""
+    load_dotenv()
+    return KnowledgeBaseSync(
+        article_service, pipeline,
+        state_path=os.getenv('KB_SYNC_STATE', 'spool/kb_sync.json'),
+        min_interval=float(os.getenv('KB_SYNC_MIN_INTERVAL_SECONDS', '30')),
+        max_interval=float(os.getenv('KB_SYNC_MAX_INTERVAL_SECONDS', '600')),
+        jitter=float(os.getenv('KB_SYNC_JITTER', '0.2')),
+    )
@@ -0,0 +1,122 @@
+import json
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from ..utils.metrics import registry
+
+EVENTS = registry.counter(
+    "realtime_events_total", "OpenAI Realtime events received, by type", ["type"]
+)
+EVENT_HANDLING = registry.histogram(
+    "realtime_event_handling_seconds", "Time spent dispatching an OpenAI Realtime event, by type", ["type"],
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1, 0.5)
+)
+
+AUDIO_DELTA = "response.audio.delta"
+
+EventHandler = Callable[[dict], Awaitable[None]]
+AudioDeltaHandler = Callable[[str, Optional[str]], Awaitable[None]]
+
+def peek_event_type(message: str) -> Optional[str]:
+    """
+    Read the top-level "type" of a realtime event without parsing the JSON
+
+    The API puts "type" first, so this normally only looks at the first few
+    dozen characters. Returns None when the cheap scan is not conclusive.
+    """
+    key = message.find('"type"')
+    # A brace before the key means it may belong to a nested object
+    if key < 0 or message.find('{', 1, key) != -1:
+        return None
+    start = message.find('"', message.find(':', key) + 1)
+    end = message.find('"', start + 1)
+    if start < 0 or end < 0:
+        return None
+    return message[start + 1:end]
+
+def _string_field(message: str, key: str) -> Optional[str]:
+    """Extract a plain string field from compact JSON, or None if it is not simply present"""
+    marker = f'"{key}":"'
+    start = message.find(marker)
+    if start < 0:
+        return None
+    start += len(marker)
+    end = message.find('"', start)
+    if end < 0:
+        return None
+    value = message[start:end]
+    # Escapes need a real JSON parse
+    return None if '\\' in value else value
+
+class RealtimeEventRouter:
+    """
+    Dispatches OpenAI Realtime events to handlers registered per event type.
+
+    The event type is read with a cheap string scan, so events nobody handles
+    are never JSON-decoded. Audio deltas, the bulk of the traffic, take a fast
+    path that hands the base64 payload straight to the audio handler. Every
+    event is counted and timed by type.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[EventHandler]] = {}
+        self._audio_handler: Optional[AudioDeltaHandler] = None
+        self._metrics: Dict[str, tuple] = {}
+
+    def on(self, event_type: str) -> Callable[[EventHandler], EventHandler]:
+        """Decorator registering a handler that receives the decoded event"""
+        def register(handler: EventHandler) -> EventHandler:
+            self.add_handler(event_type, handler)
+            return handler
+        return register
+
+    def add_handler(self, event_type: str, handler: EventHandler) -> None:
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    def on_audio_delta(self, handler: AudioDeltaHandler) -> AudioDeltaHandler:
+        """Decorator registering the fast-path handler, called with (delta, item_id)"""
+        self._audio_handler = handler
+        return handler
+
+    async def dispatch(self, message: str) -> None:
+        """Route one raw event from the realtime socket"""
+        started = time.perf_counter()
+        event_type = peek_event_type(message)
+        event = None
+        try:
+            if event_type is None:
+                # Counted as invalid if it does not parse, so one bad frame cannot end the read loop
+                event_type = 'invalid'
+                event = json.loads(message)
+                event_type = event.get('type', 'unknown')
+
+            if event_type == AUDIO_DELTA and self._audio_handler:
+                delta = _string_field(message, 'delta')
+                if delta is None:
+                    event = event or json.loads(message)
+                    delta = event.get('delta')
+                    item_id = event.get('item_id')
+                else:
+                    item_id = _string_field(message, 'item_id')
+                if delta:
+                    await self._audio_handler(delta, item_id)
+            else:
+                handlers = self._handlers.get(event_type)
+                if handlers:
+                    event = event or json.loads(message)
+                    for handler in handlers:
+                        await handler(event)
+        except Exception as e:
+            print(f"Error handling realtime event {event_type}: {e}")
+            import traceback
+            print(traceback.format_exc())
+        finally:
+            counter, histogram = self._metrics_for(event_type)
+            counter.inc()
+            histogram.observe(time.perf_counter() - started)
+
+    def _metrics_for(self, event_type: str) -> tuple:
+        metrics = self._metrics.get(event_type)
+        if metrics is None:
+            metrics = (EVENTS.labels(event_type), EVENT_HANDLING.labels(event_type))
+            self._metrics[event_type] = metrics
+        return metrics
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+import websockets
+from ..utils.metrics import registry
+
+POOL_IDLE = registry.gauge(
+    "realtime_pool_idle_sessions", "Pre-warmed realtime sessions waiting to be claimed"
+)
+POOL_CLAIMS = registry.counter(
+    "realtime_pool_claims_total", "Realtime sessions claimed by calls", ["warm"]
+)
+SESSION_SETUP = registry.histogram(
+    "realtime_session_setup_seconds", "Connect plus session.update round trip for a realtime session"
+)
+
+class PooledSession:
+    def __init__(self, ws, created_at: float):
+        self.ws = ws
+        self.created_at = created_at
+
+class RealtimeSessionPool:
+    """
+    Small pool of pre-connected, pre-configured OpenAI Realtime sessions.
+
+    Each pooled session has already completed the TLS/WebSocket handshake and
+    the session.update round trip, so a call only has to ask for its greeting.
+    A background task keeps the pool topped up and recycles sessions that have
+    been idle for longer than `max_idle` seconds. With size=0 the pool simply
+    opens a fresh session on every claim.
+    """
+
+    def __init__(self,
+                 url: str,
+                 headers: Dict[str, str],
+                 session_config: Dict[str, Any],
+                 size: int = 2,
+                 max_idle: float = 300.0,
+                 ready_timeout: float = 10.0,
+                 check_interval: float = 5.0):
+        self.url = url
+        self.headers = headers
+        self.session_config = session_config
+        self.size = size
+        self.max_idle = max_idle
+        self.ready_timeout = ready_timeout
+        self.check_interval = check_interval
+        self._idle = deque()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # Closes of stale sessions found by acquire(), held so they are not collected mid-close
+        self._closing: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """Start the background task that keeps the pool filled"""
+        if self.size > 0 and self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._maintain())
+
+    async def stop(self) -> None:
+        """Stop replenishing and close every idle session"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._idle:
+            await self._close(self._idle.popleft().ws)
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+        POOL_IDLE.set(0)
+
+    def prime(self) -> None:
+        """Wake the replenisher, e.g. when a call is about to connect"""
+        if self._wake:
+            self._wake.set()
+
+    async def acquire(self) -> Tuple[Any, bool]:
+        """
+        Claim a session for a call
+
+        Returns the websocket and whether it came warm from the pool.
+        """
+        while self._idle:
+            session = self._idle.popleft()
+            POOL_IDLE.set(len(self._idle))
+            if self._is_usable(session):
+                self.prime()
+                POOL_CLAIMS.labels("true").inc()
+                return session.ws, True
+            # Closed in the background so the call does not wait for the close handshake
+            task = asyncio.create_task(self._close(session.ws))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+        self.prime()
+        ws = await self._open_session()
+        POOL_CLAIMS.labels("false").inc()
+        return ws, False
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[Tuple[Any, bool]]:
+        """Claim a session for the duration of a call and close it afterwards"""
+        ws, warm = await self.acquire()
+        try:
+            yield ws, warm
+        finally:
+            await self._close(ws)
+
+    async def _open_session(self):
+        """Connect and configure a new realtime session"""
+        started = time.perf_counter()
+        ws = await websockets.connect(self.url, extra_headers=self.headers)
+        try:
+            await ws.send(json.dumps(self.session_config))
+            await asyncio.wait_for(self._wait_for_session_updated(ws), self.ready_timeout)
+        except BaseException:
+            await self._close(ws)
+            raise
+        SESSION_SETUP.observe(time.perf_counter() - started)
+        return ws
+
+    @staticmethod
+    async def _wait_for_session_updated(ws) -> None:
+        async for message in ws:
+            event = json.loads(message)
+            if event.get('type') == 'session.updated':
+                return
+            if event.get('type') == 'error':
+                raise Exception(f"Realtime session setup failed: {event.get('error')}")
+        raise Exception("Realtime connection closed during session setup")
+
+    def _is_usable(self, session: PooledSession) -> bool:
+        return session.ws.open and time.monotonic() - session.created_at < self.max_idle
+
+    async def _maintain(self) -> None:
+        failures = 0
+        while True:
+            # Recycle sessions that were closed by the server or sat idle too long
+            for session in list(self._idle):
+                if not self._is_usable(session):
+                    self._idle.remove(session)
+                    await self._close(session.ws)
+
+            missing = self.size - len(self._idle)
+            if missing > 0:
+                results = await asyncio.gather(
+                    *(self._open_session() for _ in range(missing)),
+                    return_exceptions=True
+                )
+                for result in results:
+                    if isinstance(result, BaseException):
+                        print(f"Error pre-warming realtime session: {result}")
+                        failures += 1
+                    else:
+                        self._idle.append(PooledSession(result, time.monotonic()))
+                        failures = 0
+            POOL_IDLE.set(len(self._idle))
+
+            # Back off while the realtime endpoint is failing, otherwise wait for a claim or the next check
+            timeout = min(self.check_interval * (2 ** failures), 60.0) if failures else self.check_interval
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    async def _close(ws) -> None:
+        try:
+            await ws.close()
+        except Exception:
+            pass
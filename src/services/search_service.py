@@ -1,53 +1,292 @@
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, FrozenSet, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import threading
+import time
 from pinecone import Pinecone
 from langchain_openai import OpenAIEmbeddings
 import os
 from dotenv import load_dotenv
 from openai import OpenAI
+from .chunk_store import create_chunk_store
+from .context_compressor import CONTEXT_TOKENS, CONTEXT_TOKENS_SAVED, ContextCompressor
+from .kb_generations import create_generation_store
+from ..utils.metrics import registry
+from ..utils.resilience import Deadline, DeadlineExceeded, FallbackCache, dependency
+from ..utils.tracing import tracer
+
+KB_STAGE_DURATION = registry.histogram(
+    "kb_search_stage_seconds", "Knowledge base lookup time by stage (embed, vector_query, chunk_store, format)", ["stage"]
+)
+
+VECTOR_QUERY_DURATION = registry.histogram(
+    "kb_vector_query_request_seconds", "Time per Pinecone query request, hedges included; sets the hedge delay"
+)
+HEDGED_QUERIES = registry.counter(
+    "kb_hedged_queries_total", "Vector queries that sent a hedge, by which request answered first", ["winner"]
+)
+KB_GENERATION = registry.gauge(
+    "kb_search_generation", "Knowledge base generation this worker's searches are served from"
+)
+KB_GENERATION_SWAP_DURATION = registry.histogram(
+    "kb_generation_swap_seconds", "Time to load a newly published knowledge base generation"
+)
+KB_FALLBACK_ANSWERS = registry.counter(
+    "kb_fallback_answers_total", "Tool answers served without a fresh search, by source (cached, keyword, unavailable)",
+    ["source"]
+)
+
+# Told to the model when the knowledge base cannot be reached and nothing is cached
+KB_UNAVAILABLE = "The knowledge base is temporarily unavailable, so no information could be found."
+# Put in front of keyword matches, which are rougher than a search's results
+KB_KEYWORD_MATCHES = "The knowledge base search is temporarily unavailable; these articles share words with the question:\n\n"
+
+# Runs the vector queries, so a slow one can be hedged with a second one
+_query_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="kb-query")
+
+def create_embeddings(request_timeout: Optional[float] = None, max_retries: int = 2) -> OpenAIEmbeddings:
+    """
+    OpenAI embeddings client
+
+    EMBEDDINGS_BASE_URL points it at another OpenAI-compatible server, such as
+    the local fake. Those take plain text, so tiktoken's client-side
+    tokenizing is skipped for them.
+    """
+    options = {"request_timeout": request_timeout, "max_retries": max_retries}
+    base_url = os.getenv('EMBEDDINGS_BASE_URL')
+    if base_url:
+        return OpenAIEmbeddings(base_url=base_url, check_embedding_ctx_length=False, **options)
+    return OpenAIEmbeddings(**options)
+
+def open_index(pc: Pinecone):
+    """
+    Connect to the knowledge base index
+
+    With PINECONE_INDEX_HOST set the index is addressed directly, which also
+    skips the describe_index round trip a lookup by name costs.
+    """
+    host = os.getenv('PINECONE_INDEX_HOST')
+    if host:
+        return pc.Index(host=host)
+    return pc.Index(os.getenv('PINECONE_INDEX_NAME'))
 
 class KnowledgeBaseSearchService:
+    # A query slower than this quantile of recent ones gets a duplicate sent
+    HEDGE_QUANTILE = 0.95
+    # Requests observed before the quantile is trusted enough to hedge on
+    HEDGE_MIN_SAMPLES = 20
+    # How many more matches to ask for when unpublished chunks leave a search short
+    REQUERY_FACTOR = 4
+
     def __init__(self):
         load_dotenv()
-        self.embeddings = OpenAIEmbeddings()
+        self.embeddings_dependency = dependency("embeddings")
+        self.pinecone_dependency = dependency("pinecone")
+        # Retries are left to the dependencies, which share one retry budget
+        self.embeddings = create_embeddings(self.embeddings_dependency.timeout, max_retries=0)
         self.pc = Pinecone(api_key=os.getenv('PINECONE_API_KEY'))
-        self.index = self.pc.Index(os.getenv('PINECONE_INDEX_NAME'))
+        self.index = open_index(self.pc)
         self.client = OpenAI()
+        # Last good answers by normalized query, served while a dependency is down
+        self.answer_cache = FallbackCache()
+        # Trims what the realtime model reads; its latency and cost grow with every token
+        self.compressor = ContextCompressor() if os.getenv('KB_COMPRESS_CONTEXT', 'true').lower() == 'true' else None
+        # Chunk text by vector id; the index only keeps slim metadata when there is one
+        self.chunk_store = create_chunk_store()
+        # Chunk ids of the published generation; matches outside it are written by a sync
+        # still under way, or kept for searches that began before its swap
+        self.generations = create_generation_store()
+        self.live_chunk_ids: Optional[FrozenSet[str]] = None
+        self._generation_version = None
+        self._generation_lock = threading.Lock()
+        # Matches asked for per result while a generation filters them
+        self.overfetch = max(1, int(os.getenv('KB_GENERATION_OVERFETCH', '2')))
+        # How long a sync keeps the chunks of the generation it replaced
+        self.generation_grace = float(os.getenv('KB_GENERATION_GRACE_SECONDS', '5'))
+        if self.generations is not None:
+            # Loaded before the first search; later generations see _refresh_generation
+            self._generation_lock.acquire()
+            self._load_generation(self.generations.version())
     
-    def search(self, query: str, top_k: int = 3) -> List[Dict]:
+    def search(self, query: str, top_k: int = 3, deadline: Optional[Deadline] = None) -> List[Dict]:
         """
         Search the knowledge base for content similar to the query
         
         Args:
             query (str): The search query
             top_k (int): Number of results to return
+            deadline (Deadline, optional): When the caller needs an answer by;
+                raises DeadlineExceeded if it passes first
             
         Returns:
             List of dictionaries containing matched content and metadata
         """
-        # Generate embedding for the query
-        query_embedding = self.embeddings.embed_query(query)
-        
-        # Search Pinecone
-        results = self.index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True
-        )
-        
-        # Format results
-        formatted_results = []
-        for match in results.matches:
-            formatted_results.append({
-                'score': match.score,
-                'article_id': int(match.metadata['article_id']),
-                'title': match.metadata['title'],
-                'url': match.metadata['url'],
-                'chunk_index': int(match.metadata['chunk_index']),
-                'content': match.metadata.get('content', 'No content available')
-            })
+        self._refresh_generation()
+        # The generation this search started with, even if another is swapped in meanwhile
+        live = self.live_chunk_ids
+        with tracer.span("kb.search", top_k=top_k) as span:
+            # Generate embedding for the query
+            with tracer.span("kb.embed"), KB_STAGE_DURATION.labels("embed").time():
+                query_embedding = self.embeddings_dependency.call(self._embed_query, query, deadline, deadline=deadline)
+            
+            # Search Pinecone
+            query_top_k = top_k * self.overfetch if live is not None else top_k
+            with tracer.span("kb.vector_query") as query_span, KB_STAGE_DURATION.labels("vector_query").time():
+                results = self.pinecone_dependency.call(
+                    self._hedged_vector_query, query_embedding, query_top_k, deadline, query_span, deadline=deadline
+                )
+                matches = results.matches
+                if live is not None:
+                    matches = [match for match in results.matches if match.id in live]
+                    if len(matches) < top_k and len(results.matches) == query_top_k:
+                        # A sync is writing chunks it has not published, and they crowd out
+                        # the published ones; ask once more, for more of them
+                        query_span.set_attribute("requeried", True)
+                        query_top_k *= self.REQUERY_FACTOR
+                        results = self.pinecone_dependency.call(
+                            self._hedged_vector_query, query_embedding, query_top_k, deadline, query_span,
+                            deadline=deadline
+                        )
+                        matches = [match for match in results.matches if match.id in live]
+                    matches = matches[:top_k]
+            
+            stored = {}
+            if self.chunk_store is not None:
+                with tracer.span("kb.chunk_store"), KB_STAGE_DURATION.labels("chunk_store").time():
+                    stored = self.chunk_store.get_many([match.id for match in matches])
+            
+            # Format results; vectors written before the chunk store still carry their text
+            formatted_results = []
+            for match in matches:
+                text = stored.get(match.id) or match.metadata
+                formatted_results.append({
+                    'score': match.score,
+                    'article_id': int(match.metadata['article_id']),
+                    'title': text.get('title'),
+                    'url': text.get('url'),
+                    'chunk_index': int(match.metadata['chunk_index']),
+                    'content': text.get('content', 'No content available')
+                })
+            span.set_attribute("matches", len(formatted_results))
         
         return formatted_results
     
+    def _refresh_generation(self) -> None:
+        """
+        Swap to a newly published generation
+
+        One published moments ago loads in the background while searches
+        keep using the current one, whose chunks stay for the sync's grace
+        period. A worker that sees the publish late (it was idle) would be
+        filtering to chunks that are about to go, or already have, so once
+        the pointer is older than half the grace period the search waits
+        for the load instead.
+        """
+        if self.generations is None:
+            return
+        version = self.generations.version()
+        if version == self._generation_version:
+            return
+        # version is the pointer's (inode, mtime_ns, size)
+        published_ago = time.time() - version[1] / 1e9 if version is not None else 0.0
+        if published_ago < self.generation_grace / 2:
+            if self._generation_lock.acquire(blocking=False):
+                threading.Thread(target=self._load_generation, args=(version,), name="kb-generation",
+                                 daemon=True).start()
+            return
+        self._generation_lock.acquire()
+        if self._generation_version == version:
+            # A background load finished it while this search waited
+            self._generation_lock.release()
+        else:
+            self._load_generation(version)
+
+    def _load_generation(self, version) -> None:
+        """
+        Swap to the published generation; called holding _generation_lock, which it releases
+
+        The new id set is built before it replaces the old, which is freed as
+        soon as the searches still using it finish, so memory only holds
+        both for the swap.
+        """
+        try:
+            started = time.perf_counter()
+            loaded = self.generations.live_chunk_ids()
+            if loaded is None:
+                self.live_chunk_ids = None
+            else:
+                number, self.live_chunk_ids = loaded
+                KB_GENERATION.set(number)
+                KB_GENERATION_SWAP_DURATION.observe(time.perf_counter() - started)
+            self._generation_version = version
+        except (OSError, ValueError, KeyError) as e:
+            # Keep serving the current generation and try again on the next search
+            print(f"Could not load the published knowledge base generation: {e!r}")
+        finally:
+            self._generation_lock.release()
+
+    def _embed_query(self, query: str, deadline: Optional[Deadline]) -> List[float]:
+        """Embed one query with a per-request timeout, which embed_query cannot take"""
+        options = {"dimensions": self.embeddings.dimensions} if self.embeddings.dimensions else {}
+        response = self.embeddings.client.create(
+            input=[query],
+            model=self.embeddings.model,
+            timeout=self.embeddings_dependency.timeout_for(deadline),
+            **options
+        )
+        return response.data[0].embedding
+
+    def _vector_query(self, vector: List[float], top_k: int, deadline: Optional[Deadline]):
+        started = time.perf_counter()
+        try:
+            return self.index.query(
+                vector=vector,
+                top_k=top_k,
+                include_metadata=True,
+                _request_timeout=self.pinecone_dependency.timeout_for(deadline)
+            )
+        finally:
+            VECTOR_QUERY_DURATION.observe(time.perf_counter() - started)
+
+    def _hedge_after(self) -> Optional[float]:
+        """How long to wait for a query before hedging it, or None to not hedge"""
+        durations = VECTOR_QUERY_DURATION.labels()
+        if durations.count < self.HEDGE_MIN_SAMPLES:
+            return None
+        return durations.quantile(self.HEDGE_QUANTILE)
+
+    def _hedged_vector_query(self, vector: List[float], top_k: int, deadline: Optional[Deadline], span):
+        """
+        Query Pinecone, sending a duplicate if the first is slower than usual
+
+        Tail latency mostly comes from the odd slow request rather than a
+        slow index, so a second request sent at the p95 usually answers
+        first. The slower request is left to finish in the background.
+        """
+        hedge_after = self._hedge_after()
+        primary = _query_pool.submit(self._vector_query, vector, top_k, deadline)
+        pending = {primary}
+        hedge = None
+        error = None
+        while pending:
+            timeout = deadline.remaining() if deadline else None
+            if hedge is None and hedge_after is not None:
+                timeout = hedge_after if timeout is None else min(timeout, hedge_after)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if hedge is not None:
+                        HEDGED_QUERIES.labels("hedge" if future is hedge else "primary").inc()
+                        span.set_attribute("hedge_won", future is hedge)
+                    return future.result()
+                error = future.exception()
+            if deadline and deadline.expired:
+                raise DeadlineExceeded("Deadline passed during the vector query")
+            if not done and hedge is None:
+                hedge = _query_pool.submit(self._vector_query, vector, top_k, deadline)
+                pending.add(hedge)
+                span.set_attribute("hedged_after_ms", round(hedge_after * 1000))
+        raise error
+
     def get_answer(self, query: str, top_k: int = 3) -> Tuple[str, List[Dict]]:
         """
         Search the knowledge base and generate an answer based on the results
@@ -107,13 +346,15 @@ class KnowledgeBaseSearchService:
         
         return answer, chunks 
 
-    def get_kb_answer(self, query: str) -> str:
+    def get_kb_answer(self, query: str, deadline: Optional[Deadline] = None) -> str:
         """
         Function specifically formatted for use as a tool call.
         Returns the relevant content found in the knowledge base.
         
         Args:
             query (str): The user's question
+            deadline (Deadline, optional): When the caller needs an answer by;
+                once it passes, the best answer already available is returned
             
         Returns:
             str: The relevant content found
@@ -122,15 +363,38 @@ class KnowledgeBaseSearchService:
         
         # Get embeddings and search
         #print("Getting vector embeddings...")
-        chunks = self.search(query, top_k=3)
+        try:
+            chunks = self.search(query, top_k=3, deadline=deadline)
+        except Exception as e:
+            # Out of time, failed after retries or the breaker is open
+            print(f"Knowledge base search failed: {e!r}")
+            return self._fallback_answer(query)
         
         if not chunks:
             print("No relevant chunks found")
             return "No relevant information found."
         
         #print(f"Found {len(chunks)} relevant chunks")
-        
+        return self.answer_from_chunks(query, chunks)
+
+    def answer_from_chunks(self, query: str, chunks: List[Dict]) -> str:
+        """Format search results as the tool's answer to query, and remember it for fallbacks"""
         # Format the content with sources
+        with tracer.span("kb.format"), KB_STAGE_DURATION.labels("format").time():
+            final_content = self._format_chunks(chunks)
+            if self.compressor is not None:
+                raw_tokens = self.compressor.counter.count(final_content)
+                final_content = self.compressor.compress(chunks)
+                compressed_tokens = self.compressor.counter.count(final_content)
+                CONTEXT_TOKENS.labels("raw").observe(raw_tokens)
+                CONTEXT_TOKENS.labels("compressed").observe(compressed_tokens)
+                CONTEXT_TOKENS_SAVED.inc(max(0, raw_tokens - compressed_tokens))
+        #print("Finished processing knowledge base response")
+        self.answer_cache.put(self._cache_key(query), final_content)
+        return final_content
+
+    @staticmethod
+    def _format_chunks(chunks: List[Dict]) -> str:
         content = []
         for i, chunk in enumerate(chunks, 1):
             #print(f"Processing chunk {i} from article '{chunk['title']}'")
@@ -139,7 +403,36 @@ class KnowledgeBaseSearchService:
                 f"{chunk['content']}\n"
                 f"Source: {chunk['url']}"
             )
-        
-        final_content = "\n\n".join(content)
-        #print("Finished processing knowledge base response")
-        return final_content 
\ No newline at end of file
+        return "\n\n".join(content)
+
+    @staticmethod
+    def _cache_key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def _fallback_answer(self, query: str) -> str:
+        """
+        The last answer to the same question, or else chunks sharing its words
+
+        The keyword search runs on the local chunk store, so it works while
+        the embeddings and Pinecone do not; it is not cached, so the next
+        search that succeeds replaces it.
+        """
+        cached = self.answer_cache.get(self._cache_key(query))
+        if cached is not None:
+            KB_FALLBACK_ANSWERS.labels("cached").inc()
+            return cached
+        chunks = []
+        if self.chunk_store is not None:
+            try:
+                chunks = self.chunk_store.search(query, limit=3, live=self.live_chunk_ids)
+            except Exception as e:
+                print(f"Keyword search of the chunk store failed: {e!r}")
+        if not chunks:
+            KB_FALLBACK_ANSWERS.labels("unavailable").inc()
+            return KB_UNAVAILABLE
+        KB_FALLBACK_ANSWERS.labels("keyword").inc()
+        answer = self._format_chunks(chunks)
+        if self.compressor is not None:
+            # Keyword scores do not compare with the compressor's threshold, so only trim to its budget
+            answer = self.compressor.counter.truncate(answer, self.compressor.token_budget)
+        return KB_KEYWORD_MATCHES + answer
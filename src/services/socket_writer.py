@@ -0,0 +1,178 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Awaitable, Callable, Iterable, Optional
+from ..utils.metrics import registry
+
+QUEUE_DEPTH = registry.gauge(
+    "relay_queue_depth", "Messages waiting in a relay send queue", ["direction"]
+)
+QUEUE_WAIT = registry.histogram(
+    "relay_queue_wait_seconds", "Time a message spent queued before being sent", ["direction"]
+)
+SEND_LATENCY = registry.histogram(
+    "relay_send_latency_seconds", "Time spent inside the socket send call", ["direction"]
+)
+DROPPED = registry.counter(
+    "relay_dropped_messages_total", "Messages dropped instead of sent", ["direction", "reason"]
+)
+
+class QueuedSocketWriter:
+    """
+    Bounded send queue with a dedicated writer task for one websocket.
+
+    Producers call send()/send_json() and return as soon as the message is
+    queued, so a slow peer only stalls the writer task for its own direction.
+    When the queue is full, messages whose kind is listed in `droppable` push
+    out the oldest droppable message; anything else waits for room.
+    """
+
+    def __init__(self,
+                 direction: str,
+                 send: Callable[[str], Awaitable[None]],
+                 maxsize: int = 500,
+                 droppable: Iterable[str] = ()):
+        self.direction = direction
+        self._send = send
+        self.maxsize = maxsize
+        self.droppable = frozenset(droppable)
+        self._queue = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._task: Optional[asyncio.Task] = None
+        self.closed = False
+
+        # Per-writer stats, summarised when the call ends
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.max_send_latency = 0.0
+        self._reported_depth = 0
+
+        self._depth_metric = QUEUE_DEPTH.labels(direction)
+        self._wait_metric = QUEUE_WAIT.labels(direction)
+        self._latency_metric = SEND_LATENCY.labels(direction)
+
+    def start(self) -> None:
+        """Start the writer task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    async def send(self, message: str, kind: str = "control") -> None:
+        """Queue a text message for sending"""
+        if self.closed:
+            self._record_drop("closed")
+            return
+
+        while len(self._queue) >= self.maxsize:
+            if kind in self.droppable and self._drop_oldest_droppable():
+                break
+            self._not_full.clear()
+            await self._not_full.wait()
+            if self.closed:
+                self._record_drop("closed")
+                return
+
+        self._queue.append((kind, message, time.perf_counter()))
+        self._update_depth()
+        self._not_empty.set()
+
+    async def send_json(self, data: dict) -> None:
+        """Queue a JSON message, using its Twilio event name as the message kind"""
+        await self.send(json.dumps(data), kind=data.get("event", "control"))
+
+    def flush(self, kinds: Iterable[str]) -> int:
+        """
+        Drop queued messages of the given kinds that have not been sent yet,
+        e.g. stale outbound audio after the caller interrupts
+
+        Returns the number of dropped messages.
+        """
+        kinds = frozenset(kinds)
+        kept = [item for item in self._queue if item[0] not in kinds]
+        flushed = len(self._queue) - len(kept)
+        if flushed:
+            self._queue = deque(kept)
+            self._record_drop("flush", flushed)
+            self._update_depth()
+            self._not_full.set()
+        return flushed
+
+    async def close(self, drain_timeout: float = 2.0) -> None:
+        """Give queued messages a chance to go out, then stop the writer task"""
+        if self._task and not self._task.done() and not self.closed:
+            deadline = time.monotonic() + drain_timeout
+            while self._queue and time.monotonic() < deadline and not self._task.done():
+                await asyncio.sleep(0.01)
+
+        self.closed = True
+        if self._queue:
+            self._record_drop("closed", len(self._queue))
+            self._queue.clear()
+            self._update_depth()
+        # Wake any producers waiting for room so they can observe the close
+        self._not_full.set()
+
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self) -> str:
+        return (f"{self.direction}: sent={self.sent} dropped={self.dropped} "
+                f"max_depth={self.max_depth} max_send_ms={self.max_send_latency * 1000:.1f}")
+
+    async def _run(self) -> None:
+        while True:
+            while not self._queue:
+                self._not_empty.clear()
+                await self._not_empty.wait()
+
+            kind, message, enqueued_at = self._queue.popleft()
+            self._update_depth()
+            self._not_full.set()
+
+            started = time.perf_counter()
+            self._wait_metric.observe(started - enqueued_at)
+            try:
+                await self._send(message)
+            except Exception as e:
+                print(f"Error sending to {self.direction}: {e}")
+                self.closed = True
+                self._record_drop("error", 1 + len(self._queue))
+                self._queue.clear()
+                self._update_depth()
+                self._not_full.set()
+                return
+
+            latency = time.perf_counter() - started
+            self._latency_metric.observe(latency)
+            self.max_send_latency = max(self.max_send_latency, latency)
+            self.sent += 1
+
+    def _drop_oldest_droppable(self) -> bool:
+        for i, item in enumerate(self._queue):
+            if item[0] in self.droppable:
+                del self._queue[i]
+                self._record_drop("overflow")
+                return True
+        return False
+
+    def _record_drop(self, reason: str, count: int = 1) -> None:
+        self.dropped += count
+        DROPPED.labels(self.direction, reason).inc(count)
+
+    def _update_depth(self) -> None:
+        # The gauge is shared by every call, so report changes rather than absolutes
+        depth = len(self._queue)
+        self.max_depth = max(self.max_depth, depth)
+        self._depth_metric.inc(depth - self._reported_depth)
+        self._reported_depth = depth
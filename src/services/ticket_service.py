@@ -1,14 +1,90 @@
-from typing import Dict, Optional, List
+from typing import Callable, Dict, Optional, List
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
 import requests
+from dotenv import load_dotenv
 from .auth_service import KayakoAuthService
 from datetime import datetime
 from .ticket_agent_service import TicketAgentService
+from ..utils.concurrency import run_in_thread
+from ..utils.metrics import registry
+from ..utils.resilience import dependency, is_transient
+from ..utils.tracing import tracer
+
+TICKET_STAGE_DURATION = registry.histogram(
+    "ticket_creation_seconds", "Time to create a ticket from a call, by stage (summarize, create)", ["stage"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+)
+SPOOLED_TICKETS = registry.gauge(
+    "spooled_tickets", "Tickets waiting on disk for Kayako to become reachable"
+)
+
+class TicketSpool:
+    """
+    Tickets Kayako could not take, kept on disk until it can
+
+    One JSON file per ticket. Workers sharing the directory claim a file by
+    renaming it before sending it, so each ticket is sent once.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def add(self, payload: Dict) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{time.time_ns()}-{os.getpid()}.json"
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(payload))
+        temporary.rename(path)
+        SPOOLED_TICKETS.inc()
+        return path
+
+    def pending(self) -> List[Path]:
+        return sorted(self.directory.glob("*.json")) if self.directory.is_dir() else []
+
+    def drain(self, send: Callable[[Dict], Optional[Dict]]) -> int:
+        """Send spooled tickets oldest first, stopping at the first failure; returns how many were sent"""
+        sent = 0
+        for path in self.pending():
+            claimed = path.with_suffix(f".sending-{os.getpid()}")
+            try:
+                path.rename(claimed)
+            except OSError:
+                continue  # Another worker is sending it
+            try:
+                ticket = send(json.loads(claimed.read_text()))
+            except Exception as e:
+                print(f"Error sending spooled ticket: {e}")
+                if not is_transient(e):
+                    # Kayako rejected it; retrying will not help, so keep it aside for a person
+                    claimed.rename(path.with_suffix(".rejected"))
+                    continue
+                ticket = None
+            if not ticket:
+                claimed.rename(path)
+                break
+            claimed.unlink()
+            sent += 1
+        SPOOLED_TICKETS.set(len(self.pending()))
+        return sent
+
+def create_ticket_spool() -> Optional[TicketSpool]:
+    """Build the spool from TICKET_SPOOL_DIR; None if spooling is off"""
+    load_dotenv()
+    directory = os.getenv('TICKET_SPOOL_DIR', '')
+    return TicketSpool(directory) if directory else None
 
 class KayakoTicketService:
     def __init__(self, auth_service: KayakoAuthService):
         self.auth_service = auth_service
         self.base_url = auth_service.base_url
         self.ticket_agent = TicketAgentService()
+        self.kayako = dependency("kayako")
+        # Tickets that fail while Kayako is unreachable are kept here and sent later
+        self.spool = create_ticket_spool()
     
     def create_ticket(self, 
                      subject: str,
@@ -31,10 +107,9 @@ class KayakoTicketService:
             type_id (int, optional): The ticket type ID. Defaults to 1
             
         Returns:
-            Dict or None: The created ticket data if successful, None if failed
+            Dict or None: The created ticket data if successful, {'id': None, 'spooled': True}
+            if Kayako was unreachable and the ticket was spooled, None if failed
         """
-        url = f"{self.base_url}/cases"
-        
         payload = {
             "subject": subject,
             "contents": contents,
@@ -46,63 +121,106 @@ class KayakoTicketService:
         }
         
         try:
-            response = requests.post(
-                url,
-                json=payload,
-                headers=self.auth_service.get_auth_headers()
-            )
-            response.raise_for_status()
-            return response.json().get('data')
+            return self.send_ticket(payload)
             
         except requests.exceptions.HTTPError as e:
             print(f"Error creating ticket: {e.response.status_code}")
             print(f"Response: {e.response.text}")
+            if self.spool and is_transient(e):
+                return self._spool_ticket(payload)
             return None
         except Exception as e:
             print(f"Error creating ticket: {e}")
-            return None 
+            if self.spool:
+                return self._spool_ticket(payload)
+            return None
+
+    def send_ticket(self, payload: Dict) -> Optional[Dict]:
+        """POST a case to Kayako with the Kayako timeout, retries and circuit breaker"""
+        # Outside the retried call: a session refresh has its own retries
+        headers = self.auth_service.get_auth_headers()
+        
+        def post_case():
+            response = requests.post(
+                f"{self.base_url}/cases",
+                json=payload,
+                headers=headers,
+                timeout=self.kayako.timeout
+            )
+            response.raise_for_status()
+            return response.json().get('data')
+        
+        return self.kayako.call(post_case)
+
+    def _spool_ticket(self, payload: Dict) -> Dict:
+        path = self.spool.add(payload)
+        print(f"Kayako unavailable, ticket spooled to {path} and will be sent later")
+        return {'id': None, 'spooled': True}
 
     def make_ticket(self, conversation: List[Dict], phone_number: str) -> Optional[Dict]:
         """Create a ticket from the conversation"""
-        try:
-            # Use the ticket agent to process the conversation
-            ticket_data = self.ticket_agent.process_conversation(conversation, phone_number)
+        with tracer.span("ticket.make_ticket", turns=len(conversation)) as span:
+            try:
+                # Use the ticket agent to process the conversation
+                with tracer.span("ticket.summarize"), TICKET_STAGE_DURATION.labels("summarize").time():
+                    ticket_data = self.ticket_agent.process_conversation(conversation, phone_number)
             
-            # Extract the subject and contents
-            subject = ticket_data.get('subject', 'Call with AI Assistant')
-            contents = ticket_data.get('contents', '')
+                # Extract the subject and contents
+                subject = ticket_data.get('subject', 'Call with AI Assistant')
+                contents = ticket_data.get('contents', '')
             
-            # Print the subject and contents for debugging
-            print("\n==== TICKET INFORMATION ====")
-            print(f"SUBJECT: {subject}")
-            print("\nCONTENTS:")
-            print(contents)
-            print("==== END TICKET INFORMATION ====\n")
+                # Print the subject and contents for debugging
+                print("\n==== TICKET INFORMATION ====")
+                print(f"SUBJECT: {subject}")
+                print("\nCONTENTS:")
+                print(contents)
+                print("==== END TICKET INFORMATION ====\n")
             
-            # Create the actual ticket in Kayako
-            # We need to determine the requester_id - for now, use a default value
-            # In a real implementation, you would look up the user by phone number
-            requester_id = 344  # Default requester ID - replace with actual lookup
+                # Create the actual ticket in Kayako
+                # We need to determine the requester_id - for now, use a default value
+                # In a real implementation, you would look up the user by phone number
+                requester_id = 344  # Default requester ID - replace with actual lookup
             
-            # Create the ticket using the create_ticket method
-            created_ticket = self.create_ticket(
-                subject=subject,
-                contents=contents,
-                requester_id=requester_id,
-            )
+                # Create the ticket using the create_ticket method
+                with tracer.span("ticket.create"), TICKET_STAGE_DURATION.labels("create").time():
+                    created_ticket = self.create_ticket(
+                        subject=subject,
+                        contents=contents,
+                        requester_id=requester_id,
+                    )
             
-            if created_ticket:
-                print(f"Successfully created ticket with ID: {created_ticket.get('id')}")
+                if created_ticket and created_ticket.get('spooled'):
+                    created_ticket['resolution_status'] = ticket_data.get('resolution_status')
+                    return created_ticket
+                elif created_ticket:
+                    print(f"Successfully created ticket with ID: {created_ticket.get('id')}")
                 
-                # Add resolution status to the response
-                created_ticket['resolution_status'] = ticket_data.get('resolution_status')
-                return created_ticket
-            else:
-                print("Failed to create ticket in Kayako")
-                return None
+                    # Add resolution status to the response
+                    created_ticket['resolution_status'] = ticket_data.get('resolution_status')
+                    return created_ticket
+                else:
+                    print("Failed to create ticket in Kayako")
+                    return None
             
+            except Exception as e:
+                span.set_attribute("error", repr(e))
+                print(f"Error creating ticket from conversation: {e}")
+                import traceback
+                print(traceback.format_exc())
+                return None
+
+async def drain_ticket_spool(ticket_service: KayakoTicketService = None) -> None:
+    """Retry spooled tickets forever; run as a background task"""
+    load_dotenv()
+    interval = float(os.getenv('TICKET_SPOOL_RETRY_SECONDS', '60'))
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if ticket_service is None:
+                ticket_service = await run_in_thread(KayakoTicketService, KayakoAuthService())
+            if ticket_service.spool and ticket_service.spool.pending():
+                sent = await run_in_thread(ticket_service.spool.drain, ticket_service.send_ticket)
+                if sent:
+                    print(f"Sent {sent} spooled tickets to Kayako")
         except Exception as e:
-            print(f"Error creating ticket from conversation: {e}")
-            import traceback
-            print(traceback.format_exc())
-            return None 
\ No newline at end of file
+            print(f"Error draining ticket spool: {e}")
@@ -1,10 +1,30 @@
 import json
+import os
 from typing import Dict, Any
 import asyncio
+import threading
+import time
+from contextlib import nullcontext
 from fastapi import WebSocket
 from .search_service import KnowledgeBaseSearchService
 from .auth_service import KayakoAuthService
 from .ticket_service import KayakoTicketService
+from .call_teardown import CallTeardown
+from .kb_prefetch import KnowledgeBasePrefetcher
+from .filler_audio import FillerAudio
+from ..utils.concurrency import run_in_thread
+from ..utils.metrics import registry
+from ..utils.resilience import Deadline
+from ..utils.tracing import tracer
+
+TOOL_CALL_DURATION = registry.histogram(
+    "tool_call_seconds", "Time to handle a function call from the realtime model", ["tool"]
+)
+KB_ANSWER_FIRST_AUDIO = registry.histogram(
+    "kb_answer_first_audio_seconds",
+    "Time from sending a knowledge base answer to the model to its first audio, by context (compressed, raw)",
+    ["context"]
+)
 
 class CallState:
     INITIAL = "initial"
@@ -16,9 +36,32 @@ class CallState:
     ENDING_QUESTION_ANSWERED = "ending_question_answered"
     ENDING_INSUFFICIENT_INFO = "ending_insufficient_info"
 
+ENDING_STATES = (CallState.ENDING, CallState.ENDING_QUESTION_ANSWERED, CallState.ENDING_INSUFFICIENT_INFO)
+
+_kb_service = None
+_kb_service_lock = threading.Lock()
+
+def shared_knowledge_base_service() -> KnowledgeBaseSearchService:
+    """
+    One knowledge base client per process, created on first use
+
+    Creating it looks up the Pinecone index over the network, which is too
+    slow to repeat for every call and must not happen on the event loop.
+    """
+    global _kb_service
+    if _kb_service is None:
+        with _kb_service_lock:
+            if _kb_service is None:
+                _kb_service = KnowledgeBaseSearchService()
+    return _kb_service
+
 class ToolService:
-    def __init__(self):
-        self.knowledge_base_service = KnowledgeBaseSearchService()
+    # When the last knowledge base answer went to the model, until its audio starts
+    kb_answer_sent_at = None
+
+    @property
+    def knowledge_base_service(self) -> KnowledgeBaseSearchService:
+        return shared_knowledge_base_service()
     
     async def handle_function_call(self, 
                                  function_name: str, 
@@ -28,35 +71,36 @@ class ToolService:
                                  openai_ws: WebSocket,
                                  stream_sid: str,
                                  conversation_service,
-                                 caller_number: str = None) -> None:
+                                 caller_number: str = None,
+                                 call_teardown: CallTeardown = None,
+                                 kb_prefetcher: KnowledgeBasePrefetcher = None,
+                                 filler: FillerAudio = None) -> None:
         """Handle function calls from the OpenAI API"""
-        try:
-            #print(f"\nFunction called: {function_name}")
-            #print(f"Arguments: {function_args}")
+        started = time.perf_counter()
+        with tracer.span(f"tool.{function_name}", call_id=call_id) as span:
+            try:
+                #print(f"\nFunction called: {function_name}")
+                #print(f"Arguments: {function_args}")
             
-            if function_name == 'end_call':
-                await self._handle_end_call(websocket, openai_ws, stream_sid, conversation_service, function_args)
+                if function_name == 'end_call':
+                    await self._handle_end_call(websocket, openai_ws, stream_sid, conversation_service, function_args, call_teardown)
                 
-            elif function_name == 'search_knowledge_base':
-                await self._handle_knowledge_base_search(function_args, call_id, openai_ws)
+                elif function_name == 'search_knowledge_base':
+                    await self._handle_knowledge_base_search(function_args, call_id, openai_ws, kb_prefetcher, filler)
+            
+                TOOL_CALL_DURATION.labels(function_name).observe(time.perf_counter() - started)
                 
-        except Exception as e:
-            print(f"Error handling function call: {e}")
-            import traceback
-            print(traceback.format_exc())
+            except Exception as e:
+                span.set_attribute("error", repr(e))
+                print(f"Error handling function call: {e}")
+                import traceback
+                print(traceback.format_exc())
     
-    async def _handle_end_call(self, websocket: WebSocket, openai_ws: WebSocket, stream_sid: str, conversation_service=None, function_args: str = None) -> None:
+    async def _handle_end_call(self, websocket: WebSocket, openai_ws: WebSocket, stream_sid: str, conversation_service=None, function_args: str = None, call_teardown: CallTeardown = None) -> None:
         """Handle the end_call function"""
         #print("Ending call, thanks for calling")
         
-        # Add a check to prevent duplicate end_call handling
         if conversation_service:
-            current_state = conversation_service.get_call_state(stream_sid)
-            # Check for all ending states
-            if current_state in ["ending", "ending_question_answered", "ending_insufficient_info"]:
-                #print(f"Call already in ending state: {current_state}, skipping duplicate end_call")
-                return
-            
             # Parse the function args to get the reason
             reason = "normal"
             if function_args:
@@ -68,51 +112,50 @@ class ToolService:
             
             # Set the appropriate ending state based on the reason
             if reason == "question_answered":
-                conversation_service.update_call_state(stream_sid, "ending_question_answered")
-                # Send a specific ending message for answered questions
-                await self._send_instruction(openai_ws, "Say: 'Thank you for calling. I'm glad I could help. Have a great day!'")
+                ending_state = CallState.ENDING_QUESTION_ANSWERED
+                goodbye = "Say: 'Thank you for calling. I'm glad I could help. Have a great day!'"
             elif reason == "insufficient_information":
-                conversation_service.update_call_state(stream_sid, "ending_insufficient_info")
-                # Send a specific ending message for insufficient information
-                await self._send_instruction(openai_ws, "Say: 'I apologize, but I don't have enough information to fully answer your question. I'll have a representative call you back to assist with this. Thank you for calling.'")
+                ending_state = CallState.ENDING_INSUFFICIENT_INFO
+                goodbye = "Say: 'I apologize, but I don't have enough information to fully answer your question. I'll have a representative call you back to assist with this. Thank you for calling.'"
             else:
-                conversation_service.update_call_state(stream_sid, "ending")
-                # Send a generic ending message
-                await self._send_instruction(openai_ws, "Say: 'Thank you for calling. Have a great day!'")
-        
-        try:
-            # Wait for the audio to be generated and sent
-            # Increase the wait time to ensure the full message is spoken
-            await asyncio.sleep(6)
-            
-            # Send stop event to Twilio
-            #print(f"Sending stop event for stream: {stream_sid}")
-            if websocket:
-                try:
-                    await websocket.send_json({
-                        "event": "stop",
-                        "streamSid": stream_sid
-                    })
-                    # Add a small delay to allow the stop event to be processed
-                    await asyncio.sleep(0.5)
-                except Exception as e:
-                    print(f"Error sending stop event to Twilio: {e}")
+                ending_state = CallState.ENDING
+                goodbye = "Say: 'Thank you for calling. Have a great day!'"
             
-            # NOTE: We no longer close the WebSocket connections here
-            # They will be closed in the 'stop' event handler
+            # Check and set in one step, so of two racing end_calls (possibly on
+            # different workers sharing the store) only one says goodbye
+            if not await conversation_service.update_call_state_async(stream_sid, ending_state, unless_in=ENDING_STATES):
+                #print("Call already in an ending state, skipping duplicate end_call")
+                return
             
-        except Exception as e:
-            print(f"Error ending call: {e}")
-            import traceback
-            print(traceback.format_exc())
+            await self._send_instruction(openai_ws, goodbye)
+        
+        # Hang up once Twilio has played the goodbye; this runs as its own task and returns immediately
+        if call_teardown:
+            call_teardown.begin()
+        else:
+            print(f"No call teardown available for stream {stream_sid}, leaving the call open")
     
-    async def _handle_knowledge_base_search(self, function_args: str, call_id: str, openai_ws: WebSocket) -> None:
+    async def _handle_knowledge_base_search(self, function_args: str, call_id: str, openai_ws: WebSocket,
+                                            kb_prefetcher: KnowledgeBasePrefetcher = None,
+                                            filler: FillerAudio = None) -> None:
         """Handle the search_knowledge_base function with progress updates"""
         args = json.loads(function_args)
         
+        # Started before the thread hop, so time spent waiting for a worker counts too
+        deadline = Deadline.after(float(os.getenv('KB_DEADLINE_SECONDS', '1.2')))
+        
         try:
-            # Perform the search directly without interim message
-            kb_response = self.knowledge_base_service.get_kb_answer(args['query'])
+            # If the lookup is slow the caller hears a short pre-rendered filler, cut off once it is done
+            async with filler.while_waiting() if filler else nullcontext():
+                # A search started on the caller's words may already have the answer
+                kb_response = None
+                if kb_prefetcher is not None:
+                    kb_response = await kb_prefetcher.answer(args['query'], deadline)
+                if kb_response is None:
+                    # Perform the search in a worker thread so the call's event loop keeps relaying audio
+                    kb_response = await run_in_thread(
+                        lambda: self.knowledge_base_service.get_kb_answer(args['query'], deadline)
+                    )
             
             # Send tool response back to OpenAI - USING THE ORIGINAL FORMAT
             tool_response = {
@@ -124,11 +167,18 @@ class ToolService:
             
             #print("Sending knowledge base response back to OpenAI")
             await openai_ws.send(json.dumps(tool_response))
+            self.kb_answer_sent_at = time.perf_counter()
         except Exception as e:
             print(f"Error in knowledge base search: {e}")
             import traceback
             print(traceback.format_exc())
 
+    def kb_answer_audio_started(self) -> None:
+        """Called with the first assistant audio after a knowledge base answer was sent"""
+        context = "raw" if self.knowledge_base_service.compressor is None else "compressed"
+        KB_ANSWER_FIRST_AUDIO.labels(context).observe(time.perf_counter() - self.kb_answer_sent_at)
+        self.kb_answer_sent_at = None
+
     async def control_call_flow(self, 
                                current_state: str,
                                next_state: str,
@@ -136,7 +186,8 @@ class ToolService:
                                websocket: WebSocket,
                                openai_ws: WebSocket,
                                stream_sid: str,
-                               conversation_service) -> None:
+                               conversation_service,
+                               call_teardown: CallTeardown = None) -> None:
         """Control the flow of the call based on state transitions"""
         #print(f"Call flow transition: {current_state} -> {next_state}")
         
@@ -163,10 +214,10 @@ class ToolService:
         
         elif next_state == CallState.ENDING:
             # Begin call termination process
-            await self._handle_end_call(websocket, openai_ws, stream_sid, conversation_service)
+            await self._handle_end_call(websocket, openai_ws, stream_sid, conversation_service, call_teardown=call_teardown)
         
         # Update conversation state
-        conversation_service.update_call_state(stream_sid, next_state) 
+        await conversation_service.update_call_state_async(stream_sid, next_state) 
 
     async def _send_interim_message(self, openai_ws: WebSocket, message: str) -> None:
         """Send an interim message to the caller while processing"""
@@ -239,37 +290,36 @@ class ToolService:
                                       conversation_service,
                                       stream_sid: str,
                                       openai_ws: WebSocket,
-                                      websocket: WebSocket = None) -> None:
+                                      websocket: WebSocket = None,
+                                      call_teardown: CallTeardown = None) -> None:
         # Skip if stream_sid is None (call not yet started)
         if not stream_sid:
             return
         
         # Check if we're in a state where we should avoid sending new instructions
-        if current_state in ["ending", "ending_question_answered", "ending_insufficient_info"]:
+        if current_state in ENDING_STATES:
             #print("Call is ending, skipping further instructions")
             return
         
         try:
             # Get recent messages to determine context
-            conversation = conversation_service.get_conversation(stream_sid)
-            if not conversation:
+            recent_messages = await conversation_service.recent_messages_async(stream_sid, 3)
+            if not recent_messages:
                 print("No conversation data available")
                 return
             
-            recent_messages = [msg for msg in conversation if msg.get('role') in ['caller', 'assistant']][-3:] if conversation else []
-            
             # Different actions based on current state
             if current_state == "awaiting_answer_feedback":
                 # Check if user indicated the answer was helpful or not
-                if recent_messages and recent_messages[-1].get('role') == 'caller':
-                    user_message = recent_messages[-1].get('content', '').lower()
+                if recent_messages and recent_messages[-1].role == 'caller':
+                    user_message = (recent_messages[-1].content or '').lower()
                     
                     # Check for positive responses
                     if any(word in user_message for word in ['yes', 'yeah', 'correct', 'right', 'good', 'helpful', 'thanks']):
                         #print("User indicated the answer was helpful, asking for more questions")
                         
                         # Update state first
-                        conversation_service.update_call_state(stream_sid, "awaiting_more_questions")
+                        await conversation_service.update_call_state_async(stream_sid, "awaiting_more_questions")
                         
                         # Then send the instruction
                         #await self._send_instruction(openai_ws, "Ask: 'Do you have any other questions I can help you with?'")
@@ -284,7 +334,8 @@ class ToolService:
                             openai_ws, 
                             stream_sid, 
                             conversation_service, 
-                            json.dumps({"reason": "insufficient_information"})
+                            json.dumps({"reason": "insufficient_information"}),
+                            call_teardown
                         )
                     else:
                         # Ambiguous response, ask for clarification
@@ -294,8 +345,8 @@ class ToolService:
             elif current_state == "awaiting_more_questions":
                 # Check if user has more questions
                 #print("Checking for more questions")
-                if recent_messages and recent_messages[-1].get('role') == 'caller':
-                    user_message = recent_messages[-1].get('content', '').lower()
+                if recent_messages and recent_messages[-1].role == 'caller':
+                    user_message = (recent_messages[-1].content or '').lower()
                     
                     if any(word in user_message for word in ['no', 'nope', "that's all", 'nothing', 'done']):
                         #print("User has no more questions, ending call")
@@ -306,13 +357,14 @@ class ToolService:
                             openai_ws, 
                             stream_sid, 
                             conversation_service, 
-                            json.dumps({"reason": "question_answered"})
+                            json.dumps({"reason": "question_answered"}),
+                            call_teardown
                         )
                     else:
                         # User has more questions, let the model handle it
                         #print("User has more questions, continuing conversation")
                         # Reset state to initial to handle the new question
-                        conversation_service.update_call_state(stream_sid, "initial")
+                        await conversation_service.update_call_state_async(stream_sid, "initial")
         except Exception as e:
             print(f"Error enforcing conversation flow: {e}")
             import traceback
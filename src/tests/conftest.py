@@ -0,0 +1,44 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import pytest
+
+from src.fakes.corpus import SyntheticCorpus
+from src.fakes.embedding_server import FakeEmbeddingServer
+from src.fakes.kayako_server import FakeKayakoServer
+from src.fakes.pinecone_server import FakePineconeServer
+
+class KnowledgeBaseFakes:
+    """Kayako, embeddings and Pinecone fakes, with the environment pointing the services at them"""
+
+    def __init__(self, corpus: SyntheticCorpus, kayako, embeddings, pinecone, directory):
+        self.corpus = corpus
+        self.kayako = kayako
+        self.embeddings = embeddings
+        self.pinecone = pinecone
+        self.directory = directory
+
+    def vector_ids(self):
+        return set(self.pinecone.namespace("").values)
+
+@pytest.fixture
+def kb_fakes(tmp_path, monkeypatch):
+    corpus = SyntheticCorpus(size=30, seed=7)
+    servers = [FakeKayakoServer(corpus), FakeEmbeddingServer(), FakePineconeServer()]
+    for server in servers:
+        server.start()
+    kayako, embeddings, pinecone = servers
+    for name, value in {
+        "KAYAKO_BASE_URL": kayako.url, "KAYAKO_USERNAME": "test", "KAYAKO_PASSWORD": "test",
+        "EMBEDDINGS_BASE_URL": embeddings.base_url, "OPENAI_API_KEY": "test",
+        "PINECONE_INDEX_HOST": pinecone.url, "PINECONE_INDEX_NAME": pinecone.index_name, "PINECONE_API_KEY": "test",
+        "KB_CHUNK_STORE": str(tmp_path / "chunks.sqlite3"), "KB_GENERATIONS_DIR": "",
+        "KB_CHUNK_ALLOW_ESTIMATED_TOKENS": "true",
+    }.items():
+        monkeypatch.setenv(name, value)
+    try:
+        yield KnowledgeBaseFakes(corpus, kayako, embeddings, pinecone, tmp_path)
+    finally:
+        for server in servers:
+            server.stop()
@@ -0,0 +1,42 @@
+import base64
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.services.audio_clip_cache import CLIP_SCRIPTS, GREETING_CLIP, AudioClipCache, spoken_prefix
+from src.utils.audio import ulaw_tone
+
+GREETING = CLIP_SCRIPTS[GREETING_CLIP]
+
+def test_clip_payloads_and_duration(tmp_path):
+    (tmp_path / "greeting.ulaw").write_bytes(ulaw_tone(1000))
+    cache = AudioClipCache(tmp_path, frames_per_payload=10)
+    payloads = cache.get("greeting")
+    # 50 frames of 20ms, ten to a payload
+    assert len(payloads) == 5
+    assert sum(len(base64.b64decode(p)) for p in payloads) == 8000
+    assert cache.duration_ms("greeting") == 1000
+
+def test_missing_clip():
+    cache = AudioClipCache("/nonexistent")
+    assert cache.get("greeting") is None
+    assert cache.duration_ms("greeting") is None
+
+def test_spoken_prefix_keeps_whole_words_heard():
+    assert spoken_prefix(GREETING, 0) == ""
+    assert spoken_prefix(GREETING, 0.1) == "Hi!"
+    assert spoken_prefix(GREETING, 0.5) == "Hi! This is Kai speaking."
+    assert spoken_prefix(GREETING, 1) == GREETING
+    # Twilio's clock can run past the clip's end
+    assert spoken_prefix(GREETING, 1.5) == GREETING
+    assert spoken_prefix(GREETING, -1) == ""
+
+def test_greeting_item_replaces_at_start():
+    from src.services.audio_streaming_service import GREETING_ITEM_ID, AudioStreamingService
+
+    full = AudioStreamingService._greeting_item(GREETING)
+    heard = AudioStreamingService._greeting_item("Hi!", previous_item_id="root")
+    assert full["item"]["id"] == heard["item"]["id"] == GREETING_ITEM_ID
+    assert "previous_item_id" not in full
+    assert heard["previous_item_id"] == "root"
+    assert heard["item"]["content"][0]["text"] == "Hi!"
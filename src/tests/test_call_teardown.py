@@ -0,0 +1,84 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.services.call_teardown import CallTeardown, TeardownState
+
+class _Call:
+    def __init__(self):
+        self.marks = 0
+        self.ended = 0
+
+    async def end(self):
+        self.ended += 1
+
+def _teardown(call: _Call, max_wait: float = 1.0) -> CallTeardown:
+    return CallTeardown(end_call=call.end, pending_marks=lambda: call.marks, max_wait=max_wait)
+
+def test_hangs_up_after_goodbye_is_played():
+    async def run():
+        call = _Call()
+        teardown = _teardown(call)
+        teardown.begin()
+        assert teardown.state == TeardownState.SPEAKING_GOODBYE
+        teardown.response_created("goodbye")
+        teardown.response_created("later")  # Only the first response is the goodbye
+        call.marks = 2
+        teardown.response_done("later")
+        assert teardown.state == TeardownState.SPEAKING_GOODBYE
+        teardown.response_done("goodbye")
+        assert teardown.state == TeardownState.DRAINING
+        call.marks = 1
+        teardown.mark_acknowledged()
+        await asyncio.sleep(0.01)
+        assert call.ended == 0
+        call.marks = 0
+        teardown.mark_acknowledged()
+        await asyncio.sleep(0.01)
+        return call, teardown
+
+    call, teardown = asyncio.run(run())
+    assert call.ended == 1
+    assert teardown.state == TeardownState.CLOSED
+
+def test_hangs_up_after_max_wait():
+    async def run():
+        call = _Call()
+        teardown = _teardown(call, max_wait=0.05)
+        teardown.begin()
+        teardown.response_created("goodbye")
+        await asyncio.sleep(0.1)
+        return call, teardown
+
+    call, teardown = asyncio.run(run())
+    assert call.ended == 1
+    assert teardown.state == TeardownState.CLOSED
+
+def test_cancel_does_not_end_call():
+    async def run():
+        call = _Call()
+        teardown = _teardown(call)
+        teardown.begin()
+        await teardown.cancel()
+        teardown.response_created("goodbye")
+        teardown.response_done("goodbye")
+        await asyncio.sleep(0.01)
+        return call, teardown
+
+    call, teardown = asyncio.run(run())
+    assert call.ended == 0
+    assert teardown.state == TeardownState.CLOSED
+
+def test_begin_only_once():
+    async def run():
+        call = _Call()
+        teardown = _teardown(call)
+        teardown.begin()
+        first = teardown._task
+        teardown.begin()
+        same = teardown._task is first
+        await teardown.cancel()
+        return same
+
+    assert asyncio.run(run())
@@ -0,0 +1,112 @@
+import threading
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import pytest
+
+from src.services.chunk_store import ChunkStore, create_chunk_store, slim_metadata
+
+def _chunk(article_id: int, index: int, text: str, title: str = "Reset a password") -> dict:
+    return {
+        "id": f"article_{article_id}_chunk_{index:016x}",
+        "text": text,
+        "metadata": {"article_id": article_id, "title": title, "url": f"https://help.example.com/{article_id}",
+                     "chunk_index": index, "updated_at": "2024-01-01T00:00:00+00:00", "content": text},
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    store = ChunkStore(str(tmp_path / "chunks.sqlite3"))
+    yield store
+    store.close()
+
+def test_slim_metadata_keeps_only_what_syncs_filter_on():
+    assert slim_metadata(_chunk(1, 0, "Open settings.")["metadata"]) == {
+        "article_id": 1, "chunk_index": 0, "updated_at": "2024-01-01T00:00:00+00:00"
+    }
+
+def test_put_and_get(store):
+    store.put_many([_chunk(1, 0, "Open settings."), _chunk(1, 1, "Then save.")])
+    found = store.get_many(["article_1_chunk_0000000000000001", "article_9_chunk_0000000000000000"])
+    assert found == {"article_1_chunk_0000000000000001": {
+        "title": "Reset a password", "url": "https://help.example.com/1", "content": "Then save."
+    }}
+    assert store.get_many([]) == {}
+
+def test_put_replaces_by_id(store):
+    store.put_many([_chunk(1, 0, "Open settings.")])
+    store.put_many([_chunk(1, 0, "Open the settings page.")])
+    assert store.get_many(["article_1_chunk_0000000000000000"])["article_1_chunk_0000000000000000"]["content"] == \
+        "Open the settings page."
+    # The keyword index follows the replacement
+    assert store.search("settings page")[0]["content"] == "Open the settings page."
+    assert [r["content"] for r in store.search("settings")] == ["Open the settings page."]
+
+def test_delete_and_delete_article(store):
+    store.put_many([_chunk(1, 0, "Open settings."), _chunk(1, 1, "Then save."), _chunk(2, 0, "Billing is monthly.")])
+    store.delete(["article_1_chunk_0000000000000000"])
+    assert store.article_ids() == {1, 2}
+    store.delete_article(1)
+    assert store.article_ids() == {2}
+    assert store.search("save") == []
+
+def test_keyword_search_ranks_title_matches_first(store):
+    store.put_many([
+        _chunk(1, 0, "Open the billing page to see your invoice.", title="Reset a password"),
+        _chunk(2, 0, "Invoices are sent monthly.", title="Billing"),
+        _chunk(3, 0, "Add a team member from the admin page.", title="Team members"),
+    ])
+    assert [r["article_id"] for r in store.search("billing")] == [2, 1]
+    assert store.search("billing", limit=1)[0]["title"] == "Billing"
+    # Punctuation and FTS syntax in questions are taken as plain words
+    assert [r["article_id"] for r in store.search('how do I add a "team" member? (admin) OR NOT')][:1] == [3]
+    assert store.search("?!") == []
+
+def test_keyword_search_keeps_to_live_ids(store):
+    store.put_many([_chunk(1, 0, "Invoices are sent monthly."), _chunk(2, 0, "Invoices can be exported.")])
+    results = store.search("invoices", live={"article_2_chunk_0000000000000000"})
+    assert [r["article_id"] for r in results] == [2]
+    assert store.search("invoices", live=frozenset()) == []
+
+def test_existing_chunks_are_indexed_on_open(tmp_path):
+    path = str(tmp_path / "chunks.sqlite3")
+    store = ChunkStore(path)
+    store.put_many([_chunk(1, 0, "Invoices are sent monthly.")])
+    store._db.executescript("DROP TABLE chunks_fts; DROP TRIGGER chunks_fts_insert; DROP TRIGGER chunks_fts_delete;")
+    store.close()
+
+    store = ChunkStore(path)
+    assert store.searchable
+    assert [r["article_id"] for r in store.search("invoices")] == [1]
+    store.close()
+
+def test_a_second_connection_sees_writes(tmp_path):
+    path = str(tmp_path / "chunks.sqlite3")
+    writer, reader = ChunkStore(path), ChunkStore(path)
+    errors = []
+
+    def write():
+        try:
+            for i in range(50):
+                writer.put_many([_chunk(i, 0, f"Step {i} opens settings.")])
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    while thread.is_alive():
+        reader.get_many(["article_0_chunk_0000000000000000"])
+    thread.join()
+    assert not errors
+    assert len(reader.article_ids()) == 50
+    writer.close()
+    reader.close()
+
+def test_create_chunk_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("KB_CHUNK_STORE", "")
+    assert create_chunk_store() is None
+    monkeypatch.setenv("KB_CHUNK_STORE", str(tmp_path / "kb" / "chunks.sqlite3"))
+    store = create_chunk_store()
+    assert (tmp_path / "kb" / "chunks.sqlite3").exists()
+    store.close()
@@ -0,0 +1,67 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import pytest
+
+from src.models.article import Article
+from src.services.kb_ingest import IngestPipeline
+from src.utils.chunking import TokenChunker, chunk_article, chunk_id
+
+# No such encoding anywhere, so counts are estimated the same way on every host
+ESTIMATED = "no-such-encoding"
+
+def _paragraph(n: int, sentences: int = 8) -> str:
+    # About 15 tokens a sentence, so the default of 8 does not fit in one chunk
+    return " ".join(f"Step {n}.{i} opens the settings page and saves the change." for i in range(sentences))
+
+def _article(content: str) -> Article:
+    return Article(id=7, status="PUBLISHED", title="Reset a password", content=content,
+                   helpcenter_url="https://help.example.com/7", updated_at="2024-01-01T00:00:00Z")
+
+def _chunker(**kwargs) -> TokenChunker:
+    return TokenChunker(**{"max_tokens": 120, "overlap_tokens": 30, "encoding_name": ESTIMATED, **kwargs})
+
+def _ids(content: str, chunker: TokenChunker = None) -> list:
+    return [chunk["id"] for chunk in chunk_article(_article(content), chunker or _chunker())]
+
+CONTENT = "\n\n".join(_paragraph(n) for n in range(4))
+
+def test_chunks_fit_and_break_at_sentences():
+    chunker = _chunker()
+    chunks = chunker.split(CONTENT)
+    assert len(chunks) > 2
+    assert all(chunker.counter.count(chunk) <= 120 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+def test_same_text_gives_the_same_ids():
+    assert _ids(CONTENT) == _ids(CONTENT)
+
+def test_appending_a_sentence_adds_one_chunk_to_embed():
+    before = set(_ids(CONTENT))
+    after = set(_ids(f"{CONTENT} Contact support if this did not help."))
+    assert len(after - before) == 1
+    assert len(before - after) <= 1
+
+def test_editing_one_paragraph_keeps_the_chunks_of_the_others():
+    paragraphs = [_paragraph(n, sentences=5) for n in range(4)]
+    before = _ids("\n\n".join(paragraphs))
+    paragraphs[1] = "Updated for the new release. " + paragraphs[1]
+    after = _ids("\n\n".join(paragraphs))
+    assert len(after) == len(before)
+    assert [i for i, (old, new) in enumerate(zip(before, after)) if old != new] == [1]
+
+def test_repeated_text_gets_distinct_ids():
+    chunks = chunk_article(_article("Save.\n\nSave.\n\nSave."), _chunker(max_tokens=4, overlap_tokens=1))
+    assert len({chunk["id"] for chunk in chunks}) == len(chunks)
+
+def test_estimated_chunks_are_marked():
+    assert chunk_id(7, "Save.") != chunk_id(7, "Save.", estimated=True)
+    assert chunk_id(7, "Save.", estimated=True).startswith("article_7_chunk_est-")
+    assert all(i.startswith("article_7_chunk_est-") for i in _ids(CONTENT))
+
+def test_sync_refuses_estimated_counts_unless_allowed():
+    pipeline = IngestPipeline(None, None, None, chunker=_chunker())
+    with pytest.raises(RuntimeError, match="KB_CHUNK_ALLOW_ESTIMATED_TOKENS"):
+        asyncio.run(pipeline.run())
@@ -0,0 +1,50 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.services.context_compressor import ContextCompressor, merge_overlapping, strip_urls
+from src.utils.tokens import TokenCounter
+
+SHARED = "and the restore button undoes any change you made."
+
+def _chunk(article_id, index, content, score=0.9, title="Reset a password"):
+    return {"article_id": article_id, "chunk_index": index, "content": content, "score": score,
+            "title": title, "url": f"https://help.example.com/{article_id}"}
+
+def _compressor(**kwargs) -> ContextCompressor:
+    options = {"min_score": 0.75, "token_budget": 400, "counter": TokenCounter()}
+    options.update(kwargs)
+    return ContextCompressor(**options)
+
+def test_merge_overlapping():
+    assert merge_overlapping(f"Open settings {SHARED}", f"{SHARED} Then save.") == f"Open settings {SHARED} Then save."
+    assert merge_overlapping("Open settings.", "Then save.") is None
+
+def test_strip_urls():
+    assert strip_urls("See (https://help.example.com/1) the guide at https://x.io/a.") == "See the guide at."
+    assert strip_urls("See the guide at https://x.io/a. Then reset.") == "See the guide at. Then reset."
+    assert strip_urls("see https://x.io/a, then go") == "see, then go"
+    # A closing parenthesis is only taken with the opening one
+    assert strip_urls("(or see https://x.io/a)") == "(or see)"
+
+def test_merges_an_articles_chunks_and_drops_weak_ones():
+    chunks = [
+        _chunk(1, 1, f"{SHARED} Then save your changes."),
+        _chunk(1, 0, f"Title: Reset a password\nContent: Open the settings page {SHARED}"),
+        _chunk(2, 0, "Billing is monthly.", score=0.5, title="Billing"),
+    ]
+    text = _compressor().compress(chunks)
+    assert text == f"From article 'Reset a password':\nOpen the settings page {SHARED} Then save your changes."
+
+def test_best_result_is_kept_even_below_the_threshold():
+    text = _compressor().compress([_chunk(2, 0, "Billing is monthly.", score=0.5, title="Billing")])
+    assert text == "From article 'Billing':\nBilling is monthly."
+
+def test_trims_to_the_token_budget_best_article_first():
+    long = " ".join(["Open the settings page and save."] * 100)
+    chunks = [_chunk(1, 0, long, score=0.8), _chunk(2, 0, "Billing is monthly.", score=0.95, title="Billing")]
+    compressor = _compressor(token_budget=60)
+    text = compressor.compress(chunks)
+    assert text.startswith("From article 'Billing'")
+    assert compressor.counter.count(text) <= 60
+    assert text.endswith(".")
@@ -0,0 +1,55 @@
+import gzip
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.services.conversation_archive import ConversationArchive
+from src.services.conversation_service import ConversationService
+from src.services.conversation_store import MemoryConversationStore
+
+def _records(directory):
+    records = []
+    for path in sorted(directory.glob("conversations-*.jsonl.gz")):
+        with gzip.open(path, "rt") as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+def test_rotates_and_keeps_newest_segments(tmp_path):
+    archive = ConversationArchive(str(tmp_path), segment_bytes=200, max_segments=3)
+    for i in range(10):
+        assert archive.submit({"stream_sid": f"MZ{i}", "padding": "x" * 250})
+    archive.close()
+
+    segments = sorted(tmp_path.glob("conversations-*.jsonl.gz"))
+    assert len(segments) == 3
+    # Each record fills a segment, so the last three survive
+    assert [r["stream_sid"] for r in _records(tmp_path)] == ["MZ7", "MZ8", "MZ9"]
+
+def test_full_queue_drops(tmp_path):
+    archive = ConversationArchive(str(tmp_path), queue_size=1)
+    archive.close()  # Nothing drains the queue any more
+    assert archive.submit({"stream_sid": "MZ1"})
+    assert not archive.submit({"stream_sid": "MZ2"})
+
+def test_closed_and_expired_conversations_are_archived(tmp_path):
+    archive = ConversationArchive(str(tmp_path))
+    store = MemoryConversationStore()
+    service = ConversationService(store, archive=archive)
+    service.wal = None
+
+    service.start_conversation("MZ1")
+    service.add_message("MZ1", "caller", "hello")
+    service.update_call_state("MZ1", "ending")
+    service.close_conversation("MZ1")
+    service.start_conversation("MZ2")
+    service.add_message("MZ2", "caller", "anyone there?")
+    assert service.evict_expired(0) == 1
+    archive.close()
+
+    assert store.active() == []
+    first, second = _records(tmp_path)
+    assert first["stream_sid"] == "MZ1" and first["reason"] == "closed"
+    assert first["state"]["state"] == "ending"
+    assert [m["content"] for m in first["messages"]] == ["hello"]
+    assert second["stream_sid"] == "MZ2" and second["reason"] == "expired"
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import pytest
+
+from src.fakes.redis_server import FakeRedisServer
+from src.services.conversation_service import ConversationService
+from src.services.conversation_store import (
+    ConversationStore, Message, MemoryConversationStore, create_conversation_store
+)
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "redis":
+        with FakeRedisServer() as server:
+            store = create_conversation_store(server.url)
+            yield store
+            store.close()
+        return
+    url = "memory" if request.param == "memory" else f"sqlite:///{tmp_path / 'conversations.db'}"
+    store = create_conversation_store(url)
+    yield store
+    store.close()
+
+def test_store_must_implement_every_operation():
+    with pytest.raises(TypeError):
+        ConversationStore()
+
+def test_messages_round_trip(store):
+    store.start("MZ1")
+    store.append("MZ1", Message("caller", "hello"))
+    store.append("MZ1", Message("assistant", "hi there"))
+    store.append("MZ1", Message("caller", "bye"))
+
+    messages = store.messages("MZ1")
+    assert [(m["role"], m["content"]) for m in messages] == [
+        ("caller", "hello"), ("assistant", "hi there"), ("caller", "bye")
+    ]
+    assert messages[0]["timestamp"].endswith("+00:00")
+    assert [m.content for m in store.recent("MZ1", 2)] == ["hi there", "bye"]
+    assert store.messages("MZ2") == []
+
+def test_start_discards_previous_conversation(store):
+    store.append("MZ1", Message("caller", "old"))
+    store.set_state("MZ1", "ending")
+    store.start("MZ1")
+    assert store.messages("MZ1") == []
+    assert store.get_state("MZ1") is None
+
+def test_conditional_state_update(store):
+    assert store.current_state("MZ1") is None
+    assert store.set_state("MZ1", "initial")
+    assert store.set_state("MZ1", "ending", unless_in={"ending", "ended"})
+    assert not store.set_state("MZ1", "ending", unless_in={"ending", "ended"})
+    state = store.get_state("MZ1")
+    assert state["state"] == "ending"
+    assert state["state_updated_at"]
+
+def test_only_one_racing_caller_wins(store):
+    store.set_state("MZ1", "initial")
+    barrier = threading.Barrier(8)
+    wins = []
+
+    def end_call():
+        barrier.wait()
+        wins.append(store.set_state("MZ1", "ending", unless_in={"ending"}))
+
+    threads = [threading.Thread(target=end_call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert wins.count(True) == 1
+
+def test_delete_active_and_expired(store):
+    store.start("MZ1")
+    store.start("MZ2")
+    assert sorted(store.active()) == ["MZ1", "MZ2"]
+    assert store.expired(60) == []
+    time.sleep(0.05)
+    store.append("MZ2", Message("caller", "still here"))
+    assert store.expired(0.04) == ["MZ1"]
+    store.delete("MZ1")
+    store.delete("MZ3")
+    assert store.active() == ["MZ2"]
+
+def test_message_timestamps_survive_a_round_trip():
+    message = Message("caller", "hello")
+    assert Message.from_dict(message.to_dict()).timestamp == message.timestamp
+    # Transcripts stored before timestamps carried an offset are read as UTC
+    legacy = Message.from_dict({"role": "caller", "content": "hi", "timestamp": "2024-01-01T12:00:00"})
+    assert legacy.timestamp == "2024-01-01T12:00:00+00:00"
+
+def test_service_runs_blocking_stores_in_a_thread(tmp_path):
+    class Recording(MemoryConversationStore):
+        blocking = True
+
+        def __init__(self):
+            super().__init__()
+            self.threads = set()
+
+        def append(self, stream_sid, message):
+            self.threads.add(threading.get_ident())
+            super().append(stream_sid, message)
+
+    async def run(store):
+        service = ConversationService(store)
+        # Whatever the environment configures, this test only looks at the store
+        service.archive = service.wal = None
+        await service.start_conversation_async("MZ1")
+        await service.add_message_async("MZ1", "caller", "hello")
+        updated = await service.update_call_state_async("MZ1", "ending", unless_in={"ending"})
+        again = await service.update_call_state_async("MZ1", "ending", unless_in={"ending"})
+        conversation = await service.get_conversation_async("MZ1")
+        return updated, again, conversation
+
+    store = Recording()
+    updated, again, conversation = asyncio.run(run(store))
+    assert updated and not again
+    assert conversation[0]["metadata"]["state"] == "ending"
+    assert conversation[1]["content"] == "hello"
+    assert threading.get_ident() not in store.threads
+
+    memory = MemoryConversationStore()
+    asyncio.run(run(memory))
+    assert memory.messages("MZ1")[0]["content"] == "hello"
+
+def test_recent_reads_only_the_tail(store):
+    store.start("MZ1")
+    for i in range(50):
+        store.append("MZ1", Message("caller", f"turn {i}"))
+    assert [m.content for m in store.recent("MZ1", 3)] == ["turn 47", "turn 48", "turn 49"]
+    assert len(store.recent("MZ1", 100)) == 50
+    assert store.recent("MZ2", 3) == []
+
+def test_retained_bytes_follow_the_messages():
+    store = MemoryConversationStore()
+    assert store.retained_bytes() == 0
+    store.append("MZ1", Message("caller", "x" * 1000))
+    one = store.retained_bytes()
+    assert one > 1000
+    store.append("MZ2", Message("caller", "x" * 1000))
+    assert store.retained_bytes() == 2 * one
+    store.delete("MZ1")
+    assert store.retained_bytes() == one
+    # Setting state touches the record but holds no extra messages
+    store.set_state("MZ2", "ending")
+    assert store.retained_bytes() == one
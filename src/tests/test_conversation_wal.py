@@ -0,0 +1,112 @@
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.services.conversation_wal import (
+    CLOSE, LOCK_FILE, MESSAGE, START, STATE, ConversationWAL, recover_orphaned_conversations, replay
+)
+
+class _Tickets:
+    def __init__(self, ok: bool = True):
+        self.ok = ok
+        self.made = []
+
+    def make_ticket(self, conversation, caller_number):
+        self.made.append((conversation, caller_number))
+        return self.ok
+
+def _orphan(root, name, events):
+    """A log directory left behind by a worker that died"""
+    directory = root / name
+    directory.mkdir(parents=True)
+    (directory / LOCK_FILE).touch()
+    (directory / "000001.log").write_text("".join(json.dumps(event) + "\n" for event in events))
+    return directory
+
+OPEN_CALL = [
+    [START, "MZ1", 1700000000.0, "+15550100"],
+    [MESSAGE, "MZ1", 1700000001.0, "caller", "my order is late"],
+    [STATE, "MZ1", 1700000002.0, "awaiting_answer_feedback"],
+    [START, "MZ2", 1700000003.0, None],
+    [CLOSE, "MZ2", 1700000004.0],
+]
+
+def test_replay_keeps_open_calls_and_skips_torn_writes(tmp_path):
+    directory = _orphan(tmp_path, "1234-abc", OPEN_CALL)
+    with open(directory / "000001.log", "a") as f:
+        f.write('["message", "MZ1", 17000')
+    calls = replay(directory)
+    assert list(calls) == ["MZ1"]
+    call = calls["MZ1"]
+    assert call["caller_number"] == "+15550100"
+    assert call["state"]["state"] == "awaiting_answer_feedback"
+    assert [m["content"] for m in call["messages"]] == ["my order is late"]
+    assert call["messages"][0]["timestamp"] == "2023-11-14T22:13:21+00:00"
+
+def test_log_writes_what_was_queued(tmp_path):
+    wal = ConversationWAL(str(tmp_path))
+    wal.log(START, "MZ1", None)
+    wal.log(MESSAGE, "MZ1", "caller", "hello")
+    wal.close()
+    assert [m["content"] for m in replay(wal.directory)["MZ1"]["messages"]] == ["hello"]
+
+def test_segments_are_pruned_once_their_calls_close(tmp_path):
+    wal = ConversationWAL(str(tmp_path), segment_bytes=1)
+    wal.close()  # Commit batches by hand instead, one segment each
+    wal._commit([(START, "MZ1", 0.0, None)])
+    wal._commit([(MESSAGE, "MZ1", 1.0, "caller", "hello")])
+    wal._commit([(START, "MZ2", 2.0, None)])
+    wal._commit([(CLOSE, "MZ1", 3.0)])
+    wal._segment.close()
+    assert sorted(p.name for p in wal.directory.glob("*.log")) == ["000003.log", "000004.log"]
+    assert list(replay(wal.directory)) == ["MZ2"]
+
+def test_each_writer_gets_its_own_directory(tmp_path):
+    orphan = _orphan(tmp_path, f"{os.getpid()}-0123456789ab", OPEN_CALL)
+    before = (orphan / "000001.log").read_bytes()
+    wal = ConversationWAL(str(tmp_path))
+    wal.log(START, "MZ9", None)
+    wal.close()
+    assert wal.directory != orphan
+    assert wal.directory.name.startswith(f"{os.getpid()}-")
+    assert (orphan / "000001.log").read_bytes() == before
+
+def test_recovers_dead_worker_with_reused_pid(tmp_path):
+    # The dead worker had the PID this process has now, and this process is logging too
+    _orphan(tmp_path, f"{os.getpid()}-0123456789ab", OPEN_CALL)
+    wal = ConversationWAL(str(tmp_path))
+    wal.log(START, "MZ9", None)
+    wal.log(MESSAGE, "MZ9", "caller", "still talking")
+
+    tickets = _Tickets()
+    assert recover_orphaned_conversations(str(tmp_path), tickets) == 1
+    [(conversation, caller_number)] = tickets.made
+    assert caller_number == "+15550100"
+    assert conversation[0] == {"metadata": {"state": "awaiting_answer_feedback",
+                                            "state_updated_at": "2023-11-14T22:13:22+00:00"}}
+    assert [d.name for d in tmp_path.iterdir()] == [wal.directory.name]
+
+    # The live worker's own log is locked, so a second pass leaves it alone
+    assert recover_orphaned_conversations(str(tmp_path), tickets) == 0
+    wal.close()
+    assert list(replay(wal.directory)) == ["MZ9"]
+
+def test_interrupted_recovery_is_picked_up_and_failures_kept(tmp_path):
+    _orphan(tmp_path, "recovering-4321-0123456789ab", OPEN_CALL)
+    tickets = _Tickets(ok=False)
+    assert recover_orphaned_conversations(str(tmp_path), tickets) == 0
+    assert len(tickets.made) == 1
+    saved = json.loads((tmp_path / "unrecovered" / "MZ1.json").read_text())
+    assert saved["caller_number"] == "+15550100"
+    assert [d.name for d in tmp_path.iterdir()] == ["unrecovered"]
+
+def test_legacy_pid_directories(tmp_path):
+    _orphan(tmp_path, str(os.getpid()), OPEN_CALL)
+    (tmp_path / str(os.getpid()) / LOCK_FILE).unlink()
+    tickets = _Tickets()
+    # Named after a live PID and without a lock, so it cannot be told apart from a running worker
+    assert recover_orphaned_conversations(str(tmp_path), tickets) == 0
+    (tmp_path / str(os.getpid())).rename(tmp_path / "999999999")
+    assert recover_orphaned_conversations(str(tmp_path), tickets) == 1
+    assert list(tmp_path.iterdir()) == []
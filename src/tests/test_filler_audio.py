@@ -0,0 +1,73 @@
+import asyncio
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.services.audio_clip_cache import LOOKUP_CLIP, AudioClipCache
+from src.services.filler_audio import FILLER_OUTCOMES, FillerAudio
+from src.services.socket_writer import QueuedSocketWriter
+from src.utils.audio import ulaw_tone
+
+def _cache(tmp_path) -> AudioClipCache:
+    # Ten 20ms payloads
+    (tmp_path / f"{LOOKUP_CLIP}.ulaw").write_bytes(ulaw_tone(200))
+    return AudioClipCache(tmp_path, frames_per_payload=1)
+
+async def _run(tmp_path, lookup_seconds: float, audio_pending: bool = False, interrupt_after: float = None):
+    """Run a lookup under the filler; returns the Twilio events sent, in order"""
+    sent = []
+
+    async def send(message):
+        sent.append(json.loads(message)["event"])
+
+    writer = QueuedSocketWriter("twilio", send)
+    writer.start()
+    filler = FillerAudio(writer, lambda: "MZ1", lambda: audio_pending, threshold=0.05, cache=_cache(tmp_path))
+
+    async def lookup():
+        await asyncio.sleep(lookup_seconds)
+
+    async with filler.while_waiting():
+        if interrupt_after is None:
+            await lookup()
+        else:
+            await asyncio.sleep(interrupt_after)
+            await filler.interrupt()
+            await lookup()
+    await writer.close()
+    return sent
+
+def _outcome(name: str) -> float:
+    return FILLER_OUTCOMES.labels(name).value
+
+def test_fast_lookup_plays_nothing(tmp_path):
+    before = _outcome("not_needed")
+    assert asyncio.run(_run(tmp_path, 0.01)) == []
+    assert _outcome("not_needed") == before + 1
+
+def test_slow_lookup_is_cut_short_and_cleared(tmp_path):
+    before = _outcome("cut_short")
+    sent = asyncio.run(_run(tmp_path, 0.12))
+    assert 0 < sent.count("media") < 10
+    assert sent[-1] == "clear"
+    assert _outcome("cut_short") == before + 1
+
+def test_clip_played_to_the_end_is_not_cleared(tmp_path):
+    before = _outcome("played")
+    sent = asyncio.run(_run(tmp_path, 0.6))
+    assert sent == ["media"] * 10
+    assert _outcome("played") == before + 1
+
+def test_skipped_while_the_caller_still_hears_audio(tmp_path):
+    before = _outcome("skipped")
+    assert asyncio.run(_run(tmp_path, 0.12, audio_pending=True)) == []
+    assert _outcome("skipped") == before + 1
+
+def test_caller_interrupting_stops_it(tmp_path):
+    before = _outcome("interrupted")
+    sent = asyncio.run(_run(tmp_path, 0.2, interrupt_after=0.1))
+    assert sent[-1] == "clear"
+    # Nothing more is sent once it has been interrupted
+    assert sent.count("clear") == 1 and sent.count("media") < 10
+    assert _outcome("interrupted") == before + 1
@@ -0,0 +1,79 @@
+import random
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.fakes.corpus import SyntheticCorpus
+from src.utils.html_text import html_to_text, html_to_text_bs4, html_to_text_many
+
+# Markup that has tripped up text extractors, each paired with BeautifulSoup's answer by the test
+PARITY_CASES = [
+    None,
+    "",
+    "   ",
+    "plain text",
+    "How to reset your <b>password</b>",
+    "<p>one</p><p>two</p>",
+    "a<b>b</b>c",
+    "<div>\n  <p>  spaced\t\tout  </p>\n</div>",
+    "Fish &amp; chips &lt;tag&gt; &quot;quoted&quot; &nbsp;non&nbsp;breaking",
+    "x&amp;y&ampz &unknown; &foo &#65;&#x42;&#X43; &#150; &#129; &#0; &#1114112;",
+    "caf&eacute; na&iuml;ve &#8212; em dash &hellip;",
+    "<script>var a = '<p>not text</p>';</script>after",
+    "<style>p { color: red }</style><p>styled</p>",
+    "<template><p>hidden <b>deep</b></p></template>shown",
+    "<ruby>漢<rp>(</rp><rt>kan</rt><rp>)</rp></ruby>",
+    "<!-- a comment --><p>text<!-- inner --> more</p>",
+    "<!DOCTYPE html><html><head><title>T</title></head><body>B</body></html>",
+    "<?xml version='1.0'?><p>pi</p>",
+    "<![CDATA[raw <b>cdata</b>]]> after",
+    "<template><![CDATA[cdata in template]]></template>",
+    "line<br>break<br/>again<br />end",
+    "a<br>b</br>c",
+    "a<br>b<br/>c</br>d",
+    "<img src='x.png' alt='alt text'>caption",
+    "<p>unclosed <b>bold <i>italic</p> tail",
+    "</p>stray close</div> tags",
+    "<p/>self-closed<div/>div",
+    "<script/>visible?<p>yes</p>",
+    "<rt>a<p>b</rt>c",
+    "<template><script>x</script>y</template>z",
+    "<ul><li>Step 1</li><li>Step 2</li></ul>",
+    "<table><tr><td>cell</td><td>other</td></tr></table>",
+    "<a href=\"https://help.example.com/1\">this guide</a> &amp; more",
+    "<p>unterminated <b",
+    "text < not a tag > and 5 < 6",
+    "<P>Upper</P><BR>CASE",
+    "<o:p>office</o:p> markup",
+    "&",
+    "&#",
+    "&#x;",
+    "<<<>>>",
+    "<p>  unicode spaces　</p>",
+]
+
+def test_parity_cases():
+    for html in PARITY_CASES:
+        assert html_to_text(html) == html_to_text_bs4(html), html
+
+def test_parity_synthetic_corpus():
+    corpus = SyntheticCorpus(size=200, seed=7)
+    for article in corpus.ordered():
+        assert html_to_text(article.html) == html_to_text_bs4(article.html)
+        assert html_to_text(article.title) == html_to_text_bs4(article.title)
+
+def test_parity_random_markup():
+    # Shuffled fragments of the cases above, to reach tag stacks nobody thought to write down
+    rnd = random.Random(1)
+    fragments = [case for case in PARITY_CASES if case]
+    pieces = [piece for case in fragments for piece in case.replace(">", ">\x00").replace("<", "\x00<").split("\x00")]
+    for _ in range(2000):
+        html = "".join(rnd.choice(pieces) for _ in range(rnd.randint(1, 12)))
+        assert html_to_text(html) == html_to_text_bs4(html), html
+
+def test_many_matches_single():
+    corpus = SyntheticCorpus(size=80, seed=3)
+    htmls = [article.html for article in corpus.ordered()] + [None, ""]
+    expected = [html_to_text(html) for html in htmls]
+    assert html_to_text_many(htmls) == expected
+    assert html_to_text_many(htmls, processes=2, chunksize=4) == expected
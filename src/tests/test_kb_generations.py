@@ -0,0 +1,114 @@
+import asyncio
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import pytest
+from pinecone import Pinecone
+
+from src.services.article_service import KayakoArticleService
+from src.services.auth_service import KayakoAuthService
+from src.services.chunk_store import ChunkStore
+from src.services.kb_generations import POINTER, GenerationStore
+from src.services.kb_ingest import IngestPipeline
+from src.services.search_service import KnowledgeBaseSearchService, create_embeddings, open_index
+from src.utils.resilience import CircuitBreaker, Dependency, RetryBudget
+
+def test_nothing_published_yet(tmp_path):
+    store = GenerationStore(str(tmp_path))
+    assert store.current() is None and store.live_chunk_ids() is None and store.version() is None
+
+def test_publish_makes_the_next_generation_current(tmp_path):
+    store = GenerationStore(str(tmp_path))
+    first = store.publish({1: ["article_1_chunk_a"], 2: []})
+    second = store.publish({1: ["article_1_chunk_b"], 3: {"article_3_chunk_c"}})
+    assert (first.number, second.number) == (1, 2)
+    # Articles without chunks are left out
+    assert first.articles == {1: {"article_1_chunk_a"}}
+    current = store.current()
+    assert (current.number, current.articles) == (2, {1: {"article_1_chunk_b"}, 3: {"article_3_chunk_c"}})
+    assert store.live_chunk_ids() == (2, frozenset({"article_1_chunk_b", "article_3_chunk_c"}))
+
+def test_version_changes_with_every_publish(tmp_path):
+    store = GenerationStore(str(tmp_path))
+    versions = [store.version()]
+    for i in range(3):
+        store.publish({1: [f"article_1_chunk_{i}"]})
+        versions.append(store.version())
+    assert len(set(versions)) == 4
+
+def test_only_the_last_few_manifests_are_kept(tmp_path):
+    store = GenerationStore(str(tmp_path), keep=2)
+    for i in range(5):
+        store.publish({1: [f"article_1_chunk_{i}"]})
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["00000004.json", "00000005.json", POINTER]
+
+def _isolated(service: KnowledgeBaseSearchService) -> KnowledgeBaseSearchService:
+    budget = RetryBudget()
+    service.embeddings_dependency = Dependency("embeddings", 1.0, retries=0, breaker=CircuitBreaker("embeddings"), budget=budget)
+    service.pinecone_dependency = Dependency("pinecone", 1.0, retries=0, breaker=CircuitBreaker("pinecone"), budget=budget)
+    return service
+
+def _publish_at(store: GenerationStore, ids, seconds_ago: float) -> None:
+    store.publish({1: ids})
+    published = time.time() - seconds_ago
+    os.utime(store.pointer, (published, published))
+
+@pytest.fixture
+def generations(kb_fakes, monkeypatch):
+    directory = kb_fakes.directory / "generations"
+    monkeypatch.setenv("KB_GENERATIONS_DIR", str(directory))
+    monkeypatch.setenv("KB_GENERATION_GRACE_SECONDS", "1")
+    return GenerationStore(str(directory))
+
+def test_service_loads_the_generation_before_its_first_search(generations):
+    generations.publish({1: ["article_1_chunk_a"]})
+    service = KnowledgeBaseSearchService()
+    assert service.live_chunk_ids == frozenset({"article_1_chunk_a"})
+
+def test_fresh_generation_loads_in_the_background(generations):
+    generations.publish({1: ["article_1_chunk_a"]})
+    service = KnowledgeBaseSearchService()
+    _publish_at(generations, ["article_1_chunk_b"], seconds_ago=0)
+    # The search that notices it carries on with the one it has
+    with service._generation_lock:
+        service._refresh_generation()
+        assert service.live_chunk_ids == frozenset({"article_1_chunk_a"})
+    service._refresh_generation()
+    for _ in range(100):
+        if service.live_chunk_ids == frozenset({"article_1_chunk_b"}):
+            break
+        time.sleep(0.01)
+    assert service.live_chunk_ids == frozenset({"article_1_chunk_b"})
+
+def test_idle_worker_swaps_before_searching(generations):
+    generations.publish({1: ["article_1_chunk_a"]})
+    service = KnowledgeBaseSearchService()
+    # Published longer ago than half the grace period, so the old chunks may be gone already
+    _publish_at(generations, ["article_1_chunk_b"], seconds_ago=0.6)
+    service._refresh_generation()
+    assert service.live_chunk_ids == frozenset({"article_1_chunk_b"})
+
+def test_searches_after_an_idle_spell_find_the_new_chunks(kb_fakes, generations):
+    store = ChunkStore(os.environ["KB_CHUNK_STORE"])
+    pipeline = IngestPipeline(KayakoArticleService(KayakoAuthService()), create_embeddings(),
+                              open_index(Pinecone(api_key="test")), store=store, generations=generations,
+                              grace_seconds=1.0, allow_estimated_tokens=True)
+    asyncio.run(pipeline.run())
+    service = _isolated(KnowledgeBaseSearchService())
+    published = [a for a in kb_fakes.corpus.ordered() if a.status == "PUBLISHED"]
+    assert service.search(published[0].title)
+
+    # Rewrite every article while the worker is idle; the sync deletes the old chunks after its grace
+    for article in published:
+        kb_fakes.corpus.edit(article.id)
+    asyncio.run(pipeline.run())
+    indexed = kb_fakes.vector_ids()
+    for article in published[:5]:
+        results = service.search(article.title, top_k=3)
+        assert len(results) == 3
+        assert all(r["content"] != "No content available" for r in results)
+    assert service.live_chunk_ids == frozenset(indexed)
+    service.chunk_store.close()
+    store.close()
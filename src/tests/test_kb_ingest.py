@@ -0,0 +1,152 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import numpy as np
+import pytest
+from pinecone import Pinecone
+
+from src.services.article_service import KayakoArticleService
+from src.services.auth_service import KayakoAuthService
+from src.services.chunk_store import ChunkStore
+from src.services.kb_ingest import IngestCheckpoint, IngestPipeline, list_article_chunks
+from src.services.search_service import create_embeddings, open_index
+
+class _FailingIndex:
+    """The index, with every upsert after the first `upserts` failing as if the process had died"""
+
+    def __init__(self, index, upserts: int):
+        self._index = index
+        self._upserts = upserts
+
+    def upsert(self, **kwargs):
+        if self._upserts <= 0:
+            raise ConnectionError("sync killed")
+        self._upserts -= 1
+        return self._index.upsert(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._index, name)
+
+class _CountingEmbeddings:
+    """The embeddings client, counting the texts this pipeline embeds"""
+
+    def __init__(self):
+        self._embeddings = create_embeddings()
+        self.texts = 0
+
+    def embed_documents(self, texts):
+        self.texts += len(texts)
+        return self._embeddings.embed_documents(texts)
+
+def _index():
+    return open_index(Pinecone(api_key="test"))
+
+def _pipeline(index=None, embeddings=None, **kwargs) -> IngestPipeline:
+    # Small pages and batches so a 30 article corpus still goes through several of each
+    options = {"page_size": 7, "upsert_batch_size": 5, "embed_batch_tokens": 2000, "allow_estimated_tokens": True}
+    options.update(kwargs)
+    return IngestPipeline(KayakoArticleService(KayakoAuthService()), embeddings or create_embeddings(),
+                          index or _index(), **options)
+
+def _sync(**kwargs):
+    return asyncio.run(_pipeline(**kwargs).run())
+
+def _published(kb_fakes) -> set:
+    return {a.id for a in kb_fakes.corpus.ordered() if a.status == "PUBLISHED"}
+
+def _by_article(ids) -> dict:
+    articles = {}
+    for vector_id in ids:
+        articles.setdefault(int(vector_id.split("_", 2)[1]), set()).add(vector_id)
+    return articles
+
+def test_sync_indexes_every_published_article(kb_fakes):
+    stats = _sync()
+    assert stats.updated == len(_published(kb_fakes))
+    assert set(_by_article(kb_fakes.vector_ids())) == _published(kb_fakes)
+    assert stats.chunks == len(kb_fakes.vector_ids())
+
+def test_second_sync_embeds_nothing(kb_fakes):
+    _sync()
+    before, embedded = kb_fakes.vector_ids(), kb_fakes.embeddings.inputs_embedded
+    stats = _sync()
+    assert (stats.updated, stats.unchanged) == (0, len(_published(kb_fakes)))
+    assert kb_fakes.embeddings.inputs_embedded == embedded
+    assert kb_fakes.vector_ids() == before
+
+def test_edited_and_removed_articles_are_synced(kb_fakes, tmp_path):
+    store = ChunkStore(str(tmp_path / "store.sqlite3"))
+    _sync(store=store)
+    edited, removed, *_ = sorted(_published(kb_fakes))
+    before = _by_article(kb_fakes.vector_ids())
+    kb_fakes.corpus.edit(edited)
+    kb_fakes.corpus.remove(removed)
+
+    stats = _sync(store=store)
+    after = _by_article(kb_fakes.vector_ids())
+    assert (stats.updated, stats.deleted) == (1, 1)
+    assert removed not in after and removed not in store.article_ids()
+    assert after[edited] != before[edited]
+    assert set(store.get_many(sorted(after[edited]))) == after[edited]
+    assert {a: ids for a, ids in after.items() if a != edited} == {
+        a: ids for a, ids in before.items() if a not in (edited, removed)
+    }
+    store.close()
+
+def test_partly_written_article_is_rewritten(kb_fakes):
+    _sync()
+    namespace = kb_fakes.pinecone.namespace("")
+    article_id = min(_published(kb_fakes))
+    # One chunk left over from the version before, as a sync that died mid-article leaves it
+    namespace.metadata[sorted(_by_article(namespace.values)[article_id])[0]]["updated_at"] = "2020-01-01T00:00:00+00:00"
+    stats = _sync()
+    assert stats.updated == 1
+    assert all(namespace.metadata[i]["updated_at"] != "2020-01-01T00:00:00+00:00" for i in namespace.values)
+
+def test_crashed_sync_resumes_from_its_checkpoint(kb_fakes, tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    with pytest.raises(ConnectionError):
+        _sync(index=_FailingIndex(_index(), upserts=4), checkpoint=IngestCheckpoint(str(path)),
+              upsert_concurrency=1)
+    checkpoint = IngestCheckpoint(str(path))
+    done = set(checkpoint.done)
+    assert done and checkpoint.dirty
+
+    # Embeddings the dead sync had in flight may still land on the fake, so count this sync's own
+    embeddings = _CountingEmbeddings()
+    stats = _sync(checkpoint=checkpoint, embeddings=embeddings)
+    published = _published(kb_fakes)
+    assert stats.unchanged == len(done)
+    assert stats.updated == len(published - done)
+    assert set(_by_article(kb_fakes.vector_ids())) == published
+    # Only the articles that were not done are embedded again
+    assert embeddings.texts == stats.chunks
+    assert not path.exists()
+
+def _seed_removed_articles(kb_fakes, articles: int, chunks: int) -> set:
+    """Chunks of articles the help center no longer has, written straight into the fake index"""
+    namespace = kb_fakes.pinecone.namespace("")
+    ids = set()
+    for article_id in range(90000, 90000 + articles):
+        for chunk in range(chunks):
+            vector_id = f"article_{article_id}_chunk_{chunk:016x}"
+            namespace.upsert(vector_id, np.ones(namespace.dimension), {"article_id": article_id, "chunk_index": chunk})
+            ids.add(vector_id)
+    return ids
+
+def test_listing_pages_through_every_id(kb_fakes):
+    # Several pages of the list endpoint's 100 ids
+    seeded = _seed_removed_articles(kb_fakes, articles=25, chunks=12)
+    listed = list_article_chunks(_index(), "article_9")
+    assert set().union(*listed.values()) == seeded
+    assert all(len(ids) == 12 for ids in listed.values())
+
+def test_sync_deletes_every_removed_article(kb_fakes):
+    _sync()
+    indexed = kb_fakes.vector_ids()
+    _seed_removed_articles(kb_fakes, articles=25, chunks=12)
+    stats = _sync()
+    assert stats.deleted == 25
+    assert kb_fakes.vector_ids() == indexed
@@ -0,0 +1,107 @@
+import asyncio
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.services.kb_prefetch import PREFETCH_OUTCOMES, KnowledgeBasePrefetcher, query_terms
+from src.utils.resilience import Deadline
+
+class _Search:
+    """Stands in for the search service; each search takes `delay` seconds"""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False, results=None):
+        self.delay = delay
+        self.fail = fail
+        self.results = [{"title": "Reset your password"}] if results is None else results
+        self.queries = []
+
+    def search(self, query, top_k=3, deadline=None):
+        self.queries.append(query)
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("down")
+        return self.results
+
+    def answer_from_chunks(self, query, chunks):
+        return f"{query}: {chunks[0]['title']}"
+
+def _prefetcher(search: _Search, **kwargs) -> KnowledgeBasePrefetcher:
+    return KnowledgeBasePrefetcher(lambda: search, min_overlap=0.6, **kwargs)
+
+def test_query_terms_drop_filler_and_stem():
+    assert query_terms("Hi, um, how do I go about resetting my password?") == {"go", "about", "reset", "passw"}
+    assert query_terms("yes please") == frozenset()
+
+def test_short_transcripts_are_not_prefetched():
+    async def run():
+        prefetcher = _prefetcher(_Search())
+        return prefetcher.start("yeah okay"), prefetcher.start("hello?")
+
+    assert asyncio.run(run()) == (False, False)
+
+def test_matching_query_uses_the_prefetch_once():
+    async def run():
+        search = _Search()
+        prefetcher = _prefetcher(search)
+        prefetcher.start("Hi, I'm trying to reset my password for the admin account")
+        first = await prefetcher.answer("reset password")
+        second = await prefetcher.answer("reset password")
+        return search, first, second
+
+    before = PREFETCH_OUTCOMES.labels("hit").value
+    search, first, second = asyncio.run(run())
+    assert first == "reset password: Reset your password"
+    assert second is None
+    assert len(search.queries) == 1
+    assert PREFETCH_OUTCOMES.labels("hit").value == before + 1
+
+def test_unrelated_query_misses():
+    async def run():
+        prefetcher = _prefetcher(_Search())
+        prefetcher.start("How do I reset my password")
+        await asyncio.sleep(0.01)
+        return await prefetcher.answer("billing invoice overdue")
+
+    before = PREFETCH_OUTCOMES.labels("miss").value
+    assert asyncio.run(run()) is None
+    assert PREFETCH_OUTCOMES.labels("miss").value == before + 1
+
+def test_failed_empty_and_late_prefetches_fall_through():
+    async def answer(search, deadline=None):
+        prefetcher = _prefetcher(search)
+        prefetcher.start("How do I reset my password")
+        return await prefetcher.answer("reset my password", deadline)
+
+    assert asyncio.run(answer(_Search(fail=True))) is None
+    assert asyncio.run(answer(_Search(results=[]))) is None
+    started = time.monotonic()
+    assert asyncio.run(answer(_Search(delay=0.3), Deadline.after(0.05))) is None
+    assert time.monotonic() - started < 0.5
+
+def test_waits_for_a_prefetch_in_flight():
+    async def run():
+        prefetcher = _prefetcher(_Search(delay=0.05))
+        prefetcher.start("How do I reset my password")
+        return await prefetcher.answer("reset password", Deadline.after(1))
+
+    assert asyncio.run(run()) == "reset password: Reset your password"
+
+def test_oldest_prefetch_is_dropped_and_counted_unused():
+    async def run():
+        prefetcher = _prefetcher(_Search(), max_pending=2)
+        prefetcher.start("reset my password")
+        prefetcher.start("export billing invoices")
+        prefetcher.start("configure webhook integration")
+        await asyncio.sleep(0.01)
+        dropped = await prefetcher.answer("reset password")
+        kept = await prefetcher.answer("export invoices")
+        prefetcher.close()
+        return dropped, kept
+
+    before = PREFETCH_OUTCOMES.labels("unused").value
+    dropped, kept = asyncio.run(run())
+    assert dropped is None
+    assert kept == "export invoices: Reset your password"
+    # The first was dropped for room and the webhook one at close
+    assert PREFETCH_OUTCOMES.labels("unused").value == before + 2
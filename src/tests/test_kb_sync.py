@@ -0,0 +1,119 @@
+import asyncio
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import pytest
+from pinecone import Pinecone
+
+from src.services.article_service import KayakoArticleService
+from src.services.auth_service import KayakoAuthService
+from src.services.kb_ingest import IngestPipeline
+from src.services.kb_sync import KB_SYNC_INTERVAL, KnowledgeBaseSync
+from src.services.search_service import create_embeddings, open_index
+
+def _sync(kb_fakes, **kwargs) -> KnowledgeBaseSync:
+    article_service = KayakoArticleService(KayakoAuthService())
+    pipeline = IngestPipeline(article_service, create_embeddings(), open_index(Pinecone(api_key="test")),
+                              allow_estimated_tokens=True)
+    return KnowledgeBaseSync(article_service, pipeline, str(kb_fakes.directory / "kb_sync.json"), **kwargs)
+
+def _state(kb_fakes) -> dict:
+    return json.loads((kb_fakes.directory / "kb_sync.json").read_text())
+
+def _published(kb_fakes) -> list:
+    return sorted(a.id for a in kb_fakes.corpus.ordered() if a.status == "PUBLISHED")
+
+def _indexed_articles(kb_fakes) -> set:
+    return {int(i.split("_", 2)[1]) for i in kb_fakes.vector_ids()}
+
+def test_first_poll_is_a_full_sync(kb_fakes):
+    assert asyncio.run(_sync(kb_fakes).poll())
+    assert _indexed_articles(kb_fakes) == set(_published(kb_fakes))
+    assert _state(kb_fakes) == {
+        "high_water": max(a.updated_at for a in kb_fakes.corpus.ordered()),
+        "articles": _published(kb_fakes),
+    }
+
+def test_poll_with_nothing_changed_loads_nothing(kb_fakes):
+    asyncio.run(_sync(kb_fakes).poll())
+    state, embedded = _state(kb_fakes), kb_fakes.embeddings.inputs_embedded
+    # A restarted worker picks up from the saved cursor
+    assert not asyncio.run(_sync(kb_fakes).poll())
+    assert kb_fakes.embeddings.inputs_embedded == embedded
+    assert _state(kb_fakes) == state
+
+def test_poll_syncs_only_what_changed_since_the_cursor(kb_fakes):
+    sync = _sync(kb_fakes)
+    asyncio.run(sync.poll())
+    edited, unpublished, removed, *_ = _published(kb_fakes)
+    before = kb_fakes.vector_ids()
+    article = kb_fakes.corpus.edit(edited)
+    kb_fakes.corpus.articles[unpublished].status = "DRAFT"
+    kb_fakes.corpus.remove(removed)
+
+    loaded = []
+    load_article = sync.pipeline.article_service.load_article
+    sync.pipeline.article_service.load_article = lambda summary, **kwargs: (
+        loaded.append(int(summary["id"])) or load_article(summary, **kwargs)
+    )
+    assert asyncio.run(sync.poll())
+    assert loaded == [edited]
+    assert _indexed_articles(kb_fakes) == set(_published(kb_fakes))
+    # The other articles' chunks were left as they were
+    untouched = {i for i in kb_fakes.vector_ids() if not i.startswith(f"article_{edited}_")}
+    assert untouched <= before
+    assert _state(kb_fakes)["high_water"] == article.updated_at
+
+def test_new_article_with_an_old_timestamp_is_synced(kb_fakes):
+    sync = _sync(kb_fakes)
+    asyncio.run(sync.poll())
+    article = kb_fakes.corpus.add()
+    article.status = "PUBLISHED"
+    article.updated_at = "2020-01-01T00:00:00+00:00"
+    assert asyncio.run(sync.poll())
+    assert article.id in _indexed_articles(kb_fakes)
+    assert _state(kb_fakes)["high_water"] > article.updated_at
+
+def test_failed_poll_keeps_the_cursor(kb_fakes):
+    sync = _sync(kb_fakes)
+    asyncio.run(sync.poll())
+    state = _state(kb_fakes)
+    edited = _published(kb_fakes)[0]
+    kb_fakes.corpus.edit(edited)
+
+    async def fail(changed, removed=()):
+        raise ConnectionError("embeddings down")
+
+    sync.pipeline.sync_articles = fail
+    with pytest.raises(ConnectionError):
+        asyncio.run(sync.poll())
+    assert _state(kb_fakes) == state
+
+    # The next worker to start redoes the change
+    retry = _sync(kb_fakes)
+    before = {i for i in kb_fakes.vector_ids() if i.startswith(f"article_{edited}_")}
+    assert asyncio.run(retry.poll())
+    assert {i for i in kb_fakes.vector_ids() if i.startswith(f"article_{edited}_")} != before
+
+def test_polls_back_off_while_idle_and_failing(kb_fakes):
+    sync = _sync(kb_fakes, min_interval=0.01, max_interval=0.04, backoff=2.0, jitter=0.0)
+    outcomes = [True, False, False, False, ConnectionError("down"), True]
+    intervals = []
+
+    async def poll():
+        # The wait run_forever chose after the previous poll
+        if len(outcomes) < 6:
+            intervals.append(KB_SYNC_INTERVAL.labels().value)
+        if not outcomes:
+            raise asyncio.CancelledError
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    sync.poll = poll
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(sync.run_forever())
+    assert intervals == [0.01, 0.02, 0.04, 0.04, 0.04, 0.01]
@@ -0,0 +1,77 @@
+import threading
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.utils.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+def _hammer(target, threads: int = 8, per_thread: int = 20000) -> None:
+    workers = [threading.Thread(target=lambda: [target() for _ in range(per_thread)]) for _ in range(threads)]
+    # Switch threads often so unsynchronized updates would be lost
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+def test_histogram_observe_from_threads_loses_nothing():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    _hammer(lambda: histogram.observe(0.5))
+    counts, total, count = histogram.snapshot()
+    assert count == 160000
+    assert counts == [0, 160000, 0]
+    assert abs(total - 80000) < 1e-6
+
+def test_counter_inc_from_threads_loses_nothing():
+    counter = Counter()
+    _hammer(counter.inc)
+    assert counter.value == 160000
+
+def test_gauge_inc_and_dec_from_threads_lose_nothing():
+    gauge = Gauge()
+    gauge.set(5)
+    _hammer(lambda: (gauge.inc(3), gauge.dec(1)))
+    assert gauge.value == 5 + 2 * 160000
+
+def test_gauge_set_replaces_what_came_before():
+    gauge = Gauge()
+    gauge.inc(4)
+    gauge.set(10)
+    gauge.dec(3)
+    assert gauge.value == 7
+    gauge.set(1)
+    assert gauge.value == 1
+
+def test_histogram_quantile():
+    histogram = Histogram(buckets=(0.1, 0.2, 0.4))
+    assert histogram.quantile(0.5) is None
+    for value in (0.05, 0.15, 0.15, 0.3):
+        histogram.observe(value)
+    assert abs(histogram.quantile(0.5) - 0.15) < 1e-9
+    assert 0.2 < histogram.quantile(0.95) <= 0.4
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("calls_total", "Calls", ["outcome"]).labels('ok "quoted"').inc(2)
+    registry.histogram("wait_seconds", "Wait", buckets=(0.5, 1)).observe(0.7)
+    text = registry.render()
+    assert 'calls_total{outcome="ok \\"quoted\\""} 2' in text
+    assert 'wait_seconds_bucket{le="0.5"} 0' in text
+    assert 'wait_seconds_bucket{le="1"} 1' in text
+    assert 'wait_seconds_bucket{le="+Inf"} 1' in text
+    assert "wait_seconds_count 1" in text
+
+def test_labels_are_checked():
+    registry = MetricsRegistry()
+    family = registry.gauge("depth", "Depth", ["direction"])
+    assert family.labels("in") is family.labels("in")
+    try:
+        family.labels("in", "extra")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("wrong label count accepted")
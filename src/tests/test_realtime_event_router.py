@@ -0,0 +1,66 @@
+import asyncio
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.services.realtime_event_router import EVENTS, RealtimeEventRouter, peek_event_type
+
+def test_peek_event_type():
+    assert peek_event_type('{"type":"response.audio.delta","delta":"AAA"}') == "response.audio.delta"
+    assert peek_event_type('{"type": "session.updated"}') == "session.updated"
+    # The first "type" belongs to a nested object, so the scan gives up
+    assert peek_event_type('{"item":{"type":"message"},"type":"conversation.item.created"}') is None
+    assert peek_event_type('{"event_id":"e1"}') is None
+    assert peek_event_type('not json') is None
+
+def _router():
+    router = RealtimeEventRouter()
+    received = []
+
+    @router.on_audio_delta
+    async def audio(delta, item_id):
+        received.append(("audio", delta, item_id))
+
+    @router.on("response.done")
+    async def done(event):
+        received.append(("done", event["response"]["id"]))
+
+    return router, received
+
+def test_audio_delta_fast_path_and_escaped_fallback():
+    router, received = _router()
+    asyncio.run(router.dispatch('{"type":"response.audio.delta","item_id":"item_1","delta":"AAEC"}'))
+    asyncio.run(router.dispatch(json.dumps({"type": "response.audio.delta", "item_id": "item_2", "delta": "a\\/b"})))
+    assert received == [("audio", "AAEC", "item_1"), ("audio", "a\\/b", "item_2")]
+
+def test_handlers_get_decoded_events_and_unhandled_are_counted():
+    router, received = _router()
+    before = EVENTS.labels("rate_limits.updated").value
+    asyncio.run(router.dispatch('{"type":"rate_limits.updated","rate_limits":[]}'))
+    asyncio.run(router.dispatch('{"type":"response.done","response":{"id":"resp_1"}}'))
+    assert received == [("done", "resp_1")]
+    assert EVENTS.labels("rate_limits.updated").value == before + 1
+
+def test_malformed_frames_do_not_raise():
+    router, received = _router()
+    before = EVENTS.labels("invalid").value
+
+    async def run():
+        for message in ("not json", "[1, 2]", '{"event_id": '):
+            await router.dispatch(message)
+        # The read loop carries on with the next event
+        await router.dispatch('{"type":"response.done","response":{"id":"resp_2"}}')
+
+    asyncio.run(run())
+    assert received == [("done", "resp_2")]
+    assert EVENTS.labels("invalid").value == before + 3
+
+def test_handler_errors_are_contained():
+    router = RealtimeEventRouter()
+
+    @router.on("response.done")
+    async def broken(event):
+        raise ValueError("boom")
+
+    asyncio.run(router.dispatch('{"type":"response.done"}'))
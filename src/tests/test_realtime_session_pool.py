@@ -0,0 +1,63 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.fakes.realtime_server import FakeRealtimeConfig, FakeRealtimeServer
+from src.services.realtime_session_pool import RealtimeSessionPool
+
+SESSION_UPDATE = {"type": "session.update", "session": {"voice": "alloy"}}
+
+async def _with_server(test):
+    server = FakeRealtimeServer(FakeRealtimeConfig(session_latency_ms=0))
+    await server.start()
+    try:
+        return await test(server)
+    finally:
+        await server.stop()
+
+async def _filled(pool: RealtimeSessionPool) -> None:
+    for _ in range(200):
+        if len(pool._idle) >= pool.size:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("pool never filled")
+
+def test_claims_warm_session_and_refills():
+    async def test(server):
+        pool = RealtimeSessionPool(server.url, {}, SESSION_UPDATE, size=1)
+        await pool.start()
+        await _filled(pool)
+        async with pool.session() as (ws, warm):
+            assert warm and ws.open
+            await _filled(pool)
+        await pool.stop()
+        return server.connections
+
+    assert asyncio.run(_with_server(test)) == 2
+
+def test_without_pool_opens_a_session_per_claim():
+    async def test(server):
+        pool = RealtimeSessionPool(server.url, {}, SESSION_UPDATE, size=0)
+        await pool.start()
+        async with pool.session() as (ws, warm):
+            assert not warm and ws.open
+        await pool.stop()
+
+    asyncio.run(_with_server(test))
+
+def test_stale_session_is_closed_and_awaited_on_stop():
+    async def test(server):
+        pool = RealtimeSessionPool(server.url, {}, SESSION_UPDATE, size=1, max_idle=0.05, check_interval=60)
+        await pool.start()
+        await _filled(pool)
+        stale = pool._idle[0].ws
+        await asyncio.sleep(0.1)
+        ws, warm = await pool.acquire()
+        assert not warm
+        await pool.stop()
+        assert not pool._closing
+        assert stale.closed
+        await ws.close()
+
+    asyncio.run(_with_server(test))
@@ -0,0 +1,127 @@
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import pytest
+
+from src.utils.resilience import (
+    CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, Dependency, FallbackCache,
+    RetryBudget, is_transient
+)
+
+class _HTTPError(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+def _flaky(failures, error=ConnectionError):
+    """A call that fails the first `failures` times"""
+    calls = []
+
+    def call():
+        calls.append(time.monotonic())
+        if len(calls) <= failures:
+            raise error("down")
+        return "ok"
+
+    return call, calls
+
+def test_deadline_caps_and_expires():
+    deadline = Deadline.after(0.05)
+    assert 0 < deadline.cap(10) <= 0.05
+    assert deadline.cap(0.01) == 0.01
+    deadline.check()
+    time.sleep(0.06)
+    assert deadline.expired and deadline.remaining() == 0
+    with pytest.raises(DeadlineExceeded):
+        deadline.check("the search")
+
+def test_transient_errors():
+    assert is_transient(ConnectionError())
+    assert is_transient(_HTTPError(503)) and is_transient(_HTTPError(429))
+    assert not is_transient(_HTTPError(404))
+
+def test_retry_budget_limits_retries_to_a_share_of_requests():
+    budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=2)
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+    budget.record_request()
+    assert not budget.try_spend()
+    budget.record_request()
+    assert budget.try_spend()
+
+def test_breaker_opens_on_failures_and_probes_once():
+    breaker = CircuitBreaker("test", window=4, min_calls=4, failure_rate=0.5, open_seconds=0.05)
+    for failed in (False, True, False):
+        breaker.record(failed, 0.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record(True, 0.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # Only one probe at a time
+    breaker.record(True, 0.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(False, 0.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_breaker_opens_on_slow_calls():
+    breaker = CircuitBreaker("test", window=2, min_calls=2, slow_call_seconds=0.1, slow_call_rate=1.0)
+    breaker.record(False, 0.5)
+    breaker.record(False, 0.5)
+    assert breaker.state == CircuitBreaker.OPEN
+
+def _dependency(retries=1, **kwargs):
+    budget = RetryBudget(ratio=1, min_per_second=0, max_tokens=10)
+    breaker = CircuitBreaker("test", window=2, min_calls=2, open_seconds=60)
+    return Dependency("test", timeout=1.0, retries=retries, backoff=0.001, breaker=breaker, budget=budget, **kwargs)
+
+def test_dependency_retries_transient_errors():
+    call, calls = _flaky(1)
+    assert _dependency().call(call) == "ok"
+    assert len(calls) == 2
+
+def test_dependency_does_not_retry_client_errors():
+    def call():
+        raise _HTTPError(400)
+
+    dependency = _dependency()
+    with pytest.raises(_HTTPError):
+        dependency.call(call)
+    # The upstream answered, so the breaker does not count it against it
+    assert dependency.breaker._outcomes[-1] == (False, False)
+
+def test_dependency_falls_back_then_rejects_while_open():
+    call, calls = _flaky(10)
+    dependency = _dependency(retries=1)
+    assert dependency.call(call, fallback=lambda: "cached") == "cached"
+    assert len(calls) == 2
+    assert dependency.breaker.state == CircuitBreaker.OPEN
+    assert dependency.call(call, fallback=lambda: "cached") == "cached"
+    assert len(calls) == 2
+    with pytest.raises(CircuitOpenError):
+        dependency.call(call)
+
+def test_dependency_respects_the_deadline():
+    call, calls = _flaky(0)
+    dependency = _dependency()
+    assert dependency.timeout_for(Deadline.after(0.2)) <= 0.2
+    assert dependency.timeout_for(None) == 1.0
+    with pytest.raises(DeadlineExceeded):
+        dependency.call(call, deadline=Deadline(time.monotonic() - 1))
+    assert calls == []
+
+def test_fallback_cache_evicts_least_recently_used():
+    cache = FallbackCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
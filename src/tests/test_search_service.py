@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import pytest
+from pinecone import Pinecone
+
+from src.services.article_service import KayakoArticleService
+from src.services.auth_service import KayakoAuthService
+from src.services.chunk_store import ChunkStore
+from src.services.kb_ingest import IngestPipeline
+from src.services.search_service import (
+    HEDGED_QUERIES, KB_KEYWORD_MATCHES, KB_UNAVAILABLE, KnowledgeBaseSearchService, create_embeddings, open_index
+)
+from src.utils.resilience import CircuitBreaker, Deadline, DeadlineExceeded, Dependency, RetryBudget
+from src.utils.tracing import NOOP_SPAN
+
+def _isolated(service: KnowledgeBaseSearchService) -> KnowledgeBaseSearchService:
+    """Give the service its own breakers, so one test's outage does not trip the next"""
+    budget = RetryBudget()
+    service.embeddings_dependency = Dependency("embeddings", 1.0, retries=0, breaker=CircuitBreaker("embeddings"), budget=budget)
+    service.pinecone_dependency = Dependency("pinecone", 1.0, retries=0, breaker=CircuitBreaker("pinecone"), budget=budget)
+    return service
+
+@pytest.fixture
+def search(kb_fakes):
+    store = ChunkStore(os.environ["KB_CHUNK_STORE"])
+    index = open_index(Pinecone(api_key="test"))
+    pipeline = IngestPipeline(KayakoArticleService(KayakoAuthService()), create_embeddings(), index, store=store,
+                              allow_estimated_tokens=True)
+    asyncio.run(pipeline.run())
+    store.close()
+    service = _isolated(KnowledgeBaseSearchService())
+    yield service
+    service.chunk_store.close()
+
+def _title(kb_fakes) -> str:
+    published = [a for a in kb_fakes.corpus.ordered() if a.status == "PUBLISHED"]
+    return published[0].title
+
+def test_search_reads_text_from_the_chunk_store(search, kb_fakes):
+    title = _title(kb_fakes)
+    results = search.search(title, top_k=3)
+    assert len(results) == 3
+    assert all(r["content"] != "No content available" and r["title"] for r in results)
+
+def test_deadline_cuts_a_slow_search_short(search, kb_fakes):
+    kb_fakes.pinecone.faults.config.latency_ms = 500
+    with pytest.raises(DeadlineExceeded):
+        search.search("reset password", deadline=Deadline.after(0.15))
+
+    started = time.monotonic()
+    answer = search.get_kb_answer("reset password", deadline=Deadline.after(0.15))
+    assert time.monotonic() - started < 0.4
+    assert answer.startswith(KB_KEYWORD_MATCHES)
+
+def test_fallback_prefers_the_last_answer_to_the_question(search, kb_fakes):
+    title = _title(kb_fakes)
+    fresh = search.get_kb_answer(title)
+    kb_fakes.embeddings.faults.config.error_rate = 1.0
+    assert search.get_kb_answer(f"  {title.upper()} ") == fresh
+
+def test_fallback_searches_the_chunk_store_by_keyword(search, kb_fakes):
+    title = _title(kb_fakes)
+    kb_fakes.embeddings.faults.config.error_rate = 1.0
+    answer = search.get_kb_answer(title)
+    assert answer.startswith(KB_KEYWORD_MATCHES)
+    assert f"From article '{title}'" in answer
+    # Keyword matches are not remembered as the answer to the question
+    assert search.answer_cache.get(search._cache_key(title)) is None
+
+def test_fallback_keeps_to_the_published_generation(search, kb_fakes):
+    title = _title(kb_fakes)
+    kb_fakes.embeddings.faults.config.error_rate = 1.0
+    search.live_chunk_ids = frozenset()
+    assert search.get_kb_answer(title) == KB_UNAVAILABLE
+
+def test_nothing_to_fall_back_on(search, kb_fakes):
+    kb_fakes.embeddings.faults.config.error_rate = 1.0
+    assert search.get_kb_answer("zyzzyva quux") == KB_UNAVAILABLE
+
+def _slow_first_query(service, first_delay: float):
+    """Make the first vector query slow and the rest quick"""
+    calls = []
+    lock = threading.Lock()
+
+    def query(vector, top_k, deadline):
+        with lock:
+            calls.append(time.monotonic())
+            first = len(calls) == 1
+        if first:
+            time.sleep(first_delay)
+        return "primary" if first else "hedge"
+
+    service._vector_query = query
+    return calls
+
+def test_slow_query_is_hedged(search):
+    calls = _slow_first_query(search, 0.5)
+    search._hedge_after = lambda: 0.02
+    before = HEDGED_QUERIES.labels("hedge").value
+    assert search._hedged_vector_query([0.0], 3, None, NOOP_SPAN) == "hedge"
+    assert len(calls) == 2 and calls[1] - calls[0] >= 0.02
+    assert HEDGED_QUERIES.labels("hedge").value == before + 1
+
+def test_no_hedge_without_enough_samples(search):
+    calls = _slow_first_query(search, 0.05)
+    search._hedge_after = lambda: None
+    assert search._hedged_vector_query([0.0], 3, None, NOOP_SPAN) == "primary"
+    assert len(calls) == 1
+
+def test_hedged_query_gives_up_at_the_deadline(search):
+    _slow_first_query(search, 0.5)
+    search._hedge_after = lambda: None
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        search._hedged_vector_query([0.0], 3, Deadline.after(0.05), NOOP_SPAN)
+    assert time.monotonic() - started < 0.3
@@ -0,0 +1,115 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.services.socket_writer import QueuedSocketWriter
+
+class _Peer:
+    """A socket whose sends block until released"""
+
+    def __init__(self, blocked: bool = False):
+        self.received = []
+        self.open = asyncio.Event()
+        if not blocked:
+            self.open.set()
+
+    async def send(self, message: str) -> None:
+        await self.open.wait()
+        self.received.append(message)
+
+def test_sends_in_order():
+    async def run():
+        peer = _Peer()
+        writer = QueuedSocketWriter("test", peer.send)
+        writer.start()
+        for i in range(5):
+            await writer.send(str(i))
+        await writer.close()
+        return peer, writer
+
+    peer, writer = asyncio.run(run())
+    assert peer.received == ["0", "1", "2", "3", "4"]
+    assert writer.sent == 5 and writer.dropped == 0
+
+def test_full_queue_drops_oldest_droppable():
+    async def run():
+        peer = _Peer(blocked=True)
+        writer = QueuedSocketWriter("test", peer.send, maxsize=3, droppable={"media"})
+        await writer.send("a", kind="media")
+        await writer.send("mark", kind="mark")
+        await writer.send("b", kind="media")
+        await writer.send("c", kind="media")
+        return [item[1] for item in writer._queue], writer.dropped
+
+    queued, dropped = asyncio.run(run())
+    assert queued == ["mark", "b", "c"]
+    assert dropped == 1
+
+def test_full_queue_waits_for_room_for_undroppable():
+    async def run():
+        peer = _Peer(blocked=True)
+        writer = QueuedSocketWriter("test", peer.send, maxsize=1)
+        writer.start()
+        await writer.send("first")
+        await asyncio.sleep(0)  # The writer takes it and blocks on the peer
+        await writer.send("second")
+        waiting = asyncio.ensure_future(writer.send("third"))
+        await asyncio.sleep(0.01)
+        blocked = not waiting.done()
+        peer.open.set()
+        await asyncio.wait_for(waiting, 1)
+        await writer.close()
+        return blocked, peer.received
+
+    blocked, received = asyncio.run(run())
+    assert blocked
+    assert received == ["first", "second", "third"]
+
+def test_flush_drops_only_given_kinds():
+    async def run():
+        peer = _Peer(blocked=True)
+        writer = QueuedSocketWriter("test", peer.send)
+        for kind in ("media", "mark", "media", "clear"):
+            await writer.send(kind, kind=kind)
+        flushed = writer.flush({"media"})
+        return flushed, [item[1] for item in writer._queue]
+
+    flushed, queued = asyncio.run(run())
+    assert flushed == 2
+    assert queued == ["mark", "clear"]
+
+def test_close_drains_then_drops_what_is_left():
+    async def run():
+        peer = _Peer(blocked=True)
+        writer = QueuedSocketWriter("test", peer.send)
+        writer.start()
+        await writer.send("stuck")
+        await writer.send("queued")
+        await writer.close(drain_timeout=0.05)
+        await writer.send("late")
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer.closed
+    # "queued" at close, "late" after it; "stuck" was being sent when the task was cancelled
+    assert writer.dropped == 2
+    assert writer.depth == 0
+
+def test_send_error_closes_writer():
+    async def run():
+        async def broken(message):
+            raise ConnectionError("gone")
+
+        writer = QueuedSocketWriter("test", broken)
+        writer.start()
+        await writer.send("a")
+        await asyncio.sleep(0.01)
+        await writer.send("b")
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer.closed
+    assert writer.sent == 0
+    assert writer.dropped == 2
@@ -0,0 +1,65 @@
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import pytest
+
+from src.utils.tracing import NOOP_SPAN, ChromeTraceFileExporter, SpanExporter, Tracer
+
+class _Collector(SpanExporter):
+    def __init__(self):
+        self.traces = []
+
+    def export(self, trace):
+        self.traces.append(trace)
+
+def test_exporter_must_implement_export():
+    with pytest.raises(TypeError):
+        SpanExporter()
+
+def test_unsampled_trace_hands_out_noop_spans():
+    collector = _Collector()
+    tracer = Tracer(0.0, [collector])
+    with tracer.trace("call") as root:
+        assert root is NOOP_SPAN
+        with tracer.span("lookup") as span:
+            assert span is NOOP_SPAN
+    assert collector.traces == []
+
+def test_sampled_trace_exports_children():
+    collector = _Collector()
+    tracer = Tracer(1.0, [collector])
+    with tracer.trace("call", trace_id="t1") as root:
+        with tracer.span("lookup", query="refund") as span:
+            assert tracer.current_span() is span
+        late = tracer.start_span("response")
+        late.end()
+        assert tracer.current_span() is root
+    [trace] = collector.traces
+    assert trace.trace_id == "t1"
+    names = {span.name: span for span in trace.spans}
+    assert set(names) == {"call", "lookup", "response"}
+    assert names["lookup"].parent_id == names["call"].span_id
+    assert names["lookup"].attributes == {"query": "refund"}
+
+def test_chrome_exporter_writes_on_shutdown(tmp_path):
+    exporter = ChromeTraceFileExporter(str(tmp_path))
+    tracer = Tracer(1.0, [exporter])
+    with tracer.trace("call", trace_id="MZ/123"):
+        with tracer.span("lookup"):
+            pass
+    tracer.shutdown()
+    with open(tmp_path / "MZ_123.json") as f:
+        data = json.load(f)
+    assert data["otherData"]["trace_id"] == "MZ/123"
+    assert [e["name"] for e in data["traceEvents"] if e["ph"] == "X"] == ["call", "lookup"]
+
+def test_chrome_exporter_drops_when_queue_is_full(tmp_path):
+    exporter = ChromeTraceFileExporter(str(tmp_path), queue_size=1)
+    exporter.shutdown()  # Nothing drains the queue any more
+    tracer = Tracer(1.0, [exporter])
+    for i in range(3):
+        with tracer.trace("call", trace_id=f"t{i}"):
+            pass
+    assert exporter.dropped == 2
@@ -0,0 +1,61 @@
+import math
+from typing import List
+
+# Twilio media streams carry 8kHz, 8-bit G.711 mu-law audio in 20ms frames
+SAMPLE_RATE = 8000
+FRAME_MS = 20
+FRAME_BYTES = SAMPLE_RATE * FRAME_MS // 1000
+ULAW_SILENCE = 0xFF
+
+_ULAW_BIAS = 0x84
+_ULAW_CLIP = 32635
+
+def linear_to_ulaw(sample: int) -> int:
+    """Encode one signed 16-bit PCM sample as a G.711 mu-law byte"""
+    sign = 0x80 if sample < 0 else 0
+    if sample < 0:
+        sample = -sample
+    sample = min(sample, _ULAW_CLIP) + _ULAW_BIAS
+
+    exponent = 7
+    mask = 0x4000
+    while exponent > 0 and not sample & mask:
+        exponent -= 1
+        mask >>= 1
+    mantissa = (sample >> (exponent + 3)) & 0x0F
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+def ulaw_silence(duration_ms: int) -> bytes:
+    """Mu-law encoded silence"""
+    return bytes([ULAW_SILENCE]) * (SAMPLE_RATE * duration_ms // 1000)
+
+def ulaw_tone(duration_ms: int, frequency: float = 440.0, amplitude: int = 8000) -> bytes:
+    """Mu-law encoded sine tone, handy as synthetic speech for tests and fakes"""
+    samples = SAMPLE_RATE * duration_ms // 1000
+    return bytes(
+        linear_to_ulaw(int(amplitude * math.sin(2 * math.pi * frequency * i / SAMPLE_RATE)))
+        for i in range(samples)
+    )
+
+def split_frames(audio: bytes, frame_bytes: int = FRAME_BYTES) -> List[bytes]:
+    """Split audio into fixed-size frames; the last frame is padded with silence"""
+    frames = [audio[i:i + frame_bytes] for i in range(0, len(audio), frame_bytes)]
+    if frames and len(frames[-1]) < frame_bytes:
+        frames[-1] = frames[-1] + bytes([ULAW_SILENCE]) * (frame_bytes - len(frames[-1]))
+    return frames
+
+def ulaw_to_linear(byte: int) -> int:
+    """Decode one G.711 mu-law byte to a signed 16-bit PCM sample"""
+    byte = ~byte & 0xFF
+    exponent = (byte >> 4) & 0x07
+    sample = (((byte & 0x0F) << 3) + _ULAW_BIAS) << exponent
+    sample -= _ULAW_BIAS
+    return -sample if byte & 0x80 else sample
+
+_ULAW_DECODE = [ulaw_to_linear(b) for b in range(256)]
+
+def ulaw_rms(audio: bytes) -> float:
+    """Root mean square level of mu-law audio, e.g. for a crude voice activity check"""
+    if not audio:
+        return 0.0
+    return math.sqrt(sum(_ULAW_DECODE[b] ** 2 for b in audio) / len(audio))
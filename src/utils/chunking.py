@@ -0,0 +1,157 @@
+"""
+Token-sized chunks of help center articles for the knowledge base index.
+
+Chunks are sized in tokens of the embedding model's tokenizer, since that
+is what the model's input limit and the tool answer budget are counted
+in. They break at paragraph (and heading) boundaries where they can and
+at sentence boundaries otherwise, and carry a few sentences over as
+overlap when a paragraph is split. Chunk ids are derived from the text, so
+a chunk whose text did not change keeps its vector id across syncs and an
+edit re-embeds only the chunks it touches, plus any whose boundaries move.
+Appending a sentence re-embeds an article's last chunk; with positional ids
+inserting one near the start re-embedded most of them, and with these about
+one (scripts/bench_chunking.py).
+
+Boundaries depend on the tokenizer, so chunks split with estimated counts
+(tiktoken unavailable) get ids marked "est-" and never share an id with
+chunks split by the real tokenizer.
+"""
+import hashlib
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Iterator, List, Sequence, Tuple
+from .tokens import TokenCounter, token_counter
+
+DEFAULT_MAX_TOKENS = 250
+DEFAULT_OVERLAP_TOKENS = 50
+# Tokenizer of text-embedding-ada-002 and text-embedding-3-*
+DEFAULT_ENCODING = "cl100k_base"
+
+_BLOCK_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+
+def chunk_id(article_id: int, text: str, estimated: bool = False) -> str:
+    """Vector id of a chunk: the same article, text and way of counting tokens always give the same id"""
+    marker = "est-" if estimated else ""
+    return f"article_{article_id}_chunk_{marker}{hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]}"
+
+class TokenChunker:
+    """
+    Split text into chunks of at most max_tokens tokens
+
+    A chunk is closed early at a paragraph boundary once it is at least
+    min_fill full, so headings start chunks rather than end them. When a
+    chunk has to end inside a paragraph, its last sentences (up to
+    overlap_tokens) start the next one too.
+    """
+
+    def __init__(self, max_tokens: int = DEFAULT_MAX_TOKENS, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+                 encoding_name: str = DEFAULT_ENCODING, min_fill: float = 0.5):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.encoding_name = encoding_name
+        self.min_fill = min_fill
+
+    @property
+    def counter(self) -> TokenCounter:
+        # Looked up rather than kept, so the chunker pickles cheaply into pool workers
+        return token_counter(self.encoding_name)
+
+    def _units(self, text: str) -> Iterator[Tuple[str, int, bool]]:
+        """(sentence, tokens, starts a paragraph) for each sentence, with long ones cut to fit"""
+        counter = self.counter
+        for block in _BLOCK_BREAK.split(text):
+            starts_block = True
+            for sentence in _SENTENCE_BREAK.split(block.strip()):
+                if not sentence:
+                    continue
+                tokens = counter.count(sentence)
+                pieces = [sentence] if tokens <= self.max_tokens else counter.split(sentence, self.max_tokens)
+                for piece in pieces:
+                    yield piece, tokens if len(pieces) == 1 else counter.count(piece), starts_block
+                    starts_block = False
+
+    def split(self, text: str) -> List[str]:
+        chunks: List[str] = []
+        current: List[Tuple[str, int, bool]] = []
+        carried = 0  # Leading units of current that repeat the previous chunk
+        size = 0
+
+        def emit():
+            if len(current) > carried:
+                paragraphs: List[List[str]] = []
+                for i, (sentence, _, starts_block) in enumerate(current):
+                    if starts_block or not paragraphs:
+                        paragraphs.append([])
+                    paragraphs[-1].append(sentence)
+                chunks.append("\n\n".join(" ".join(p) for p in paragraphs))
+
+        for unit in self._units(text):
+            _, tokens, starts_block = unit
+            # Every join may cost a token, so sizes count one per sentence on top
+            overflows = size + tokens + 1 > self.max_tokens
+            if current and (overflows or (starts_block and size >= self.max_tokens * self.min_fill)):
+                emit()
+                overlap: List[Tuple[str, int, bool]] = []
+                if not starts_block:
+                    overlap_size = 0
+                    for previous in reversed(current):
+                        if overlap_size + previous[1] + 1 > self.overlap_tokens:
+                            break
+                        overlap.insert(0, previous)
+                        overlap_size += previous[1] + 1
+                    if overlap_size + tokens + 1 > self.max_tokens:
+                        overlap, overlap_size = [], 0
+                current, carried, size = overlap, len(overlap), overlap_size if overlap else 0
+            current.append(unit)
+            size += tokens + 1
+        emit()
+        return chunks
+
+def chunk_article(article, chunker: TokenChunker) -> List[Dict]:
+    """The chunks of one article, with ids and metadata ready to upsert"""
+    if not article.content:
+        return []
+    # The title leads the first chunk, as its own paragraph
+    full_text = f"Title: {article.title}\n\nContent: {article.content}"
+    chunks = []
+    seen: Dict[str, int] = {}
+    estimated = not chunker.counter.exact
+    for i, text in enumerate(chunker.split(full_text)):
+        vector_id = chunk_id(article.id, text, estimated)
+        # The same text twice in one article still needs two ids
+        seen[vector_id] = seen.get(vector_id, 0) + 1
+        if seen[vector_id] > 1:
+            vector_id = f"{vector_id}_{seen[vector_id]}"
+        chunks.append({
+            "id": vector_id,
+            "text": text,
+            "metadata": {
+                "article_id": article.id,
+                "title": article.title,
+                "url": article.helpcenter_url,
+                "chunk_index": i,
+                "updated_at": article.updated_at,
+                "content": text
+            }
+        })
+    return chunks
+
+def chunk_articles(articles: Sequence, chunker: TokenChunker = None, processes: int = 0,
+                   chunksize: int = 8) -> List[Dict]:
+    """
+    Chunks of every article, in article order
+
+    With processes > 1 the articles are split in a process pool; tokenizing
+    is pure CPU, so this is what scales a full sync of a large help center.
+    """
+    chunker = chunker or TokenChunker()
+    split = partial(chunk_article, chunker=chunker)
+    if processes <= 1 or len(articles) < 2 * chunksize:
+        per_article = map(split, articles)
+        return [chunk for chunks in per_article for chunk in chunks]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return [chunk for chunks in pool.map(split, articles, chunksize=chunksize) for chunk in chunks]
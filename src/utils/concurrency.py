@@ -0,0 +1,50 @@
+import asyncio
+import contextvars
+import functools
+import time
+from typing import Any, Callable
+
+async def run_in_thread(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a blocking function in the default executor without stalling the event loop
+
+    Context variables are copied into the worker thread, like asyncio.to_thread
+    (which is only available from Python 3.9).
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(None, call)
+
+class RateLimiter:
+    """
+    Token bucket for coroutines: acquire(n) waits until n units may be spent
+
+    rate is units per second and 0 means no limit. A request larger than the
+    bucket goes through once the bucket is full and leaves it in debt, so
+    one oversized batch is slowed down rather than stuck forever. Waiters
+    are served in order, so small requests cannot starve a large one.
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._lock = None
+
+    async def acquire(self, amount: float = 1) -> None:
+        if not self.rate:
+            return
+        if self._lock is None:
+            # Created on first use, inside the loop that will wait on it
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+                self._refilled_at = now
+                if self._tokens >= min(amount, self.burst):
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((min(amount, self.burst) - self._tokens) / self.rate)
@@ -0,0 +1,161 @@
+"""
+Plain text from help center HTML.
+
+html_to_text gives exactly what BeautifulSoup(html, 'html.parser')
+.get_text(separator=' ') gives after whitespace is collapsed, without
+building a tree: it listens to the same html.parser events and keeps only
+the strings BeautifulSoup would have returned. src/tests/test_html_text.py
+checks the two agree; scripts/bench_html_text.py compares their speed.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import List, Optional, Sequence
+from bs4 import BeautifulSoup
+from bs4.dammit import EntitySubstitution
+
+# Tags whose strings BeautifulSoup gives their own class and get_text skips
+# (HTMLTreeBuilder.DEFAULT_STRING_CONTAINERS)
+_HIDDEN_TEXT_TAGS = frozenset(("rt", "rp", "style", "script", "template"))
+# Tags html.parser never sees closed; BeautifulSoup closes them at once (HTMLTreeBuilder.empty_element_tags)
+_VOID_TAGS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta",
+    "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex",
+    "nextid", "spacer",
+))
+
+class _TextExtractor(HTMLParser):
+    """
+    Collects the strings BeautifulSoup's get_text would return
+
+    Mirrors BeautifulSoupHTMLParser and BeautifulSoup's tag stack closely
+    enough to know, for each string, whether its innermost string container
+    hides it. A string ends at every tag, comment or declaration, as it does
+    in the tree.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.strings: List[str] = []
+        self._data: List[str] = []
+        self._open: List[str] = []
+        # Open hidden-text tags, innermost last, by their index in _open
+        self._hiding: List[int] = []
+        self._closed_void: List[str] = []
+
+    def _end_data(self) -> None:
+        if self._data:
+            if not self._hiding:
+                self.strings.append("".join(self._data))
+            self._data = []
+
+    def handle_starttag(self, tag, attrs):
+        self._start(tag, void_closes=True)
+
+    def handle_startendtag(self, tag, attrs):
+        # BeautifulSoupHTMLParser.handle_startendtag
+        self._start(tag, void_closes=False)
+        self._end(tag, check_closed_void=True)
+
+    def handle_endtag(self, tag):
+        self._end(tag, check_closed_void=True)
+
+    def _start(self, tag: str, void_closes: bool) -> None:
+        self._end_data()
+        if tag in _HIDDEN_TEXT_TAGS:
+            self._hiding.append(len(self._open))
+        self._open.append(tag)
+        if void_closes and tag in _VOID_TAGS:
+            # Closed at once, and a later </tag> is ignored once
+            self._end(tag, check_closed_void=False)
+            self._closed_void.append(tag)
+
+    def _end(self, tag: str, check_closed_void: bool) -> None:
+        if check_closed_void and tag in self._closed_void:
+            # Ignored outright, so the string around it is not even split
+            self._closed_void.remove(tag)
+            return
+        self._end_data()
+        self._pop_to(tag)
+
+    def _pop_to(self, tag: str) -> None:
+        """Close the most recent open tag with this name and everything opened after it"""
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i] == tag:
+                del self._open[i:]
+                while self._hiding and self._hiding[-1] >= i:
+                    self._hiding.pop()
+                return
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_charref(self, name):
+        # Same as BeautifulSoupHTMLParser.handle_charref for str markup
+        number = int(name.lstrip("xX"), 16) if name[0] in "xX" else int(name)
+        data = None
+        if number < 256:
+            try:
+                data = bytearray([number]).decode("windows-1252")
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(number)
+            except (ValueError, OverflowError):
+                pass
+        self._data.append(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name):
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self._data.append(character if character is not None else f"&{name}")
+
+    def handle_comment(self, data):
+        self._end_data()
+
+    def handle_decl(self, decl):
+        self._end_data()
+
+    def handle_pi(self, data):
+        self._end_data()
+
+    def unknown_decl(self, data):
+        self._end_data()
+        if data.upper().startswith("CDATA["):
+            # CDATA sections are text to get_text, even inside hidden-text tags
+            self.strings.append(data[len("CDATA["):])
+
+    def close(self):
+        super().close()
+        self._end_data()
+
+def html_to_text_bs4(html: Optional[str]) -> Optional[str]:
+    """The BeautifulSoup reference html_to_text must match"""
+    if not html:
+        return None
+    text = BeautifulSoup(html, 'html.parser').get_text(separator=' ')
+    return ' '.join(text.split())
+
+def html_to_text(html: Optional[str]) -> Optional[str]:
+    """Remove HTML tags and clean up whitespace"""
+    if not html:
+        return None
+    extractor = _TextExtractor()
+    try:
+        extractor.feed(html)
+        extractor.close()
+    except Exception:
+        # Markup html.parser gives up on; BeautifulSoup reports it the same way it always has
+        return html_to_text_bs4(html)
+    return ' '.join(' '.join(extractor.strings).split())
+
+def html_to_text_many(htmls: Sequence[Optional[str]], processes: int = 0, chunksize: int = 16) -> List[Optional[str]]:
+    """
+    html_to_text over many documents, in a pool of processes if processes > 1
+
+    Cleaning is pure CPU, so threads would not help; a pool only pays for
+    itself on bulk work such as a full sync.
+    """
+    if processes <= 1 or len(htmls) < 2 * chunksize:
+        return [html_to_text(html) for html in htmls]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(html_to_text, htmls, chunksize=chunksize))
@@ -0,0 +1,305 @@
+import asyncio
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, tuned for voice: most interesting values sit
+# between a single 20ms audio frame and a couple of seconds of dead air.
+DEFAULT_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Metrics are updated from the event loop and from worker threads (run_in_thread,
+# the KB query pool), and "+=" is not atomic across threads. Rather than lock,
+# every metric keeps one slot list per thread: a thread only ever writes its own,
+# so no update is lost, and reads add the lists up. Recording stays a dict
+# lookup and a few increments, with no lock on the audio hot path.
+
+class _PerThread:
+    """Slots of numbers kept per thread and summed on read"""
+
+    def __init__(self, size: int):
+        self._size = size
+        # By thread ident; a new thread reusing a dead one's ident carries on its slots
+        self._shards: Dict[int, List[float]] = {}
+
+    def _shard(self) -> List[float]:
+        shard = self._shards.get(threading.get_ident())
+        if shard is None:
+            shard = self._shards.setdefault(threading.get_ident(), [0] * self._size)
+        return shard
+
+    def _totals(self) -> List[float]:
+        totals = [0] * self._size
+        for shard in list(self._shards.values()):
+            # One copy per shard, so its slots are read as of one moment
+            for i, value in enumerate(list(shard)):
+                totals[i] += value
+        return totals
+
+class Counter(_PerThread):
+    """Monotonically increasing value"""
+
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._shard()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return float(self._totals()[0])
+
+class Gauge(_PerThread):
+    """
+    Value that can go up and down
+
+    inc and dec add to the calling thread's slot. set records the value
+    together with the sum of the slots at that moment, and later reads count
+    only what was added since, so an inc or dec racing a set lands either
+    before it or after it, never lost. Racing sets leave one of them.
+    """
+
+    def __init__(self):
+        super().__init__(1)
+        # (value set, sum of the slots when it was set), replaced as one
+        self._base = (0.0, 0)
+
+    def set(self, value: float) -> None:
+        self._base = (value, self._totals()[0])
+
+    def inc(self, amount: float = 1) -> None:
+        self._shard()[0] += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self._shard()[0] -= amount
+
+    @property
+    def value(self) -> float:
+        base, offset = self._base
+        return float(base + self._totals()[0] - offset)
+
+class Histogram(_PerThread):
+    """
+    Fixed-bucket histogram.
+
+    Recording is a bisect plus two increments in the calling thread's own
+    slots, with no lock, so it is cheap enough to call for every audio frame
+    on the event loop and safe to call from worker threads.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # A count per bucket, one more for values above the largest (+Inf), then the sum
+        super().__init__(len(self.buckets) + 2)
+
+    def observe(self, value: float) -> None:
+        shard = self._shard()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """
+        Bucket counts, sum and count
+
+        The count is the bucket counts added up, so the two always agree; the
+        sum may miss the value of an observation being recorded as it is read.
+        """
+        totals = self._totals()
+        counts = [int(c) for c in totals[:-1]]
+        return counts, float(totals[-1]), sum(counts)
+
+    @property
+    def counts(self) -> List[int]:
+        return self.snapshot()[0]
+
+    @property
+    def sum(self) -> float:
+        return self.snapshot()[1]
+
+    @property
+    def count(self) -> int:
+        return self.snapshot()[2]
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the wall time spent inside the block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile by linear interpolation inside the matching bucket
+
+        Returns None if nothing has been observed yet.
+        """
+        counts, _, count = self.snapshot()
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        lower = 0.0
+        for i, bucket_count in enumerate(counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if bucket_count and seen + bucket_count >= rank:
+                fraction = (rank - seen) / bucket_count
+                return lower + (upper - lower) * fraction
+            seen += bucket_count
+            lower = upper
+        return self.buckets[-1]
+
+class MetricFamily:
+    """A named metric with optional labels; each label combination is a child"""
+
+    def __init__(self, name: str, help_text: str, metric_type: str,
+                 label_names: Tuple[str, ...] = (), buckets: Sequence[float] = None):
+        self.name = name
+        self.help = help_text
+        self.type = metric_type
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self.children: Dict[Tuple[str, ...], object] = {}
+
+    def _new_child(self):
+        if self.type == "counter":
+            return Counter()
+        if self.type == "gauge":
+            return Gauge()
+        return Histogram(self.buckets or DEFAULT_LATENCY_BUCKETS)
+
+    def labels(self, *values) -> object:
+        """Get (or create) the child metric for the given label values"""
+        key = tuple(str(v) for v in values)
+        child = self.children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}, got {key}")
+            # setdefault, so two threads creating the same child end up sharing one
+            child = self.children.setdefault(key, self._new_child())
+        return child
+
+    # Shortcuts for metrics without labels
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+class MetricsRegistry:
+    """Process-wide collection of metric families"""
+
+    def __init__(self):
+        self.families: Dict[str, MetricFamily] = {}
+
+    def _get_or_create(self, name: str, help_text: str, metric_type: str,
+                       labels: Sequence[str], buckets: Sequence[float] = None) -> MetricFamily:
+        family = self.families.get(name)
+        if family is None:
+            family = MetricFamily(name, help_text, metric_type, tuple(labels), buckets)
+            self.families[name] = family
+        elif family.type != metric_type:
+            raise ValueError(f"Metric {name} already registered as {family.type}")
+        return family
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> MetricFamily:
+        return self._get_or_create(name, help_text, "counter", labels)
+
+    def gauge(self, name: str, help_text: str, labels: Sequence[str] = ()) -> MetricFamily:
+        return self._get_or_create(name, help_text, "gauge", labels)
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> MetricFamily:
+        return self._get_or_create(name, help_text, "histogram", labels, buckets)
+
+    def collect(self) -> List[MetricFamily]:
+        return list(self.families.values())
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for family in self.collect():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.type}")
+            for key, child in list(family.children.items()):
+                labels = list(zip(family.label_names, key))
+                if family.type == "histogram":
+                    counts, total, count = child.snapshot()
+                    cumulative = 0
+                    for bound, bucket_count in zip(child.buckets, counts):
+                        cumulative += bucket_count
+                        lines.append(_sample(f"{family.name}_bucket", labels + [("le", _format_value(bound))], cumulative))
+                    lines.append(_sample(f"{family.name}_bucket", labels + [("le", "+Inf")], count))
+                    lines.append(_sample(f"{family.name}_sum", labels, total))
+                    lines.append(_sample(f"{family.name}_count", labels, count))
+                else:
+                    lines.append(_sample(family.name, labels, child.value))
+        return "\n".join(lines) + "\n"
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _sample(name: str, labels: List[Tuple[str, str]], value: float) -> str:
+    if labels:
+        label_text = ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels)
+        return f"{name}{{{label_text}}} {_format_value(value)}"
+    return f"{name} {_format_value(value)}"
+
+# Shared registry used by the whole application
+registry = MetricsRegistry()
+
+EVENT_LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop woke up a periodic timer",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+PROCESS_CPU = registry.gauge(
+    "process_cpu_seconds", "User plus system CPU time used by this worker process"
+)
+
+async def monitor_event_loop_lag(interval: float = 0.1) -> None:
+    """Record event loop lag forever; run as a background task"""
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - expected))
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        PROCESS_CPU.set(time.process_time())
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics on a background thread, for processes that are not the web app (such as the KB sync)"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
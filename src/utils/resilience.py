@@ -0,0 +1,323 @@
+"""
+Timeouts, retries and circuit breakers for the services' remote dependencies.
+
+Each dependency (embeddings, Pinecone, Kayako) is a Dependency with its own
+timeout, retry policy and circuit breaker. Retries are jittered and drawn
+from one process-wide RetryBudget, so an outage cannot multiply the load on
+a struggling upstream. When a breaker is open, calls fail immediately and
+the caller's fallback is used instead of waiting on a timeout.
+"""
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Hashable, Optional
+from dotenv import load_dotenv
+from .metrics import registry
+
+DEPENDENCY_CALLS = registry.counter(
+    "dependency_calls_total", "Calls to remote dependencies by outcome (success, error, rejected, fallback)",
+    ["dependency", "outcome"]
+)
+DEPENDENCY_ATTEMPT_DURATION = registry.histogram(
+    "dependency_attempt_seconds", "Time per attempt at a remote dependency call, retries included", ["dependency"]
+)
+DEPENDENCY_RETRIES = registry.counter(
+    "dependency_retries_total", "Retries of remote dependency calls", ["dependency"]
+)
+RETRY_BUDGET_EXHAUSTED = registry.counter(
+    "retry_budget_exhausted_total", "Retries skipped because the retry budget was spent", ["dependency"]
+)
+CIRCUIT_STATE = registry.gauge(
+    "circuit_breaker_state", "Circuit breaker state: 0 closed, 1 half open, 2 open", ["dependency"]
+)
+
+class CircuitOpenError(Exception):
+    """The dependency's circuit breaker is open, so the call was not attempted"""
+
+class DeadlineExceeded(TimeoutError):
+    """The work's deadline passed before it finished"""
+
+class Deadline:
+    """
+    A point in time by which a piece of work must be done
+
+    Passed down through a tool call so each step caps its own timeouts to
+    what is left instead of starting a full-length attempt it cannot finish.
+    """
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def cap(self, timeout: float) -> float:
+        """The timeout to use for a step that would normally get `timeout`"""
+        return min(timeout, self.remaining())
+
+    def check(self, what: str = "work") -> None:
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline passed before {what}")
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether retrying could help
+
+    Errors carrying an HTTP status (requests, OpenAI and Pinecone all attach
+    one) are transient for 408, 429 and 5xx; errors without one are
+    timeouts and connection failures, which are.
+    """
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    response = getattr(error, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    if isinstance(status, int):
+        return status in (408, 429) or status >= 500
+    return True
+
+class RetryBudget:
+    """
+    Allow retries up to a fraction of recent requests
+
+    Every first attempt deposits ratio tokens and every retry spends one, so
+    retries stay at most ~ratio of traffic; min_per_second keeps a trickle
+    of retries available when traffic is low.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_tokens: float = 20.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._refilled_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount: float) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + amount + (now - self._refilled_at) * self.min_per_second)
+        self._refilled_at = now
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._refill(self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            self._refill(0.0)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+class CircuitBreaker:
+    """
+    Open after too many recent calls failed or were slow
+
+    Looks at the last `window` calls once at least min_calls were made.
+    After open_seconds one probe call is let through (half open); it closes
+    the breaker if it succeeds and reopens it if not.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 10, failure_rate: float = 0.5,
+                 slow_call_seconds: Optional[float] = None, slow_call_rate: float = 0.8,
+                 open_seconds: float = 10.0):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self._outcomes = deque(maxlen=window)  # (failed, slow) per call
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(name).set(self.CLOSED)
+
+    @property
+    def state(self) -> int:
+        return self._state
+
+    def _set_state(self, state: int) -> None:
+        if state != self._state:
+            print(f"Circuit breaker for {self.name}: {('closed', 'half open', 'open')[state]}")
+        self._state = state
+        CIRCUIT_STATE.labels(self.name).set(state)
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._set_state(self.HALF_OPEN)
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, failed: bool, duration: float) -> None:
+        slow = self.slow_call_seconds is not None and duration > self.slow_call_seconds
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probing = False
+                if failed or slow:
+                    self._open()
+                else:
+                    self._outcomes.clear()
+                    self._set_state(self.CLOSED)
+                return
+            self._outcomes.append((failed, slow))
+            calls = len(self._outcomes)
+            if self._state == self.CLOSED and calls >= self.min_calls:
+                failures = sum(1 for f, _ in self._outcomes if f)
+                slow_calls = sum(1 for _, s in self._outcomes if s)
+                if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_call_rate:
+                    self._open()
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self._set_state(self.OPEN)
+
+class Dependency:
+    """A remote dependency with a timeout, a retry policy and a circuit breaker"""
+
+    def __init__(self, name: str, timeout: float, retries: int = 1, backoff: float = 0.1,
+                 max_backoff: float = 1.0, breaker: CircuitBreaker = None, budget: RetryBudget = None):
+        self.name = name
+        # Passed to the client library by the caller; every call should use it
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker(name)
+        self.budget = budget or retry_budget
+
+    def timeout_for(self, deadline: Optional[Deadline]) -> float:
+        """This dependency's timeout, capped to what is left of the deadline"""
+        return deadline.cap(self.timeout) if deadline else self.timeout
+
+    def call(self, fn: Callable, *args, fallback: Callable[[], Any] = None,
+             retryable: Callable[[BaseException], bool] = is_transient,
+             deadline: Optional[Deadline] = None, **kwargs) -> Any:
+        """
+        Call fn, retrying transient errors
+
+        Errors that are not retryable count as the dependency answering and
+        are raised as they are. If the breaker is open, every attempt failed
+        or the deadline passed, fallback() is returned when given; otherwise
+        the error (CircuitOpenError for an open breaker, DeadlineExceeded for
+        the deadline) is raised. fn should use timeout_for(deadline) as its
+        own timeout.
+        """
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            if deadline and deadline.expired:
+                return self._fall_back(fallback, DeadlineExceeded(f"Deadline passed before calling {self.name}"))
+            if not self.breaker.allow():
+                DEPENDENCY_CALLS.labels(self.name, "rejected").inc()
+                return self._fall_back(fallback, CircuitOpenError(f"{self.name} circuit breaker is open"))
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                duration = time.perf_counter() - started
+                DEPENDENCY_ATTEMPT_DURATION.labels(self.name).observe(duration)
+                transient = retryable(e)
+                self.breaker.record(transient, duration)
+                if not transient:
+                    DEPENDENCY_CALLS.labels(self.name, "success").inc()
+                    raise
+                DEPENDENCY_CALLS.labels(self.name, "error").inc()
+                if attempt >= self.retries:
+                    return self._fall_back(fallback, e)
+                if not self.budget.try_spend():
+                    RETRY_BUDGET_EXHAUSTED.labels(self.name).inc()
+                    return self._fall_back(fallback, e)
+                attempt += 1
+                # Full jitter, so callers that failed together do not retry together
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                if deadline and delay >= deadline.remaining():
+                    return self._fall_back(fallback, e)
+                DEPENDENCY_RETRIES.labels(self.name).inc()
+                time.sleep(delay)
+                continue
+            duration = time.perf_counter() - started
+            DEPENDENCY_ATTEMPT_DURATION.labels(self.name).observe(duration)
+            self.breaker.record(False, duration)
+            DEPENDENCY_CALLS.labels(self.name, "success").inc()
+            return result
+
+    def _fall_back(self, fallback: Optional[Callable[[], Any]], error: Exception) -> Any:
+        if fallback is None:
+            raise error
+        print(f"{self.name} unavailable ({error!r}), using fallback")
+        DEPENDENCY_CALLS.labels(self.name, "fallback").inc()
+        return fallback()
+
+class FallbackCache:
+    """Small thread-safe LRU of recent good answers, to serve while a dependency is down"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+# Shared by every dependency, so retries across all of them stay bounded
+retry_budget = RetryBudget()
+
+# Defaults per dependency; each can be overridden with <NAME>_TIMEOUT_SECONDS,
+# <NAME>_RETRIES and <NAME>_SLOW_CALL_SECONDS
+DEPENDENCY_DEFAULTS = {
+    "embeddings": {"timeout": 2.0, "retries": 1, "slow_call_seconds": 1.0},
+    "pinecone": {"timeout": 1.5, "retries": 1, "slow_call_seconds": 0.8},
+    "kayako": {"timeout": 5.0, "retries": 2, "slow_call_seconds": 3.0},
+}
+
+_dependencies: Dict[str, Dependency] = {}
+_dependencies_lock = threading.Lock()
+
+def dependency(name: str) -> Dependency:
+    """The process-wide Dependency for a name in DEPENDENCY_DEFAULTS"""
+    with _dependencies_lock:
+        if name not in _dependencies:
+            load_dotenv()
+            defaults = DEPENDENCY_DEFAULTS[name]
+            prefix = name.upper()
+            slow = float(os.getenv(f'{prefix}_SLOW_CALL_SECONDS', defaults["slow_call_seconds"]))
+            _dependencies[name] = Dependency(
+                name,
+                timeout=float(os.getenv(f'{prefix}_TIMEOUT_SECONDS', defaults["timeout"])),
+                retries=int(os.getenv(f'{prefix}_RETRIES', defaults["retries"])),
+                breaker=CircuitBreaker(name, slow_call_seconds=slow)
+            )
+        return _dependencies[name]
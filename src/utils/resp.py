@@ -0,0 +1,136 @@
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Sequence
+from urllib.parse import urlparse
+
+class RespError(Exception):
+    """An error reply from the server"""
+
+class RespClient:
+    """
+    Minimal blocking client for the Redis protocol (RESP2).
+
+    Enough for the conversation store: single commands, pipelines and
+    MULTI/EXEC transactions. One connection, shared between threads under a
+    lock, reconnected on the next command after a network error.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, db: int = 0,
+                 password: Optional[str] = None, timeout: float = 2.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float = 2.0) -> "RespClient":
+        """Build a client from redis://[:password@]host[:port][/db]"""
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(parsed.hostname or "127.0.0.1", parsed.port or 6379, db, parsed.password, timeout)
+
+    def _connect(self) -> None:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+        if self.password:
+            self._roundtrip([("AUTH", self.password)])
+        if self.db:
+            self._roundtrip([("SELECT", self.db)])
+
+    def close(self) -> None:
+        with self._lock:
+            self._disconnect()
+
+    def _disconnect(self) -> None:
+        if self._sock:
+            try:
+                self._reader.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+
+    @contextmanager
+    def exclusive(self) -> Iterator["RespClient"]:
+        """Hold the connection across several calls, e.g. WATCH ... EXEC"""
+        with self._lock:
+            yield self
+
+    def execute(self, *args):
+        """Run one command and return its reply"""
+        return self.pipeline([args])[0]
+
+    def pipeline(self, commands: Sequence[Sequence]) -> List:
+        """Send several commands in one write and read all replies; error replies are returned, not raised"""
+        with self._lock:
+            if self._sock is None:
+                self._connect()
+            try:
+                return self._roundtrip(commands, raise_errors=False)
+            except (OSError, ConnectionError):
+                self._disconnect()
+                raise
+
+    def transaction(self, commands: Sequence[Sequence]) -> Optional[List]:
+        """
+        Run commands atomically in MULTI/EXEC
+
+        Returns the replies, or None if a key WATCHed on this connection
+        changed; wrap WATCH, the reads and this call in exclusive().
+        """
+        replies = self.pipeline([("MULTI",)] + [tuple(c) for c in commands] + [("EXEC",)])
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies[-1]
+
+    def _roundtrip(self, commands: Sequence[Sequence], raise_errors: bool = True) -> List:
+        self._sock.sendall(b"".join(_encode(command) for command in commands))
+        replies = [self._read_reply() for _ in commands]
+        if raise_errors:
+            for reply in replies:
+                if isinstance(reply, RespError):
+                    raise reply
+        return replies
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            return RespError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            if count < 0:
+                return None
+            return [self._read_reply() for _ in range(count)]
+        raise ConnectionError(f"Unexpected reply from server: {line!r}")
+
+def _encode(command: Sequence) -> bytes:
+    parts = [b"*%d\r\n" % len(command)]
+    for arg in command:
+        if isinstance(arg, bytes):
+            data = arg
+        else:
+            data = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
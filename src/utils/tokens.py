@@ -0,0 +1,64 @@
+import re
+import threading
+from typing import Dict, List
+
+_SENTENCE_END = re.compile(r"[.!?](?=\s|$)")
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken, or estimates them when its encoding is unavailable
+
+    tiktoken downloads its encodings on first use, which fails on hosts
+    without internet access; those fall back to ~4 characters per token.
+    exact says which: anything that must come out the same on every host
+    (chunk boundaries, and so vector ids) should check it.
+    """
+
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, encoding_name: str = "o200k_base"):
+        self.encoding_name = encoding_name
+        try:
+            import tiktoken
+            self.encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            print(f"tiktoken encoding {encoding_name} unavailable ({e!r}), estimating token counts")
+            self.encoding = None
+
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return -(-len(text) // self.CHARS_PER_TOKEN)
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, tokens: int) -> str:
+        """The longest prefix of text within `tokens`, ending at a sentence if there is one"""
+        if self.encoding is None:
+            cut = text[:tokens * self.CHARS_PER_TOKEN]
+        else:
+            cut = self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:tokens])
+        if len(cut) == len(text):
+            return text
+        ends = [m.end() for m in _SENTENCE_END.finditer(cut)]
+        return cut[:ends[-1]] if ends else cut.rstrip() + "..."
+
+    def split(self, text: str, tokens: int) -> List[str]:
+        """text cut into consecutive pieces of at most `tokens` each, for text with no better place to cut"""
+        if self.encoding is None:
+            size = tokens * self.CHARS_PER_TOKEN
+            return [text[i:i + size] for i in range(0, len(text), size)]
+        encoded = self.encoding.encode(text, disallowed_special=())
+        return [self.encoding.decode(encoded[i:i + tokens]) for i in range(0, len(encoded), tokens)]
+
+_counters: Dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+def token_counter(encoding_name: str = "o200k_base") -> TokenCounter:
+    """The process-wide TokenCounter for an encoding, so each encoding is loaded (or given up on) once"""
+    with _counters_lock:
+        if encoding_name not in _counters:
+            _counters[encoding_name] = TokenCounter(encoding_name)
+        return _counters[encoding_name]
@@ -0,0 +1,289 @@
+import abc
+import asyncio
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+from dotenv import load_dotenv
+
+class Trace:
+    """All spans recorded for one call; exported together when the root span ends"""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+
+class Span:
+    """A timed operation inside a trace"""
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start", "end_time",
+                 "attributes", "thread_id", "task_name")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: Dict):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end_time: Optional[float] = None
+        self.attributes = attributes
+        self.thread_id = threading.get_ident()
+        self.task_name = _current_task_name()
+        # list.append is atomic, so spans finishing in worker threads are safe to record
+        trace.spans.append(self)
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end_time is None else self.end_time - self.start
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def set_trace_id(self, trace_id: str) -> None:
+        """Rename the whole trace, e.g. once a call's stream SID is known"""
+        if trace_id:
+            self.trace.trace_id = trace_id
+
+    def end(self) -> None:
+        if self.end_time is None:
+            self.end_time = time.time()
+
+class _NoopSpan:
+    """Stands in for a span when the trace is not sampled, so callers never need to check"""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def set_trace_id(self, trace_id: str) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+def _current_task_name() -> Optional[str]:
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        return None
+    return task.get_name() if task else None
+
+class SpanExporter(abc.ABC):
+    """Receives each sampled trace once its root span has ended"""
+
+    @abc.abstractmethod
+    def export(self, trace: Trace) -> None:
+        """Called on the thread that ended the root span, usually the event loop"""
+
+    def shutdown(self) -> None:
+        pass
+
+class ConsoleExporter(SpanExporter):
+    """Prints an indented summary of each trace"""
+
+    def export(self, trace: Trace) -> None:
+        children: Dict[Optional[str], List[Span]] = {}
+        for span in sorted(trace.spans, key=lambda s: s.start):
+            children.setdefault(span.parent_id, []).append(span)
+
+        lines = [f"Trace {trace.trace_id}"]
+
+        def walk(parent_id: Optional[str], depth: int):
+            for span in children.get(parent_id, []):
+                duration = span.duration
+                took = f"{duration * 1000:.1f}ms" if duration is not None else "unfinished"
+                lines.append(f"{'  ' * (depth + 1)}{span.name} {took}")
+                walk(span.span_id, depth + 1)
+
+        walk(None, 0)
+        print("\n".join(lines))
+
+class ChromeTraceFileExporter(SpanExporter):
+    """
+    Writes one JSON file per trace in the Chrome trace event format.
+
+    Open the files in chrome://tracing or https://ui.perfetto.dev. Each asyncio
+    task or worker thread gets its own row so concurrent work does not overlap.
+    Files are written on a background thread so the end of a call never waits
+    on the disk; traces are dropped if the queue is full.
+    """
+
+    def __init__(self, directory: str = "traces", queue_size: int = 100):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Write the traces that are queued and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                break
+            try:
+                self._write(trace)
+            except Exception as e:
+                print(f"Error writing trace {trace.trace_id}: {e}")
+
+    def _write(self, trace: Trace) -> None:
+        rows: Dict[tuple, int] = {}
+        events = []
+        for span in sorted(trace.spans, key=lambda s: s.start):
+            track = (span.thread_id, span.task_name)
+            if track not in rows:
+                rows[track] = len(rows) + 1
+                events.append({
+                    "name": "thread_name", "ph": "M", "pid": 1, "tid": rows[track],
+                    "args": {"name": span.task_name or f"thread-{span.thread_id}"}
+                })
+            end_time = span.end_time if span.end_time is not None else span.start
+            events.append({
+                "name": span.name,
+                "cat": span.name.split(".", 1)[0],
+                "ph": "X",
+                "ts": int(span.start * 1_000_000),
+                "dur": int((end_time - span.start) * 1_000_000),
+                "pid": 1,
+                "tid": rows[track],
+                "args": dict(span.attributes, span_id=span.span_id, parent_id=span.parent_id)
+            })
+
+        safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in trace.trace_id)
+        path = os.path.join(self.directory, f"{safe_id}.json")
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "otherData": {"trace_id": trace.trace_id}}, f)
+
+class Tracer:
+    """
+    Minimal in-process tracer.
+
+    The active span lives in a context variable, so child spans attach to the
+    right parent across asyncio tasks and run_in_thread calls. Sampling is
+    decided once per trace at the root; unsampled traces hand out a no-op span
+    and cost a single context variable lookup per span.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, exporters: List[SpanExporter] = None):
+        self.sample_rate = sample_rate
+        self.exporters: List[SpanExporter] = list(exporters or [])
+        self._current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+            "current_span", default=None
+        )
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """
+        Build a tracer from TRACE_SAMPLE_RATE (0-1) and TRACE_EXPORTER
+
+        TRACE_EXPORTER is a comma separated list of "console" and "chrome";
+        chrome traces are written to TRACE_DIR.
+        """
+        load_dotenv()
+        exporters = []
+        for name in os.getenv("TRACE_EXPORTER", "").split(","):
+            name = name.strip().lower()
+            if name == "console":
+                exporters.append(ConsoleExporter())
+            elif name == "chrome":
+                exporters.append(ChromeTraceFileExporter(os.getenv("TRACE_DIR", "traces")))
+            elif name:
+                print(f"Unknown trace exporter '{name}', ignoring")
+        return cls(float(os.getenv("TRACE_SAMPLE_RATE", "0")), exporters)
+
+    def add_exporter(self, exporter: SpanExporter) -> None:
+        self.exporters.append(exporter)
+
+    def current_span(self):
+        return self._current.get() or NOOP_SPAN
+
+    @contextmanager
+    def trace(self, name: str, trace_id: str = None, **attributes) -> Iterator:
+        """Start a new trace; the root span is exported with all its children on exit"""
+        if not self.exporters or random.random() >= self.sample_rate:
+            # Shield the block from any trace it happens to be nested in
+            token = self._current.set(None)
+            try:
+                yield NOOP_SPAN
+            finally:
+                self._current.reset(token)
+            return
+
+        trace = Trace(trace_id or uuid.uuid4().hex)
+        root = Span(trace, name, None, attributes)
+        token = self._current.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.set_attribute("error", repr(e))
+            raise
+        finally:
+            self._current.reset(token)
+            root.end()
+            self._export(trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator:
+        """Time the block as a child of the current span, if the current trace is sampled"""
+        parent = self._current.get()
+        if parent is None:
+            yield NOOP_SPAN
+            return
+
+        span = Span(parent.trace, name, parent.span_id, attributes)
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_attribute("error", repr(e))
+            raise
+        finally:
+            self._current.reset(token)
+            span.end()
+
+    def start_span(self, name: str, **attributes):
+        """
+        Start a child of the current span without making it current
+
+        For operations that begin and end in different callbacks, such as a
+        model response; the caller must call end() on the result.
+        """
+        parent = self._current.get()
+        if parent is None:
+            return NOOP_SPAN
+        return Span(parent.trace, name, parent.span_id, attributes)
+
+    def _export(self, trace: Trace) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(trace)
+            except Exception as e:
+                print(f"Error exporting trace {trace.trace_id}: {e}")
+
+    def shutdown(self) -> None:
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+# Shared tracer used by the whole application
+tracer = Tracer.from_env()